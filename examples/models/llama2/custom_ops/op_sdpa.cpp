@@ -16,6 +16,7 @@
 #include <executorch/runtime/core/exec_aten/util/scalar_type_util.h>
 
 #include <array>
+#include <cmath>
 #include <vector>
 
 #ifdef ET_USE_THREADPOOL
@@ -177,6 +178,56 @@ inline void fill_stub(scalar_t* data, scalar_t val, int64_t size) {
   }
 }
 
+/*
+KV cache quantized to int8, or to int4 packed in pairs along the head dim, with
+a float scale per token and head. Values are symmetric: an int8 q stands for
+q * scale, and a byte b of the int4 cache stands for ((b >> 4) - 8) * scale
+at even indices and ((b & 0xF) - 8) * scale at odd ones, like the weights of
+the 4 bit ops.
+
+The caches are [B, max_seq_len, num heads, head dim] (head dim / 2 for int4)
+and the scales [B, max_seq_len, num heads].
+*/
+struct QuantizedKV {
+  const Tensor& key_scales;
+  const Tensor& value_scales;
+  int64_t bits;
+};
+
+constexpr float kInt8Max = 127;
+constexpr float kInt4Max = 7;
+
+// Dequantizes num_rows rows of head_size values of a quantized cache into out,
+// which is [num_rows, head_size].
+template <typename accum_t>
+void dequantize_kv_block(
+    const uint8_t* data,
+    int64_t row_stride,
+    const float* scales,
+    int64_t scale_stride,
+    int64_t num_rows,
+    int64_t head_size,
+    int64_t bits,
+    accum_t* out) {
+  for (int64_t row = 0; row < num_rows; ++row) {
+    const uint8_t* row_data = data + row * row_stride;
+    const accum_t scale = static_cast<accum_t>(scales[row * scale_stride]);
+    accum_t* out_row = out + row * head_size;
+    if (bits == 8) {
+      const int8_t* values = reinterpret_cast<const int8_t*>(row_data);
+      for (int64_t d = 0; d < head_size; ++d) {
+        out_row[d] = static_cast<accum_t>(values[d]) * scale;
+      }
+    } else {
+      for (int64_t d = 0; d < head_size / 2; ++d) {
+        const uint8_t packed = row_data[d];
+        out_row[2 * d] = static_cast<accum_t>((packed >> 4) - 8) * scale;
+        out_row[2 * d + 1] = static_cast<accum_t>((packed & 0xF) - 8) * scale;
+      }
+    }
+  }
+}
+
 /*
 Note on start_pos as a parameter:
 What is start_pos?
@@ -224,7 +275,8 @@ void cpu_flash_attention(
     const optional<Tensor>& attn_mask,
     const optional<double>& scale,
     bool is_with_kv_cache = false,
-    const int64_t start_pos = 0) {
+    const int64_t start_pos = 0,
+    const QuantizedKV* quantized_kv = nullptr) {
   (void)dropout_p;
   // Query (Batch x Num_heads  x Q_seq_len  x Dim_per_head)
   // Key   (Batch x Num_heads  x KV_seq_len x Dim_per_head)
@@ -256,6 +308,7 @@ void cpu_flash_attention(
   int64_t qSize = query.size(2);
   int64_t headSize = query.size(3);
   int64_t kvSize = value.size(2);
+  const bool is_quantized_kv = quantized_kv != nullptr;
   int64_t num_heads_kv = key.size(1);
 
   if (is_with_kv_cache) {
@@ -339,6 +392,19 @@ void cpu_flash_attention(
     oStrideM = strides[1];
   }
 
+  // Strides of the scales of a quantized cache, which are [B, seq len, num
+  // heads].
+  int64_t sStrideB = 0;
+  int64_t sStrideH = 0;
+  int64_t sStrideN = 0;
+  if (is_quantized_kv) {
+    ET_CHECK_MSG(is_with_kv_cache, "Quantized KV requires a KV cache layout");
+    strides = quantized_kv->key_scales.strides();
+    sStrideB = strides[0];
+    sStrideN = strides[1];
+    sStrideH = strides[2];
+  }
+
   int64_t mStrideB = 0;
   int64_t mStrideH = 0;
   int64_t mStrideM = 0;
@@ -374,7 +440,9 @@ void cpu_flash_attention(
       /* qk     */ qSplitSize * kvSplitSize +
       /* qk_max */ qSplitSize +
       /* qk_sum */ qSplitSize +
-      /* dst    */ qSplitSize * headSize;
+      /* dst    */ qSplitSize * headSize +
+      /* k, v dequantized */
+      (is_quantized_kv ? 2 * kvSplitSize * headSize : 0);
 
   int64_t size_bytes = size_per_thread * num_thread * query.element_size();
   std::vector<char> buf_vec(size_bytes);
@@ -389,8 +457,20 @@ void cpu_flash_attention(
 
   // Data ptrs
   const scalar_t* q_data = query.const_data_ptr<scalar_t>();
-  const scalar_t* k_data = key.const_data_ptr<scalar_t>();
-  const scalar_t* v_data = value.const_data_ptr<scalar_t>();
+  const scalar_t* k_data =
+      is_quantized_kv ? nullptr : key.const_data_ptr<scalar_t>();
+  const scalar_t* v_data =
+      is_quantized_kv ? nullptr : value.const_data_ptr<scalar_t>();
+  const uint8_t* k_quantized_data =
+      is_quantized_kv ? key.const_data_ptr<uint8_t>() : nullptr;
+  const uint8_t* v_quantized_data =
+      is_quantized_kv ? value.const_data_ptr<uint8_t>() : nullptr;
+  const float* k_scales_data = is_quantized_kv
+      ? quantized_kv->key_scales.const_data_ptr<float>()
+      : nullptr;
+  const float* v_scales_data = is_quantized_kv
+      ? quantized_kv->value_scales.const_data_ptr<float>()
+      : nullptr;
   const accum_t* mask_data =
       has_attn_mask ? attn_mask.value().const_data_ptr<accum_t>() : nullptr;
   scalar_t* out_data = output.mutable_data_ptr<scalar_t>();
@@ -407,6 +487,10 @@ void cpu_flash_attention(
     accum_t* qk_max_data = qk_data + qSplitSize * kvSplitSize;
     accum_t* qk_sum_data = qk_max_data + qSplitSize;
     accum_t* dst_data = qk_sum_data + qSplitSize;
+    // Blocks of the quantized cache are dequantized here right before they
+    // are used, so the cache is never dequantized as a whole.
+    accum_t* k_dequantized_data = dst_data + qSplitSize * headSize;
+    accum_t* v_dequantized_data = k_dequantized_data + kvSplitSize * headSize;
     scalar_t* qk_reduced_data = is_reduced_type
         ? buf_reduced_data + ompIdx * qSplitSize * kvSplitSize
         : nullptr;
@@ -421,6 +505,24 @@ void cpu_flash_attention(
       auto j_kv = j / num_reps;
       for (int64_t n = 0; n < num_keys; n += kvSplitSize) {
         int64_t kvBlockSize = std::min(kvSplitSize, kvSize - n);
+        const accum_t* k_block;
+        int64_t k_block_stride;
+        if (is_quantized_kv) {
+          dequantize_kv_block(
+              k_quantized_data + i * kStrideB + j_kv * kStrideH + n * kStrideN,
+              kStrideN,
+              k_scales_data + i * sStrideB + j_kv * sStrideH + n * sStrideN,
+              sStrideN,
+              kvBlockSize,
+              headSize,
+              quantized_kv->bits,
+              k_dequantized_data);
+          k_block = k_dequantized_data;
+          k_block_stride = headSize;
+        } else {
+          k_block = k_data + i * kStrideB + j_kv * kStrideH + n * kStrideN;
+          k_block_stride = kStrideN;
+        }
         // Calculate scale * q @ k.T
         fill_stub(qk_data, static_cast<accum_t>(0), qSplitSize * kvSplitSize);
         ::executorch::cpublas::gemm(
@@ -430,8 +532,8 @@ void cpu_flash_attention(
             qBlockSize,
             headSize,
             static_cast<accum_t>(1),
-            k_data + i * kStrideB + j_kv * kStrideH + n * kStrideN,
-            kStrideN,
+            k_block,
+            k_block_stride,
             q_data + i * qStrideB + j * qStrideH + m * qStrideM,
             qStrideM,
             static_cast<accum_t>(0),
@@ -519,6 +621,24 @@ void cpu_flash_attention(
                 headSize);
           }
         }
+        const accum_t* v_block;
+        int64_t v_block_stride;
+        if (is_quantized_kv) {
+          dequantize_kv_block(
+              v_quantized_data + i * vStrideB + j_kv * vStrideH + n * vStrideN,
+              vStrideN,
+              v_scales_data + i * sStrideB + j_kv * sStrideH + n * sStrideN,
+              sStrideN,
+              kvBlockSize,
+              headSize,
+              quantized_kv->bits,
+              v_dequantized_data);
+          v_block = v_dequantized_data;
+          v_block_stride = headSize;
+        } else {
+          v_block = v_data + i * vStrideB + j_kv * vStrideH + n * vStrideN;
+          v_block_stride = vStrideN;
+        }
         // Calculate Softmax(q @ k.T) @ v
         ::executorch::cpublas::gemm(
             ::executorch::cpublas::TransposeType::NoTranspose,
@@ -527,8 +647,8 @@ void cpu_flash_attention(
             qBlockSize,
             kvBlockSize,
             static_cast<accum_t>(1),
-            v_data + i * vStrideB + j_kv * vStrideH + n * vStrideN,
-            vStrideN,
+            v_block,
+            v_block_stride,
             conditional_data_ptr(qk_data, qk_reduced_data),
             kvBlockSize,
             n == 0 ? static_cast<accum_t>(0) : static_cast<accum_t>(1),
@@ -690,6 +810,97 @@ void update_cache(
       (uint8_t*)cache_data + pos_offset_bytes, projected_value_data, num_bytes);
 }
 
+bool validate_quantized_cache_params(
+    const Tensor& projected_value,
+    const Tensor& cache,
+    const Tensor& scales) {
+  ET_LOG_MSG_AND_RETURN_IF_FALSE(
+      projected_value.scalar_type() == ScalarType::Float,
+      "projected key and value must be Float type");
+
+  ET_LOG_MSG_AND_RETURN_IF_FALSE(
+      (cache.scalar_type() == ScalarType::Char &&
+       cache.size(3) == projected_value.size(3)) ||
+          (cache.scalar_type() == ScalarType::Byte &&
+           cache.size(3) * 2 == projected_value.size(3)),
+      "quantized cache must be Char with the head dim of the projected value,"
+      " or Byte with half of it for int4");
+
+  ET_LOG_MSG_AND_RETURN_IF_FALSE(
+      scales.scalar_type() == ScalarType::Float, "scales must be Float type");
+
+  ET_LOG_MSG_AND_RETURN_IF_FALSE(
+      scales.dim() == 3 && scales.size(0) == cache.size(0) &&
+          scales.size(1) == cache.size(1) && scales.size(2) == cache.size(2),
+      "scales must be [batch size, max seq len, num heads] like the cache");
+
+  ET_LOG_MSG_AND_RETURN_IF_FALSE(
+      is_contiguous_dim_order(scales.dim_order().data(), scales.dim()),
+      "scales must be in contiguous dim order");
+
+  return true;
+}
+
+// Quantizes projected_value, which is [1, seq_len, num heads, head dim], into
+// the cache at start_pos with a scale per token and head.
+void update_quantized_cache(
+    const Tensor& projected_value,
+    const Tensor& cache,
+    const Tensor& scales,
+    int64_t start_pos) {
+  ET_CHECK_MSG(
+      projected_value.size(0) == 1,
+      "projected_value must have batch size of 1");
+  ET_CHECK_MSG(cache.size(0) == 1, "cache must have batch size of 1");
+  ET_CHECK_MSG(
+      is_contiguous_dim_order(
+          projected_value.dim_order().data(), projected_value.dim()),
+      "projected value must be in contiguous dim order");
+  const bool is_int4 = cache.scalar_type() == ScalarType::Byte;
+  const float q_max = is_int4 ? kInt4Max : kInt8Max;
+  const int64_t seq_len = projected_value.size(1);
+  const int64_t num_heads = projected_value.size(2);
+  const int64_t head_size = projected_value.size(3);
+  const int64_t cache_row_size = cache.size(3);
+
+  const float* values = projected_value.const_data_ptr<float>();
+  uint8_t* cache_data = cache.mutable_data_ptr<uint8_t>();
+  float* scales_data = scales.mutable_data_ptr<float>();
+  ET_CHECK_MSG(values != nullptr, "projected_value data is null");
+  ET_CHECK_MSG(cache_data != nullptr, "cache data is null");
+  ET_CHECK_MSG(scales_data != nullptr, "scales data is null");
+
+  for (int64_t s = 0; s < seq_len; ++s) {
+    for (int64_t h = 0; h < num_heads; ++h) {
+      const float* row = values + (s * num_heads + h) * head_size;
+      float abs_max = 0;
+      for (int64_t d = 0; d < head_size; ++d) {
+        abs_max = std::max(abs_max, std::abs(row[d]));
+      }
+      const float scale = abs_max > 0 ? abs_max / q_max : 1.0f;
+      const int64_t cache_row = (start_pos + s) * num_heads + h;
+      scales_data[cache_row] = scale;
+      uint8_t* out = cache_data + cache_row * cache_row_size;
+      auto quantize = [&](float value) {
+        return static_cast<int32_t>(std::max(
+            -q_max, std::min(q_max, std::nearbyint(value / scale))));
+      };
+      if (is_int4) {
+        for (int64_t d = 0; d < head_size / 2; ++d) {
+          out[d] = static_cast<uint8_t>(
+              ((quantize(row[2 * d]) + 8) << 4) |
+              (quantize(row[2 * d + 1]) + 8));
+        }
+      } else {
+        int8_t* out_int8 = reinterpret_cast<int8_t*>(out);
+        for (int64_t d = 0; d < head_size; ++d) {
+          out_int8[d] = static_cast<int8_t>(quantize(row[d]));
+        }
+      }
+    }
+  }
+}
+
 } // anonymous namespace
 
 Tensor& flash_attention_kernel_out(
@@ -917,6 +1128,176 @@ Tensor& sdpa_with_kv_cache_out(
       });
   return output;
 }
+
+/*
+  Same as sdpa_with_kv_cache_out, with a KV cache quantized to int8, or to int4
+  packed in pairs along the head dim, and a float scale per token and head.
+
+  @param[in] key_cache Cache of previous k_projected. Char tensor of format
+  [batch size, max_seq_len, num heads, head dim], or Byte tensor of format
+  [batch size, max_seq_len, num heads, head dim / 2] for int4.
+  @param[in] key_scales Scales of key_cache. Format [batch size, max_seq_len,
+  num heads]
+  @param[in] value_cache, value_scales Same for v_projected.
+
+  k_projected and v_projected are quantized into the caches, and blocks of the
+  caches are dequantized inside the attention loop.
+*/
+Tensor& sdpa_with_quantized_kv_cache_out(
+    RuntimeContext& ctx,
+    const Tensor& q_projected,
+    const Tensor& k_projected,
+    const Tensor& v_projected,
+    Tensor& key_cache,
+    Tensor& value_cache,
+    Tensor& key_scales,
+    Tensor& value_scales,
+    const int64_t start_pos,
+    const int64_t seq_len,
+    const optional<Tensor>& attn_mask,
+    const double dropout_p,
+    const bool is_causal,
+    // @lint-ignore CLANGTIDY facebook-hte-ParameterMightThrowOnCopy
+    const optional<double> scale,
+    Tensor& output) {
+  (void)ctx;
+  ET_KERNEL_CHECK(
+      ctx,
+      validate_cache_params(key_cache, value_cache, start_pos, seq_len),
+      InvalidArgument,
+      output);
+
+  ET_KERNEL_CHECK(
+      ctx,
+      validate_quantized_cache_params(k_projected, key_cache, key_scales) &&
+          validate_quantized_cache_params(
+              v_projected, value_cache, value_scales),
+      InvalidArgument,
+      output);
+
+  ET_KERNEL_CHECK_MSG(
+      ctx,
+      key_cache.scalar_type() == value_cache.scalar_type(),
+      InvalidArgument,
+      output,
+      "key cache and value cache must have the same type");
+
+  ET_KERNEL_CHECK_MSG(
+      ctx,
+      !attn_mask.has_value() || !is_causal,
+      InvalidArgument,
+      output,
+      "attn_mask and is_causal cannot be set at the same time");
+
+  ET_CHECK_MSG(q_projected.dim() == 4, "query must be a 4D tensor");
+
+  update_quantized_cache(k_projected, key_cache, key_scales, start_pos);
+  update_quantized_cache(v_projected, value_cache, value_scales, start_pos);
+
+  auto q_seq_len = q_projected.size(1);
+
+  std::array<exec_aten::DimOrderType, util::kKVDim> sliced_key_dim_order{
+      0, 1, 2, 3};
+  std::array<exec_aten::SizesType, util::kKVDim> sliced_key_sizes;
+  sliced_key_sizes[0] = key_cache.size(0);
+  sliced_key_sizes[1] = start_pos + seq_len;
+  sliced_key_sizes[2] = key_cache.size(2);
+  sliced_key_sizes[3] = key_cache.size(3);
+  std::array<exec_aten::StridesType, util::kKVDim> sliced_key_strides;
+  dim_order_to_stride_nocheck(
+      sliced_key_sizes.data(),
+      sliced_key_dim_order.data(),
+      util::kKVDim,
+      sliced_key_strides.data());
+  TensorImpl k_impl = TensorImpl(
+      key_cache.scalar_type(),
+      util::kKVDim,
+      sliced_key_sizes.data(),
+      key_cache.mutable_data_ptr(),
+      sliced_key_dim_order.data(),
+      sliced_key_strides.data(),
+      TensorShapeDynamism::STATIC);
+  Tensor sliced_key_cache(&k_impl);
+
+  std::array<exec_aten::DimOrderType, util::kKVDim> sliced_value_dim_order{
+      0, 1, 2, 3};
+  std::array<exec_aten::SizesType, util::kKVDim> sliced_value_sizes;
+  sliced_value_sizes[0] = value_cache.size(0);
+  sliced_value_sizes[1] = start_pos + seq_len;
+  sliced_value_sizes[2] = value_cache.size(2);
+  sliced_value_sizes[3] = value_cache.size(3);
+  std::array<exec_aten::StridesType, util::kKVDim> sliced_value_strides;
+  dim_order_to_stride_nocheck(
+      sliced_value_sizes.data(),
+      sliced_value_dim_order.data(),
+      util::kKVDim,
+      sliced_value_strides.data());
+  TensorImpl value_impl = TensorImpl(
+      value_cache.scalar_type(),
+      util::kKVDim,
+      sliced_value_sizes.data(),
+      value_cache.mutable_data_ptr(),
+      sliced_value_dim_order.data(),
+      sliced_value_strides.data(),
+      TensorShapeDynamism::STATIC);
+  Tensor sliced_value_cache(&value_impl);
+
+  const QuantizedKV quantized_kv{
+      key_scales,
+      value_scales,
+      key_cache.scalar_type() == ScalarType::Byte ? 4 : 8};
+
+  ET_KERNEL_CHECK(
+      ctx,
+      resize_tensor(output, q_projected.sizes()) == Error::Ok,
+      InvalidArgument,
+      output);
+
+  ET_SWITCH_FLOAT_TYPES(
+      q_projected.scalar_type(), ctx, "flash_attention", CTYPE, [&] {
+        if (q_seq_len >= 768) {
+          cpu_flash_attention<CTYPE, 256, 512>(
+              output,
+              q_projected,
+              sliced_key_cache,
+              sliced_value_cache,
+              dropout_p,
+              is_causal,
+              attn_mask,
+              scale,
+              true,
+              start_pos,
+              &quantized_kv);
+        } else if (q_seq_len >= 192) {
+          cpu_flash_attention<CTYPE, 64, 512>(
+              output,
+              q_projected,
+              sliced_key_cache,
+              sliced_value_cache,
+              dropout_p,
+              is_causal,
+              attn_mask,
+              scale,
+              true,
+              start_pos,
+              &quantized_kv);
+        } else {
+          cpu_flash_attention<CTYPE, 32, 512>(
+              output,
+              q_projected,
+              sliced_key_cache,
+              sliced_value_cache,
+              dropout_p,
+              is_causal,
+              attn_mask,
+              scale,
+              true,
+              start_pos,
+              &quantized_kv);
+        }
+      });
+  return output;
+}
 } // namespace native
 } // namespace executor
 } // namespace torch
@@ -925,3 +1306,11 @@ EXECUTORCH_LIBRARY(
     llama,
     "sdpa_with_kv_cache.out",
     torch::executor::native::sdpa_with_kv_cache_out);
+
+// EXECUTORCH_LIBRARY names its registration after the namespace, so the
+// second kernel of the namespace is registered explicitly.
+static auto res_llama_sdpa_with_quantized_kv_cache =
+    ::torch::executor::register_kernels(::torch::executor::make_boxed_kernel(
+        "llama::sdpa_with_quantized_kv_cache.out",
+        EXECUTORCH_FN(
+            torch::executor::native::sdpa_with_quantized_kv_cache_out)));
@@ -124,3 +124,58 @@ def sdpa_with_kv_cache_meta(
     )
 
     return torch.empty_like(query)
+
+
+def _validate_quantized_cache_params(key, key_cache, key_scales):
+    assert (
+        key_cache.dim() == 4
+    ), f"Expected key_cache to be 4 dimensional but got {key_cache.dim()}"
+    assert (key_cache.dtype == torch.int8 and key_cache.size(3) == key.size(3)) or (
+        key_cache.dtype == torch.uint8 and key_cache.size(3) * 2 == key.size(3)
+    ), (
+        f"Expected key_cache to be int8 with head dim {key.size(3)}, or uint8 with"
+        f" head dim {key.size(3) // 2} for int4, but got {key_cache.dtype} with head dim {key_cache.size(3)}"
+    )
+    assert (
+        key_scales.dtype == torch.float32
+    ), f"Expected scales to be float32 but got {key_scales.dtype}"
+    assert (
+        key_scales.size() == key_cache.size()[:3]
+    ), f"Expected scales of size {key_cache.size()[:3]} but got {key_scales.size()}"
+
+
+@impl(custom_ops_lib, "sdpa_with_quantized_kv_cache", "Meta")
+def sdpa_with_quantized_kv_cache_meta(
+    query,
+    key,
+    value,
+    key_cache,
+    value_cache,
+    key_scales,
+    value_scales,
+    start_pos,
+    seq_len,
+    attn_mask=None,
+    drpout_p=0.0,
+    is_causal=False,
+    scale=None,
+):
+    assert (
+        query.dim() == 4 and key.dim() == 4 and value.dim() == 4
+    ), "Expected query, key and value to be 4 dimensional"
+    assert (
+        query.dtype == torch.float32
+        and key.dtype == torch.float32
+        and value.dtype == torch.float32
+    ), "Expected query, key and value to be float32"
+    _validate_quantized_cache_params(key, key_cache, key_scales)
+    _validate_quantized_cache_params(value, value_cache, value_scales)
+    assert (
+        key_cache.dtype == value_cache.dtype
+    ), f"Key cache and value cache must have the same dtype but got {key_cache.dtype} and {value_cache.dtype}"
+    if attn_mask is not None:
+        assert (
+            attn_mask.dim() == 2
+        ), f"Expected attn_mask to be 2 dimensional but got {attn_mask.dim()} dimensions."
+
+    return torch.empty_like(query)
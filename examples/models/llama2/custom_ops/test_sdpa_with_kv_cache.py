@@ -365,3 +365,77 @@ class SDPATestWithMQA(unittest.TestCase):
             q, k, v, self.k_cache, self.v_cache, 1, 1, None, 0, False
         )
         self.assertTrue(torch.allclose(ref_output, op_output))
+
+
+def _quantize_dequantize_ref(x, bits):
+    # Symmetric quantization with a scale per token and head, as done by
+    # sdpa_with_quantized_kv_cache when writing to the cache.
+    q_max = 127 if bits == 8 else 7
+    scales = x.abs().amax(dim=-1, keepdim=True) / q_max
+    scales = torch.where(scales > 0, scales, torch.ones_like(scales))
+    return torch.clamp(torch.round(x / scales), -q_max, q_max) * scales, scales
+
+
+class SDPAWithQuantizedKVCacheTest(unittest.TestCase):
+
+    def _test_sdpa_with_quantized_kv_cache(self, bits):
+        torch.manual_seed(42)
+        n_heads_q, n_heads_kv, head_dim, max_seq_len = 8, 4, 16, 20
+        cache_dtype = torch.int8 if bits == 8 else torch.uint8
+        cache_head_dim = head_dim if bits == 8 else head_dim // 2
+        k_cache = torch.zeros(
+            (1, max_seq_len, n_heads_kv, cache_head_dim), dtype=cache_dtype
+        )
+        v_cache = torch.zeros_like(k_cache)
+        k_scales = torch.ones((1, max_seq_len, n_heads_kv))
+        v_scales = torch.ones_like(k_scales)
+        k_cache_ref = torch.zeros((1, max_seq_len, n_heads_kv, head_dim))
+        v_cache_ref = torch.zeros_like(k_cache_ref)
+        mask = torch.triu(torch.full((max_seq_len, max_seq_len), float("-inf")), 1)
+
+        start_pos = 0
+        for seq_len in [5, 1, 1, 7]:
+            q = torch.rand((1, seq_len, n_heads_q, head_dim))
+            k = torch.rand((1, seq_len, n_heads_kv, head_dim))
+            v = torch.rand((1, seq_len, n_heads_kv, head_dim))
+            k_ref, k_scales_ref = _quantize_dequantize_ref(k, bits)
+            v_ref, _ = _quantize_dequantize_ref(v, bits)
+            attn_mask = mask[start_pos : start_pos + seq_len, : start_pos + seq_len]
+            ref_output = _sdpa_with_kv_cache_ref(
+                q,
+                k_ref,
+                v_ref,
+                k_cache_ref,
+                v_cache_ref,
+                attn_mask,
+                start_pos,
+                seq_len,
+            )
+            op_output = torch.ops.llama.sdpa_with_quantized_kv_cache(
+                q,
+                k,
+                v,
+                k_cache,
+                v_cache,
+                k_scales,
+                v_scales,
+                start_pos,
+                seq_len,
+                None,
+                0,
+                True,
+            )
+            self.assertTrue(torch.allclose(ref_output, op_output, atol=1e-5))
+            self.assertTrue(
+                torch.allclose(
+                    k_scales[:, start_pos : start_pos + seq_len],
+                    k_scales_ref.squeeze(-1),
+                )
+            )
+            start_pos += seq_len
+
+    def test_sdpa_with_int8_kv_cache(self):
+        self._test_sdpa_with_quantized_kv_cache(8)
+
+    def test_sdpa_with_int4_kv_cache(self):
+        self._test_sdpa_with_quantized_kv_cache(4)
@@ -14,6 +14,13 @@ from executorch.examples.models.llama2.evaluate import EagerEvalWrapper, evaluat
 from executorch.examples.models.llama2.export_llama_lib import (
     get_quantizer_and_quant_params,
 )
+from executorch.examples.models.llama2.llama_transformer import KVCache
+from executorch.examples.models.llama2.source_transformation.quantized_kv_cache import (
+    QuantizedKVCache,
+)
+from executorch.examples.models.llama2.source_transformation.ring_kv_cache import (
+    RingKVCache,
+)
 from executorch.examples.models.llama2.tokenizer.tiktoken import Tokenizer as Tiktoken
 from executorch.examples.models.llama2.tokenizer.tokenizer import (
     Tokenizer as SentencePieceTokenizer,
@@ -40,6 +47,7 @@ class ETPybindEvalWrapper(EagerEvalWrapper):
         model: str,
         tokenizer: Union[SentencePieceTokenizer, Tiktoken],
         max_seq_length: Optional[int] = None,
+        prefill_chunk_size: Optional[int] = None,
     ):
         super().__init__(None, tokenizer, max_seq_length)
         self._model = model  # Expects model to be path to a .pte file
@@ -48,16 +56,34 @@ class ETPybindEvalWrapper(EagerEvalWrapper):
 
         self._et_model = _load_for_executorch(self._model)
         self._use_kv_cache = self._et_model.run_method("use_kv_cache")[0]
+        # Models exported with dynamic shape take several tokens per call, up
+        # to max_seq_length of them, starting at the position given by input_pos.
+        # Older .pte files lack the enable_dynamic_shape metadata method, and
+        # are prefilled one token at a time.
+        try:
+            enable_dynamic_shape = self._et_model.run_method("enable_dynamic_shape")
+            self._enable_dynamic_shape = enable_dynamic_shape[0]
+        except RuntimeError:
+            self._enable_dynamic_shape = False
+        self._prefill_chunk_size = (
+            self._max_seq_length
+            if prefill_chunk_size is None
+            else min(prefill_chunk_size, self._max_seq_length)
+        )
 
     def _model_call(self, inps):
         # Given inps (tokens), return the logits from a single forward call
         # inps: Tensor of shape (1, max_seq_len - 1)
         # logits: Tensor of shape (1, max_seq_len - 1, vocab_size)
         if self._use_kv_cache:
+            # Without dynamic shape, the model only takes one token per call.
+            chunk_size = self._prefill_chunk_size if self._enable_dynamic_shape else 1
             result_logits = []
-            for pos in range(self._max_seq_length):
+            for pos in range(0, self._max_seq_length, chunk_size):
                 pos_tensor = torch.tensor([pos], dtype=torch.int64)
-                logits = self._et_model.forward((inps[:, pos : pos + 1], pos_tensor))
+                logits = self._et_model.forward(
+                    (inps[:, pos : pos + chunk_size], pos_tensor)
+                )
                 result_logits.append(logits[0])
             return torch.cat(result_logits, dim=1)
         else:
@@ -127,6 +153,7 @@ def gen_eval_wrapper(
             # Exported model takes at most (max_seq_length - 1) tokens.
             # Note that the eager model takes at most max_seq_length tokens.
             max_seq_length=args.max_seq_length - 1,
+            prefill_chunk_size=args.prefill_chunk_size,
         )
 
     pt2e_quant_params, quantizers, quant_dtype = get_quantizer_and_quant_params(args)
@@ -188,16 +215,38 @@ def build_args_parser() -> argparse.ArgumentParser:
         default=None,
         help="[For ExecuTorch] Path to the Tokenizer binary for evaluating ExecuTorch models via runtime",
     )
+    parser.add_argument(
+        "--prefill_chunk_size",
+        type=int,
+        default=None,
+        help="[For ExecuTorch] Number of tokens passed to each forward call of a model exported with kv cache and dynamic shape. Defaults to the whole sequence",
+    )
 
     return parser
 
 
+def kv_cache_num_bytes(model: torch.nn.Module) -> int:
+    """Size in bytes of the KV caches of an eager model, scales included."""
+    return sum(
+        buffer.nbytes
+        for module in model.modules()
+        if isinstance(module, (KVCache, QuantizedKVCache, RingKVCache))
+        for buffer in module.buffers()
+    )
+
+
 def eval_llama(
     model_name: str,
     args: argparse.ArgumentParser,
 ) -> None:
     # Generate the eval wrapper
     eval_wrapper = gen_eval_wrapper(model_name, args)
+    # The KV cache modules of models captured for pt2e quantization or
+    # loaded from a .pte file are not visible.
+    if isinstance(eval_wrapper._model, torch.nn.Module) and (
+        num_bytes := kv_cache_num_bytes(eval_wrapper._model)
+    ):
+        print(f"KV cache memory: {num_bytes / 2**20:.2f} MiB")
 
     # Evaluate the model
     eval_results = evaluate_model(
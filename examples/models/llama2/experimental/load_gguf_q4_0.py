@@ -173,7 +173,8 @@ def load_gguf_q4_0(gguf_file: str) -> torch.nn.Module:
 
     logging.info("Load float weights")
     state_dict = get_float_weights(pt_model, gguf_weights)
-    pt_model.load_state_dict(state_dict, strict=False)
+    # The model is created on the meta device, its weights must be assigned.
+    pt_model.load_state_dict(state_dict, strict=False, assign=True)
 
     logging.info("Change linear weights to Q4_0 tensors")
     change_linear_weights_to_q4_0_tensors(pt_model, gguf_weights)
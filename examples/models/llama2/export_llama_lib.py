@@ -8,10 +8,12 @@
 
 import argparse
 import copy
+import itertools
 import json
 import logging
 import shlex
 from enum import Enum
+from functools import partial
 from json import JSONDecodeError
 from pathlib import Path
 from typing import Optional, Union
@@ -46,6 +48,10 @@ from .source_transformation.quantize import (
     get_quant_embedding_transform,
     get_quant_weight_transform,
 )
+from .source_transformation.quantized_kv_cache import (
+    replace_kv_cache_with_quantized_kv_cache,
+)
+from .source_transformation.ring_kv_cache import replace_kv_cache_with_ring_kv_cache
 from .source_transformation.rope import materialze_broadcast_of_rope_freq_cis
 from .source_transformation.sdpa import (
     replace_causal_mask,
@@ -134,7 +140,7 @@ def build_args_parser() -> argparse.ArgumentParser:
         "--quantization_mode",
         type=str,
         default=None,
-        choices=["int8", "8da4w", "8da4w-gptq"],
+        choices=["int8", "int4", "8da4w", "8da4w-gptq"],
         help="type of quantization",
     )
 
@@ -259,6 +265,40 @@ def build_args_parser() -> argparse.ArgumentParser:
         help="maximum length sequence to evaluate",
     )
 
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=1,
+        help="Number of sequences the model runs at once, each at its own position."
+        " Values larger than 1 require --use_kv_cache and --disable_dynamic_shape.",
+    )
+
+    parser.add_argument(
+        "--kv_cache_window_size",
+        type=int,
+        default=None,
+        help="Attend to the last kv_cache_window_size tokens and to the first"
+        " --attention_sink_size tokens only, with a KV cache of that many positions"
+        " instead of --max_seq_length. --max_seq_length then only bounds the positions"
+        " of the RoPE table. Requires --use_kv_cache.",
+    )
+
+    parser.add_argument(
+        "--attention_sink_size",
+        type=int,
+        default=4,
+        help="Number of first tokens every token attends to with --kv_cache_window_size.",
+    )
+
+    parser.add_argument(
+        "--quantize_kv_cache",
+        default=None,
+        choices=["int8", "int4"],
+        help="Store the KV cache in int8 or int4 with a scale per token and head."
+        " With --use_sdpa_with_kv_cache, the cache is dequantized inside the custom"
+        " SDPA op. Requires --use_kv_cache.",
+    )
+
     parser.add_argument("-2", "--fairseq2", action="store_true")
     parser.add_argument("-v", "--verbose", action="store_true")
     parser.add_argument("-X", "--xnnpack", action="store_true")
@@ -376,6 +416,23 @@ def _prepare_for_llama_export(modelname: str, args) -> LLMEdgeManager:
     if args.use_sdpa_with_kv_cache:
         transforms.append(replace_sdpa_with_custom_op)
 
+    if args.kv_cache_window_size is not None:
+        transforms.append(
+            partial(
+                replace_kv_cache_with_ring_kv_cache,
+                window_size=args.kv_cache_window_size,
+                sink_size=args.attention_sink_size,
+            )
+        )
+
+    if args.quantize_kv_cache:
+        transforms.append(
+            partial(
+                replace_kv_cache_with_quantized_kv_cache,
+                bits=8 if args.quantize_kv_cache == "int8" else 4,
+            )
+        )
+
     if args.use_kv_cache:
         if args.qnn or args.coreml or args.mps:
             # Currently qnn/coreml/mps doesn't support sdpa op, use the simpler decomposition
@@ -394,6 +451,7 @@ def _prepare_for_llama_export(modelname: str, args) -> LLMEdgeManager:
             enable_dynamic_shape=args.enable_dynamic_shape,
             verbose=args.verbose,
             max_seq_len=args.max_seq_length,
+            max_batch_size=args.max_batch_size,
             metadata_str=args.metadata,
         )
         .set_output_dir(output_dir_path)
@@ -427,6 +485,43 @@ def _validate_args(args):
             "Dynamic shape is not supported with coreml, MPS or qnn backends."
             " Please us --disble_dynamic_shape."
         )
+    if args.max_batch_size > 1 and (
+        not args.use_kv_cache
+        or args.enable_dynamic_shape
+        or args.use_sdpa_with_kv_cache
+        or args.expand_rope_table
+        or args.qnn
+        or args.coreml
+        or args.mps
+    ):
+        raise ValueError(
+            "max_batch_size > 1 requires --use_kv_cache and --disable_dynamic_shape,"
+            " and is not supported with --use_sdpa_with_kv_cache, --expand_rope_table,"
+            " coreml, MPS or qnn backends."
+        )
+    if args.kv_cache_window_size is not None and (
+        not args.use_kv_cache
+        or args.use_sdpa_with_kv_cache
+        or args.max_batch_size > 1
+        or args.qnn
+        or args.coreml
+        or args.mps
+    ):
+        raise ValueError(
+            "kv_cache_window_size requires --use_kv_cache, and is not supported with"
+            " --use_sdpa_with_kv_cache, max_batch_size > 1, coreml, MPS or qnn backends."
+        )
+    if args.quantize_kv_cache and (
+        not args.use_kv_cache
+        or args.kv_cache_window_size is not None
+        or args.qnn
+        or args.coreml
+        or args.mps
+    ):
+        raise ValueError(
+            "quantize_kv_cache requires --use_kv_cache, and is not supported with"
+            " --kv_cache_window_size, coreml, MPS or qnn backends."
+        )
 
 
 def _export_llama(modelname, args) -> LLMEdgeManager:  # noqa: C901
@@ -578,6 +673,7 @@ def _load_llama_model(
     enable_dynamic_shape: bool = False,
     verbose: bool = False,
     max_seq_len: int = 128,
+    max_batch_size: int = 1,
     metadata_str: Optional[str] = None,
 ) -> "LLMEdgeManager":
     """
@@ -602,10 +698,21 @@ def _load_llama_model(
         use_sdpa_with_kv_cache=use_sdpa_with_kv_cache,
         fairseq2=weight_type == WeightType.FAIRSEQ2,
         max_seq_len=max_seq_len,
+        max_batch_size=max_batch_size,
         enable_dynamic_shape=enable_dynamic_shape,
     )
-    state_dict = model.state_dict()
-    dtype = state_dict[next(iter(state_dict))].dtype
+    # The dtype the model was converted to, found without building its state
+    # dict. A model without floating point parameters or buffers was converted
+    # to float32 by Llama2Model.get_eager_model().
+    first = next(
+        (
+            tensor
+            for tensor in itertools.chain(model.parameters(), model.buffers())
+            if tensor.is_floating_point()
+        ),
+        None,
+    )
+    dtype = first.dtype if first is not None else torch.float32
     assert dtype in [
         torch.bfloat16,
         torch.float16,
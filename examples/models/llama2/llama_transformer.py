@@ -147,6 +147,10 @@ def precompute_freqs_cis(dim: int, end: int, theta: float):
 def reshape_for_broadcast(freqs_cis: torch.Tensor, x: torch.Tensor):
     ndim = x.ndim
     freqs_cis_ndim = freqs_cis.ndim
+    if freqs_cis_ndim == 4:
+        # freqs_cis: (bsz, seq_len, 1, head_dim // 2), with per-sequence positions
+        assert freqs_cis.shape == (x.shape[0], x.shape[1], 1, x.shape[-1])
+        return freqs_cis
     if freqs_cis_ndim == 3:
         # freqs_cis: (seq_len, n_heads, head_dim // 2)
         assert freqs_cis.shape == (x.shape[-3], x.shape[-2], x.shape[-1])
@@ -211,7 +215,8 @@ class KVCache(nn.Module):
     def update(
         self, input_pos: torch.Tensor, k_val: torch.Tensor, v_val: torch.Tensor
     ) -> Tuple[torch.Tensor, torch.Tensor]:
-        # input_pos: [S], k_val: [B, H, S, D] or [B, S, H, D] depending on transpose_cache
+        # input_pos: [S], or [B, S] for per-sequence positions
+        # k_val: [B, H, S, D] or [B, S, H, D] depending on transpose_cache
         if self.enable_dynamic_shape:
             start_pos = input_pos[-1].item()
             torch._check_is_size(start_pos)
@@ -233,8 +238,15 @@ class KVCache(nn.Module):
         else:
             k_out = self.k_cache
             v_out = self.v_cache
-            k_out[:, :, input_pos] = k_val
-            v_out[:, :, input_pos] = v_val
+            if input_pos.dim() == 2:
+                # Each sequence of the batch is written at its own positions.
+                # The result of indexing with batch and input_pos is [B, S, H, D].
+                batch = torch.arange(k_val.size(0)).unsqueeze(1)
+                k_out[batch, :, input_pos] = k_val.transpose(1, 2)
+                v_out[batch, :, input_pos] = v_val.transpose(1, 2)
+            else:
+                k_out[:, :, input_pos] = k_val
+                v_out[:, :, input_pos] = v_val
 
             return k_out, v_out
 
@@ -279,6 +291,11 @@ class SDPA(nn.Module):
             seq_length = q.size(2)
             # pyre-ignore: Incompatible parameter type [6]
             attn_mask = mask.narrow(0, start_pos, seq_length)
+            # The KV cache may only return the positions up to the last one
+            # written.
+            attn_mask = attn_mask.narrow(1, 0, k.size(2))
+        elif input_pos.dim() == 2:
+            attn_mask = mask[input_pos].unsqueeze(1)
         else:
             attn_mask = mask[None, None, input_pos]
 
@@ -530,6 +547,10 @@ class Transformer(nn.Module):
                 # can support dynamic shape?
                 freqs_cos = self.freqs_cos[input_pos]
                 freqs_sin = self.freqs_sin[input_pos]
+                if input_pos.dim() == 2:
+                    # Per-sequence positions: broadcast the frequencies over the heads.
+                    freqs_cos = freqs_cos.unsqueeze(2)
+                    freqs_sin = freqs_sin.unsqueeze(2)
 
         else:
             assert input_pos is None, "input_pos is unused when use_kv_cache is False"
@@ -5,9 +5,11 @@
 # LICENSE file in the root directory of this source tree.
 
 
+import glob
 import json
 import os
 from pathlib import Path
+from typing import List
 
 import torch
 
@@ -27,6 +29,31 @@ except ImportError:
 from ..model_base import EagerModelBase
 
 
+def checkpoint_shard_paths(checkpoint_dir: str) -> List[str]:
+    """Paths of the shards of a checkpoint, consolidated.0.pth, consolidated.1.pth..."""
+    paths = glob.glob(os.path.join(checkpoint_dir, "consolidated.*.pth"))
+    assert paths, f"No consolidated.*.pth checkpoint shard in {checkpoint_dir}"
+    return sorted(paths, key=lambda path: int(path.split(".")[-2]))
+
+
+def merge_checkpoint_shards(key: str, values: List[torch.Tensor]) -> torch.Tensor:
+    """
+    Merges the shards of a tensor of a sharded checkpoint. Only the merged
+    tensors are read in memory: the others are returned as loaded, e.g. mmaped.
+    """
+    # Layers shared between each checkpoint, i.e. the norms, are 1-D and
+    # not duplicated. Comparing larger tensors would read all their shards.
+    if len(values) == 1 or (
+        values[0].dim() <= 1 and torch.equal(values[0], values[1])
+    ):
+        return values[0]
+    if "wo" in key or "w2" in key:
+        # Concat on dim=1 for "wo" and "w2".
+        return torch.cat(values, dim=1)
+    # Concat on dim=0 for everything else.
+    return torch.cat(values, dim=0)
+
+
 class Llama2Model(EagerModelBase):
     def __init__(self, **kwargs):
         import pkg_resources
@@ -81,37 +108,30 @@ class Llama2Model(EagerModelBase):
         )
 
         self.max_seq_len = kwargs["max_seq_len"] if "max_seq_len" in kwargs else 128
+        # With a batch size larger than 1, the KV cache has a row for each
+        # sequence of the batch, and each row is at its own position.
+        self.max_batch_size = (
+            kwargs["max_batch_size"] if "max_batch_size" in kwargs else 1
+        )
+        if self.max_batch_size > 1:
+            assert (
+                self.use_kv_cache and not self.enable_dynamic_shape
+            ), "max_batch_size > 1 requires a KV cache and static shapes"
         # The example is using a dummy small model with random weights for demo purpose only.
         # Follow the instruction in https://github.com/facebookresearch/llama to download the model
         device = "cpu"
         # flake8: noqa: TOR102
-        cps = []
         if checkpoint_dir is not None:
             # Load multiple checkpoint; ignore the single path.
             checkpoint_path = None
-            for i in range(4):
-                cp_name = f"consolidated.{i}.pth"
-                print(f"Loading {cp_name}")
-                cps.append(
-                    torch.load(
-                        os.path.join(checkpoint_dir, cp_name),
-                        map_location=device,
-                        mmap=True,
-                    )
-                )
-            checkpoint = {}
-            for key in cps[0].keys():
-                if not torch.allclose(cps[0][key], cps[1][key]):
-                    values = (cps[0][key], cps[1][key], cps[2][key], cps[3][key])
-                    if "wo" in key or "w2" in key:
-                        # Concat on dim=1 for "wo" and "w2".
-                        checkpoint[key] = torch.cat(values, dim=1)
-                    else:
-                        # Concat on dim=0 for everything else.
-                        checkpoint[key] = torch.cat(values, dim=0)
-                else:
-                    # Do not duplicate layers shared between each checkpoint.
-                    checkpoint[key] = cps[0][key]
+            cps = []
+            for cp_path in checkpoint_shard_paths(checkpoint_dir):
+                print(f"Loading {os.path.basename(cp_path)}")
+                cps.append(torch.load(cp_path, map_location=device, mmap=True))
+            checkpoint = {
+                key: merge_checkpoint_shards(key, [cp[key] for cp in cps])
+                for key in cps[0].keys()
+            }
         else:
             checkpoint = torch.load(checkpoint_path, map_location=device, mmap=True)
         fairseq2_checkpoint = kwargs.get("fairseq2", False)
@@ -151,12 +171,12 @@ the checkpoint format to avoid generating faulty models.
             ]
             if len(mismatched_dtypes) > 0:
                 print(
-                    f"Mixed dtype model. Dtype of {first.key}: {first.dtype}. Mismatches in the checkpoint: {mismatched_dtypes}"
+                    f"Mixed dtype model. Dtype of {next(iter(checkpoint))}: {first.dtype}. Mismatches in the checkpoint: {mismatched_dtypes}"
                 )
         with open(params_path, "r") as f:
             params = json.loads(f.read())
         max_seq_len = self.max_seq_len
-        max_batch_size = 1
+        max_batch_size = self.max_batch_size
         model_args: ModelArgs = ModelArgs(
             max_seq_len=max_seq_len,
             max_batch_size=max_batch_size,
@@ -177,23 +197,24 @@ the checkpoint format to avoid generating faulty models.
 
         # Within the device="meta" context, tensors that are created do not carry data.
         # They possess all other metadata a tensor carries such as size, stride, requires_grad.
+        # The quantized layers are also swapped in on the meta device, so that
+        # the only copy of the weights is the one loaded from the checkpoint.
         with torch.device("meta"):
             self.model_ = Transformer(model_args)
 
-        if "int8" in str(checkpoint_path):
-            print("Using int8 weight-only quantization!")
-            # pyre-ignore: Undefined import [21]: Could not find a module corresponding to import `executorch.examples.models.source_transformation.quantize`
-            from ..source_transformation.quantize import WeightOnlyInt8QuantHandler
+            if "int8" in str(checkpoint_path):
+                print("Using int8 weight-only quantization!")
+                from .source_transformation.quantize import WeightOnlyInt8QuantHandler
 
-            simple_quantizer = WeightOnlyInt8QuantHandler(self.model_)
-            self.model_ = simple_quantizer.convert_for_runtime()
-        elif "8da4w" in str(checkpoint_path):
-            print("Using int4 weight and int8 dynamic activation quantization!")
-            from torchao.quantization.quant_api import Int8DynActInt4WeightQuantizer
+                simple_quantizer = WeightOnlyInt8QuantHandler(self.model_)
+                self.model_ = simple_quantizer.convert_for_runtime()
+            elif "8da4w" in str(checkpoint_path):
+                print("Using int4 weight and int8 dynamic activation quantization!")
+                from torchao.quantization.quant_api import Int8DynActInt4WeightQuantizer
 
-            self.model_ = Int8DynActInt4WeightQuantizer()._convert_for_runtime(
-                self.model_
-            )
+                self.model_ = Int8DynActInt4WeightQuantizer()._convert_for_runtime(
+                    self.model_
+                )
 
         # assign=True: load params/buffers by assignment instead of performing an in-place copy.
         # Because we are using device="meta", tensors do not have memory associated with them
@@ -231,6 +252,15 @@ the checkpoint format to avoid generating faulty models.
                 torch.tensor([[2, 3, 4]], dtype=torch.long),
                 torch.tensor([0, 1, 2], dtype=torch.long),
             )
+        elif self.max_batch_size > 1:
+            return (
+                torch.ones(
+                    (self.max_batch_size, 1), dtype=torch.long
+                ),  # tokens, one per sequence of the batch.
+                torch.zeros(
+                    (self.max_batch_size, 1), dtype=torch.long
+                ),  # input_pos, the position of each sequence of the batch.
+            )
         else:
             return (
                 torch.tensor(
@@ -0,0 +1,64 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# Example script for quantizing the linear layers of a Llama checkpoint to int8
+# without loading it in memory, for checkpoints larger than the available RAM.
+
+import argparse
+
+from .model import checkpoint_shard_paths
+from .source_transformation.quantize import quantize_checkpoint_int8
+
+
+def build_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-c",
+        "--checkpoint",
+        default=None,
+        help="checkpoint path",
+    )
+    parser.add_argument(
+        "--checkpoint_dir",
+        default=None,
+        help="checkpoint directory. Use with a sharded checkpoint, not for the standard llama2 model. Note, checkpoint_dir takes precedence over checkpoint if both are set.",
+    )
+    parser.add_argument(
+        "-p",
+        "--params",
+        required=True,
+        help="config.json",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Path of the quantized checkpoint. Its name must contain 'int8'.",
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=1,
+        help="Number of tensors quantized at once. Each one takes 5 to 7 bytes"
+        " of memory per element.",
+    )
+    return parser
+
+
+def main() -> None:
+    args = build_args_parser().parse_args()
+    if args.checkpoint_dir is not None:
+        checkpoint_paths = checkpoint_shard_paths(args.checkpoint_dir)
+    else:
+        assert args.checkpoint is not None, "Need to specify a checkpoint"
+        checkpoint_paths = [args.checkpoint]
+    quantize_checkpoint_int8(
+        checkpoint_paths, args.params, args.output, num_threads=args.num_threads
+    )
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
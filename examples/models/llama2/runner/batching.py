@@ -0,0 +1,237 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Continuous batching for Llama models exported with a KV cache, static shapes
+and a batch size larger than 1 (export_llama.py --max_batch_size N
+--disable_dynamic_shape).
+
+Such a model takes tokens of shape [max_batch_size, 1] and the position of
+each of these tokens, of shape [max_batch_size, 1], so that every row of the
+batch, and of the KV cache, can hold a sequence at a different position. The
+ContinuousBatchingEngine assigns a row to each request, feeds its prompt one
+token per step and then samples its completion, and gives the row to the next
+waiting request as soon as the completion is done, instead of waiting for the
+whole batch to finish.
+
+Example:
+
+    engine = ContinuousBatchingEngine(forward, max_batch_size=8, max_seq_len=128, stop_tokens=[2])
+    streams = [engine.submit(prompt, max_gen_len=64) for prompt in prompts]
+    for token in streams[0]:  # Advances all the requests.
+        ...
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterable, Iterator, List, Optional
+
+import torch
+
+
+def sample_top_p(probs, p):
+    """
+    Perform top-p (nucleus) sampling on a probability distribution.
+
+    Args:
+        probs (torch.Tensor): Probability distribution tensor.
+        p (float): Probability threshold for top-p sampling.
+
+    Returns:
+        torch.Tensor: Sampled token indices.
+
+    Note:
+        Top-p sampling selects the smallest set of tokens whose cumulative probability mass
+        exceeds the threshold p. The distribution is renormalized based on the selected tokens.
+    """
+    probs_sort, probs_idx = torch.sort(probs, dim=-1, descending=True)
+    probs_sum = torch.cumsum(probs_sort, dim=-1)
+    mask = probs_sum - probs_sort > p
+    probs_sort[mask] = 0.0
+    probs_sort.div_(probs_sort.sum(dim=-1, keepdim=True))
+    next_token = torch.multinomial(probs_sort, num_samples=1)
+    next_token = torch.gather(probs_idx, -1, next_token)
+    return next_token
+
+
+@dataclass
+class _Request:
+    prompt_tokens: List[int]
+    max_gen_len: int
+    temperature: float
+    top_p: float
+    generated_tokens: List[int] = field(default_factory=list)
+    # Tokens generated but not yet returned by the stream of the request.
+    pending_tokens: Deque[int] = field(default_factory=deque)
+    # Position of the next token to feed to the model, which is also the number
+    # of tokens of the request already in the KV cache.
+    pos: int = 0
+    finished: bool = False
+
+
+class GenerationStream:
+    """
+    Iterator over the tokens generated for a request, stop token excluded.
+    Iterating advances the engine, and thus all the requests it runs, until
+    the request has a new token.
+    """
+
+    def __init__(self, engine: "ContinuousBatchingEngine", request: _Request):
+        self._engine = engine
+        self._request = request
+
+    @property
+    def finished(self) -> bool:
+        return self._request.finished
+
+    @property
+    def generated_tokens(self) -> List[int]:
+        """All the tokens generated so far, including those not iterated over yet."""
+        return self._request.generated_tokens
+
+    def __iter__(self) -> Iterator[int]:
+        return self
+
+    def __next__(self) -> int:
+        request = self._request
+        while not request.pending_tokens and not request.finished:
+            self._engine.step()
+        if request.pending_tokens:
+            return request.pending_tokens.popleft()
+        raise StopIteration
+
+
+class ContinuousBatchingEngine:
+    def __init__(
+        self,
+        forward: Callable[[torch.Tensor, torch.Tensor], torch.Tensor],
+        max_batch_size: int,
+        max_seq_len: int,
+        stop_tokens: Iterable[int],
+        pad_id: int = 0,
+    ):
+        """
+        Args:
+            forward: Runs the model on tokens of shape [max_batch_size, 1] at
+                positions of shape [max_batch_size, 1], and returns the logits
+                of shape [max_batch_size, 1, vocab_size].
+            max_batch_size: Number of rows of the batch, and of the KV cache.
+            max_seq_len: Number of positions of each row of the KV cache.
+            stop_tokens: Tokens that end a completion.
+            pad_id: Token fed to the rows that hold no request.
+        """
+        self.forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_seq_len = max_seq_len
+        self.stop_tokens = set(stop_tokens)
+        self.pad_id = pad_id
+        self._waiting: Deque[_Request] = deque()
+        self._slots: List[Optional[_Request]] = [None] * max_batch_size
+        self.num_steps = 0
+
+    def submit(
+        self,
+        prompt_tokens: List[int],
+        max_gen_len: int,
+        temperature: float = 0.0,
+        top_p: float = 0.9,
+    ) -> GenerationStream:
+        """
+        Queues a request, which starts as soon as a row of the batch is free,
+        and returns the stream of its tokens. The completion ends at a stop
+        token, after `max_gen_len` tokens, or when the row is full.
+        """
+        if not 0 < len(prompt_tokens) <= self.max_seq_len:
+            raise ValueError(
+                f"Prompt length {len(prompt_tokens)} must be between 1 and max_seq_len {self.max_seq_len}"
+            )
+        request = _Request(
+            prompt_tokens=list(prompt_tokens),
+            max_gen_len=max_gen_len,
+            temperature=temperature,
+            top_p=top_p,
+        )
+        if max_gen_len <= 0:
+            request.finished = True
+        else:
+            self._waiting.append(request)
+        return GenerationStream(self, request)
+
+    @property
+    def num_active(self) -> int:
+        return sum(request is not None for request in self._slots)
+
+    @property
+    def num_waiting(self) -> int:
+        return len(self._waiting)
+
+    def _admit(self) -> None:
+        for slot, request in enumerate(self._slots):
+            if not self._waiting:
+                return
+            if request is None:
+                # The new request overwrites the KV cache of the row from
+                # position 0, and the causal mask hides the positions of the
+                # previous request that it has not overwritten yet.
+                self._slots[slot] = self._waiting.popleft()
+
+    def _sample(self, logits: torch.Tensor, request: _Request) -> int:
+        if request.temperature > 0:
+            probs = torch.softmax(logits / request.temperature, dim=-1)
+            return sample_top_p(probs, request.top_p).item()
+        return torch.argmax(logits, dim=-1).item()
+
+    def step(self) -> bool:
+        """
+        Admits waiting requests into the free rows, and runs the model once to
+        feed every running request its next token. Returns False if there was
+        no request to run.
+        """
+        self._admit()
+        if self.num_active == 0:
+            return False
+
+        tokens = torch.full((self.max_batch_size, 1), self.pad_id, dtype=torch.long)
+        # Free rows are fed at position 0, which the next request of the row
+        # overwrites before attending to it.
+        input_pos = torch.zeros((self.max_batch_size, 1), dtype=torch.long)
+        for slot, request in enumerate(self._slots):
+            if request is None:
+                continue
+            if request.pos < len(request.prompt_tokens):
+                tokens[slot, 0] = request.prompt_tokens[request.pos]
+            else:
+                tokens[slot, 0] = request.generated_tokens[-1]
+            input_pos[slot, 0] = request.pos
+
+        logits = self.forward(tokens, input_pos)
+        self.num_steps += 1
+
+        for slot, request in enumerate(self._slots):
+            if request is None:
+                continue
+            request.pos += 1
+            if request.pos < len(request.prompt_tokens):
+                # Still prefilling the prompt.
+                continue
+            next_token = self._sample(logits[slot, -1], request)
+            if next_token in self.stop_tokens:
+                request.finished = True
+            else:
+                request.generated_tokens.append(next_token)
+                request.pending_tokens.append(next_token)
+                request.finished = (
+                    len(request.generated_tokens) >= request.max_gen_len
+                    or request.pos >= self.max_seq_len
+                )
+            if request.finished:
+                self._slots[slot] = None
+        return True
+
+    def run(self) -> None:
+        """Runs until every submitted request is finished."""
+        while self.step():
+            pass
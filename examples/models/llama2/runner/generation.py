@@ -13,6 +13,15 @@ from typing import List, Optional, Tuple, TypedDict
 import torch
 import torch.nn.functional as F
 from executorch.examples.models.llama2.llama_transformer import ModelArgs
+from executorch.examples.models.llama2.runner.batching import (
+    ContinuousBatchingEngine,
+    sample_top_p,
+)
+from executorch.examples.models.llama2.runner.prefix_cache import PrefixCache
+from executorch.examples.models.llama2.runner.speculative import (
+    SpeculativeDecoder,
+    SpeculativeStats,
+)
 
 from executorch.examples.models.llama2.tokenizer.tiktoken import (
     Dialog,
@@ -34,39 +43,116 @@ class ChatPrediction(TypedDict, total=False):
     logprobs: List[float]  # not required
 
 
-def sample_top_p(probs, p):
-    """
-    Perform top-p (nucleus) sampling on a probability distribution.
-
-    Args:
-        probs (torch.Tensor): Probability distribution tensor.
-        p (float): Probability threshold for top-p sampling.
-
-    Returns:
-        torch.Tensor: Sampled token indices.
-
-    Note:
-        Top-p sampling selects the smallest set of tokens whose cumulative probability mass
-        exceeds the threshold p. The distribution is renormalized based on the selected tokens.
-    """
-    probs_sort, probs_idx = torch.sort(probs, dim=-1, descending=True)
-    probs_sum = torch.cumsum(probs_sort, dim=-1)
-    mask = probs_sum - probs_sort > p
-    probs_sort[mask] = 0.0
-    probs_sort.div_(probs_sort.sum(dim=-1, keepdim=True))
-    next_token = torch.multinomial(probs_sort, num_samples=1)
-    next_token = torch.gather(probs_idx, -1, next_token)
-    return next_token
-
-
 class LlamaRunner:
-    def __init__(self, model_path: str, tokenizer_path: str, model_args: ModelArgs):
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: str,
+        model_args: ModelArgs,
+        prefill_chunk_size: Optional[int] = None,
+        prefix_cache: Optional[PrefixCache] = None,
+        draft_model_path: Optional[str] = None,
+    ):
         # model is a pte file.
         self.model = _load_for_executorch(model_path)
         self.params = model_args
+        # Optional smaller model sharing the tokenizer, for speculative decoding.
+        self.draft_model = (
+            _load_for_executorch(draft_model_path)
+            if draft_model_path is not None
+            else None
+        )
+        # With kv cache and dynamic shape, the prompt is fed to the model in
+        # chunks of at most this many tokens, by default all at once. Without
+        # dynamic shape, it is fed one token at a time.
+        self.prefill_chunk_size = (
+            model_args.max_seq_len - 1
+            if prefill_chunk_size is None
+            else min(prefill_chunk_size, model_args.max_seq_len - 1)
+        )
+        # With kv cache, saves the state of the model after each prompt and
+        # restores it for later prompts sharing a prefix, which then skip
+        # prefilling this prefix. Only used for single prompts without logprobs.
+        self.prefix_cache = prefix_cache
         self.tokenizer = Tokenizer(tokenizer_path)
         assert model_args.vocab_size == self.tokenizer.n_words
 
+    def generate_speculative(
+        self,
+        prompt_tokens: List[int],
+        max_gen_len: int,
+        num_draft_tokens: int = 4,
+        temperature: float = 0.0,
+    ) -> Tuple[List[int], SpeculativeStats]:
+        """
+        Generates a completion of a single prompt with speculative decoding:
+        the draft model proposes num_draft_tokens tokens, and the model checks
+        them all in one forward call. The model must be exported with kv cache
+        and dynamic shape, the draft model with kv cache.
+
+        Returns:
+            The generated tokens, stop token excluded, and the acceptance rate
+            and throughput of the generation.
+        """
+        assert self.draft_model is not None, "No draft model was given"
+        assert (
+            self.params.use_kv_cache and self.params.enable_dynamic_shape
+        ), "Speculative decoding requires a model with kv cache and dynamic shape"
+        assert self.draft_model.run_method("use_kv_cache")[0]
+        assert (
+            self.draft_model.run_method("get_vocab_size")[0] == self.params.vocab_size
+        ), "The draft model must share the tokenizer of the model"
+
+        def target_forward(tokens: torch.Tensor, start_pos: int) -> torch.Tensor:
+            pos = torch.tensor([start_pos], dtype=torch.int64)
+            return self.model.forward((tokens, pos))[0]
+
+        def draft_forward(tokens: torch.Tensor, start_pos: int) -> torch.Tensor:
+            pos = torch.tensor([start_pos], dtype=torch.int64)
+            return self.draft_model.forward((tokens, pos))[0]
+
+        decoder = SpeculativeDecoder(
+            target_forward,
+            draft_forward,
+            max_seq_len=min(
+                self.params.max_seq_len,
+                self.draft_model.run_method("get_max_seq_len")[0],
+            ),
+            stop_tokens=self.tokenizer.stop_tokens,
+            draft_dynamic_shape=self.draft_model.run_method("enable_dynamic_shape")[0],
+        )
+        return decoder.generate(
+            prompt_tokens,
+            max_gen_len,
+            num_draft_tokens=num_draft_tokens,
+            temperature=temperature,
+        )
+
+    def continuous_batching_engine(self) -> ContinuousBatchingEngine:
+        """
+        Returns an engine that runs each request in its own row of the batch,
+        and starts waiting requests as soon as rows free up. The model must be
+        exported with a KV cache, static shapes and per-sequence positions,
+        i.e. with --max_batch_size and --disable_dynamic_shape.
+
+        Example:
+            engine = runner.continuous_batching_engine()
+            streams = [engine.submit(tokens, max_gen_len=64) for tokens in prompt_tokens]
+            for token in streams[0]:
+                print(runner.tokenizer.decode([token]), end="")
+        """
+        assert self.params.use_kv_cache, "Continuous batching requires a KV cache"
+
+        def forward(tokens: torch.Tensor, input_pos: torch.Tensor) -> torch.Tensor:
+            return self.model.forward((tokens, input_pos))[0]
+
+        return ContinuousBatchingEngine(
+            forward,
+            max_batch_size=self.params.max_batch_size,
+            max_seq_len=self.params.max_seq_len,
+            stop_tokens=self.tokenizer.stop_tokens,
+        )
+
     def generate(  # noqa: C901
         self,
         prompt_tokens: List[List[int]],
@@ -93,8 +179,42 @@ class LlamaRunner:
             token_logprobs = torch.zeros_like(tokens, dtype=torch.float)
 
         prev_pos = 0
-        if self.params.use_kv_cache:
-            min_prompt_len = 1
+        use_prefix_cache = (
+            self.prefix_cache is not None
+            and self.params.use_kv_cache
+            and bsz == 1
+            and not logprobs
+            and min_prompt_len < total_len
+        )
+        if use_prefix_cache:
+            cached_prefix = self.prefix_cache.lookup(prompt_tokens[0])
+            if cached_prefix is not None:
+                # The KV cache now holds the prefix, continue from its end.
+                prev_pos, state = cached_prefix
+                self.model.set_method_state("forward", state)
+
+        if (
+            self.params.use_kv_cache
+            and self.params.enable_dynamic_shape
+            and min_prompt_len < total_len
+        ):
+            # Chunked prefill of the prompt tokens shared by the batch. The
+            # last chunk is fed by the first step of the generation loop, which
+            # samples the first generated token from its logits.
+            while min_prompt_len - prev_pos > self.prefill_chunk_size:
+                cur_pos = prev_pos + self.prefill_chunk_size
+                pos = torch.tensor([prev_pos], dtype=torch.int64)
+                logits = self.model.forward((tokens[:, prev_pos:cur_pos], pos))
+                if logprobs:
+                    token_logprobs[:, prev_pos + 1 : cur_pos + 1] = -F.cross_entropy(
+                        input=logits[0].transpose(1, 2),
+                        target=tokens[:, prev_pos + 1 : cur_pos + 1],
+                        reduction="none",
+                        ignore_index=pad_id,
+                    )
+                prev_pos = cur_pos
+        elif self.params.use_kv_cache:
+            min_prompt_len = prev_pos + 1
 
         eos_reached = torch.tensor([False] * bsz, device="cpu")
         input_text_mask = tokens != pad_id
@@ -123,6 +243,15 @@ class LlamaRunner:
                 inputs = (tokens[:, :cur_pos],)
             logits = self.model.forward(inputs)  # updated forward call.
             logits = logits[0]
+            if (
+                use_prefix_cache
+                and cur_pos == len(prompt_tokens[0])
+                and not self.prefix_cache.is_saved(prompt_tokens[0])
+            ):
+                # The whole prompt is in the KV cache.
+                self.prefix_cache.insert(
+                    prompt_tokens[0], self.model.get_method_state("forward")
+                )
             if temperature > 0:
                 probs = torch.softmax(logits[:, -1] / temperature, dim=-1)
                 next_token = sample_top_p(probs, top_p)
@@ -340,6 +469,34 @@ def build_args_parser() -> argparse.ArgumentParser:
         help="Maximum length of the generated response sequence.",
     )
 
+    parser.add_argument(
+        "--dynamic_shape",
+        default=False,
+        action="store_true",
+        help="Whether the model was exported with dynamic shape, which lets it prefill several prompt tokens at once with kv cache.",
+    )
+
+    parser.add_argument(
+        "--prefill_chunk_size",
+        type=int,
+        default=None,
+        help="Maximum number of prompt tokens to prefill at once with --dynamic_shape. Defaults to the whole prompt.",
+    )
+
+    parser.add_argument(
+        "--draft_pte",
+        type=str,
+        default=None,
+        help="Path to a smaller exported model sharing the tokenizer, to use for speculative decoding. Requires --kv_cache and --dynamic_shape.",
+    )
+
+    parser.add_argument(
+        "--num_draft_tokens",
+        type=int,
+        default=4,
+        help="Number of tokens the draft model proposes per forward call of the model.",
+    )
+
     return parser
 
 
@@ -353,11 +510,26 @@ def main() -> None:
         max_seq_len=128,
         max_batch_size=1,
         use_kv_cache=args.kv_cache,
+        enable_dynamic_shape=args.dynamic_shape,
         **params,
     )
     runner = LlamaRunner(
-        model_path=args.pte, tokenizer_path=args.tokenizer, model_args=model_args
+        model_path=args.pte,
+        tokenizer_path=args.tokenizer,
+        model_args=model_args,
+        prefill_chunk_size=args.prefill_chunk_size,
+        draft_model_path=args.draft_pte,
     )
+    if args.draft_pte is not None:
+        tokens, stats = runner.generate_speculative(
+            prompt_tokens=runner.tokenizer.encode(args.prompt, bos=True, eos=False),
+            max_gen_len=args.max_gen_len,
+            num_draft_tokens=args.num_draft_tokens,
+            temperature=args.temperature,
+        )
+        print(f"Result: {runner.tokenizer.decode(tokens)}")
+        print(f"Speculative decoding: {stats}")
+        return
     result = runner.text_completion(
         prompts=[args.prompt],
         max_gen_len=args.max_gen_len,
@@ -0,0 +1,140 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Reuses the KV cache of prompts that share a prefix, such as a system prompt.
+
+After a prompt is prefilled, the state of the model, which holds its KV cache,
+is saved under every prefix of the prompt whose length is a multiple of
+`block_size`. A later prompt starting with one of these prefixes restores the
+state and only prefills the tokens after the prefix. Positions of the KV cache
+past the prefix hold the rest of the prompt the state was saved for, but they
+are overwritten before the new prompt attends to them.
+
+Example:
+
+    cache = PrefixCache(max_bytes=1 << 30)
+    runner = LlamaRunner(model_path, tokenizer_path, model_args, prefix_cache=cache)
+"""
+
+import array
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass
+class _Entry:
+    state: Any
+    num_bytes: int
+    keys: Set[bytes] = field(default_factory=set)
+
+
+def _state_num_bytes(state: Sequence[Any]) -> int:
+    return sum(memoryview(buffer).nbytes for buffer in state)
+
+
+class PrefixCache:
+    def __init__(self, max_bytes: int, block_size: int = 32):
+        """
+        Args:
+            max_bytes: Memory budget of the saved states. The least recently
+                used states are evicted to stay within it.
+            block_size: Granularity, in tokens, of the prefixes states are
+                saved for. Smaller blocks match more prefixes, at the cost of
+                hashing more keys.
+        """
+        if block_size <= 0:
+            raise ValueError(f"block_size must be positive, got {block_size}")
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Entries from least to most recently used.
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # Prefix hash -> (entry id, prefix length).
+        self._keys: Dict[bytes, Tuple[int, int]] = {}
+        self._next_id = 0
+
+    def _prefix_hashes(self, tokens: Sequence[int], max_len: int) -> List[bytes]:
+        """Hashes of the prefixes of `tokens` of every length that is a multiple
+        of block_size, up to `max_len`, in increasing length."""
+        hashes = []
+        digest = b""
+        for end in range(self.block_size, max_len + 1, self.block_size):
+            block = array.array("q", tokens[end - self.block_size : end])
+            digest = hashlib.sha256(digest + block.tobytes()).digest()
+            hashes.append(digest)
+        return hashes
+
+    def lookup(self, tokens: Sequence[int]) -> Optional[Tuple[int, Any]]:
+        """
+        Returns the length of the longest saved prefix of `tokens`, leaving at
+        least one token to prefill, and the state saved for it, or None.
+        """
+        hashes = self._prefix_hashes(tokens, len(tokens) - 1)
+        for digest in reversed(hashes):
+            if digest in self._keys:
+                entry_id, prefix_len = self._keys[digest]
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return prefix_len, self._entries[entry_id].state
+        self.misses += 1
+        return None
+
+    def is_saved(self, tokens: Sequence[int]) -> bool:
+        """Whether every prefix of `tokens` that insert() would save is saved."""
+        return all(
+            digest in self._keys for digest in self._prefix_hashes(tokens, len(tokens))
+        )
+
+    def insert(self, tokens: Sequence[int], state: Any) -> None:
+        """
+        Saves `state`, the state of the model after prefilling `tokens`, for
+        every prefix of `tokens` that is a multiple of block_size. Does nothing
+        if all these prefixes are already saved.
+
+        The new state replaces older states for the prefixes they share, and
+        older states left without prefixes are dropped.
+        """
+        num_bytes = _state_num_bytes(state)
+        if num_bytes > self.max_bytes or self.is_saved(tokens):
+            return
+        hashes = self._prefix_hashes(tokens, len(tokens))
+        for digest in hashes:
+            if digest in self._keys:
+                old_id, _ = self._keys.pop(digest)
+                old_entry = self._entries[old_id]
+                old_entry.keys.discard(digest)
+                if not old_entry.keys:
+                    self._remove(old_id)
+        while self.num_bytes + num_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        entry_id = self._next_id
+        self._next_id += 1
+        entry = _Entry(state=state, num_bytes=num_bytes)
+        for index, digest in enumerate(hashes):
+            self._keys[digest] = (entry_id, (index + 1) * self.block_size)
+            entry.keys.add(digest)
+        self._entries[entry_id] = entry
+        self.num_bytes += num_bytes
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for digest in entry.keys:
+            del self._keys[digest]
+        self.num_bytes -= entry.num_bytes
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
+        self.num_bytes = 0
+
+    def __len__(self) -> int:
+        """Number of saved states."""
+        return len(self._entries)
@@ -0,0 +1,216 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Speculative decoding: a small draft model proposes a few tokens, one forward
+call each, and the target model checks all of them in a single forward call.
+Every accepted token saves the target a forward call, and the target always
+contributes one token of its own, so each round yields between 1 and
+num_draft_tokens + 1 tokens.
+
+The target must be exported with kv cache and dynamic shape, so that it takes
+several tokens starting at the position in input_pos and returns the logits of
+each of them. The draft can be any kv cache export sharing the tokenizer of the
+target. Both come from export_llama.py, e.g.:
+
+    python -m examples.models.llama2.export_llama -c target.pt -p target.json -kv -n target.pte
+    python -m examples.models.llama2.export_llama -c draft.pt -p draft.json -kv -n draft.pte
+
+When a proposed token is rejected, the KV cache positions past the last
+accepted token are rolled back by resuming from that position: the model
+overwrites them before attending to them.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Tuple
+
+import torch
+
+# Runs a model on tokens of shape [1, seq_len] starting at a position, and
+# returns the logits of shape [1, seq_len, vocab_size].
+ForwardFn = Callable[[torch.Tensor, int], torch.Tensor]
+
+
+@dataclass
+class SpeculativeStats:
+    num_rounds: int = 0
+    # Tokens proposed by the draft model, and how many of them the target
+    # model accepted.
+    num_drafted: int = 0
+    num_accepted: int = 0
+    num_generated: int = 0
+    num_target_calls: int = 0
+    num_draft_calls: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.num_accepted / self.num_drafted if self.num_drafted else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.num_generated / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.num_generated} tokens in {self.elapsed_s:.3f} s "
+            f"({self.tokens_per_second:.2f} tokens/s), "
+            f"acceptance rate {self.acceptance_rate:.2%} "
+            f"({self.num_accepted}/{self.num_drafted}), "
+            f"{self.num_target_calls} target and {self.num_draft_calls} draft calls"
+        )
+
+
+class SpeculativeDecoder:
+    def __init__(
+        self,
+        target_forward: ForwardFn,
+        draft_forward: ForwardFn,
+        max_seq_len: int,
+        stop_tokens: Iterable[int],
+        draft_dynamic_shape: bool = False,
+    ):
+        """
+        Args:
+            target_forward: Runs the target model, which must take several
+                tokens per call.
+            draft_forward: Runs the draft model.
+            max_seq_len: Smallest max_seq_len of the two models.
+            stop_tokens: Tokens that end the completion.
+            draft_dynamic_shape: Whether the draft model takes several tokens
+                per call. Otherwise, it is fed one token per call.
+        """
+        self.target_forward = target_forward
+        self.draft_forward = draft_forward
+        self.max_seq_len = max_seq_len
+        self.stop_tokens = set(stop_tokens)
+        self.draft_dynamic_shape = draft_dynamic_shape
+
+    def _feed_draft(
+        self, tokens: List[int], start_pos: int, stats: SpeculativeStats
+    ) -> torch.Tensor:
+        """Feeds tokens to the draft model, and returns the logits of the last one."""
+        if self.draft_dynamic_shape:
+            stats.num_draft_calls += 1
+            return self.draft_forward(torch.tensor([tokens]), start_pos)[0, -1]
+        for i, token in enumerate(tokens):
+            stats.num_draft_calls += 1
+            logits = self.draft_forward(torch.tensor([[token]]), start_pos + i)
+        return logits[0, -1]
+
+    @staticmethod
+    def _sample(probs: torch.Tensor) -> int:
+        return torch.multinomial(probs, num_samples=1).item()
+
+    def generate(
+        self,
+        prompt_tokens: List[int],
+        max_gen_len: int,
+        num_draft_tokens: int = 4,
+        temperature: float = 0.0,
+    ) -> Tuple[List[int], SpeculativeStats]:
+        """
+        Generates up to max_gen_len tokens after the prompt, stop token
+        excluded. With temperature 0, the tokens are those of greedy decoding
+        with the target model alone. Otherwise, they are sampled from the
+        distribution of the target model with this temperature, and drafts are
+        accepted by rejection sampling.
+        """
+        assert 0 < len(prompt_tokens) < self.max_seq_len, len(prompt_tokens)
+        stats = SpeculativeStats()
+        start = time.perf_counter()
+        tokens = list(prompt_tokens)
+        generated: List[int] = []
+        # Number of tokens in the KV cache of each model. The tokens after them
+        # are fed at the start of the next round.
+        target_pos = 0
+        draft_pos = 0
+
+        while len(generated) < max_gen_len and len(tokens) < self.max_seq_len:
+            stats.num_rounds += 1
+            # Leave room for the token of the target, within both the maximum
+            # length of the completion and the KV cache.
+            num_drafts = max(
+                0,
+                min(
+                    num_draft_tokens,
+                    max_gen_len - len(generated) - 1,
+                    self.max_seq_len - len(tokens) - 1,
+                ),
+            )
+
+            # Propose tokens with the draft model.
+            drafts: List[int] = []
+            draft_probs: List[torch.Tensor] = []
+            pending = tokens[draft_pos:]
+            for _ in range(num_drafts):
+                logits = self._feed_draft(pending, draft_pos, stats)
+                draft_pos += len(pending)
+                if temperature > 0:
+                    probs = torch.softmax(logits.float() / temperature, dim=-1)
+                    draft = self._sample(probs)
+                    draft_probs.append(probs)
+                else:
+                    draft = torch.argmax(logits).item()
+                drafts.append(draft)
+                pending = [draft]
+            stats.num_drafted += len(drafts)
+
+            # Check all the proposed tokens with one call of the target model.
+            inputs = tokens[target_pos:] + drafts
+            stats.num_target_calls += 1
+            logits = self.target_forward(torch.tensor([inputs]), target_pos)[0]
+            # The logits predicting the first draft, followed by those
+            # predicting each next draft, and the token after the last one.
+            logits = logits[len(tokens) - target_pos - 1 :].float()
+
+            accepted = 0
+            if temperature > 0:
+                target_probs = torch.softmax(logits / temperature, dim=-1)
+                for i, draft in enumerate(drafts):
+                    p, q = target_probs[i], draft_probs[i]
+                    if torch.rand(()).item() * q[draft] < p[draft]:
+                        accepted += 1
+                        continue
+                    # Rejected: sample from the part of the target distribution
+                    # that the draft distribution under-represents.
+                    residual = torch.clamp(p - q, min=0)
+                    if residual.sum() <= 0:
+                        residual = p
+                    next_token = self._sample(residual / residual.sum())
+                    break
+                else:
+                    next_token = self._sample(target_probs[len(drafts)])
+            else:
+                predictions = torch.argmax(logits, dim=-1).tolist()
+                for i, draft in enumerate(drafts):
+                    if predictions[i] != draft:
+                        break
+                    accepted += 1
+                next_token = predictions[accepted]
+            stats.num_accepted += accepted
+
+            # The target KV cache holds the inputs up to the last accepted
+            # draft. Positions past it are rolled back, and the draft model
+            # keeps those of the accepted drafts it was fed.
+            target_pos = len(tokens) + accepted
+            draft_pos = min(draft_pos, target_pos)
+            new_tokens = drafts[:accepted] + [next_token]
+            finished = False
+            for token in new_tokens:
+                if token in self.stop_tokens:
+                    finished = True
+                    break
+                tokens.append(token)
+                generated.append(token)
+            if finished:
+                break
+
+        generated = generated[:max_gen_len]
+        stats.num_generated = len(generated)
+        stats.elapsed_s = time.perf_counter() - start
+        return generated, stats
@@ -4,9 +4,14 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import json
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Deque, Dict, List, Optional
 
 import torch
 import torch.nn as nn
@@ -68,6 +73,10 @@ def quantize(
     if qmode == "int8":
         # Add quantization mode options here: group size, bit width, etc.
         return WeightOnlyInt8QuantHandler(model).quantized_model()
+    elif qmode == "int4":
+        return WeightOnlyInt4QuantHandler(
+            model, group_size=group_size
+        ).quantized_model()
     elif qmode == "8da4w":
         # Check for required args
         if group_size is None:
@@ -365,6 +374,7 @@ class WeightOnlyInt8Linear(torch.nn.Module):
         out_features: int,
         bias: bool = True,
         dtype=None,
+        group_size: Optional[int] = None,
     ) -> None:
         super().__init__()
         self.in_features = in_features
@@ -372,13 +382,243 @@ class WeightOnlyInt8Linear(torch.nn.Module):
         self.register_buffer(
             "weight", torch.empty((out_features, in_features), dtype=torch.int8)
         )
-        self.register_buffer("scales", torch.ones(out_features, dtype=torch.bfloat16))
+        if group_size:
+            scales_shape = (out_features, in_features // group_size)
+        else:
+            scales_shape = (out_features,)
+        self.register_buffer("scales", torch.ones(scales_shape, dtype=torch.bfloat16))
 
     def forward(self, input: torch.Tensor) -> torch.Tensor:
+        if self.scales.dim() == 2:
+            # Group-wise scales: dequantize the weight one group at a time.
+            num_groups = self.scales.size(1)
+            weight = self.weight.view(self.out_features, num_groups, -1).to(
+                dtype=input.dtype
+            ) * self.scales.to(dtype=input.dtype).unsqueeze(-1)
+            return F.linear(input, weight.view(self.out_features, self.in_features))
         return F.linear(input, self.weight.to(dtype=input.dtype)) * self.scales
         # return F.linear(input, self.weight.to(dtype=input.dtype)) * se...
 
 
+#########################################################################
+###             Weight-only int4 grouped, packed quantized code       ###
+
+
+def pack_4bit(weight: torch.Tensor) -> torch.Tensor:
+    """
+    Packs int8 values in [-8, 7] two per byte, offset by 8 and the value at an
+    even column in the high nibble, as expected by the embedding_4bit and
+    mixed_linear_4bit ops.
+    """
+    weight = weight.add(8).view(torch.uint8)
+    weight = weight.view(weight.shape[0], weight.shape[1] // 2, 2)
+    return weight[:, :, 0] * 16 + weight[:, :, 1]
+
+
+def replace_linear_weight_only_int4(module, group_size: Optional[int]):
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear):
+            setattr(
+                module,
+                name,
+                WeightOnlyInt4Linear(child.in_features, child.out_features, group_size),
+            )
+        else:
+            replace_linear_weight_only_int4(child, group_size)
+
+
+class WeightOnlyInt4QuantHandler(QuantHandler):
+    """
+    Quantizes the weights of linear layers to 4 bits with a scale per group of
+    group_size input features, or per output feature when group_size is None,
+    and stores them packed two per byte.
+    """
+
+    def __init__(self, mod, *, group_size: Optional[int] = None):
+        self.mod = mod
+        self.group_size = group_size
+
+    @torch.no_grad()
+    def create_quantized_state_dict(self) -> Dict:
+        cur_state_dict = self.mod.state_dict()
+
+        for fqn, mod in self.mod.named_modules():
+            if isinstance(mod, torch.nn.Linear):
+                print(f"quantize {fqn, mod} with group_size {self.group_size}")
+                if mod.in_features % 2 != 0 or (
+                    self.group_size and mod.in_features % self.group_size != 0
+                ):
+                    raise ValueError(
+                        f"in_features of {fqn} must be even and a multiple of "
+                        f"group size {self.group_size}, got {mod.in_features}"
+                    )
+                weight, scales, _ = dynamically_quantize_per_channel(
+                    mod.weight.float(),
+                    -8,
+                    7,
+                    torch.int8,
+                    self.group_size,
+                    scales_dtype=mod.weight.dtype,
+                )
+                cur_state_dict[f"{fqn}.weight"] = pack_4bit(weight)
+                if self.group_size:
+                    # [out_features, num_groups], even for a single group, as
+                    # registered by WeightOnlyInt4Linear.
+                    cur_state_dict[f"{fqn}.scales"] = scales
+                else:
+                    cur_state_dict[f"{fqn}.scales"] = scales.squeeze(dim=-1)
+
+        return cur_state_dict
+
+    def convert_for_runtime(self) -> nn.Module:
+        replace_linear_weight_only_int4(self.mod, self.group_size)
+        return self.mod
+
+
+class WeightOnlyInt4Linear(torch.nn.Module):
+    __constants__ = ["in_features", "out_features"]
+    in_features: int
+    out_features: int
+    weight: torch.Tensor
+
+    def __init__(
+        self,
+        in_features: int,
+        out_features: int,
+        group_size: Optional[int] = None,
+    ) -> None:
+        super().__init__()
+        self.in_features = in_features
+        self.out_features = out_features
+        self.register_buffer(
+            "weight", torch.empty((out_features, in_features // 2), dtype=torch.uint8)
+        )
+        if group_size:
+            scales_shape = (out_features, in_features // group_size)
+        else:
+            scales_shape = (out_features,)
+        self.register_buffer("scales", torch.ones(scales_shape, dtype=torch.float32))
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        output = torch.ops.quantized_decomposed.mixed_linear_4bit(
+            input.reshape(-1, self.in_features),
+            self.weight,
+            self.scales.to(dtype=input.dtype),
+            None,
+        )
+        return output.view(*input.shape[:-1], self.out_features)
+
+
+#########################################################################
+###          Streaming weight-only int8 checkpoint quantization       ###
+
+
+def _load_checkpoint_shard(path: str) -> Dict[str, torch.Tensor]:
+    # mmap=True: tensors are read from the file when they are accessed.
+    shard = torch.load(path, map_location="cpu", mmap=True)
+    if "model" in shard:
+        shard = shard["model"]
+    return shard
+
+
+def quantize_checkpoint_int8(
+    checkpoint_paths: List[str],
+    params_path: str,
+    output_path: str,
+    num_threads: int = 1,
+) -> None:
+    """
+    Quantizes the linear layers of a checkpoint like WeightOnlyInt8QuantHandler,
+    without materializing the model nor the whole checkpoint in memory.
+
+    The checkpoint shards are loaded with mmap, and each tensor is merged
+    across shards, quantized by a pool of num_threads threads and copied to a
+    file-backed buffer as it is read. The quantized state dict is then saved
+    from these buffers. Each thread works on one tensor at a time, and holds
+    a float32 copy of it, its int8 quantization and, when the checkpoint is
+    sharded, its merged copy: 5 bytes per element, 7 for a sharded bfloat16
+    checkpoint. The memory used grows with num_threads accordingly.
+
+    Args:
+        checkpoint_paths: The checkpoint, or its shards, like consolidated.*.pth.
+        params_path: params.json of the model, to find its linear layers.
+        output_path: Quantized checkpoint, loaded as such by Llama2Model when
+            its name contains "int8".
+        num_threads: Number of tensors quantized at once.
+    """
+    if num_threads < 1:
+        raise ValueError(f"num_threads must be at least 1, got {num_threads}")
+    if "int8" not in Path(output_path).name:
+        raise ValueError(
+            f"The name of the quantized checkpoint {output_path} must contain 'int8'"
+        )
+    # Imported here since model.py imports this file.
+    from executorch.examples.models.llama2.llama_transformer import (
+        ModelArgs,
+        Transformer,
+    )
+    from executorch.examples.models.llama2.model import merge_checkpoint_shards
+
+    with open(params_path, "r") as f:
+        params = json.loads(f.read())
+    # Within the device="meta" context, tensors that are created do not carry data.
+    with torch.device("meta"):
+        model = Transformer(ModelArgs(max_batch_size=1, **params))
+    linear_weights = {
+        f"{fqn}.weight"
+        for fqn, mod in model.named_modules()
+        if isinstance(mod, torch.nn.Linear) or isinstance(mod, fsLinear)
+    }
+
+    shards = [_load_checkpoint_shard(path) for path in checkpoint_paths]
+    with tempfile.TemporaryDirectory(
+        dir=Path(output_path).parent
+    ) as buffer_dir, ThreadPoolExecutor(num_threads) as executor:
+
+        def to_file(name: str, tensor: torch.Tensor) -> torch.Tensor:
+            # Copies tensor to a file-backed buffer, whose pages are written
+            # back to the file instead of staying in memory.
+            buffer = torch.from_file(
+                os.path.join(buffer_dir, f"{name}.bin"),
+                shared=True,
+                size=tensor.numel(),
+                dtype=tensor.dtype,
+            )
+            return buffer.view(tensor.shape).copy_(tensor)
+
+        @torch.no_grad()
+        def process(key: str) -> Dict[str, torch.Tensor]:
+            value = merge_checkpoint_shards(key, [shard[key] for shard in shards])
+            if key not in linear_weights:
+                return {key: to_file(key, value)}
+            print(f"quantize {key} of shape {tuple(value.shape)}")
+            weight, scales, _ = dynamically_quantize_per_channel(
+                value.float(),
+                -128,
+                127,
+                torch.int8,
+                scales_dtype=value.dtype,
+            )
+            fqn = key[: -len(".weight")]
+            return {
+                key: to_file(key, weight),
+                # squeeze makes group_size=rowsize unidimensional
+                f"{fqn}.scales": to_file(f"{fqn}.scales", scales.squeeze(dim=-1)),
+            }
+
+        # Only submit a tensor once a thread is free for it, rather than all of
+        # them upfront, so that at most num_threads tensors are in memory.
+        state_dict = {}
+        pending: Deque[Future] = deque()
+        for key in shards[0].keys():
+            if len(pending) == num_threads:
+                state_dict.update(pending.popleft().result())
+            pending.append(executor.submit(process, key))
+        while pending:
+            state_dict.update(pending.popleft().result())
+        torch.save(state_dict, output_path)
+
+
 #########################################################################
 #####                   embedding table quantization               ######
 
@@ -463,15 +703,7 @@ class EmbeddingQuantHandler(QuantHandler):
                 if packed:
                     if weight.shape[-1] % 2 != 0:
                         raise RuntimeError("automatic padding not implemented yet")
-
-                    weight_range_shifted = weight.add(8).view(torch.uint8)
-                    weight_view = weight_range_shifted.view(
-                        weight.shape[0], weight.shape[1] // 2, 2
-                    )
-                    weight_even = weight_view[:, :, 0] * 16  # left shift 4
-                    weight_odd = weight_view[:, :, 1]
-                    weight_packed = weight_even + weight_odd
-                    weight = weight_packed
+                    weight = pack_4bit(weight)
 
                 weight = weight.to(device=self.device)
                 scales = scales.to(device=self.device)
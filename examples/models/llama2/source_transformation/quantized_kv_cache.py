@@ -0,0 +1,226 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+KV cache quantized to int8, or to int4 packed in pairs along the head dim, with
+a float32 scale per token and head. Values are quantized symmetrically when
+they are written to the cache: a token of a head with largest absolute value
+m gets the scale m / 127 for int8 and m / 7 for int4. Int4 values q are stored
+as q + 8, the one at even indices of the head dim in the high 4 bits of a byte
+and the next one in the low 4 bits, like the weights of the 4 bit ops.
+
+With sdpa_with_kv_cache (--use_sdpa_with_kv_cache), the quantization and the
+dequantization are done by the sdpa_with_quantized_kv_cache custom op, which
+dequantizes blocks of the cache inside its attention loop. Otherwise, the
+cache is dequantized before attention, which only saves memory between calls:
+up to the last position written with dynamic shapes, and as a whole without.
+"""
+
+from typing import Tuple
+
+import torch
+
+from executorch.examples.models.llama2.llama_transformer import Attention
+from executorch.examples.models.llama2.source_transformation.sdpa import SDPACustom
+
+
+def quantize_per_token(x: torch.Tensor, bits: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Quantizes x along its last dim. Returns the quantized values, int8 for 8
+    bits and uint8 with half the last dim for 4 bits, and the float32 scales,
+    with the shape of x without its last dim.
+    """
+    q_max = 127 if bits == 8 else 7
+    x = x.float()
+    scales = x.abs().amax(dim=-1) / q_max
+    scales = torch.where(scales > 0, scales, torch.ones_like(scales))
+    q = torch.clamp(torch.round(x / scales.unsqueeze(-1)), -q_max, q_max)
+    if bits == 8:
+        return q.to(torch.int8), scales
+    q = (q + 8).to(torch.uint8)
+    return q[..., 0::2] * 16 + q[..., 1::2], scales
+
+
+def dequantize_per_token(
+    q: torch.Tensor, scales: torch.Tensor, bits: int, dtype: torch.dtype
+) -> torch.Tensor:
+    if bits == 4:
+        q = torch.stack([q // 16, q % 16], dim=-1).flatten(-2).float() - 8
+    return (q.float() * scales.unsqueeze(-1)).to(dtype)
+
+
+class QuantizedKVCache(torch.nn.Module):
+    def __init__(
+        self,
+        max_batch_size: int,
+        max_seq_length: int,
+        n_heads: int,
+        head_dim: int,
+        transpose_cache: bool,
+        enable_dynamic_shape: bool,
+        bits: int = 8,
+        dtype=torch.float32,
+    ):
+        super().__init__()
+        if bits not in (4, 8):
+            raise ValueError(f"Only 8 and 4 bits KV caches are supported, got {bits}")
+        if bits == 4 and head_dim % 2 != 0:
+            raise ValueError(f"int4 KV cache requires an even head_dim, got {head_dim}")
+        self.max_seq_length = max_seq_length
+        self.transpose_cache = transpose_cache
+        self.enable_dynamic_shape = enable_dynamic_shape
+        self.bits = bits
+        self.dtype = dtype
+        if transpose_cache:
+            scales_shape = (max_batch_size, n_heads, max_seq_length)
+        else:
+            scales_shape = (max_batch_size, max_seq_length, n_heads)
+        cache_shape = scales_shape + (head_dim if bits == 8 else head_dim // 2,)
+        cache_dtype = torch.int8 if bits == 8 else torch.uint8
+        self.register_buffer(
+            "k_cache", torch.zeros(cache_shape, dtype=cache_dtype, device="cpu")
+        )
+        self.register_buffer(
+            "v_cache", torch.zeros(cache_shape, dtype=cache_dtype, device="cpu")
+        )
+        self.register_buffer(
+            "k_scales", torch.ones(scales_shape, dtype=torch.float32, device="cpu")
+        )
+        self.register_buffer(
+            "v_scales", torch.ones(scales_shape, dtype=torch.float32, device="cpu")
+        )
+
+    def _write(
+        self, cache: torch.Tensor, value: torch.Tensor, input_pos: torch.Tensor
+    ) -> None:
+        # cache: [B, H, max_seq_length, ...] or [B, max_seq_length, H, ...]
+        # depending on transpose_cache, and value: [B, H, S, ...] or [B, S, H, ...]
+        seq_dim = 2 if self.transpose_cache else 1
+        if self.enable_dynamic_shape:
+            start_pos = input_pos[-1].item()
+            torch._check_is_size(start_pos)
+            torch._check(start_pos < self.max_seq_length)
+            # pyre-ignore: Incompatible parameter type [6]
+            cache.narrow(seq_dim, start_pos, value.size(seq_dim)).copy_(value)
+        elif input_pos.dim() == 2:
+            # Each sequence of the batch is written at its own positions.
+            assert self.transpose_cache
+            batch = torch.arange(value.size(0)).unsqueeze(1)
+            cache[batch, :, input_pos] = value.transpose(1, 2)
+        elif self.transpose_cache:
+            cache[:, :, input_pos] = value
+        else:
+            cache[:, input_pos] = value
+
+    def update(
+        self, input_pos: torch.Tensor, k_val: torch.Tensor, v_val: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Quantizes and writes k_val and v_val like KVCache.update(), and returns
+        the caches dequantized to the dtype of the model. With dynamic shapes,
+        only the positions up to the last one written are returned.
+        """
+        k_quantized, k_scales = quantize_per_token(k_val, self.bits)
+        v_quantized, v_scales = quantize_per_token(v_val, self.bits)
+        self._write(self.k_cache, k_quantized, input_pos)
+        self._write(self.v_cache, v_quantized, input_pos)
+        self._write(self.k_scales, k_scales, input_pos)
+        self._write(self.v_scales, v_scales, input_pos)
+        caches = [
+            (self.k_cache, self.k_scales),
+            (self.v_cache, self.v_scales),
+        ]
+        if self.enable_dynamic_shape:
+            seq_dim = 2 if self.transpose_cache else 1
+            start_pos = input_pos[-1].item()
+            torch._check_is_size(start_pos)
+            end_pos = start_pos + k_val.size(seq_dim)
+            torch._check(end_pos <= self.max_seq_length)
+            caches = [
+                # pyre-ignore: Incompatible parameter type [6]
+                (cache.narrow(seq_dim, 0, end_pos), scales.narrow(seq_dim, 0, end_pos))
+                for cache, scales in caches
+            ]
+        k, v = [
+            dequantize_per_token(cache, scales, self.bits, self.dtype)
+            for cache, scales in caches
+        ]
+        return k, v
+
+
+class SDPAQuantizedCustom(torch.nn.Module):
+    def __init__(
+        self,
+        kv_cache: QuantizedKVCache,
+        dim: int,
+    ):
+        super().__init__()
+        self.kv_cache = kv_cache
+        self.dim = dim
+
+    def forward(
+        self,
+        input_pos: torch.Tensor,
+        q: torch.Tensor,
+        k: torch.Tensor,
+        v: torch.Tensor,
+        bsz,
+        seqlen,
+        mask,
+    ):
+        output = torch.ops.llama.sdpa_with_quantized_kv_cache(
+            q,
+            k,
+            v,
+            self.kv_cache.k_cache,
+            self.kv_cache.v_cache,
+            self.kv_cache.k_scales,
+            self.kv_cache.v_scales,
+            input_pos[-1].item(),
+            seqlen,
+            None,  # Attention mask
+            0,  # dropout probability. Ignored by the code
+            True,  # is_causal
+        )
+        return output.view(bsz, seqlen, self.dim)
+
+
+def replace_kv_cache_with_quantized_kv_cache(
+    module: torch.nn.Module, bits: int
+) -> torch.nn.Module:
+    """
+    Replaces the KV cache of every attention of a model with kv cache by a
+    QuantizedKVCache of `bits` bits. Apply after replace_sdpa_with_custom_op,
+    whose SDPA is replaced by the sdpa_with_quantized_kv_cache custom op.
+    """
+    for child in module.modules():
+        if not isinstance(child, Attention):
+            continue
+        assert child.use_kv_cache, "Quantized KV cache requires a model with kv cache"
+        kv_cache = child.kv_cache
+        if kv_cache.transpose_cache:
+            batch_size, n_heads, max_seq_length, head_dim = kv_cache.k_cache.shape
+        else:
+            batch_size, max_seq_length, n_heads, head_dim = kv_cache.k_cache.shape
+        child.kv_cache = QuantizedKVCache(
+            batch_size,
+            max_seq_length,
+            n_heads,
+            head_dim,
+            kv_cache.transpose_cache,
+            kv_cache.enable_dynamic_shape,
+            bits=bits,
+            dtype=kv_cache.k_cache.dtype,
+        )
+        if isinstance(child.SDPA, SDPACustom):
+            from executorch.examples.models.llama2.custom_ops import (  # noqa
+                sdpa_with_kv_cache,
+            )
+
+            child.SDPA = SDPAQuantizedCustom(child.kv_cache, child.SDPA.dim)
+        else:
+            child.SDPA.kv_cache = child.kv_cache
+    return module
@@ -0,0 +1,197 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Sliding window attention with attention sinks, on a KV cache of fixed size.
+
+Each token attends to the first `sink_size` tokens of the sequence and to the
+last `window_size` tokens up to itself. The KV cache keeps the sink tokens,
+followed by a ring buffer of `window_size` slots where the token at position
+`pos` is written at `(pos - sink_size) % window_size`, so its size does not
+depend on max_seq_len, which then only bounds the positions of the RoPE table.
+
+The tokens fed to the model attend to the cache as it was before them and to
+each other, and are then written to the cache, so that a chunk of any length
+can be prefilled without overwriting tokens its first queries attend to. The
+tokens of a chunk that fall out of the window of the next tokens are written
+to a scratch slot, which is never attended to.
+
+Keys are rotated with their position in the sequence before they are cached,
+so the relative positions seen by RoPE stay exact after the buffer wraps. The
+position held in each slot of the cache is tracked, and the attention mask is
+computed from these positions instead of the causal mask of the model. Feeding
+tokens again from an earlier position, e.g. to roll back rejected tokens, hides
+the tokens after it, but the tokens they evicted from the ring buffer are lost.
+"""
+
+from typing import Tuple
+
+import torch
+import torch.nn.functional as F
+
+from executorch.examples.models.llama2.llama_transformer import Attention
+
+
+class RingKVCache(torch.nn.Module):
+    def __init__(
+        self,
+        max_batch_size: int,
+        window_size: int,
+        sink_size: int,
+        n_heads: int,
+        head_dim: int,
+        enable_dynamic_shape: bool,
+        dtype=torch.float32,
+    ):
+        super().__init__()
+        self.window_size = window_size
+        self.sink_size = sink_size
+        self.enable_dynamic_shape = enable_dynamic_shape
+        # Slots attended to, followed by the scratch slot.
+        self.cache_size = sink_size + window_size
+        cache_shape = (max_batch_size, n_heads, self.cache_size + 1, head_dim)
+        self.register_buffer(
+            "k_cache", torch.zeros(cache_shape, dtype=dtype, device="cpu")
+        )
+        self.register_buffer(
+            "v_cache", torch.zeros(cache_shape, dtype=dtype, device="cpu")
+        )
+        # Position of the token held in each slot, or -1 for empty slots.
+        self.register_buffer(
+            "cache_positions",
+            torch.full((self.cache_size + 1,), -1, dtype=torch.long, device="cpu"),
+        )
+
+    def positions(self, input_pos: torch.Tensor, seq_length: int) -> torch.Tensor:
+        """Positions of the tokens fed to the model, of shape [seq_length]."""
+        if self.enable_dynamic_shape:
+            start_pos = input_pos[-1].item()
+            torch._check_is_size(start_pos)
+            return torch.arange(seq_length, dtype=torch.long) + start_pos
+        return input_pos
+
+    def _attends(
+        self, query_positions: torch.Tensor, key_positions: torch.Tensor
+    ) -> torch.Tensor:
+        query_positions = query_positions.unsqueeze(1)
+        key_positions = key_positions.unsqueeze(0)
+        return (key_positions <= query_positions) & (
+            (key_positions < self.sink_size)
+            | (key_positions > query_positions - self.window_size)
+        )
+
+    def update(
+        self, positions: torch.Tensor, k_val: torch.Tensor, v_val: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Writes the keys and values of the tokens at `positions` to the cache.
+
+        Returns:
+            The keys and values the tokens attend to, of shape
+            [B, H, cache_size + S, D], and the boolean attention mask, of shape
+            [S, cache_size + S].
+        """
+        # positions: [S]
+        # k_val: [B, H, S, D]
+        cache_positions = self.cache_positions[: self.cache_size]
+        # Slots holding tokens before the first one fed, i.e. neither empty nor
+        # rolled back.
+        cache_mask = self._attends(positions, cache_positions) & (
+            (cache_positions >= 0) & (cache_positions < positions[0])
+        ).unsqueeze(0)
+        attn_mask = torch.cat([cache_mask, self._attends(positions, positions)], dim=-1)
+        k = torch.cat([self.k_cache[:, :, : self.cache_size], k_val], dim=2)
+        v = torch.cat([self.v_cache[:, :, : self.cache_size], v_val], dim=2)
+
+        ring_slots = self.sink_size + (positions - self.sink_size) % self.window_size
+        slots = torch.where(
+            positions < self.sink_size,
+            positions,
+            torch.where(
+                positions > positions[-1] - self.window_size,
+                ring_slots,
+                self.cache_size,
+            ),
+        )
+        self.k_cache[:, :, slots] = k_val
+        self.v_cache[:, :, slots] = v_val
+        self.cache_positions[slots] = positions
+        return k, v, attn_mask
+
+
+class SDPARing(torch.nn.Module):
+    def __init__(
+        self,
+        kv_cache: RingKVCache,
+        dim: int,
+        n_rep: int,
+    ):
+        super().__init__()
+        self.kv_cache = kv_cache
+        self.dim = dim
+        self.n_rep = n_rep
+
+    def forward(
+        self,
+        input_pos: torch.Tensor,
+        q: torch.Tensor,
+        k: torch.Tensor,
+        v: torch.Tensor,
+        bsz,
+        seqlen,
+        mask,
+    ):
+        # The causal mask of the model is unused: the mask is computed from the
+        # positions of the tokens in the cache.
+        q = q.transpose(1, 2)  # (bs, n_local_heads, seqlen, head_dim)
+        k = k.transpose(1, 2)
+        v = v.transpose(1, 2)
+
+        positions = self.kv_cache.positions(input_pos, seqlen)
+        k, v, attn_mask = self.kv_cache.update(positions, k, v)
+
+        k = k.repeat_interleave(self.n_rep, dim=1)
+        v = v.repeat_interleave(self.n_rep, dim=1)
+        y = F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask, dropout_p=0.0)
+
+        return y.transpose(1, 2).contiguous().view(bsz, seqlen, self.dim)
+
+
+def replace_kv_cache_with_ring_kv_cache(
+    module: torch.nn.Module, window_size: int, sink_size: int
+) -> torch.nn.Module:
+    """
+    Replaces the KV cache and SDPA of every attention of a model with kv cache
+    by a RingKVCache of `sink_size + window_size` positions.
+    """
+    if window_size <= 0 or sink_size < 0:
+        raise ValueError(
+            f"Invalid window_size {window_size} or sink_size {sink_size} for the ring KV cache"
+        )
+    for child in module.modules():
+        if not isinstance(child, Attention):
+            continue
+        assert child.use_kv_cache, "The ring KV cache requires a model with kv cache"
+        kv_cache = child.kv_cache
+        assert (
+            kv_cache.transpose_cache
+        ), "The ring KV cache is not supported with sdpa_with_kv_cache"
+        batch_size, n_heads, _, head_dim = kv_cache.k_cache.shape
+        child.kv_cache = RingKVCache(
+            batch_size,
+            window_size,
+            sink_size,
+            n_heads,
+            head_dim,
+            kv_cache.enable_dynamic_shape,
+            dtype=kv_cache.k_cache.dtype,
+        )
+        child.SDPA = SDPARing(child.kv_cache, child.dim, child.n_rep)
+        # The causal mask has max_seq_len * max_seq_len entries, and is unused.
+        child.register_buffer(
+            "mask", torch.empty(0, 0, dtype=torch.bool), persistent=False
+        )
+    return module
@@ -0,0 +1,50 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+
+
+def _model() -> Transformer:
+    torch.manual_seed(0)
+    args = ModelArgs(
+        dim=64,
+        n_layers=2,
+        n_heads=4,
+        vocab_size=32,
+        max_batch_size=1,
+        max_seq_len=32,
+        use_kv_cache=True,
+        enable_dynamic_shape=True,
+    )
+    return Transformer(args).eval()
+
+
+class ChunkedPrefillTest(unittest.TestCase):
+    def test_chunks_match_single_tokens(self):
+        # The runner and the eval wrapper feed prompts to models exported with
+        # dynamic shape in chunks, each starting at the position in input_pos.
+        tokens = torch.randint(0, 32, (1, 11))
+        single_token_model = _model()
+        chunked_model = _model()
+        with torch.no_grad():
+            expected = torch.cat(
+                [
+                    single_token_model(tokens[:, pos : pos + 1], torch.tensor([pos]))
+                    for pos in range(tokens.size(1))
+                ],
+                dim=1,
+            )
+            logits = torch.cat(
+                [
+                    chunked_model(tokens[:, pos : pos + 4], torch.tensor([pos]))
+                    for pos in range(0, tokens.size(1), 4)
+                ],
+                dim=1,
+            )
+        torch.testing.assert_close(logits, expected)
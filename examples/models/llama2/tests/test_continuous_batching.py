@@ -0,0 +1,110 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+from executorch.examples.models.llama2.runner.batching import ContinuousBatchingEngine
+
+
+def _model(max_batch_size: int) -> Transformer:
+    torch.manual_seed(0)
+    args = ModelArgs(
+        dim=64,
+        n_layers=2,
+        n_heads=4,
+        vocab_size=32,
+        max_batch_size=max_batch_size,
+        max_seq_len=32,
+        use_kv_cache=True,
+    )
+    return Transformer(args).eval()
+
+
+def _greedy(model: Transformer, prompt, max_gen_len, stop_token):
+    # Reference decoding of a single sequence, one token at a time.
+    tokens = []
+    with torch.no_grad():
+        for pos in range(len(prompt) + max_gen_len - 1):
+            token = prompt[pos] if pos < len(prompt) else tokens[-1]
+            logits = model(torch.tensor([[token]]), torch.tensor([pos]))
+            if pos + 1 < len(prompt):
+                continue
+            next_token = torch.argmax(logits[0, -1]).item()
+            if next_token == stop_token:
+                break
+            tokens.append(next_token)
+            if len(tokens) == max_gen_len:
+                break
+    return tokens
+
+
+class ContinuousBatchingTest(unittest.TestCase):
+    def test_per_sequence_positions(self):
+        model = _model(max_batch_size=2)
+        reference = _model(max_batch_size=1)
+        with torch.no_grad():
+            expected = [
+                reference(torch.tensor([[3]]), torch.tensor([0]))[0, -1],
+                reference(torch.tensor([[5]]), torch.tensor([1]))[0, -1],
+            ]
+            model(torch.tensor([[3], [7]]), torch.tensor([[0], [0]]))
+            # Only the first sequence is at position 1.
+            logits = model(torch.tensor([[5], [3]]), torch.tensor([[1], [0]]))
+        torch.testing.assert_close(logits[0, -1], expected[1])
+        torch.testing.assert_close(logits[1, -1], expected[0])
+
+    def test_matches_single_sequence_decoding(self):
+        model = _model(max_batch_size=2)
+        reference = _model(max_batch_size=1)
+        stop_token = 31
+
+        def forward(tokens, input_pos):
+            with torch.no_grad():
+                return model(tokens, input_pos)
+
+        engine = ContinuousBatchingEngine(
+            forward, max_batch_size=2, max_seq_len=32, stop_tokens=[stop_token]
+        )
+        prompts = [[1, 2, 3, 4, 5], [6], [7, 8, 9], [10, 11]]
+        max_gen_lens = [3, 12, 6, 4]
+        streams = [
+            engine.submit(prompt, max_gen_len)
+            for prompt, max_gen_len in zip(prompts, max_gen_lens)
+        ]
+        # Requests wait for a free row.
+        self.assertEqual(engine.num_waiting, 4)
+        first = list(streams[0])
+        self.assertTrue(streams[0].finished)
+        # Its row is given to the next request on the next step.
+        self.assertEqual(engine.num_waiting, 2)
+        engine.step()
+        self.assertEqual(engine.num_waiting, 1)
+        engine.run()
+
+        outputs = [first] + [list(stream) for stream in streams[1:]]
+        for prompt, max_gen_len, output in zip(prompts, max_gen_lens, outputs):
+            self.assertEqual(
+                output, _greedy(reference, prompt, max_gen_len, stop_token)
+            )
+        # Finished requests free their row for the waiting ones, so the engine
+        # runs fewer steps than the same requests in two static batches.
+        prompt_and_gen = [len(p) + n for p, n in zip(prompts, max_gen_lens)]
+        static_steps = max(prompt_and_gen[:2]) + max(prompt_and_gen[2:])
+        self.assertLess(engine.num_steps, static_steps)
+
+    def test_invalid_prompt(self):
+        engine = ContinuousBatchingEngine(
+            lambda tokens, input_pos: None,
+            max_batch_size=1,
+            max_seq_len=4,
+            stop_tokens=[],
+        )
+        with self.assertRaises(ValueError):
+            engine.submit([1, 2, 3, 4, 5], max_gen_len=1)
+        self.assertEqual(list(engine.submit([1], max_gen_len=0)), [])
+        self.assertFalse(engine.step())
@@ -0,0 +1,78 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import torch
+
+# Registers quantized_decomposed::mixed_linear_4bit.
+import executorch.exir.passes._quant_patterns_and_replacements  # noqa
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+from executorch.examples.models.llama2.source_transformation.quantize import (
+    WeightOnlyInt4Linear,
+    WeightOnlyInt4QuantHandler,
+    WeightOnlyInt8QuantHandler,
+)
+
+
+def _model() -> Transformer:
+    torch.manual_seed(0)
+    args = ModelArgs(
+        dim=64,
+        n_layers=2,
+        n_heads=4,
+        n_kv_heads=2,
+        vocab_size=32,
+        max_batch_size=1,
+    )
+    return Transformer(args).eval()
+
+
+def _linear_weight_num_bytes(model: torch.nn.Module) -> int:
+    return sum(
+        module.weight.nbytes
+        for module in model.modules()
+        if hasattr(module, "scales") and not isinstance(module, torch.nn.Embedding)
+    )
+
+
+class Int4WeightQuantizationTest(unittest.TestCase):
+    def test_matches_float_model(self):
+        tokens = torch.randint(0, 32, (1, 8))
+        with torch.no_grad():
+            expected = _model()(tokens)
+            for group_size in [None, 32]:
+                model = WeightOnlyInt4QuantHandler(
+                    _model(), group_size=group_size
+                ).quantized_model()
+                self.assertIsInstance(
+                    model.layers[0].attention.wq, WeightOnlyInt4Linear
+                )
+                torch.testing.assert_close(model(tokens), expected, atol=0.2, rtol=0)
+
+    def test_single_group(self):
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(32, 8, bias=False))
+        x = torch.randn(2, 32)
+        with torch.no_grad():
+            expected = model(x)
+            model = WeightOnlyInt4QuantHandler(model, group_size=32).quantized_model()
+            self.assertEqual(model[0].scales.shape, (8, 1))
+            torch.testing.assert_close(model(x), expected, atol=0.2, rtol=0)
+
+    def test_half_of_int8(self):
+        int4_model = WeightOnlyInt4QuantHandler(
+            _model(), group_size=32
+        ).quantized_model()
+        int8_model = WeightOnlyInt8QuantHandler(_model()).quantized_model()
+        self.assertEqual(
+            2 * _linear_weight_num_bytes(int4_model),
+            _linear_weight_num_bytes(int8_model),
+        )
+
+    def test_invalid_group_size(self):
+        with self.assertRaises(ValueError):
+            WeightOnlyInt4QuantHandler(_model(), group_size=48).quantized_model()
@@ -0,0 +1,83 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import tempfile
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+from executorch.examples.models.llama2.model import Llama2Model
+from executorch.examples.models.llama2.source_transformation.quantize import (
+    quantize_checkpoint_int8,
+)
+
+PARAMS = {
+    "dim": 64,
+    "n_layers": 2,
+    "n_heads": 4,
+    "n_kv_heads": 2,
+    "vocab_size": 32,
+}
+
+
+class Llama2ModelLoadingTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.reference = Transformer(ModelArgs(max_batch_size=1, **PARAMS)).eval()
+        self.checkpoint = {
+            key: value
+            for key, value in self.reference.state_dict().items()
+            if "kv_cache" not in key
+        }
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.params_path = os.path.join(self.tmp_dir.name, "params.json")
+        with open(self.params_path, "w") as f:
+            json.dump(PARAMS, f)
+        self.tokens = torch.randint(0, 32, (1, 8))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _assert_loaded(self, model: torch.nn.Module) -> None:
+        # Nothing is left on the meta device the model is built on.
+        for name, tensor in model.state_dict().items():
+            self.assertFalse(tensor.is_meta, name)
+
+    def test_sharded_checkpoint(self):
+        # Split like consolidated.*.pth: "wo" and "w2" on dim 1, norms shared,
+        # and everything else on dim 0.
+        for i in range(3):
+            shard = {}
+            for key, value in self.checkpoint.items():
+                if value.dim() == 1:
+                    shard[key] = value
+                else:
+                    dim = 1 if "wo" in key or "w2" in key else 0
+                    shard[key] = value.tensor_split(3, dim=dim)[i].clone()
+            torch.save(shard, os.path.join(self.tmp_dir.name, f"consolidated.{i}.pth"))
+        model = Llama2Model(
+            checkpoint_dir=self.tmp_dir.name, params=self.params_path
+        ).get_eager_model()
+        self._assert_loaded(model)
+        with torch.no_grad():
+            torch.testing.assert_close(model(self.tokens), self.reference(self.tokens))
+
+    def test_int8_checkpoint(self):
+        checkpoint_path = os.path.join(self.tmp_dir.name, "model.pth")
+        torch.save(self.checkpoint, checkpoint_path)
+        quantized_path = os.path.join(self.tmp_dir.name, "model_int8.pth")
+        quantize_checkpoint_int8([checkpoint_path], self.params_path, quantized_path)
+        model = Llama2Model(
+            checkpoint=quantized_path, params=self.params_path
+        ).get_eager_model()
+        self._assert_loaded(model)
+        self.assertEqual(model.layers[0].attention.wq.weight.dtype, torch.int8)
+        with torch.no_grad():
+            torch.testing.assert_close(
+                model(self.tokens), self.reference(self.tokens), atol=0.05, rtol=0
+            )
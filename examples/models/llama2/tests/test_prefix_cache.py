@@ -0,0 +1,56 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+from executorch.examples.models.llama2.runner.prefix_cache import PrefixCache
+
+
+class PrefixCacheTest(unittest.TestCase):
+    def test_lookup(self):
+        cache = PrefixCache(max_bytes=1024, block_size=4)
+        system_prompt = list(range(10))
+        cache.insert(system_prompt + [50, 51], [b"a" * 16])
+
+        # The longest saved prefix, a multiple of the block size.
+        self.assertEqual(cache.lookup(system_prompt + [60]), (8, [b"a" * 16]))
+        self.assertEqual(cache.lookup(system_prompt + [50, 51, 52]), (12, [b"a" * 16]))
+        # At least one token is left to prefill.
+        self.assertEqual(cache.lookup(system_prompt[:8]), (4, [b"a" * 16]))
+        self.assertIsNone(cache.lookup([1, 2, 3, 4, 5]))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+        self.assertTrue(cache.is_saved(system_prompt + [50, 51]))
+        self.assertFalse(cache.is_saved(system_prompt + [60, 61]))
+
+    def test_newer_state_replaces_shared_prefixes(self):
+        cache = PrefixCache(max_bytes=1024, block_size=4)
+        system_prompt = list(range(8))
+        cache.insert(system_prompt + [50, 51, 52, 53], [b"a"])
+        cache.insert(system_prompt + [60, 61, 62, 63], [b"b"])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.lookup(system_prompt + [70]), (8, [b"b"]))
+        self.assertEqual(
+            cache.lookup(system_prompt + [50, 51, 52, 53, 0]), (12, [b"a"])
+        )
+
+        # A state left without prefixes is dropped.
+        cache.insert(system_prompt + [50, 51, 52, 53, 54, 55, 56, 57], [b"c"])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.num_bytes, 2)
+
+    def test_lru_eviction(self):
+        cache = PrefixCache(max_bytes=32, block_size=2)
+        cache.insert([1, 2], [b"a" * 16])
+        cache.insert([3, 4], [b"b" * 16])
+        cache.lookup([1, 2, 0])
+        cache.insert([5, 6], [b"c" * 16])
+        self.assertEqual(cache.num_bytes, 32)
+        self.assertIsNone(cache.lookup([3, 4, 0]))
+        self.assertIsNotNone(cache.lookup([1, 2, 0]))
+        # A state larger than the budget is not saved.
+        cache.insert([7, 8], [b"d" * 64])
+        self.assertIsNone(cache.lookup([7, 8, 0]))
@@ -0,0 +1,90 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import tempfile
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+from executorch.examples.models.llama2.source_transformation.quantize import (
+    quantize_checkpoint_int8,
+    WeightOnlyInt8QuantHandler,
+)
+
+PARAMS = {
+    "dim": 64,
+    "n_layers": 2,
+    "n_heads": 4,
+    "n_kv_heads": 2,
+    "vocab_size": 32,
+}
+
+
+class QuantizeCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = Transformer(ModelArgs(max_batch_size=1, **PARAMS)).to(
+            torch.bfloat16
+        )
+        self.checkpoint = {
+            key: value
+            for key, value in self.model.state_dict().items()
+            if "kv_cache" not in key
+        }
+        self.expected = WeightOnlyInt8QuantHandler(
+            self.model
+        ).create_quantized_state_dict()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.params_path = os.path.join(self.tmp_dir.name, "params.json")
+        with open(self.params_path, "w") as f:
+            json.dump(PARAMS, f)
+        self.output_path = os.path.join(self.tmp_dir.name, "model_int8.pth")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _assert_matches_quant_handler(self):
+        quantized = torch.load(self.output_path, mmap=True)
+        self.assertEqual(
+            set(quantized.keys()),
+            {key for key in self.expected if "kv_cache" not in key},
+        )
+        for key, value in quantized.items():
+            self.assertEqual(value.dtype, self.expected[key].dtype, key)
+            self.assertTrue(torch.equal(value, self.expected[key]), key)
+
+    def test_single_checkpoint(self):
+        checkpoint_path = os.path.join(self.tmp_dir.name, "model.pth")
+        torch.save({"model": self.checkpoint}, checkpoint_path)
+        quantize_checkpoint_int8(
+            [checkpoint_path], self.params_path, self.output_path, num_threads=2
+        )
+        self._assert_matches_quant_handler()
+
+    def test_sharded_checkpoint(self):
+        # Split like consolidated.*.pth: "wo" and "w2" on dim 1, norms shared,
+        # and everything else on dim 0.
+        paths = []
+        for i in range(2):
+            shard = {}
+            for key, value in self.checkpoint.items():
+                if value.dim() == 1:
+                    shard[key] = value
+                else:
+                    dim = 1 if "wo" in key or "w2" in key else 0
+                    shard[key] = value.chunk(2, dim=dim)[i].clone()
+            paths.append(os.path.join(self.tmp_dir.name, f"consolidated.{i}.pth"))
+            torch.save(shard, paths[-1])
+        quantize_checkpoint_int8(paths, self.params_path, self.output_path)
+        self._assert_matches_quant_handler()
+
+    def test_output_name(self):
+        with self.assertRaises(ValueError):
+            quantize_checkpoint_int8(
+                [], self.params_path, os.path.join(self.tmp_dir.name, "model.pth")
+            )
@@ -0,0 +1,118 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import (
+    KVCache,
+    ModelArgs,
+    Transformer,
+)
+from executorch.examples.models.llama2.source_transformation.quantized_kv_cache import (
+    dequantize_per_token,
+    QuantizedKVCache,
+    quantize_per_token,
+    replace_kv_cache_with_quantized_kv_cache,
+)
+
+
+def _model(enable_dynamic_shape: bool = False) -> Transformer:
+    torch.manual_seed(0)
+    args = ModelArgs(
+        dim=64,
+        n_layers=2,
+        n_heads=4,
+        n_kv_heads=2,
+        vocab_size=32,
+        max_batch_size=1,
+        max_seq_len=24,
+        use_kv_cache=True,
+        enable_dynamic_shape=enable_dynamic_shape,
+    )
+    return Transformer(args).eval()
+
+
+def _kv_cache_num_bytes(model: torch.nn.Module) -> int:
+    return sum(
+        buffer.nbytes
+        for module in model.modules()
+        if isinstance(module, (KVCache, QuantizedKVCache))
+        for buffer in module.buffers()
+    )
+
+
+class QuantizedKVCacheTest(unittest.TestCase):
+    def test_quantize_per_token(self):
+        torch.manual_seed(0)
+        x = torch.randn(2, 3, 5, 8)
+        x[0, 0, 0] = 0
+        for bits, q_max in [(8, 127), (4, 7)]:
+            q, scales = quantize_per_token(x, bits)
+            self.assertEqual(q.dtype, torch.int8 if bits == 8 else torch.uint8)
+            self.assertEqual(q.shape[-1], 8 if bits == 8 else 4)
+            # All-zero tokens get a scale of 1.
+            self.assertEqual(scales[0, 0, 0].item(), 1.0)
+            torch.testing.assert_close(scales[1:], x[1:].abs().amax(dim=-1) / q_max)
+            dequantized = dequantize_per_token(q, scales, bits, torch.float32)
+            self.assertTrue(
+                ((dequantized - x).abs() <= scales.unsqueeze(-1) / 2 + 1e-6).all()
+            )
+
+    def test_int4_packing(self):
+        # Like the weights of the 4 bit ops, the value at an even index is in
+        # the high 4 bits.
+        q, scales = quantize_per_token(torch.tensor([[7.0, -7.0, 0.0, 1.0]]), 4)
+        self.assertEqual(scales.tolist(), [1.0])
+        self.assertEqual(q.tolist(), [[15 * 16 + 1, 8 * 16 + 9]])
+
+    def test_matches_float_kv_cache(self):
+        torch.manual_seed(1)
+        tokens = torch.randint(0, 32, (1, 20))
+        reference = _model()
+        for bits, atol in [(8, 0.02), (4, 0.3)]:
+            model = replace_kv_cache_with_quantized_kv_cache(_model(), bits)
+            self.assertEqual(
+                _kv_cache_num_bytes(model),
+                # int values, and a float32 scale per head_dim=16 values.
+                _kv_cache_num_bytes(reference) * (bits / 32 + 1 / 16),
+            )
+            with torch.no_grad():
+                for pos in range(tokens.size(1)):
+                    input_pos = torch.tensor([pos])
+                    expected = reference(tokens[:, pos : pos + 1], input_pos)
+                    logits = model(tokens[:, pos : pos + 1], input_pos)
+                    torch.testing.assert_close(logits, expected, atol=atol, rtol=0)
+            reference = _model()
+
+    def test_dynamic_shape(self):
+        torch.manual_seed(1)
+        tokens = torch.randint(0, 32, (1, 20))
+        for bits, atol in [(8, 0.02), (4, 0.3)]:
+            reference = _model(enable_dynamic_shape=True)
+            model = replace_kv_cache_with_quantized_kv_cache(
+                _model(enable_dynamic_shape=True), bits
+            )
+            with torch.no_grad():
+                for start, end in [(0, 7), (7, 8), (8, 20)]:
+                    input_pos = torch.tensor([start])
+                    expected = reference(tokens[:, start:end], input_pos)
+                    logits = model(tokens[:, start:end], input_pos)
+                    torch.testing.assert_close(logits, expected, atol=atol, rtol=0)
+
+    def test_dynamic_shape_dequantizes_written_positions(self):
+        kv_cache = QuantizedKVCache(
+            1, 20, 2, 8, transpose_cache=True, enable_dynamic_shape=True
+        )
+        k_val = torch.randn(1, 2, 3, 8)
+        k, v = kv_cache.update(torch.tensor([4]), k_val, torch.randn(1, 2, 3, 8))
+        self.assertEqual(k.shape, (1, 2, 7, 8))
+        self.assertEqual(v.shape, (1, 2, 7, 8))
+        torch.testing.assert_close(k[:, :, 4:], k_val, atol=0.02, rtol=0)
+
+    def test_invalid_bits(self):
+        with self.assertRaises(ValueError):
+            replace_kv_cache_with_quantized_kv_cache(_model(), 2)
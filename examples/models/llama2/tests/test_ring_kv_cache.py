@@ -0,0 +1,114 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+from executorch.examples.models.llama2.source_transformation.ring_kv_cache import (
+    replace_kv_cache_with_ring_kv_cache,
+    RingKVCache,
+)
+
+MAX_SEQ_LEN = 40
+WINDOW_SIZE = 6
+SINK_SIZE = 2
+
+
+def _model(use_kv_cache: bool, enable_dynamic_shape: bool = False) -> Transformer:
+    torch.manual_seed(0)
+    args = ModelArgs(
+        dim=64,
+        n_layers=2,
+        n_heads=4,
+        n_kv_heads=2,
+        vocab_size=32,
+        max_batch_size=1,
+        max_seq_len=MAX_SEQ_LEN,
+        use_kv_cache=use_kv_cache,
+        enable_dynamic_shape=enable_dynamic_shape,
+    )
+    return Transformer(args).eval()
+
+
+def _reference_logits(tokens: torch.Tensor) -> torch.Tensor:
+    # Full sequence without kv cache, with the sliding window and sinks as mask.
+    model = _model(use_kv_cache=False)
+    pos = torch.arange(MAX_SEQ_LEN)
+    query, key = pos.unsqueeze(1), pos.unsqueeze(0)
+    mask = (key <= query) & ((key < SINK_SIZE) | (key > query - WINDOW_SIZE))
+    for layer in model.layers:
+        layer.attention.register_buffer("mask", mask, persistent=False)
+    with torch.no_grad():
+        return model(tokens)[0]
+
+
+class RingKVCacheTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(1)
+        self.tokens = torch.randint(0, 32, (1, MAX_SEQ_LEN - 1))
+        self.expected = _reference_logits(self.tokens)
+
+    def test_token_by_token(self):
+        model = replace_kv_cache_with_ring_kv_cache(
+            _model(use_kv_cache=True), WINDOW_SIZE, SINK_SIZE
+        )
+        cache = model.layers[0].attention.kv_cache
+        self.assertIsInstance(cache, RingKVCache)
+        # The cache does not depend on max_seq_len.
+        self.assertEqual(cache.k_cache.size(2), SINK_SIZE + WINDOW_SIZE + 1)
+        with torch.no_grad():
+            for pos in range(self.tokens.size(1)):
+                logits = model(self.tokens[:, pos : pos + 1], torch.tensor([pos]))
+                torch.testing.assert_close(logits[0, -1], self.expected[pos])
+
+    def test_chunks(self):
+        model = replace_kv_cache_with_ring_kv_cache(
+            _model(use_kv_cache=True, enable_dynamic_shape=True),
+            WINDOW_SIZE,
+            SINK_SIZE,
+        )
+        start = 0
+        with torch.no_grad():
+            # Chunks shorter and longer than the window, wrapping around the ring.
+            for size in [9, 1, 6, 3, 13, 7]:
+                chunk = self.tokens[:, start : start + size]
+                logits = model(chunk, torch.tensor([start]))
+                torch.testing.assert_close(
+                    logits[0], self.expected[start : start + chunk.size(1)]
+                )
+                start += chunk.size(1)
+        self.assertEqual(start, self.tokens.size(1))
+
+    def test_restart(self):
+        # A new sequence from position 0 ignores the tokens of the previous one.
+        model = replace_kv_cache_with_ring_kv_cache(
+            _model(use_kv_cache=True), WINDOW_SIZE, SINK_SIZE
+        )
+        with torch.no_grad():
+            for pos in range(20):
+                model(torch.tensor([[pos % 32]]), torch.tensor([pos]))
+            for pos in range(10):
+                logits = model(self.tokens[:, pos : pos + 1], torch.tensor([pos]))
+                torch.testing.assert_close(logits[0, -1], self.expected[pos])
+
+    def test_rollback(self):
+        # Feeding again from an earlier position ignores the tokens after it,
+        # as long as they did not overwrite tokens of the window.
+        model = replace_kv_cache_with_ring_kv_cache(
+            _model(use_kv_cache=True, enable_dynamic_shape=True),
+            WINDOW_SIZE,
+            SINK_SIZE,
+        )
+        with torch.no_grad():
+            model(self.tokens[:, :6], torch.tensor([0]))
+            model(torch.zeros((1, 2), dtype=torch.long), torch.tensor([6]))
+            logits = model(self.tokens[:, 6:20], torch.tensor([6]))
+        torch.testing.assert_close(logits[0], self.expected[6:20])
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            replace_kv_cache_with_ring_kv_cache(_model(use_kv_cache=True), 0, 4)
@@ -0,0 +1,99 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import torch
+from executorch.examples.models.llama2.llama_transformer import ModelArgs, Transformer
+from executorch.examples.models.llama2.runner.speculative import SpeculativeDecoder
+
+
+def _forward(seed: int, n_layers: int, enable_dynamic_shape: bool):
+    torch.manual_seed(seed)
+    args = ModelArgs(
+        dim=64,
+        n_layers=n_layers,
+        n_heads=4,
+        vocab_size=32,
+        max_batch_size=1,
+        max_seq_len=48,
+        use_kv_cache=True,
+        enable_dynamic_shape=enable_dynamic_shape,
+    )
+    model = Transformer(args).eval()
+
+    def forward(tokens, start_pos):
+        with torch.no_grad():
+            return model(tokens, torch.tensor([start_pos]))
+
+    return forward
+
+
+def _greedy(forward, prompt, max_gen_len):
+    # Reference decoding with the target model alone.
+    logits = forward(torch.tensor([prompt]), 0)
+    tokens = []
+    while True:
+        tokens.append(torch.argmax(logits[0, -1]).item())
+        if len(tokens) == max_gen_len:
+            return tokens
+        logits = forward(torch.tensor([tokens[-1:]]), len(prompt) + len(tokens) - 1)
+
+
+class SpeculativeDecodingTest(unittest.TestCase):
+    def test_greedy_matches_target(self):
+        prompt = [1, 5, 9, 2]
+        expected = _greedy(_forward(0, 2, True), prompt, 20)
+        for draft_dynamic_shape in (False, True):
+            decoder = SpeculativeDecoder(
+                target_forward=_forward(0, 2, True),
+                draft_forward=_forward(1, 1, draft_dynamic_shape),
+                max_seq_len=48,
+                stop_tokens=[],
+                draft_dynamic_shape=draft_dynamic_shape,
+            )
+            tokens, stats = decoder.generate(prompt, 20, num_draft_tokens=3)
+            self.assertEqual(tokens, expected)
+            self.assertEqual(stats.num_generated, 20)
+            self.assertLessEqual(stats.num_accepted, stats.num_drafted)
+
+    def test_identical_draft_is_always_accepted(self):
+        decoder = SpeculativeDecoder(
+            target_forward=_forward(0, 2, True),
+            draft_forward=_forward(0, 2, False),
+            max_seq_len=48,
+            stop_tokens=[],
+        )
+        prompt = [3, 4]
+        tokens, stats = decoder.generate(prompt, 16, num_draft_tokens=4)
+        self.assertEqual(tokens, _greedy(_forward(0, 2, True), prompt, 16))
+        self.assertEqual(stats.acceptance_rate, 1.0)
+        # Each round yields the drafts and a token of the target.
+        self.assertEqual(stats.num_target_calls, 4)
+
+    def test_stop_and_limits(self):
+        target = _forward(0, 2, True)
+        prompt = [7, 8, 9]
+        expected = _greedy(target, prompt, 10)
+        decoder = SpeculativeDecoder(
+            target_forward=target,
+            draft_forward=_forward(1, 1, False),
+            max_seq_len=48,
+            stop_tokens=[expected[5]],
+        )
+        tokens, _ = decoder.generate(prompt, 10, num_draft_tokens=4)
+        self.assertEqual(tokens, expected[: expected.index(expected[5])])
+
+        # Sampling stays within the KV cache.
+        decoder = SpeculativeDecoder(
+            target_forward=_forward(0, 2, True),
+            draft_forward=_forward(1, 1, False),
+            max_seq_len=12,
+            stop_tokens=[],
+        )
+        tokens, stats = decoder.generate(prompt, 100, temperature=0.8)
+        self.assertEqual(len(tokens), 12 - len(prompt))
+        self.assertEqual(stats.num_generated, len(tokens))
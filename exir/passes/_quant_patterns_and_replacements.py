@@ -172,6 +172,19 @@ def embedding_byte_dtype_out_meta(
     )
 
 
+def unpack_4bit(weight: torch.Tensor) -> torch.Tensor:
+    """
+    Unpacks the uint8 weight of a 4 bit op, with two values offset by 8 per
+    byte and the value at an even column in the high nibble, to an int8 tensor
+    with twice as many columns.
+    """
+    weight_even = weight.div(16, rounding_mode="trunc")
+    weight_odd = weight.remainder(16)
+    weight_unpacked = torch.stack((weight_even, weight_odd), dim=-1)
+    weight = weight_unpacked.view(weight.shape[0], -1)
+    return weight.view(torch.int8).add(-8)
+
+
 quantized_decomposed_lib.define(
     "embedding_4bit(Tensor weight, Tensor weight_scales, Tensor? weight_zero_points, "
     "int weight_quant_min, int weight_quant_max, Tensor indices) -> Tensor",
@@ -206,11 +219,7 @@ def embedding_4bit(
     group_size = (2 * weight.size(1)) // (
         weight_scales.size(1) if weight_scales.dim() == 2 else 1
     )
-    weight_even = weight.div(16, rounding_mode="trunc")
-    weight_odd = weight.remainder(16)
-    weight_unpacked = torch.stack((weight_even, weight_odd), dim=-1)
-    weight = weight_unpacked.view(weight.shape[0], -1)
-    weight = weight.view(torch.int8).add(-8)
+    weight = unpack_4bit(weight)
 
     weight = torch.ops.quantized_decomposed.dequantize_per_channel_group.default(
         weight,
@@ -259,11 +268,7 @@ def embedding_4bit_dtype(
     group_size = (2 * weight.size(1)) // (
         weight_scales.size(1) if weight_scales.dim() == 2 else 1
     )
-    weight_even = weight.div(16, rounding_mode="trunc")
-    weight_odd = weight.remainder(16)
-    weight_unpacked = torch.stack((weight_even, weight_odd), dim=-1)
-    weight = weight_unpacked.view(weight.shape[0], -1)
-    weight = weight.view(torch.int8).add(-8)
+    weight = unpack_4bit(weight)
 
     weight = torch.ops.quantized_decomposed.dequantize_per_channel_group.default(
         weight,
@@ -308,6 +313,58 @@ quantized_decomposed_lib.define(
     "mixed_linear(Tensor input, Tensor weight, Tensor weight_scales, Tensor? weight_zero_points, ScalarType? dtype=None) -> Tensor",
 )
 
+quantized_decomposed_lib.define(
+    "mixed_linear_4bit(Tensor input, Tensor weight, Tensor weight_scales, Tensor? weight_zero_points, ScalarType? dtype=None) -> Tensor",
+)
+
+quantized_decomposed_lib.define(
+    "mixed_linear_4bit.out(Tensor input, Tensor weight, Tensor weight_scales, Tensor? weight_zero_points, ScalarType? dtype=None, *, Tensor(a!) out) -> Tensor(a!)",
+)
+
+
+@impl(quantized_decomposed_lib, "mixed_linear_4bit", "CompositeExplicitAutograd")
+def mixed_linear_4bit(
+    input: torch.Tensor,
+    weight: torch.Tensor,
+    weight_scales: torch.Tensor,
+    weight_zero_points: Optional[torch.Tensor],
+    dtype: Optional[torch.dtype] = None,
+) -> torch.Tensor:
+    """
+    Linear with a weight of shape [out_features, in_features / 2] holding two
+    4 bit values per byte, packed like the weight of embedding_4bit, and
+    weight_scales of shape [out_features] or [out_features, num_groups].
+    """
+    weight = unpack_4bit(weight)
+    group_size = weight.size(1) // (
+        weight_scales.size(1) if weight_scales.dim() == 2 else 1
+    )
+    weight = torch.ops.quantized_decomposed.dequantize_per_channel_group.default(
+        weight,
+        weight_scales,
+        weight_zero_points,
+        -8,
+        7,
+        weight.dtype,
+        group_size,
+        input.dtype,
+    )
+    out = torch.ops.aten.linear.default(input, weight)
+    return out if dtype is None else out.to(dtype)
+
+
+@impl_abstract("quantized_decomposed::mixed_linear_4bit.out")
+def mixed_linear_4bit_out_meta(
+    input: torch.Tensor,
+    weight: torch.Tensor,
+    weight_scales: torch.Tensor,
+    weight_zero_points: Optional[torch.Tensor],
+    dtype: Optional[torch.dtype],
+    out: torch.Tensor,
+) -> torch.Tensor:
+    return mixed_linear_4bit(input, weight, weight_scales, weight_zero_points, dtype)
+
+
 quantized_decomposed_lib.define(
     "add(Tensor a, float a_scale, int a_zero_point, int a_quant_min, int a_quant_max, Tensor b, float b_scale, int b_zero_point, int b_quant_min, int b_quant_max, float out_scale, int out_zero_point, int out_quant_min, int out_quant_max) -> Tensor qc"
 )
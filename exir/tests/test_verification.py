@@ -11,6 +11,7 @@ from executorch.exir import to_edge
 from executorch.exir.passes.const_prop_pass import ConstPropPass
 from executorch.exir.schema import Tensor, TensorList
 
+from executorch.exir.verification.differential import run_differential
 from executorch.exir.verification.interpreter import Interpreter
 from executorch.exir.verification.verifier import EXIREdgeDialectVerifier
 from torch._export.verifier import SpecViolationError
@@ -116,6 +117,56 @@ class TestVerification(unittest.TestCase):
             },
         )
 
+    def test_optimized_interpreter(self) -> None:
+        class Model(torch.nn.Module):
+            def __init__(self) -> None:
+                super().__init__()
+                self.a = torch.ones(2, 2)
+                self.b = 2 * torch.ones(2, 2)
+
+            def forward(self, x: torch.Tensor) -> torch.Tensor:
+                z = self.a * x
+                y = torch.cat([z, x]) - torch.cat([self.b, z])
+                return y.relu()
+
+        model = Model()
+        inputs = (torch.randn(2, 2),)
+        program = to_edge(export(model, inputs)).to_executorch().executorch_program
+        expected = model(*inputs)
+
+        torch.testing.assert_close(Interpreter(program).run(*inputs)[0], expected)
+        interpreter = Interpreter(program, optimize=True)
+        # The dispatch table is reused by later runs.
+        for _ in range(2):
+            x = torch.randn(2, 2)
+            torch.testing.assert_close(interpreter.run(x)[0], model(x))
+
+        outputs, traces = Interpreter(program).run_with_trace(*inputs)
+        torch.testing.assert_close(outputs[0], expected)
+        self.assertEqual(
+            [trace.instruction_index for trace in traces],
+            list(range(len(program.execution_plan[0].chains[0].instructions))),
+        )
+        self.assertEqual(traces[0].name, str(torch.ops.aten.mul.out))
+        torch.testing.assert_close(traces[-1].output, expected)
+
+    def test_differential(self) -> None:
+        class Model(torch.nn.Module):
+            def forward(self, x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
+                return (x + y) * y
+
+        inputs = (torch.randn(2, 2), torch.randn(2, 2))
+        report = run_differential(
+            to_edge(export(Model(), inputs)).to_executorch(), inputs
+        )
+        self.assertEqual(report.interpreter_max_abs_error, 0.0)
+        self.assertLess(report.runtime_max_abs_error, 1e-6)
+        self.assertEqual(
+            [instruction.name for instruction in report.instructions],
+            [str(torch.ops.aten.add.out), str(torch.ops.aten.mul.out)],
+        )
+        self.assertIsNone(report.first_divergence())
+
     def test_verification(self) -> None:
         class Op2(torch.nn.Module):
             def __init__(self) -> None:
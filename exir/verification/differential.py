@@ -0,0 +1,291 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Runs the same inputs through eager PyTorch, the Python Interpreter and the
+pybindings runtime, and reports where and by how much they diverge.
+
+Example:
+
+    report = run_differential(to_edge(export(model, inputs)).to_executorch(), inputs)
+    print(report)
+    divergence = report.first_divergence()
+"""
+
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+from executorch.exir.program import ExecutorchProgramManager
+from executorch.exir.verification.interpreter import InstructionTrace, Interpreter
+from torch.utils._pytree import tree_flatten
+
+# The runtime aligns every tensor it logs to the debug buffer to this many bytes.
+_DEBUG_BUFFER_ALIGNMENT = 64
+
+
+@dataclass
+class InstructionDivergence:
+    instruction_index: int
+    # Operator of a KernelCall, or the instruction type otherwise.
+    name: str
+    # Max absolute difference between the outputs of the instruction in the
+    # Interpreter and in the runtime, or None if the runtime did not log it
+    # (e.g. for instructions that are not kernel calls, or if the runtime was
+    # built without the event tracer).
+    max_abs_error: Optional[float]
+    matches: Optional[bool]
+    interpreter_ms: float
+    runtime_ms: Optional[float]
+
+
+@dataclass
+class DifferentialReport:
+    # Instructions in the order the Interpreter executed them.
+    instructions: List[InstructionDivergence]
+    # Max absolute difference of the outputs of the program with eager PyTorch.
+    interpreter_max_abs_error: float
+    runtime_max_abs_error: float
+    eager_ms: float
+    interpreter_ms: float
+    runtime_ms: float
+
+    def first_divergence(self) -> Optional[InstructionDivergence]:
+        """Returns the first instruction whose outputs did not match, if any."""
+        for instruction in self.instructions:
+            if instruction.matches is False:
+                return instruction
+        return None
+
+    def __str__(self) -> str:
+        lines = [
+            f"eager: {self.eager_ms:.3f} ms",
+            f"interpreter: {self.interpreter_ms:.3f} ms, "
+            f"max abs error vs eager {self.interpreter_max_abs_error:.3g}",
+            f"runtime: {self.runtime_ms:.3f} ms, "
+            f"max abs error vs eager {self.runtime_max_abs_error:.3g}",
+        ]
+        for instruction in self.instructions:
+            error = (
+                "not logged"
+                if instruction.max_abs_error is None
+                else f"max abs error {instruction.max_abs_error:.3g}"
+                + ("" if instruction.matches else " DIVERGED")
+            )
+            runtime_ms = (
+                "-"
+                if instruction.runtime_ms is None
+                else f"{instruction.runtime_ms:.3f} ms"
+            )
+            lines.append(
+                f"  [{instruction.instruction_index}] {instruction.name}: {error}, "
+                f"interpreter {instruction.interpreter_ms:.3f} ms, "
+                f"runtime {runtime_ms}"
+            )
+        return "\n".join(lines)
+
+
+# pyre-ignore[2]: "Any" in parameter type annotations.
+def _flatten_values(value: Any) -> List[Any]:
+    return tree_flatten(value)[0]
+
+
+def _max_abs_error(
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    actual: Any,
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    expected: Any,
+) -> float:
+    """Max absolute difference between two values, or inf if they differ in structure."""
+    actual_values = _flatten_values(actual)
+    expected_values = _flatten_values(expected)
+    if len(actual_values) != len(expected_values):
+        return math.inf
+    max_error = 0.0
+    for a, e in zip(actual_values, expected_values):
+        if isinstance(a, torch.Tensor) and isinstance(e, torch.Tensor):
+            if a.shape != e.shape:
+                return math.inf
+            if a.numel() == 0:
+                continue
+            a, e = a.double(), e.double()
+            # NaNs and infinities in the same places are not errors.
+            same = (a == e) | (a.isnan() & e.isnan())
+            max_error = max(
+                max_error, torch.where(same, 0.0, (a - e).abs()).max().item()
+            )
+        elif isinstance(a, (int, float)) and isinstance(e, (int, float)):
+            max_error = max(max_error, abs(a - e))
+        elif a != e:
+            return math.inf
+    return max_error
+
+
+def _all_close(
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    actual: Any,
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    expected: Any,
+    rtol: float,
+    atol: float,
+) -> bool:
+    actual_values = _flatten_values(actual)
+    expected_values = _flatten_values(expected)
+    if len(actual_values) != len(expected_values):
+        return False
+    for a, e in zip(actual_values, expected_values):
+        if isinstance(a, torch.Tensor) and isinstance(e, torch.Tensor):
+            if a.shape != e.shape or not torch.allclose(
+                a, e, rtol=rtol, atol=atol, equal_nan=True
+            ):
+                return False
+        elif a != e:
+            return False
+    return True
+
+
+def _debug_buffer_size(traces: Sequence[InstructionTrace]) -> int:
+    """Size of a debug buffer that can hold the outputs of every instruction."""
+    size = 0
+    for trace in traces:
+        for value in _flatten_values(trace.output):
+            if isinstance(value, torch.Tensor):
+                size += value.nbytes + _DEBUG_BUFFER_ALIGNMENT
+    # The runtime also logs the outputs of the program.
+    return 2 * size + 4096
+
+
+def _runtime_instruction_outputs(
+    etdump_data: bytes,
+    debug_buffer: bytes,
+    # pyre-ignore[3]: "Any" in return type annotations.
+) -> Dict[int, List[Any]]:
+    """
+    Returns the outputs logged by the runtime, by instruction index. An
+    instruction executed several times, e.g. in a loop, has several outputs.
+    """
+    from executorch.sdk.etdump.serialize import deserialize_from_etdump_flatcc
+    from executorch.sdk.inspector._inspector_utils import (
+        inflate_runtime_output,
+        is_debug_output,
+    )
+
+    outputs = {}
+    for run_data in deserialize_from_etdump_flatcc(etdump_data).run_data:
+        for event in run_data.events or []:
+            debug_event = event.debug_event
+            if debug_event is None or is_debug_output(debug_event.debug_entry):
+                continue
+            outputs.setdefault(debug_event.instruction_id, []).append(
+                inflate_runtime_output(debug_event.debug_entry, debug_buffer)
+            )
+    return outputs
+
+
+def run_differential(
+    executorch_program: ExecutorchProgramManager,
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    inputs: Tuple[Any, ...],
+    eager_module: Optional[torch.nn.Module] = None,
+    method_name: str = "forward",
+    rtol: float = 1e-5,
+    atol: float = 1e-8,
+) -> DifferentialReport:
+    """
+    Runs `inputs` through `eager_module` (by default, the exported program of
+    `method_name`), through the Interpreter and through the portable pybindings,
+    and compares their outputs, along with the outputs of every instruction in
+    the Interpreter and in the runtime. An instruction matches if all its
+    outputs are close within `rtol` and `atol`.
+
+    The Interpreter only supports programs with a single method.
+    """
+    from executorch.extension.pybindings.portable_lib import (
+        _load_for_executorch_from_buffer,
+    )
+    from executorch.sdk.inspector import summarize_op_timings
+
+    if eager_module is None:
+        eager_module = executorch_program.exported_program(method_name).module()
+    start = time.perf_counter()
+    eager_outputs = eager_module(*inputs)
+    eager_ms = (time.perf_counter() - start) * 1000
+
+    interpreter = Interpreter(executorch_program.executorch_program, optimize=True)
+    start = time.perf_counter()
+    interpreter_outputs, traces = interpreter.run_with_trace(*inputs)
+    interpreter_ms = (time.perf_counter() - start) * 1000
+
+    buffer = executorch_program.buffer
+    flat_inputs = _flatten_values(inputs)
+    module = _load_for_executorch_from_buffer(buffer, methods=[method_name])
+    start = time.perf_counter()
+    runtime_outputs = module.run_method(method_name, flat_inputs)
+    runtime_ms = (time.perf_counter() - start) * 1000
+
+    # Replay the run with the event tracer logging the output of every
+    # instruction, and its duration.
+    debug_module = _load_for_executorch_from_buffer(
+        buffer,
+        enable_etdump=True,
+        debug_buffer_size=_debug_buffer_size(traces),
+        methods=[method_name],
+    )
+    debug_module.run_method(method_name, flat_inputs)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        etdump_path = os.path.join(tmpdir, "etdump.etdp")
+        debug_buffer_path = os.path.join(tmpdir, "debug_buffer.bin")
+        debug_module.write_etdump_result_to_file(etdump_path, debug_buffer_path)
+        with open(etdump_path, "rb") as f:
+            etdump_data = f.read()
+        with open(debug_buffer_path, "rb") as f:
+            debug_buffer = f.read()
+    runtime_instruction_outputs = _runtime_instruction_outputs(
+        etdump_data, debug_buffer
+    )
+    timings = summarize_op_timings(etdump_data)
+
+    instructions = []
+    # Number of times each instruction was executed so far.
+    executions: Dict[int, int] = {}
+    for trace in traces:
+        execution = executions.get(trace.instruction_index, 0)
+        executions[trace.instruction_index] = execution + 1
+        runtime_outputs_of_instruction = runtime_instruction_outputs.get(
+            trace.instruction_index, []
+        )
+        max_abs_error = None
+        matches = None
+        if execution < len(runtime_outputs_of_instruction):
+            runtime_output = runtime_outputs_of_instruction[execution]
+            max_abs_error = _max_abs_error(runtime_output, trace.output)
+            matches = _all_close(runtime_output, trace.output, rtol, atol)
+        timing = timings.get(f"OPERATOR_CALL[{trace.instruction_index}]")
+        instructions.append(
+            InstructionDivergence(
+                instruction_index=trace.instruction_index,
+                name=trace.name,
+                max_abs_error=max_abs_error,
+                matches=matches,
+                interpreter_ms=trace.time_ms,
+                runtime_ms=timing.mean if timing is not None else None,
+            )
+        )
+
+    return DifferentialReport(
+        instructions=instructions,
+        interpreter_max_abs_error=_max_abs_error(interpreter_outputs, eager_outputs),
+        runtime_max_abs_error=_max_abs_error(runtime_outputs, eager_outputs),
+        eager_ms=eager_ms,
+        interpreter_ms=interpreter_ms,
+        runtime_ms=runtime_ms,
+    )
@@ -7,7 +7,9 @@
 # pyre-strict
 
 import copy
-from typing import List, Optional, Union
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple, Union
 
 # pyre-fixme[21]: Could not find module `executorch.exir.verification.bindings`.
 import executorch.exir.verification.bindings as bindings  # @manual=//executorch/exir/verification:bindings
@@ -125,8 +127,35 @@ def make_operators_list(
     return operator_list
 
 
+# An instruction of the dispatch table. Takes the value list, and returns the
+# index of the next instruction, or None to continue with the following one.
+DispatchFn = Callable[[List[ValueType]], Optional[int]]
+
+
+@dataclass
+class InstructionTrace:
+    """What an instruction did during Interpreter.run_with_trace()."""
+
+    # Index of the instruction in the chain.
+    instruction_index: int
+    # Name of the operator of a KernelCall, or the instruction type otherwise.
+    name: str
+    # Value written by the instruction, cloned, or None if it wrote nothing.
+    output: ValueType
+    time_ms: float
+
+
 class Interpreter:
-    def __init__(self, program: Program) -> None:
+    """
+    Executes a Program in Python, instruction by instruction.
+
+    With `optimize=True`, `run` executes from a dispatch table built on the
+    first run instead: operators, arguments and value slots are resolved once,
+    constant values are loaded once, and no per-instruction type checks are
+    done.
+    """
+
+    def __init__(self, program: Program, optimize: bool = False) -> None:
         # Currently there is only 1 execution plan in the list -- this assert will help
         # catch any changes in the future
         assert len(program.execution_plan) == 1
@@ -150,6 +179,8 @@ class Interpreter:
         self._operators_list: List[torch._ops.OpOverload] = make_operators_list(
             self.execution_plan
         )
+        self.optimize = optimize
+        self._dispatch_table: Optional[List[Tuple[str, DispatchFn]]] = None
 
     def get_value_list(self) -> List[ValueType]:
         # TODO(meghajain) may need to change deepcopy to clone
@@ -357,17 +388,7 @@ class Interpreter:
         else:
             self.set_value(output_idxs[0], res)
 
-    def run(self, *raw_args: torch.Tensor) -> PyTree:
-        """
-        Loops through instructions given some inputs
-
-        Args:
-        `args` : list of inputs required for interpretation
-
-        Returns:
-        Outputs after completing all computations
-        """
-
+    def _flatten_args(self, raw_args: Tuple[torch.Tensor, ...]) -> List[ValueType]:
         # pyre-fixme[16]: Module `pytree` has no attribute `tree_flatten`.
         args, pytree = ex_pytree.tree_flatten((raw_args, {}))
 
@@ -376,11 +397,178 @@ class Interpreter:
                 f"Arguments provided do not match required type. \nRequired: {self.container_metatype.encoded_inp_str} \nProvided: {pytree.to_str()}"
             )
 
-        # Initialize user inputs in value list
+        # Check the number of user inputs
         if len(self.execution_plan.inputs) != len(args):
             raise RuntimeError(
                 f"Incorrect number of arguments provided. Expected {len(self.execution_plan.inputs)} values, but received {len(args)}"
             )
+        return args
+
+    def _unflatten_outputs(self) -> PyTree:
+        ret = [self._value_list[i] for i in self.execution_plan.outputs]
+        # pyre-fixme[16]: Module `pytree` has no attribute `from_str`.
+        treespec = ex_pytree.from_str(self.container_metatype.encoded_out_str)
+        # pyre-fixme[16]: Module `pytree` has no attribute `tree_unflatten`.
+        return ex_pytree.tree_unflatten(ret, treespec)
+
+    def _compile_kernel(self, kernel: KernelCall) -> DispatchFn:
+        """Resolves the operator, arguments and output slots of a KernelCall."""
+        values = self.execution_plan.values
+        operator = self._operators_list[kernel.op_index]
+        arguments = operator._schema.arguments
+        num_args = len([arg for arg in arguments if not arg.kwarg_only])
+        kwarg_names = [arg.name for arg in arguments if arg.kwarg_only]
+        arg_slots = kernel.args[:num_args]
+        kwarg_slots = list(
+            zip(kwarg_names, kernel.args[num_args : num_args + len(kwarg_names)])
+        )
+        output_idxs = kernel.args[num_args + len(kwarg_names) :]
+        assert (
+            len(output_idxs) == 1
+        ), "emitter is expected to pack multiple outputs into a TensorList"
+        output_slot = output_idxs[0]
+
+        # Tensor lists alias the tensors they hold, which may have been written
+        # since the list was loaded, so they are gathered again on every call.
+        list_slots = [
+            (i, values[i].val.items)
+            for i in kernel.args[: num_args + len(kwarg_names)]
+            if isinstance(values[i].val, (TensorList, OptionalTensorList))
+        ]
+        output_val = values[output_slot].val
+        output_items = (
+            output_val.items
+            if isinstance(output_val, (TensorList, OptionalTensorList))
+            else None
+        )
+
+        def call_kernel(value_list: List[ValueType]) -> None:
+            for slot, items in list_slots:
+                value_list[slot] = [value_list[i] if i != -1 else None for i in items]
+            res = operator(
+                *[value_list[i] for i in arg_slots],
+                **{name: value_list[i] for name, i in kwarg_slots},
+            )
+            if output_items is not None:
+                res = list(res)
+                for i, item in zip(output_items, res):
+                    value_list[i] = item
+            value_list[output_slot] = res
+
+        return call_kernel
+
+    def _build_dispatch_table(self) -> List[Tuple[str, DispatchFn]]:
+        """
+        Loads every value that does not depend on the inputs, and compiles each
+        instruction into a function operating on pre-resolved value slots.
+        """
+        for idx, evalue in enumerate(self.execution_plan.values):
+            if not isinstance(evalue.val, (TensorList, OptionalTensorList)):
+                self.load_value(idx)
+
+        assert len(self.execution_plan.chains) == 1
+        table = []
+        for instruction in self.execution_plan.chains[0].instructions:
+            instr_args = instruction.instr_args
+            if isinstance(instr_args, KernelCall):
+                name = str(self._operators_list[instr_args.op_index])
+                table.append((name, self._compile_kernel(instr_args)))
+            elif isinstance(instr_args, JumpFalseCall):
+
+                def jump_false(
+                    value_list: List[ValueType],
+                    cond: int = instr_args.cond_value_index,
+                    destination: int = instr_args.destination_instruction,
+                ) -> Optional[int]:
+                    return None if value_list[cond] else destination
+
+                table.append(("JumpFalseCall", jump_false))
+            elif isinstance(instr_args, MoveCall):
+
+                def move(
+                    value_list: List[ValueType],
+                    move_from: int = instr_args.move_from,
+                    move_to: int = instr_args.move_to,
+                ) -> None:
+                    value_list[move_to] = value_list[move_from]
+
+                table.append(("MoveCall", move))
+            else:
+                raise RuntimeError(
+                    f"Received unknown instruction from program: {instruction}."
+                )
+        return table
+
+    def _get_dispatch_table(self) -> List[Tuple[str, DispatchFn]]:
+        if self._dispatch_table is None:
+            self._dispatch_table = self._build_dispatch_table()
+        return self._dispatch_table
+
+    def _output_slot(self, instruction_index: int) -> Optional[int]:
+        instr_args = (
+            self.execution_plan.chains[0].instructions[instruction_index].instr_args
+        )
+        if isinstance(instr_args, KernelCall):
+            return instr_args.args[-1]
+        if isinstance(instr_args, MoveCall):
+            return instr_args.move_to
+        return None
+
+    def run_with_trace(
+        self, *raw_args: torch.Tensor
+    ) -> Tuple[PyTree, List[InstructionTrace]]:
+        """
+        Same as run, using the dispatch table, but also returns the output and
+        execution time of every instruction executed, in execution order.
+        """
+        args = self._flatten_args(raw_args)
+        table = self._get_dispatch_table()
+        value_list = self._value_list
+        for idx, arg in zip(self.execution_plan.inputs, args):
+            value_list[idx] = arg
+
+        traces = []
+        ip = 0
+        while ip < len(table):
+            name, fn = table[ip]
+            start = time.perf_counter()
+            next_ip = fn(value_list)
+            time_ms = (time.perf_counter() - start) * 1000
+            slot = self._output_slot(ip)
+            output = None if slot is None else value_list[slot]
+            if isinstance(output, torch.Tensor):
+                output = output.clone()
+            elif isinstance(output, list):
+                output = [
+                    x.clone() if isinstance(x, torch.Tensor) else x for x in output
+                ]
+            traces.append(InstructionTrace(ip, name, output, time_ms))
+            ip = ip + 1 if next_ip is None else next_ip
+        return self._unflatten_outputs(), traces
+
+    def run(self, *raw_args: torch.Tensor) -> PyTree:
+        """
+        Loops through instructions given some inputs
+
+        Args:
+        `args` : list of inputs required for interpretation
+
+        Returns:
+        Outputs after completing all computations
+        """
+        args = self._flatten_args(raw_args)
+
+        if self.optimize:
+            table = self._get_dispatch_table()
+            value_list = self._value_list
+            for idx, arg in zip(self.execution_plan.inputs, args):
+                value_list[idx] = arg
+            ip = 0
+            while ip < len(table):
+                next_ip = table[ip][1](value_list)
+                ip = ip + 1 if next_ip is None else next_ip
+            return self._unflatten_outputs()
+
         for i in range(len(self.execution_plan.inputs)):
             idx = self.execution_plan.inputs[i]
             self._value_list[idx] = args[i]
@@ -400,9 +588,7 @@ class Interpreter:
                 self.load_value(instruction.instr_args.cond_value_index)
                 ip = (
                     ip + 1
-                    # pyre-ignore
-                    if self._value_list[instruction.instr_args.cond_val_index]
-                    # pyre-ignore
+                    if self._value_list[instruction.instr_args.cond_value_index]
                     else instruction.instr_args.destination_instruction
                 )
                 continue
@@ -418,8 +604,4 @@ class Interpreter:
                 )
             ip += 1
 
-        ret = [self._value_list[i] for i in self.execution_plan.outputs]
-        # pyre-fixme[16]: Module `pytree` has no attribute `from_str`.
-        treespec = ex_pytree.from_str(self.container_metatype.encoded_out_str)
-        # pyre-fixme[16]: Module `pytree` has no attribute `tree_unflatten`.
-        return ex_pytree.tree_unflatten(ret, treespec)
+        return self._unflatten_outputs()
@@ -43,6 +43,7 @@ def define_common_targets():
         exported_headers = ["file_data_loader.h"],
         visibility = [
             "//executorch/test/...",
+            "//executorch/extension/pybindings/...",
             "//executorch/runtime/executor/test/...",
             "//executorch/extension/data_loader/test/...",
             "@EXECUTORCH_CLIENTS",
@@ -5,15 +5,23 @@
 # LICENSE file in the root directory of this source tree.
 
 import copy
-from typing import Any, Mapping
+from typing import Any, Dict, Mapping, Tuple
 
+import numpy as np
 import torch
 import torch.nn as nn
 from executorch.examples.models.llama2.llama_transformer import (
     ModelArgs as LlamaModelArgs,
     Transformer as LlamaTransformer,
 )
+from executorch.examples.models.llama2.source_transformation.quantize import (
+    QuantizedGroupEmbedding,
+    WeightOnlyInt4Linear,
+    WeightOnlyInt8Linear,
+)
 from executorch.extension.gguf_util.load_gguf import GGUFModelArgs, GGUFWeights
+from gguf import ReaderTensor
+from gguf.constants import GGMLQuantizationType
 
 
 def _create_pt_model(
@@ -29,7 +37,10 @@ def _create_pt_model(
         hidden_dim=gguf_model_args.feed_forward_length,
         rope_freq_base=gguf_model_args.rope.freq_base,
     )
-    pt_model = LlamaTransformer(llama_model_args)
+    # The model is created on the meta device: its weights are assigned from
+    # the GGUF file when they are loaded, without allocating them first.
+    with torch.device("meta"):
+        pt_model = LlamaTransformer(llama_model_args)
     pt_model.eval()
     return pt_model
 
@@ -56,37 +67,167 @@ def _convert_gguf_tensor_name_to_llama_nn(gguf_name: str) -> str:
     return result
 
 
-def _convert_to_state_dict(gguf_weights: GGUFWeights) -> Mapping[str, Any]:
+# Q4_0 and Q8_0 split each row in blocks of 32 values sharing a float16 scale.
+_GGUF_BLOCK_SIZE = 32
+# Number of bytes of a block: the scale, then 16 bytes of packed 4 bit values
+# for Q4_0, or 32 int8 values for Q8_0.
+_GGUF_TYPE_SIZES = {
+    GGMLQuantizationType.Q4_0: 2 + _GGUF_BLOCK_SIZE // 2,
+    GGMLQuantizationType.Q8_0: 2 + _GGUF_BLOCK_SIZE,
+}
+
+
+def _gguf_blocks(tensor: ReaderTensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Returns a view of the blocks of a quantized tensor, read from the memory
+    mapped file, as a uint8 tensor of shape [num_blocks, type_size], and the
+    scales of the blocks as float16 with shape [rows, cols / 32].
+    """
+    rows, cols = tensor.shape[::-1]
+    blocks = torch.from_numpy(
+        np.asarray(tensor.data).reshape(-1, _GGUF_TYPE_SIZES[tensor.tensor_type])
+    )
+    scales = blocks[:, :2].view(torch.float16)
+    return blocks, scales.reshape(rows, cols // _GGUF_BLOCK_SIZE).contiguous()
+
+
+def _convert_q8_0(tensor: ReaderTensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Returns the int8 weight of shape [rows, cols] and the group-wise scales of
+    a Q8_0 tensor, as expected by WeightOnlyInt8Linear and
+    QuantizedGroupEmbedding.
+    """
+    rows, cols = tensor.shape[::-1]
+    blocks, scales = _gguf_blocks(tensor)
+    weight = blocks[:, 2:].view(torch.int8).reshape(rows, cols)
+    return weight, scales
+
+
+def _convert_q4_0(tensor: ReaderTensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Returns the packed uint8 weight of shape [rows, cols / 2] and the
+    group-wise scales of a Q4_0 tensor, as expected by WeightOnlyInt4Linear and
+    QuantizedGroupEmbedding.
+
+    Both formats store 4 bit values offset by 8, but a Q4_0 block holds its
+    first 16 values in the low nibbles of its 16 bytes and the last 16 in the
+    high nibbles, while ExecuTorch packs consecutive values in the high then
+    low nibble of a byte. The nibbles are moved without being dequantized.
+    """
+    rows, cols = tensor.shape[::-1]
+    blocks, scales = _gguf_blocks(tensor)
+    qs = blocks[:, 2:]
+    values = torch.cat([qs & 0x0F, qs >> 4], dim=1).view(-1, _GGUF_BLOCK_SIZE // 2, 2)
+    weight = (values[:, :, 0] << 4) | values[:, :, 1]
+    return weight.reshape(rows, cols // 2), scales
+
 
+def _dequantize(tensor: ReaderTensor) -> torch.Tensor:
+    """
+    Returns the float32 values of a tensor of another quantization type, like
+    the Q6_K output.weight of Q4_0 files, with shape [rows, cols].
+    """
+    try:
+        from gguf.quants import dequantize
+    except ImportError as e:
+        raise NotImplementedError(
+            f"Unsupported quantization type {tensor.tensor_type.name} for "
+            f"{tensor.name}: dequantizing it requires a newer gguf package."
+        ) from e
+    values = dequantize(np.asarray(tensor.data), tensor.tensor_type)
+    return torch.from_numpy(values.reshape(tensor.shape[::-1]))
+
+
+def _convert_to_state_dict(
+    gguf_weights: GGUFWeights,
+) -> Tuple[Mapping[str, Any], Dict[str, GGMLQuantizationType]]:
+    """
+    Returns the state dict of the model, and the quantization type of the
+    weights which are kept quantized, by fqn of their module.
+    """
     state_dict = {}
+    quantized_modules = {}
     for tensor in gguf_weights.tensors:
         gguf_tensor_name = tensor.name
         nn_tensor_name = _convert_gguf_tensor_name_to_llama_nn(gguf_tensor_name)
-        # gguf is reversed
-        reversed_shape = tensor.shape[::-1]
-        new_tensor = tensor.data.reshape(reversed_shape)
-        state_dict[nn_tensor_name] = torch.from_numpy(new_tensor)
+        if tensor.tensor_type in (
+            GGMLQuantizationType.F32,
+            GGMLQuantizationType.F16,
+        ):
+            # gguf is reversed
+            reversed_shape = tensor.shape[::-1]
+            new_tensor = tensor.data.reshape(reversed_shape)
+            # The weights are assigned as is, so convert them to the float32
+            # of the model.
+            state_dict[nn_tensor_name] = torch.from_numpy(new_tensor).float()
+            continue
+
+        if tensor.tensor_type == GGMLQuantizationType.Q8_0:
+            weight, scales = _convert_q8_0(tensor)
+        elif tensor.tensor_type == GGMLQuantizationType.Q4_0:
+            weight, scales = _convert_q4_0(tensor)
+        else:
+            state_dict[nn_tensor_name] = _dequantize(tensor)
+            continue
+        module_name = nn_tensor_name.rsplit(".", 1)[0]
+        state_dict[nn_tensor_name] = weight
+        state_dict[f"{module_name}.scales"] = scales
+        quantized_modules[module_name] = tensor.tensor_type
 
-    return state_dict
+    return state_dict, quantized_modules
+
+
+def _replace_quantized_modules(
+    pt_model: nn.Module, quantized_modules: Dict[str, GGMLQuantizationType]
+) -> None:
+    """
+    Swaps the linear and embedding layers whose weights are quantized in the
+    GGUF file for their group-quantized counterparts, with a group of 32.
+    """
+    for fqn, tensor_type in quantized_modules.items():
+        parent_name, _, name = fqn.rpartition(".")
+        parent = pt_model.get_submodule(parent_name)
+        child = getattr(parent, name)
+        packed = tensor_type == GGMLQuantizationType.Q4_0
+        if isinstance(child, nn.Linear):
+            if packed:
+                new_child = WeightOnlyInt4Linear(
+                    child.in_features, child.out_features, _GGUF_BLOCK_SIZE
+                )
+            else:
+                new_child = WeightOnlyInt8Linear(
+                    "meta",
+                    child.in_features,
+                    child.out_features,
+                    group_size=_GGUF_BLOCK_SIZE,
+                )
+        elif isinstance(child, nn.Embedding):
+            new_child = QuantizedGroupEmbedding(
+                "meta",
+                child.num_embeddings,
+                child.embedding_dim,
+                _GGUF_BLOCK_SIZE,
+                dtype=torch.float32,
+                packed=packed,
+            )
+        else:
+            raise NotImplementedError(
+                f"Quantized weights are not supported for {fqn}: {type(child).__name__}."
+            )
+        setattr(parent, name, new_child)
 
 
 def _load_weights_into_nn(
     pt_model: nn.Module, gguf_model_args: GGUFModelArgs, gguf_weights: GGUFWeights
 ):
 
-    state_dict: Mapping[str, Any] = _convert_to_state_dict(gguf_weights)
-
-    # We need to fake initialize the mask, to match with the llama_transformer.py
-    for id in range(gguf_model_args.block_count):
-        mask_name = f"layers.{id}.attention.mask"
-        mask = torch.full(
-            (1, 1, pt_model.params.max_seq_len, pt_model.params.max_seq_len),
-            float("-inf"),
-        )
-        mask = torch.triu(mask, diagonal=1)
-        state_dict[mask_name] = mask
+    state_dict, quantized_modules = _convert_to_state_dict(gguf_weights)
+    with torch.device("meta"):
+        _replace_quantized_modules(pt_model, quantized_modules)
 
-    pt_model.load_state_dict(state_dict)
+    # assign=True: the model is on the meta device, so its tensors are replaced
+    # by the ones read from the GGUF file instead of being copied into.
+    pt_model.load_state_dict(state_dict, assign=True)
     return
 
 
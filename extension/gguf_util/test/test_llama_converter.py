@@ -0,0 +1,203 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+from typing import Any, Dict, NamedTuple, Tuple
+
+import numpy as np
+import torch
+
+# Registers quantized_decomposed::mixed_linear_4bit and embedding_4bit.
+import executorch.exir.passes._quant_patterns_and_replacements  # noqa
+from executorch.examples.models.llama2.source_transformation.quantize import (
+    QuantizedGroupEmbedding,
+    WeightOnlyInt4Linear,
+    WeightOnlyInt8Linear,
+)
+from executorch.extension.gguf_util.converters.llama_converter import (
+    _create_pt_model,
+    _load_weights_into_nn,
+)
+from executorch.extension.gguf_util.load_gguf import (
+    AttentionArgs,
+    GGUFModelArgs,
+    GGUFWeights,
+    RopeArgs,
+)
+from gguf.constants import GGMLQuantizationType
+
+DIM = 64
+HIDDEN_DIM = 96
+VOCAB_SIZE = 16
+KV_DIM = 32
+
+
+class _ReaderTensor(NamedTuple):
+    # The fields of gguf.ReaderTensor used by the converter.
+    name: str
+    shape: np.ndarray
+    tensor_type: GGMLQuantizationType
+    # pyre-ignore[4]: "Any" in attribute type annotations.
+    data: Any
+
+
+def _q4_0_tensor(
+    name: str, rows: int, cols: int, rng: np.random.Generator
+) -> Tuple[_ReaderTensor, torch.Tensor]:
+    """
+    Returns a Q4_0 tensor, whose block holds a float16 scale d then 32 4 bit
+    values q, the first 16 in the low nibbles, and its values d * (q - 8).
+    """
+    d = rng.uniform(0.5, 2, (rows, cols // 32)).astype(np.float16)
+    q = rng.integers(0, 16, (rows, cols // 32, 32), dtype=np.uint8)
+    qs = q[:, :, :16] | (q[:, :, 16:] << 4)
+    blocks = np.concatenate([d[:, :, None].view(np.uint8), qs], axis=-1)
+    expected = d[:, :, None].astype(np.float32) * (q.astype(np.float32) - 8)
+    return (
+        _ReaderTensor(
+            name, np.array([cols, rows]), GGMLQuantizationType.Q4_0, blocks.ravel()
+        ),
+        torch.from_numpy(expected.reshape(rows, cols)),
+    )
+
+
+def _q8_0_tensor(
+    name: str, rows: int, cols: int, rng: np.random.Generator
+) -> Tuple[_ReaderTensor, torch.Tensor]:
+    """
+    Returns a Q8_0 tensor, whose block holds a float16 scale d then 32 int8
+    values q, and its values d * q.
+    """
+    d = rng.uniform(0.5, 2, (rows, cols // 32)).astype(np.float16)
+    q = rng.integers(-128, 128, (rows, cols // 32, 32), dtype=np.int8)
+    blocks = np.concatenate([d[:, :, None].view(np.uint8), q.view(np.uint8)], axis=-1)
+    expected = d[:, :, None].astype(np.float32) * q.astype(np.float32)
+    return (
+        _ReaderTensor(
+            name, np.array([cols, rows]), GGMLQuantizationType.Q8_0, blocks.ravel()
+        ),
+        torch.from_numpy(expected.reshape(rows, cols)),
+    )
+
+
+def _bf16_tensor(
+    name: str, rows: int, cols: int, rng: np.random.Generator
+) -> Tuple[_ReaderTensor, torch.Tensor]:
+    """
+    Returns a BF16 tensor, which is neither loaded as is nor kept quantized,
+    and its values.
+    """
+    values = rng.standard_normal((rows, cols)).astype(np.float32)
+    bits = (values.view(np.uint32) >> 16).astype(np.uint16)
+    expected = (bits.astype(np.uint32) << 16).view(np.float32)
+    return (
+        _ReaderTensor(
+            name, np.array([cols, rows]), GGMLQuantizationType.BF16, bits.view(np.uint8)
+        ),
+        torch.from_numpy(expected),
+    )
+
+
+def _f32_tensor(name: str, size: int) -> _ReaderTensor:
+    return _ReaderTensor(
+        name, np.array([size]), GGMLQuantizationType.F32, np.ones(size, np.float32)
+    )
+
+
+def _gguf_model(
+    embedding_type: GGMLQuantizationType,
+) -> Tuple[GGUFModelArgs, GGUFWeights, Dict[str, torch.Tensor]]:
+    """
+    Returns a one layer llama model whose attention weights are Q4_0, feed
+    forward weights Q8_0 and output weight BF16, and the values of its
+    quantized weights by name.
+    """
+    rng = np.random.default_rng(0)
+    make_tensor = {
+        GGMLQuantizationType.Q4_0: _q4_0_tensor,
+        GGMLQuantizationType.Q8_0: _q8_0_tensor,
+        GGMLQuantizationType.BF16: _bf16_tensor,
+    }
+    weights = [
+        ("token_embd.weight", VOCAB_SIZE, DIM, embedding_type),
+        ("blk.0.attn_q.weight", DIM, DIM, GGMLQuantizationType.Q4_0),
+        ("blk.0.attn_k.weight", KV_DIM, DIM, GGMLQuantizationType.Q4_0),
+        ("blk.0.attn_v.weight", KV_DIM, DIM, GGMLQuantizationType.Q4_0),
+        ("blk.0.attn_output.weight", DIM, DIM, GGMLQuantizationType.Q4_0),
+        ("blk.0.ffn_gate.weight", HIDDEN_DIM, DIM, GGMLQuantizationType.Q8_0),
+        ("blk.0.ffn_up.weight", HIDDEN_DIM, DIM, GGMLQuantizationType.Q8_0),
+        ("blk.0.ffn_down.weight", DIM, HIDDEN_DIM, GGMLQuantizationType.Q8_0),
+        ("output.weight", VOCAB_SIZE, DIM, GGMLQuantizationType.BF16),
+    ]
+    tensors = [
+        _f32_tensor("blk.0.attn_norm.weight", DIM),
+        _f32_tensor("blk.0.ffn_norm.weight", DIM),
+        _f32_tensor("output_norm.weight", DIM),
+    ]
+    expected = {}
+    for name, rows, cols, tensor_type in weights:
+        tensor, expected[name] = make_tensor[tensor_type](name, rows, cols, rng)
+        tensors.append(tensor)
+    model_args = GGUFModelArgs(
+        arch="llama",
+        embedding_length=DIM,
+        block_count=1,
+        feed_forward_length=HIDDEN_DIM,
+        vocab_size=VOCAB_SIZE,
+        attention=AttentionArgs(
+            head_count=4, head_count_kv=2, layer_norm_rms_epsilon=1e-5
+        ),
+        rope=RopeArgs(freq_base=10000.0),
+    )
+    return model_args, GGUFWeights(tensors=tensors), expected
+
+
+class LlamaConverterTest(unittest.TestCase):
+    def test_load_quantized_weights(self):
+        for embedding_type in [GGMLQuantizationType.Q4_0, GGMLQuantizationType.Q8_0]:
+            with self.subTest(embedding_type=embedding_type.name):
+                model_args, weights, expected = _gguf_model(embedding_type)
+                model = _create_pt_model(model_args)
+                _load_weights_into_nn(model, model_args, weights)
+
+                # Non-persistent buffers, which are not in the state dict, must
+                # not be left on the meta device either.
+                for name, tensor in [
+                    *model.named_parameters(),
+                    *model.named_buffers(),
+                ]:
+                    self.assertFalse(tensor.is_meta, name)
+
+                self.assertIsInstance(model.tok_embeddings, QuantizedGroupEmbedding)
+                self.assertIsInstance(
+                    model.layers[0].attention.wq, WeightOnlyInt4Linear
+                )
+                self.assertIsInstance(
+                    model.layers[0].feed_forward.w2, WeightOnlyInt8Linear
+                )
+                self.assertIsInstance(model.output, torch.nn.Linear)
+
+                with torch.no_grad():
+                    # The embedding ops dequantize in the float16 of the scales.
+                    torch.testing.assert_close(
+                        model.tok_embeddings(torch.arange(VOCAB_SIZE)),
+                        expected["token_embd.weight"].half().float(),
+                    )
+                    # The output of a linear layer for the identity matrix is
+                    # its transposed weight.
+                    for name, module in [
+                        ("blk.0.attn_q.weight", model.layers[0].attention.wq),
+                        ("blk.0.attn_k.weight", model.layers[0].attention.wk),
+                        ("blk.0.ffn_gate.weight", model.layers[0].feed_forward.w1),
+                        ("blk.0.ffn_down.weight", model.layers[0].feed_forward.w2),
+                        ("output.weight", model.output),
+                    ]:
+                        torch.testing.assert_close(
+                            module(torch.eye(module.in_features)).T,
+                            expected[name],
+                            msg=name,
+                        )
+                    model(torch.tensor([[1, 2, 3]]))
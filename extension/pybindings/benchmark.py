@@ -0,0 +1,404 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Latency and throughput benchmark of ExecuTorch programs.
+
+Example:
+
+    python -m executorch.extension.pybindings.benchmark \\
+        --pte model.pte --iterations 200 --concurrency 1 4
+
+Inputs are taken from a bundled program if one is given with
+--bundled_program, and are otherwise generated from the input tensor
+metadata of each method.
+"""
+
+import argparse
+import json
+import resource
+import sys
+import time
+from concurrent.futures import wait
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import torch
+from executorch.exir import schema
+from executorch.exir._serialize._program import deserialize_pte_binary
+from executorch.exir.tensor import get_scalar_type
+from executorch.extension.pybindings.bundled_verification import (
+    load_bundled_test_cases,
+)
+from executorch.extension.pybindings.module_pool import ExecuTorchModulePool
+
+
+@dataclass
+class ThroughputResult:
+    concurrency: int
+    # Calls completed per second.
+    calls_per_s: float
+
+
+@dataclass
+class MethodBenchmarkResult:
+    method_name: str
+    iterations: int
+    mean_ms: float
+    min_ms: float
+    max_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    throughput: List[ThroughputResult] = field(default_factory=list)
+    # Where the ETDump of a replay of the slowest iteration was written to. The
+    # replay runs the inputs of that iteration again on a separate module, so
+    # its timings are not those of the slowest iteration.
+    etdump_path: Optional[str] = None
+
+
+@dataclass
+class BenchmarkResult:
+    load_time_ms: float
+    # Peak resident set size of the whole process since it started, in MiB. It
+    # includes the Python interpreter, the copy of the program read to generate
+    # the inputs and everything the process did before the benchmark, not just
+    # the loaded module.
+    process_peak_rss_mb: float
+    methods: List[MethodBenchmarkResult]
+    # Counters of the data loader, as returned by get_load_stats().
+    # pyre-ignore[4]: "Any" in attribute type annotations.
+    load_stats: Dict[str, Any] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+    def __str__(self) -> str:
+        lines = [
+            f"load time: {self.load_time_ms:.2f} ms",
+            f"process peak RSS: {self.process_peak_rss_mb:.1f} MiB",
+        ]
+        if self.load_stats:
+            lines.append(
+                f"{self.load_stats['data_loader']} loader: "
+                f"{self.load_stats['num_segment_loads']} segments, "
+                f"{self.load_stats['segment_bytes_loaded'] / (1024 * 1024):.1f} "
+                f"MiB in {self.load_stats['segment_load_ms']:.2f} ms"
+            )
+        for method in self.methods:
+            lines.append(
+                f"{method.method_name} ({method.iterations} iterations): "
+                f"mean {method.mean_ms:.3f} ms, p50 {method.p50_ms:.3f} ms, "
+                f"p90 {method.p90_ms:.3f} ms, p99 {method.p99_ms:.3f} ms"
+            )
+            for throughput in method.throughput:
+                lines.append(
+                    f"  concurrency {throughput.concurrency}: "
+                    f"{throughput.calls_per_s:.1f} calls/s"
+                )
+            if method.etdump_path is not None:
+                lines.append(
+                    "  ETDump of a replay of the slowest iteration: "
+                    f"{method.etdump_path}"
+                )
+        return "\n".join(lines)
+
+
+def process_peak_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+# pyre-ignore[3]: "Any" in return type annotations.
+def _generate_input(plan: schema.ExecutionPlan, index: int) -> Any:
+    val = plan.values[index].val
+    if isinstance(val, schema.Tensor):
+        dtype = get_scalar_type(val.scalar_type)
+        if dtype.is_floating_point:
+            return torch.rand(val.sizes, dtype=dtype)
+        return torch.zeros(val.sizes, dtype=dtype)
+    if isinstance(val, schema.Int):
+        return val.int_val
+    if isinstance(val, schema.Bool):
+        return val.bool_val
+    if isinstance(val, schema.Null):
+        return None
+    raise ValueError(
+        f"Cannot generate input {index} of type {type(val).__name__} for method "
+        f"{plan.name}, use a bundled program to provide the inputs instead"
+    )
+
+
+# pyre-ignore[3]: "Any" in return type annotations.
+def generate_method_inputs(program_data: bytes) -> Dict[str, List[List[Any]]]:
+    """
+    Generates one set of inputs for every method of a serialized program, from
+    the shapes and dtypes of the input tensors of the method. Floating point
+    tensors are random, other tensors are zeros.
+    """
+    return {
+        plan.name: [[_generate_input(plan, i) for i in plan.inputs]]
+        for plan in deserialize_pte_binary(program_data).execution_plan
+    }
+
+
+def benchmark_method(
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    module: Any,
+    method_name: str,
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    inputs: Sequence[Sequence[Any]],
+    warmup: int = 10,
+    iterations: int = 100,
+    concurrency: Sequence[int] = (1,),
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    etdump_module: Optional[Any] = None,
+    etdump_path: Optional[str] = None,
+) -> MethodBenchmarkResult:
+    """
+    Benchmarks one method of a loaded ExecuTorchModule.
+
+    Iteration i runs the method on inputs[i % len(inputs)]. Latencies are
+    measured on consecutive calls from a single thread. Throughput is then
+    measured for every level of `concurrency`, by running `iterations` calls
+    through an ExecuTorchModulePool of that many instances.
+
+    If `etdump_module` (a module loaded with ETDump enabled) and `etdump_path`
+    are given, the inputs of the slowest iteration are replayed on it after the
+    measurements and its ETDump is written to `etdump_path`. The timed runs
+    are not traced, so the replay shows where that input spends its time, not
+    why that particular iteration was slow.
+    """
+    if not inputs:
+        raise ValueError(f"No inputs for method {method_name}")
+
+    for i in range(warmup):
+        module.run_method(method_name, inputs[i % len(inputs)], clone_outputs=False)
+
+    latencies_ms = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        module.run_method(method_name, inputs[i % len(inputs)], clone_outputs=False)
+        latencies_ms[i] = (time.perf_counter() - start) * 1000
+
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+    result = MethodBenchmarkResult(
+        method_name=method_name,
+        iterations=iterations,
+        mean_ms=float(latencies_ms.mean()),
+        min_ms=float(latencies_ms.min()),
+        max_ms=float(latencies_ms.max()),
+        p50_ms=float(p50),
+        p90_ms=float(p90),
+        p99_ms=float(p99),
+    )
+
+    for num_instances in concurrency:
+        if num_instances == 1:
+            calls_per_s = iterations / (latencies_ms.sum() / 1000)
+        else:
+            # The pool takes ownership of its first instance, so give it one of
+            # its own rather than `module`.
+            with ExecuTorchModulePool(module.new_instance(), num_instances) as pool:
+                # Warm up every instance.
+                wait(
+                    [
+                        pool.submit(method_name, inputs[i % len(inputs)])
+                        for i in range(num_instances)
+                    ]
+                )
+                start = time.perf_counter()
+                wait(
+                    [
+                        pool.submit(method_name, inputs[i % len(inputs)])
+                        for i in range(iterations)
+                    ]
+                )
+                calls_per_s = iterations / (time.perf_counter() - start)
+        result.throughput.append(
+            ThroughputResult(concurrency=num_instances, calls_per_s=calls_per_s)
+        )
+
+    if etdump_module is not None and etdump_path is not None:
+        slowest = int(latencies_ms.argmax())
+        etdump_module.run_method(method_name, inputs[slowest % len(inputs)])
+        etdump_module.write_etdump_result_to_file(etdump_path)
+        result.etdump_path = etdump_path
+
+    return result
+
+
+def run_benchmark(
+    pte_path: Optional[str] = None,
+    bundled_program_path: Optional[str] = None,
+    methods: Optional[Sequence[str]] = None,
+    warmup: int = 10,
+    iterations: int = 100,
+    concurrency: Sequence[int] = (1,),
+    etdump_path: Optional[str] = None,
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    loader_options: Optional[Dict[str, Any]] = None,
+) -> BenchmarkResult:
+    """
+    Loads a program from a .pte file or from a bundled program, and benchmarks
+    its methods (all of them if `methods` is None).
+
+    The load time includes loading the benchmarked methods. If `etdump_path` is
+    given, the ETDump of a replay of each method's slowest iteration is written
+    to `etdump_path` with the method name appended. `loader_options` are passed
+    to _load_for_executorch to choose how a .pte file is loaded.
+    """
+    from executorch.extension.pybindings.portable_lib import (
+        _load_for_executorch,
+        _load_for_executorch_from_buffer,
+    )
+
+    if (pte_path is None) == (bundled_program_path is None):
+        raise ValueError("Exactly one of pte_path and bundled_program_path is required")
+    if loader_options and pte_path is None:
+        raise ValueError("loader_options only apply to pte_path")
+
+    if bundled_program_path is not None:
+        with open(bundled_program_path, "rb") as f:
+            program_data, test_cases = load_bundled_test_cases(f.read())
+        method_inputs: Dict[str, List[List[Any]]] = {}
+        for test_case in test_cases:
+            method_inputs.setdefault(test_case.method_name, []).append(test_case.inputs)
+
+        def load(**kwargs: Any) -> Any:  # pyre-ignore[3]
+            return _load_for_executorch_from_buffer(program_data, **kwargs)
+
+    else:
+        assert pte_path is not None
+        with open(pte_path, "rb") as f:
+            program_data = f.read()
+        method_inputs = generate_method_inputs(program_data)
+
+        def load(**kwargs: Any) -> Any:  # pyre-ignore[3]
+            return _load_for_executorch(pte_path, **kwargs, **(loader_options or {}))
+
+    method_names = list(methods) if methods is not None else list(method_inputs)
+
+    start = time.perf_counter()
+    module = load(methods=method_names)
+    load_time_ms = (time.perf_counter() - start) * 1000
+
+    results = []
+    for method_name in method_names:
+        if method_name not in method_inputs:
+            raise ValueError(f"No inputs for method {method_name}")
+        etdump_module = None
+        method_etdump_path = None
+        if etdump_path is not None:
+            etdump_module = load(enable_etdump=True, methods=[method_name])
+            method_etdump_path = f"{etdump_path}.{method_name}"
+        results.append(
+            benchmark_method(
+                module,
+                method_name,
+                method_inputs[method_name],
+                warmup=warmup,
+                iterations=iterations,
+                concurrency=concurrency,
+                etdump_module=etdump_module,
+                etdump_path=method_etdump_path,
+            )
+        )
+
+    return BenchmarkResult(
+        load_time_ms=load_time_ms,
+        process_peak_rss_mb=process_peak_rss_mb(),
+        methods=results,
+        load_stats=module.get_load_stats(),
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure the latency and throughput of an ExecuTorch program."
+    )
+    program_group = parser.add_mutually_exclusive_group(required=True)
+    program_group.add_argument("--pte", help="Path to the .pte file to benchmark.")
+    program_group.add_argument(
+        "--bundled_program",
+        help="Path to a bundled program, whose test inputs are used for the runs.",
+    )
+    parser.add_argument(
+        "--method",
+        action="append",
+        dest="methods",
+        help="Method to benchmark. Can be repeated. Defaults to every method.",
+    )
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="Numbers of concurrent calls to measure the throughput at.",
+    )
+    parser.add_argument(
+        "--etdump_path",
+        help="If set, replay the inputs of the slowest iteration of each method "
+        "and write its ETDump to this path, suffixed with the method name.",
+    )
+    parser.add_argument(
+        "--data_loader",
+        choices=["mmap", "file"],
+        default="mmap",
+        help="Whether to map the .pte file, or read its segments into buffers.",
+    )
+    parser.add_argument(
+        "--mlock_config",
+        choices=["no_mlock", "use_mlock", "use_mlock_ignore_errors"],
+        default="use_mlock_ignore_errors",
+        help="Whether the mmap loader locks the pages it maps.",
+    )
+    parser.add_argument(
+        "--prefault",
+        action="store_true",
+        help="Ask for each segment to be read ahead as soon as it is mapped.",
+    )
+    parser.add_argument(
+        "--output_json", help="If set, also write the results to this JSON file."
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    result = run_benchmark(
+        pte_path=args.pte,
+        bundled_program_path=args.bundled_program,
+        methods=args.methods,
+        warmup=args.warmup,
+        iterations=args.iterations,
+        concurrency=args.concurrency,
+        etdump_path=args.etdump_path,
+        loader_options=(
+            {
+                "data_loader": args.data_loader,
+                "mlock_config": args.mlock_config,
+                "prefault": args.prefault,
+            }
+            if args.pte is not None
+            else None
+        ),
+    )
+    print(result)
+    if args.output_json is not None:
+        with open(args.output_json, "w") as f:
+            f.write(result.to_json())
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -0,0 +1,260 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Verifies all the test cases of a bundled program in parallel.
+
+Example:
+
+    results = verify_bundled_program("model.bpte", num_instances=8)
+    failures = [result for result in results if not result.passed]
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import torch
+from executorch.exir.tensor import get_scalar_type
+
+
+@dataclass
+class BundledTestCase:
+    method_name: str
+    # Index of the test case in the test suite of its method.
+    index: int
+    # pyre-ignore[4]: "Any" in attribute type annotations.
+    inputs: List[Any]
+    expected_outputs: List[torch.Tensor]
+
+
+@dataclass
+class TestCaseResult:
+    method_name: str
+    index: int
+    passed: bool
+    # Largest absolute and relative differences between an output and its
+    # expected value, over all outputs. The relative error ignores elements
+    # that are expected to be zero, NaN or infinite.
+    max_abs_error: float
+    max_rel_error: float
+    latency_ms: float
+    # Why the test case failed, if it did.
+    error: Optional[str] = None
+
+
+# pyre-ignore[2, 3]: "Any" in parameter and return type annotations.
+def _bundled_value_to_python(value: Any) -> Any:
+    from executorch.sdk.bundled_program.schema import bundled_program_schema as bp
+
+    val = value.val
+    if isinstance(val, bp.Tensor):
+        dtype = get_scalar_type(val.scalar_type)
+        if len(val.data) == 0:
+            return torch.empty(val.sizes, dtype=dtype)
+        return torch.frombuffer(bytearray(val.data), dtype=dtype).reshape(val.sizes)
+    if isinstance(val, bp.Int):
+        return val.int_val
+    if isinstance(val, bp.Bool):
+        return val.bool_val
+    if isinstance(val, bp.Double):
+        return val.double_val
+    raise ValueError(f"Unsupported bundled value type {type(val).__name__}")
+
+
+def load_bundled_test_cases(
+    bundled_program_data: bytes,
+) -> Tuple[bytes, List[BundledTestCase]]:
+    """Returns the program of a serialized bundled program, and its test cases."""
+    from executorch.sdk.bundled_program.serialize import (
+        deserialize_from_flatbuffer_to_bundled_program,
+    )
+
+    bundled_program = deserialize_from_flatbuffer_to_bundled_program(
+        bundled_program_data
+    )
+    test_cases = [
+        BundledTestCase(
+            method_name=suite.method_name,
+            index=index,
+            inputs=[_bundled_value_to_python(value) for value in test_case.inputs],
+            expected_outputs=[
+                _bundled_value_to_python(value) for value in test_case.expected_outputs
+            ],
+        )
+        for suite in bundled_program.method_test_suites
+        for index, test_case in enumerate(suite.test_cases)
+    ]
+    return bundled_program.program, test_cases
+
+
+def _compare(
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    outputs: Sequence[Any],
+    expected_outputs: Sequence[torch.Tensor],
+    rtol: float,
+    atol: float,
+) -> Tuple[Optional[str], float, float]:
+    """
+    Compares outputs like VerifyResultWithBundledExpectedOutput does. Returns
+    the reason of the mismatch if any, and the max absolute and relative errors.
+    """
+    if len(outputs) != len(expected_outputs):
+        return (
+            f"Expected {len(expected_outputs)} outputs, got {len(outputs)}",
+            float("inf"),
+            float("inf"),
+        )
+    error = None
+    max_abs_error = 0.0
+    max_rel_error = 0.0
+    for i, (output, expected) in enumerate(zip(outputs, expected_outputs)):
+        if output.dtype != expected.dtype or output.shape != expected.shape:
+            return (
+                f"Output {i} is a {output.dtype} tensor of shape "
+                f"{list(output.shape)}, expected {expected.dtype} and "
+                f"{list(expected.shape)}",
+                float("inf"),
+                float("inf"),
+            )
+        if output.numel() == 0:
+            continue
+        if expected.is_floating_point():
+            close = torch.isclose(
+                output, expected, rtol=rtol, atol=atol, equal_nan=True
+            )
+        else:
+            close = output == expected
+        output, expected = output.double(), expected.double()
+        abs_error = (output - expected).abs()
+        # NaNs and infinities in the same places are not errors.
+        abs_error = torch.where(close & ~abs_error.isfinite(), 0.0, abs_error)
+        max_abs_error = max(max_abs_error, abs_error.max().item())
+        nonzero = (expected != 0) & expected.isfinite()
+        if nonzero.any():
+            max_rel_error = max(
+                max_rel_error,
+                (abs_error[nonzero] / expected[nonzero].abs()).max().item(),
+            )
+        if error is None and not close.all():
+            error = f"Output {i} mismatches its expected value"
+    return error, max_abs_error, max_rel_error
+
+
+def verify_bundled_test_cases(
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    module: Any,
+    test_cases: Sequence[BundledTestCase],
+    num_instances: int = 1,
+    rtol: float = 1e-5,
+    atol: float = 1e-8,
+    fail_fast: bool = False,
+) -> List[TestCaseResult]:
+    """
+    Runs the test cases on `num_instances` instances of `module` (an
+    ExecuTorchModule from the portable or ATen bindings) in parallel, and
+    compares their outputs to the expected ones.
+
+    The bindings release the GIL while a method executes, so the instances run
+    concurrently. If `fail_fast` is true, the test cases that have not started
+    when a test case fails are skipped, and are missing from the results.
+
+    Returns:
+        The result of every test case that ran, in the order of `test_cases`.
+    """
+    if num_instances < 1:
+        raise ValueError(f"num_instances must be positive, got {num_instances}")
+    # pyre-ignore[4]: "Any" in attribute type annotations.
+    idle: "queue.Queue[Any]" = queue.Queue()
+    idle.put(module)
+    for _ in range(num_instances - 1):
+        idle.put(module.new_instance())
+    failed = threading.Event()
+
+    def run(test_case: BundledTestCase) -> Optional[TestCaseResult]:
+        if fail_fast and failed.is_set():
+            return None
+        instance = idle.get()
+        error = None
+        max_abs_error = max_rel_error = float("inf")
+        latency_ms = 0.0
+        start = time.perf_counter()
+        try:
+            try:
+                outputs = instance.run_method(
+                    test_case.method_name, test_case.inputs, clone_outputs=False
+                )
+            finally:
+                latency_ms = (time.perf_counter() - start) * 1000
+            # Compare before releasing the instance, since the outputs alias
+            # its buffers.
+            error, max_abs_error, max_rel_error = _compare(
+                outputs, test_case.expected_outputs, rtol, atol
+            )
+        # Any failure only fails its own test case, and must not leak out of
+        # the executor.
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            idle.put(instance)
+        if error is not None:
+            failed.set()
+        return TestCaseResult(
+            method_name=test_case.method_name,
+            index=test_case.index,
+            passed=error is None,
+            max_abs_error=max_abs_error,
+            max_rel_error=max_rel_error,
+            latency_ms=latency_ms,
+            error=error,
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=num_instances, thread_name_prefix="executorch"
+    ) as executor:
+        futures: List["Future[Optional[TestCaseResult]]"] = [
+            executor.submit(run, test_case) for test_case in test_cases
+        ]
+    results = [future.result() for future in futures]
+    return [result for result in results if result is not None]
+
+
+def verify_bundled_program(
+    bundled_program: Union[str, bytes],
+    num_instances: int = 1,
+    rtol: float = 1e-5,
+    atol: float = 1e-8,
+    fail_fast: bool = False,
+) -> List[TestCaseResult]:
+    """
+    Verifies every test case of every MethodTestSuite of a bundled program, given
+    as a path or as serialized bytes, on `num_instances` parallel instances of
+    its program loaded with the portable bindings.
+
+    See verify_bundled_test_cases for the arguments and results.
+    """
+    from executorch.extension.pybindings.portable_lib import (
+        _load_for_executorch_from_buffer,
+    )
+
+    if isinstance(bundled_program, str):
+        with open(bundled_program, "rb") as f:
+            bundled_program = f.read()
+    program_data, test_cases = load_bundled_test_cases(bundled_program)
+    module = _load_for_executorch_from_buffer(program_data)
+    return verify_bundled_test_cases(
+        module,
+        test_cases,
+        num_instances=num_instances,
+        rtol=rtol,
+        atol=atol,
+        fail_fast=fail_fast,
+    )
@@ -0,0 +1,131 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+import asyncio
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Union
+
+
+class ExecuTorchModulePool:
+    """
+    Runs methods of an ExecuTorch program concurrently from several threads.
+
+    The program is loaded once. Every instance in the pool shares its constant
+    data, but has its own methods and planned memory. Since the bindings
+    release the GIL while a method executes, calls dispatched to different
+    instances run in parallel.
+
+    Args:
+        module: Path to a .pte file, or an ExecuTorchModule (from either the
+            portable or the ATen bindings) to create the instances from. The
+            module becomes the first instance of the pool.
+        num_instances: The number of instances, which is also the number of
+            calls that can execute at the same time.
+
+    Example:
+        with ExecuTorchModulePool("model.pte", 4) as pool:
+            futures = [pool.submit("forward", inputs) for inputs in requests]
+            outputs = [future.result() for future in futures]
+    """
+
+    def __init__(
+        self,
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        module: Union[str, Any],
+        num_instances: int,
+    ) -> None:
+        if num_instances < 1:
+            raise ValueError(f"num_instances must be positive, got {num_instances}")
+        if isinstance(module, str):
+            from executorch.extension.pybindings.portable_lib import (
+                _load_for_executorch,
+            )
+
+            module = _load_for_executorch(module)
+
+        # pyre-ignore[4]: "Any" in attribute type annotations.
+        self._instances: List[Any] = [module] + [
+            module.new_instance() for _ in range(num_instances - 1)
+        ]
+        # pyre-ignore[4]: "Any" in attribute type annotations.
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        for instance in self._instances:
+            self._idle.put(instance)
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_instances, thread_name_prefix="executorch"
+        )
+
+    @property
+    def num_instances(self) -> int:
+        return len(self._instances)
+
+    def _run(
+        self,
+        method_name: str,
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        inputs: Sequence[Any],
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        out: Optional[Sequence[Any]],
+        # pyre-ignore[3]: "Any" in return type annotations.
+    ) -> List[Any]:
+        instance = self._idle.get()
+        try:
+            return instance.run_method(method_name, inputs, out=out)
+        finally:
+            self._idle.put(instance)
+
+    def submit(
+        self,
+        method_name: str,
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        inputs: Sequence[Any],
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        out: Optional[Sequence[Any]] = None,
+    ) -> "Future[List[Any]]":
+        """Schedules a call to `method_name` on the next idle instance."""
+        return self._executor.submit(self._run, method_name, inputs, out)
+
+    def run_method(
+        self,
+        method_name: str,
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        inputs: Sequence[Any],
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        out: Optional[Sequence[Any]] = None,
+        # pyre-ignore[3]: "Any" in return type annotations.
+    ) -> List[Any]:
+        """Runs `method_name` on the next idle instance and waits for it."""
+        return self.submit(method_name, inputs, out).result()
+
+    # pyre-ignore[2, 3]: "Any" in parameter and return type annotations.
+    def forward(self, inputs: Sequence[Any]) -> List[Any]:
+        return self.run_method("forward", inputs)
+
+    async def run_method_async(
+        self,
+        method_name: str,
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        inputs: Sequence[Any],
+        # pyre-ignore[2]: "Any" in parameter type annotations.
+        out: Optional[Sequence[Any]] = None,
+        # pyre-ignore[3]: "Any" in return type annotations.
+    ) -> List[Any]:
+        """Awaitable version of run_method, for use from an asyncio event loop."""
+        return await asyncio.wrap_future(self.submit(method_name, inputs, out))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops accepting calls. Pending calls still run if `wait` is true."""
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "ExecuTorchModulePool":
+        return self
+
+    # pyre-ignore[2]: "Any" in parameter type annotations.
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
@@ -7,17 +7,28 @@
  */
 
 #include <algorithm>
+#include <atomic>
+#include <cerrno>
+#include <chrono>
 #include <cstdio>
+#include <cstring>
 #include <iostream>
 #include <memory>
+#include <mutex>
+#include <random>
 #include <stdexcept>
+#include <string>
 #include <unordered_map>
 
+#include <sys/mman.h>
+#include <unistd.h>
+
 #include <pybind11/iostream.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
 #include <executorch/extension/data_loader/buffer_data_loader.h>
+#include <executorch/extension/data_loader/file_data_loader.h>
 #include <executorch/extension/data_loader/mmap_data_loader.h>
 #include <executorch/extension/memory_allocator/malloc_memory_allocator.h>
 #include <executorch/runtime/core/data_loader.h>
@@ -37,6 +48,7 @@
 #include <ATen/Tensor.h>
 #include <ATen/core/functional.h>
 #include <c10/core/ScalarTypeToTypeMeta.h>
+#include <torch/csrc/autograd/python_variable.h>
 #include <torch/csrc/utils/pybind.h>
 #include <torch/python.h>
 
@@ -56,10 +68,21 @@
     }                                                             \
   })
 
+namespace {
+// Guards the writes to std::cerr and the redirection of std::cout/std::cerr
+// to python, which swaps the buffers of these process-wide streams.
+std::recursive_mutex log_mutex;
+
+// Logs emitted by the current thread while it runs a binding that releases
+// the GIL, see ScopedLogCapture. Null when no capture is active.
+thread_local std::string* captured_logs = nullptr;
+} // namespace
+
 // Our logs work by writing to stderr. By default this is done through fprintf
 // (as defined in posix.cpp) which then does not show up in python environments.
 // Here we override the pal to use std::cerr which can be properly redirected by
-// scoped_estream_redirect.
+// scoped_estream_redirect, or to capture the logs of bindings that release
+// the GIL.
 void et_pal_emit_log_message(
     et_timestamp_t timestamp,
     et_pal_log_level_t level,
@@ -68,6 +91,17 @@ void et_pal_emit_log_message(
     size_t line,
     const char* message,
     __ET_UNUSED size_t length) {
+  if (captured_logs != nullptr) {
+    captured_logs->append("[")
+        .append(filename)
+        .append(":")
+        .append(std::to_string(line))
+        .append("] ")
+        .append(message)
+        .append("\n");
+    return;
+  }
+  std::lock_guard<std::recursive_mutex> guard(log_mutex);
   std::cerr << "[" << filename << ":" << line << "] " << message << std::endl;
 }
 
@@ -95,56 +129,183 @@ void write_data_to_file(const std::string& path, void* buf, size_t size) {
   }
 }
 
+/// Owns an ETDump finalized by ETDumpGen, and exposes it to python through the
+/// buffer protocol so that it can be read without copying it.
+struct ETDumpBuffer final {
+  explicit ETDumpBuffer(etdump_result result)
+      : data(static_cast<uint8_t*>(result.buf)), size(result.size) {}
+  ETDumpBuffer(const ETDumpBuffer&) = delete;
+  ETDumpBuffer& operator=(const ETDumpBuffer&) = delete;
+  ~ETDumpBuffer() {
+    free(data);
+  }
+
+  uint8_t* data;
+  size_t size;
+};
+
 using util::BufferDataLoader;
+using util::FileDataLoader;
 using util::MallocMemoryAllocator;
 using util::MmapDataLoader;
 
-class Module final {
+/// Names of the only methods of a program that may be used, or nullopt to
+/// allow every method.
+using MethodFilter = std::optional<std::vector<std::string>>;
+
+/// Forwards to another DataLoader, counting the segments it loads and the
+/// time spent loading them. The counters are atomic since the methods of
+/// several Module instances can be loaded concurrently.
+///
+/// If `will_need` is true, the kernel is also told that every loaded segment
+/// will be accessed soon (MADV_WILLNEED), so that the pages of mmapped
+/// segments are read ahead instead of being faulted in one at a time.
+class InstrumentedDataLoader final : public DataLoader {
  public:
-  explicit Module(
+  InstrumentedDataLoader(
       std::unique_ptr<DataLoader> loader,
-      std::unique_ptr<ETDumpGen> tracer = nullptr,
-      size_t debug_buffer_size = 0)
-      : loader_(std::move(loader)),
-        event_tracer_(std::move(tracer)),
-        debug_buffer_size_(debug_buffer_size) {
+      const char* name,
+      bool will_need = false)
+      : loader_(std::move(loader)), name_(name), will_need_(will_need) {}
+
+  __ET_NODISCARD Result<FreeableBuffer> Load(size_t offset, size_t size)
+      override {
+    return load(offset, size, SegmentInfo());
+  }
+
+  __ET_NODISCARD Result<FreeableBuffer>
+  load(size_t offset, size_t size, const SegmentInfo& segment_info) override {
+    const auto start = std::chrono::steady_clock::now();
+    Result<FreeableBuffer> buffer = loader_->load(offset, size, segment_info);
+    if (buffer.ok() && will_need_ && buffer->size() > 0) {
+      advise_will_need(buffer->data(), buffer->size());
+    }
+    load_time_ns_ += std::chrono::duration_cast<std::chrono::nanoseconds>(
+                         std::chrono::steady_clock::now() - start)
+                         .count();
+    if (buffer.ok()) {
+      num_loads_ += 1;
+      bytes_loaded_ += size;
+    }
+    return buffer;
+  }
+
+  __ET_NODISCARD Result<size_t> size() const override {
+    return loader_->size();
+  }
+
+  const char* name() const {
+    return name_;
+  }
+
+  size_t num_loads() const {
+    return num_loads_;
+  }
+
+  size_t bytes_loaded() const {
+    return bytes_loaded_;
+  }
+
+  double load_time_ms() const {
+    return load_time_ns_ / 1e6;
+  }
+
+ private:
+  static void advise_will_need(const void* data, size_t size) {
+    static const uintptr_t page_size = sysconf(_SC_PAGESIZE);
+    // madvise() needs a page aligned address.
+    const uintptr_t start =
+        reinterpret_cast<uintptr_t>(data) & ~(page_size - 1);
+    const uintptr_t end = reinterpret_cast<uintptr_t>(data) + size;
+    if (::madvise(reinterpret_cast<void*>(start), end - start, MADV_WILLNEED) <
+        0) {
+      // Only a hint, so carry on without it.
+      ET_LOG(Debug, "Ignoring madvise(MADV_WILLNEED) error %d", errno);
+    }
+  }
+
+  std::unique_ptr<DataLoader> loader_;
+  const char* name_;
+  const bool will_need_;
+  std::atomic<size_t> num_loads_{0};
+  std::atomic<size_t> bytes_loaded_{0};
+  std::atomic<int64_t> load_time_ns_{0};
+};
+
+/// A loaded program along with the loader that its data comes from. It can
+/// be shared by several Module instances, which then share the program's
+/// constant data.
+struct LoadedProgram final {
+  /// `owner`, if provided, is kept alive as long as the program, for loaders
+  /// that do not own the data they read from.
+  explicit LoadedProgram(
+      std::unique_ptr<InstrumentedDataLoader> data_loader,
+      std::shared_ptr<void> owner = nullptr)
+      : data_owner(std::move(owner)), loader(std::move(data_loader)) {
     runtime_init();
-    Result<Program> program = Program::load(
-        loader_.get(), Program::Verification::InternalConsistency);
+    const auto start = std::chrono::steady_clock::now();
+    Result<Program> result = Program::load(
+        loader.get(), Program::Verification::InternalConsistency);
     THROW_IF_ERROR(
-        program.error(),
+        result.error(),
         "loading program failed with error: 0x%" PRIx32,
-        static_cast<uint32_t>(program.error()));
-    program_ = std::make_unique<Program>(std::move(program.get()));
-
-    // Figure out the size of each non_const layer we need to support every
-    // method in the program. Map will be easier to use than a list because we
-    // dont know how many non_const arenas there will be
-    std::map<size_t, int64_t> non_const_buffer_sizes;
-    for (size_t i = 0; i < program_->num_methods(); ++i) {
-      auto name = program_->get_method_name(i).get();
-      auto method_meta = program_->method_meta(name).get();
-      for (size_t j = 0; j < method_meta.num_non_const_buffers(); j++) {
-        int64_t buffer_size = method_meta.non_const_buffer_size(j).get();
-        if (non_const_buffer_sizes.find(j) == non_const_buffer_sizes.end()) {
-          non_const_buffer_sizes.insert({j, buffer_size});
-        } else {
-          non_const_buffer_sizes[j] =
-              std::max(non_const_buffer_sizes[j], buffer_size);
-        }
-      }
-    }
+        static_cast<uint32_t>(result.error()));
+    program = std::make_unique<Program>(std::move(result.get()));
+    program_load_time_ms = std::chrono::duration<double, std::milli>(
+                               std::chrono::steady_clock::now() - start)
+                               .count();
+  }
 
-    // Allocate the arenas. Using vector because we need to remember the size as
-    // well, so vector is easier then unique_ptr.
-    std::vector<std::vector<uint8_t>> non_const_buffers_;
-    for (std::map<size_t, int64_t>::iterator i = non_const_buffer_sizes.begin();
-         i != non_const_buffer_sizes.end();
-         i++) {
-      non_const_buffers_.push_back(std::vector<uint8_t>(i->second));
-    }
+  std::shared_ptr<void> data_owner; // loader may point to this.
+  std::unique_ptr<InstrumentedDataLoader> loader; // program points to this.
+  std::unique_ptr<const Program> program;
+  double program_load_time_ms = 0;
+};
+
+/// How load_from_file reads a program.
+struct LoaderOptions final {
+  /// "mmap" to map the file, or "file" to read its segments into buffers.
+  std::string data_loader = "mmap";
+  /// How the "mmap" loader locks the pages it maps.
+  MmapDataLoader::MlockConfig mlock_config =
+      MmapDataLoader::MlockConfig::UseMlockIgnoreErrors;
+  /// Whether the "mmap" loader asks for each segment to be read ahead as soon
+  /// as it is mapped.
+  bool prefault = false;
+  /// Alignment of the buffers the "file" loader reads segments into.
+  size_t file_alignment = alignof(std::max_align_t);
+};
 
-    memory_ = std::make_unique<Memory>(std::move(non_const_buffers_));
+class Module final {
+ public:
+  explicit Module(
+      std::unique_ptr<InstrumentedDataLoader> loader,
+      std::unique_ptr<ETDumpGen> tracer = nullptr,
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt)
+      : Module(
+            std::make_shared<LoadedProgram>(std::move(loader)),
+            std::move(tracer),
+            debug_buffer_size,
+            methods) {}
+
+  /// Creates a Module from an already loaded program. Modules created from the
+  /// same LoadedProgram share its constant data, but each has its own methods
+  /// and planned memory, so they can execute concurrently.
+  ///
+  /// Methods are loaded on first use. If `methods` is provided, only those
+  /// methods can be used, and they are loaded right away so that errors
+  /// surface at load time.
+  explicit Module(
+      std::shared_ptr<const LoadedProgram> loaded_program,
+      std::unique_ptr<ETDumpGen> tracer = nullptr,
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt)
+      : loaded_program_(std::move(loaded_program)),
+        program_(loaded_program_->program.get()),
+        allowed_methods_(methods),
+        event_tracer_(std::move(tracer)),
+        debug_buffer_size_(debug_buffer_size) {
     if (event_tracer_ && debug_buffer_size > 0) {
       // If a debug buffer was requested for the ETDump, allocate it and make
       // sure its lifetime is as long as the event_tracer.
@@ -154,22 +315,10 @@ class Module final {
           EventTracerDebugLogLevel::kIntermediateOutputs);
     }
 
-    // Load methods
-    for (size_t i = 0; i < program_->num_methods(); ++i) {
-      auto name = program_->get_method_name(i).get();
-      // It's safe to use the same memory manager for all modules because
-      // we can guarantee that only one will be executing at a time.
-      // Everything in this module runs on a single thread.
-      Result<Method> method = program_->load_method(
-          name, memory_->mem_manager(), event_tracer_.get());
-      THROW_IF_ERROR(
-          method.error(),
-          "loading method %s failed with error 0x%" PRIx32,
-          name,
-          static_cast<uint32_t>(method.error()));
-      methods_.insert(
-          {std::string(name),
-           std::make_unique<Method>(std::move(method.get()))});
+    if (allowed_methods_) {
+      for (const auto& name : *allowed_methods_) {
+        get_method(name);
+      }
     }
   }
 
@@ -183,9 +332,9 @@ class Module final {
   std::vector<EValue> run_method(
       const std::string& method_name,
       const std::vector<EValue>& args,
-      const std::optional<std::vector<Span<uint8_t>>>& output_storages =
+      const std::optional<Span<const Span<uint8_t>>>& output_storages =
           std::nullopt) {
-    auto& method = methods_[method_name];
+    Method* method = &get_method(method_name);
     exec_aten::ArrayRef<EValue> input_evalue_list(args.data(), args.size());
 
     Error set_inputs_status = method->set_inputs(input_evalue_list);
@@ -211,7 +360,7 @@ class Module final {
     if (output_storages) {
       if (output_storages->size() != method->outputs_size()) {
         THROW_IF_ERROR(
-            Error(),
+            Error::InvalidArgument,
             "number of output storages %zu does not match number of outputs %zu",
             output_storages->size(),
             method->outputs_size());
@@ -249,12 +398,42 @@ class Module final {
     return result;
   }
 
+  /// Returns the method, loading it first if it is not loaded yet.
   Method& get_method(const std::string& method_name) {
-    if (methods_.count(method_name) == 0) {
+    auto it = methods_.find(method_name);
+    if (it != methods_.end()) {
+      return *it->second.method;
+    }
+    if (allowed_methods_ &&
+        std::find(
+            allowed_methods_->begin(), allowed_methods_->end(), method_name) ==
+            allowed_methods_->end()) {
       THROW_IF_ERROR(
-          Error(), "no such method in program: %s", method_name.c_str());
+          Error::InvalidArgument,
+          "method %s was not requested when loading the program",
+          method_name.c_str());
     }
-    return *methods_[method_name].get();
+    return *load_method(method_name).method;
+  }
+
+  bool is_method_loaded(const std::string& method_name) const {
+    return methods_.count(method_name) > 0;
+  }
+
+  /// Returns the planned memory arenas of the method, loading it first if it
+  /// is not loaded yet. They hold the mutable buffers of the method, e.g. KV
+  /// caches, along with its intermediate values. The arenas must not be
+  /// resized, since the method points to them.
+  std::vector<std::vector<uint8_t>>& planned_buffers(
+      const std::string& method_name) {
+    get_method(method_name);
+    return methods_.at(method_name).memory->non_const_buffers();
+  }
+
+  /// Frees the method and its planned memory. It will be loaded again on its
+  /// next use.
+  void unload_method(const std::string& method_name) {
+    methods_.erase(method_name);
   }
 
   bool has_etdump() {
@@ -273,7 +452,55 @@ class Module final {
     return Span<uint8_t>(debug_buffer_.get(), debug_buffer_size_);
   }
 
+  std::shared_ptr<const LoadedProgram> loaded_program() const {
+    return loaded_program_;
+  }
+
+  const MethodFilter& allowed_methods() const {
+    return allowed_methods_;
+  }
+
  private:
+  struct LoadedMethod;
+
+  LoadedMethod& load_method(const std::string& method_name) {
+    Result<MethodMeta> method_meta = program_->method_meta(method_name.c_str());
+    THROW_IF_ERROR(
+        method_meta.error(),
+        "no such method in program: %s",
+        method_name.c_str());
+
+    // Allocate the planned memory arenas of this method only, as described by
+    // its MethodMeta.
+    std::vector<std::vector<uint8_t>> non_const_buffers;
+    for (size_t i = 0; i < method_meta->num_non_const_buffers(); ++i) {
+      Result<int64_t> buffer_size = method_meta->non_const_buffer_size(i);
+      THROW_IF_ERROR(
+          buffer_size.error(),
+          "getting the size of buffer %zu of method %s failed with error 0x%" PRIx32,
+          i,
+          method_name.c_str(),
+          static_cast<uint32_t>(buffer_size.error()));
+      non_const_buffers.emplace_back(buffer_size.get());
+    }
+    auto memory = std::make_unique<Memory>(std::move(non_const_buffers));
+
+    Result<Method> method = program_->load_method(
+        method_name.c_str(), memory->mem_manager(), event_tracer_.get());
+    THROW_IF_ERROR(
+        method.error(),
+        "loading method %s failed with error 0x%" PRIx32,
+        method_name.c_str(),
+        static_cast<uint32_t>(method.error()));
+    return methods_
+        .emplace(
+            method_name,
+            LoadedMethod{
+                std::move(memory),
+                std::make_unique<Method>(std::move(method.get()))})
+        .first->second;
+  }
+
   /// A wrapper/util class for executorch memory allocations/manager.
   class Memory {
    public:
@@ -295,6 +522,10 @@ class Module final {
       return &mem_manager_;
     }
 
+    std::vector<std::vector<uint8_t>>& non_const_buffers() {
+      return non_const_buffers_;
+    }
+
     Memory(const Memory&) = delete;
     Memory& operator=(const Memory&) = delete;
 
@@ -323,47 +554,89 @@ class Module final {
     }
   };
 
-  std::unique_ptr<Memory> memory_;
-  std::unique_ptr<DataLoader> loader_; // program_ points to this.
-  std::unique_ptr<const Program> program_; // methods_ entries points to this.
-  std::unordered_map<std::string, std::unique_ptr<Method>> methods_;
+  /// A loaded method along with the memory it was planned into.
+  struct LoadedMethod {
+    std::unique_ptr<Memory> memory; // method points to this.
+    std::unique_ptr<Method> method;
+  };
+
+  // methods_ entries point to the program.
+  std::shared_ptr<const LoadedProgram> loaded_program_;
+  const Program* program_;
+  MethodFilter allowed_methods_;
+  std::unordered_map<std::string, LoadedMethod> methods_;
   std::unique_ptr<ETDumpGen> event_tracer_;
   std::unique_ptr<uint8_t[]> debug_buffer_;
   size_t debug_buffer_size_;
 };
 
+/// Loads a program from a buffer, which must outlive the module unless
+/// `data_owner` keeps it alive.
 inline std::unique_ptr<Module> load_from_buffer(
     const void* ptr,
     size_t ptr_len,
     bool enable_etdump,
-    size_t debug_buffer_size) {
+    size_t debug_buffer_size,
+    const MethodFilter& methods,
+    std::shared_ptr<void> data_owner = nullptr) {
   EXECUTORCH_SCOPE_PROF("load_from_buffer");
-  auto loader = std::make_unique<BufferDataLoader>(ptr, ptr_len);
+  auto loader = std::make_unique<InstrumentedDataLoader>(
+      std::make_unique<BufferDataLoader>(ptr, ptr_len), "buffer");
   return std::make_unique<Module>(
-      std::move(loader),
+      std::make_shared<LoadedProgram>(
+          std::move(loader), std::move(data_owner)),
       enable_etdump ? std::make_unique<torch::executor::ETDumpGen>() : nullptr,
-      debug_buffer_size);
+      debug_buffer_size,
+      methods);
+}
+
+inline std::unique_ptr<InstrumentedDataLoader> create_file_loader(
+    const std::string& path,
+    const LoaderOptions& options) {
+  if (options.data_loader == "mmap") {
+    Result<MmapDataLoader> res =
+        MmapDataLoader::from(path.c_str(), options.mlock_config);
+    THROW_IF_ERROR(
+        res.error(),
+        "Failed to create MmapDataLoader from file %s, error: 0x:%" PRIx32,
+        path.c_str(),
+        static_cast<uint32_t>(res.error()));
+    return std::make_unique<InstrumentedDataLoader>(
+        std::make_unique<MmapDataLoader>(std::move(res.get())),
+        "mmap",
+        options.prefault);
+  }
+  if (options.data_loader == "file") {
+    if (options.prefault) {
+      throw std::invalid_argument("prefault requires the mmap data loader");
+    }
+    Result<FileDataLoader> res =
+        FileDataLoader::from(path.c_str(), options.file_alignment);
+    THROW_IF_ERROR(
+        res.error(),
+        "Failed to create FileDataLoader from file %s, error: 0x:%" PRIx32,
+        path.c_str(),
+        static_cast<uint32_t>(res.error()));
+    return std::make_unique<InstrumentedDataLoader>(
+        std::make_unique<FileDataLoader>(std::move(res.get())), "file");
+  }
+  throw std::invalid_argument(
+      "data_loader must be \"mmap\" or \"file\", got \"" +
+      options.data_loader + "\"");
 }
 
 inline std::unique_ptr<Module> load_from_file(
     const std::string& path,
     bool enable_etdump,
-    size_t debug_buffer_size) {
+    size_t debug_buffer_size,
+    const MethodFilter& methods,
+    const LoaderOptions& loader_options = LoaderOptions()) {
   EXECUTORCH_SCOPE_PROF("load_from_file");
-
-  Result<MmapDataLoader> res = MmapDataLoader::from(
-      path.c_str(), MmapDataLoader::MlockConfig::UseMlockIgnoreErrors);
-  THROW_IF_ERROR(
-      res.error(),
-      "Failed to create MmapDataLoader from file %s, error: 0x:%" PRIx32,
-      path.c_str(),
-      static_cast<uint32_t>(res.error()));
-
-  auto loader = std::make_unique<MmapDataLoader>(std::move(res.get()));
   return std::make_unique<Module>(
-      std::move(loader),
+      create_file_loader(path, loader_options),
       enable_etdump ? std::make_unique<torch::executor::ETDumpGen>() : nullptr,
-      debug_buffer_size);
+      debug_buffer_size,
+      methods);
 }
 
 static constexpr size_t kDEFAULT_BUNDLED_INPUT_POOL_SIZE = 16 * 1024U;
@@ -409,179 +682,271 @@ struct PyBundledModule final {
   size_t program_len_;
 };
 
+/// Returns the contiguous data of a python object supporting the buffer
+/// protocol. The data stays valid as long as the returned buffer_info is alive.
+std::shared_ptr<py::buffer_info> request_contiguous_buffer(
+    const py::buffer& buffer) {
+  auto info = std::make_shared<py::buffer_info>(buffer.request());
+  if (!PyBuffer_IsContiguous(info->view(), 'C')) {
+    throw std::invalid_argument("buffer must be C contiguous");
+  }
+  return info;
+}
+
 struct PyModule final {
   explicit PyModule(
-      const py::bytes& buffer,
+      std::shared_ptr<py::buffer_info> buffer,
       bool enable_etdump,
-      size_t debug_buffer_size = 0)
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt)
       : module_(torch::executor::load_from_buffer(
-            buffer.cast<std::string_view>().data(),
-            py::len(buffer),
+            buffer->ptr,
+            buffer->size * buffer->itemsize,
             enable_etdump,
-            debug_buffer_size)) {}
+            debug_buffer_size,
+            methods,
+            buffer)) {}
 
   explicit PyModule(
       const void* ptr,
       size_t ptr_len,
       bool enable_etdump,
-      size_t debug_buffer_size = 0)
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt)
       : module_(torch::executor::load_from_buffer(
             ptr,
             ptr_len,
             enable_etdump,
-            debug_buffer_size)) {}
+            debug_buffer_size,
+            methods)) {}
 
   explicit PyModule(
       const std::string& path,
       bool enable_etdump,
-      size_t debug_buffer_size = 0)
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt,
+      const LoaderOptions& loader_options = LoaderOptions())
       : module_(torch::executor::load_from_file(
             path,
             enable_etdump,
-            debug_buffer_size)) {}
+            debug_buffer_size,
+            methods,
+            loader_options)) {}
+
+  explicit PyModule(std::unique_ptr<Module> module)
+      : module_(std::move(module)) {}
 
   PyModule(const PyModule&) = delete;
   PyModule& operator=(const PyModule&) = delete;
-  PyModule(PyModule&&) = default;
-  PyModule& operator=(PyModule&&) = default;
+  // Not movable because of the mutex.
+  PyModule(PyModule&&) = delete;
+  PyModule& operator=(PyModule&&) = delete;
 
-  // Module is only valid as long as the python buffer is alive.
+  /// Loads a program from any object supporting the buffer protocol, without
+  /// copying it. The module keeps the buffer alive.
   static std::unique_ptr<PyModule> load_from_buffer(
-      const py::bytes& buffer,
+      const py::buffer& buffer,
       bool enable_etdump,
-      size_t debug_buffer_size = 0) {
-    return std::make_unique<PyModule>(buffer, enable_etdump, debug_buffer_size);
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt) {
+    return std::make_unique<PyModule>(
+        request_contiguous_buffer(buffer),
+        enable_etdump,
+        debug_buffer_size,
+        methods);
   }
   static std::unique_ptr<PyModule> load_from_file(
       const std::string& path,
       bool enable_etdump,
-      size_t debug_buffer_size = 0) {
-    return std::make_unique<PyModule>(path, enable_etdump, debug_buffer_size);
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt,
+      const std::string& data_loader = "mmap",
+      const std::string& mlock_config = "use_mlock_ignore_errors",
+      bool prefault = false,
+      size_t file_alignment = alignof(std::max_align_t)) {
+    LoaderOptions loader_options;
+    loader_options.data_loader = data_loader;
+    if (mlock_config == "no_mlock") {
+      loader_options.mlock_config = MmapDataLoader::MlockConfig::NoMlock;
+    } else if (mlock_config == "use_mlock") {
+      loader_options.mlock_config = MmapDataLoader::MlockConfig::UseMlock;
+    } else if (mlock_config == "use_mlock_ignore_errors") {
+      loader_options.mlock_config =
+          MmapDataLoader::MlockConfig::UseMlockIgnoreErrors;
+    } else {
+      throw std::invalid_argument(
+          "mlock_config must be \"no_mlock\", \"use_mlock\" or "
+          "\"use_mlock_ignore_errors\", got \"" +
+          mlock_config + "\"");
+    }
+    loader_options.prefault = prefault;
+    loader_options.file_alignment = file_alignment;
+    return std::make_unique<PyModule>(
+        path, enable_etdump, debug_buffer_size, methods, loader_options);
   }
 
   static std::unique_ptr<PyModule> load_from_bundled_program(
       PyBundledModule& m,
       bool enable_etdump,
-      size_t debug_buffer_size = 0) {
+      size_t debug_buffer_size = 0,
+      const MethodFilter& methods = std::nullopt) {
     return std::make_unique<PyModule>(
         m.get_program_ptr(),
         m.get_program_len(),
         enable_etdump,
-        debug_buffer_size);
+        debug_buffer_size,
+        methods);
   }
 
+  /// Runs the method on the inputs. Tensor outputs are written into the `out`
+  /// tensors if provided. Otherwise they are written to buffers owned by the
+  /// module and reused across calls, and are either cloned (the default) or
+  /// returned as tensors aliasing those buffers when `clone_outputs` is false.
   py::list run_method(
       const std::string& method_name,
-      const py::sequence& inputs) {
+      const py::sequence& inputs,
+      const py::object& out = py::none(),
+      bool clone_outputs = true) {
+    // Calls on the same module are serialized, since they share the planned
+    // memory and output buffers. Wait for the lock without holding the GIL so
+    // that the thread currently executing can reacquire it.
+    auto lock = acquire_lock();
+
     const auto inputs_size = py::len(inputs);
-    std::vector<EValue> cpp_inputs;
+    // Reuse the EValues and tensor metadata of the previous call to this
+    // method, which stay valid until Module->run_method returns since the
+    // lock is held.
+    auto& input_cache = get_input_cache(method_name);
+    std::vector<EValue>& cpp_inputs = input_cache.values;
+    cpp_inputs.clear();
     cpp_inputs.reserve(inputs_size);
-
-#ifndef USE_ATEN_LIB // Portable mode
-    // So the ETensors and their metadata stay in scope for
-    // Module->run_method.
-    std::vector<torch::executor::TensorImpl> input_tensors;
-    std::vector<std::vector<torch::executor::Tensor::SizesType>> input_sizes;
-    std::vector<std::vector<torch::executor::Tensor::StridesType>>
-        input_strides;
-    std::vector<std::vector<torch::executor::Tensor::DimOrderType>>
-        input_dim_order;
-    // We store pointers to these vector elements so important to reserve so
-    // that we don't lose those on a vector resize. Don't need to do this for
-    // the others since they are vectors of vectors, and we don't store a
-    // pointer to the root level vector data.
-    input_tensors.reserve(inputs_size);
-#endif
+    // Contiguous copies of the inputs that are not contiguous, which must stay
+    // alive until the method has run. Only allocates if there are any.
+    std::vector<at::Tensor> contiguous_inputs;
 
     // Convert python objects into EValues.
     for (size_t i = 0; i < inputs_size; ++i) {
-      auto python_input = inputs[i];
-      const std::string& type_str = py::str(python_input.get_type());
-      if (type_str == "<class 'torch.Tensor'>") {
-        auto at_tensor = python_input.cast<at::Tensor>();
-        // alias_etensor_to_attensor will assert on this later, so to better
-        // propogate up to python we check early and throw an exception.
-        if (!at_tensor.is_contiguous()) {
-          auto error_msg = "Input " + std::to_string(i) + "for method " +
-              method_name + " is not contiguous.";
-          throw std::runtime_error(error_msg);
+      const py::object item = inputs[i];
+      PyObject* python_input = item.ptr();
+      if (THPVariable_Check(python_input)) {
+        const at::Tensor* at_tensor = &THPVariable_Unpack(python_input);
+        if (!at_tensor->is_contiguous()) {
+          // Non-contiguous (e.g. channels last) inputs are copied once into
+          // the contiguous layout that ExecuTorch expects.
+          contiguous_inputs.push_back(at_tensor->contiguous());
+          at_tensor = &contiguous_inputs.back();
         }
-
 #ifdef USE_ATEN_LIB
-        EValue evalue(at_tensor);
+        cpp_inputs.push_back(EValue(*at_tensor));
 #else
-        // convert at::Tensor to torch::executor::Tensor
-        auto type = torch::util::torchToExecuTorchScalarType(
-            at_tensor.options().dtype());
-        size_t dim = at_tensor.dim();
-        // cant directly alias at::Tensor sizes and strides due to int64 vs
-        // int32 typing conflict
-        input_sizes.emplace_back(
-            at_tensor.sizes().begin(), at_tensor.sizes().end());
-        input_strides.emplace_back(
-            at_tensor.strides().begin(), at_tensor.strides().end());
-
-        // Only works for MemoryFormat::Contiguous inputs
-        std::vector<torch::executor::Tensor::DimOrderType> dim_order;
-        for (size_t cur_dim = 0; cur_dim < dim; cur_dim++) {
-          dim_order.push_back(cur_dim);
-        }
-        input_dim_order.push_back(std::move(dim_order));
-        input_tensors.emplace_back(
-            type,
-            dim,
-            input_sizes.back().data(),
-            nullptr,
-            input_dim_order.back().data(),
-            input_strides.back().data());
-
-        torch::executor::Tensor temp =
-            torch::executor::Tensor(&input_tensors.back());
-        torch::util::alias_etensor_to_attensor(at_tensor, temp);
-        EValue evalue(temp);
+        cpp_inputs.push_back(EValue(input_cache.alias_tensor(i, *at_tensor)));
 #endif
-
-        cpp_inputs.push_back(evalue);
-      } else if (py::isinstance<py::none>(python_input)) {
+      } else if (python_input == Py_None) {
         cpp_inputs.push_back(EValue());
-      } else if (py::isinstance<py::bool_>(python_input)) {
-        cpp_inputs.push_back(EValue(py::cast<bool>(python_input)));
-      } else if (py::isinstance<py::int_>(python_input)) {
-        cpp_inputs.push_back(EValue(py::cast<int64_t>(python_input)));
+      } else if (PyBool_Check(python_input)) {
+        cpp_inputs.push_back(EValue(python_input == Py_True));
+      } else if (PyLong_Check(python_input)) {
+        cpp_inputs.push_back(
+            EValue(py::cast<int64_t>(py::handle(python_input))));
       } else {
         // Unsupported pytype
+        const std::string& type_str =
+            py::str(py::handle(python_input).get_type());
         ET_ASSERT_UNREACHABLE_MSG(type_str.c_str());
       }
     }
 
     const auto& method = module_->get_method(method_name);
     const auto num_outputs = method.outputs_size();
-    // These output storages will not be used if the ExecuTorch program already
-    // pre-allocated output space. That is represented by an error from
-    // set_output_data_ptr.
-    std::vector<std::unique_ptr<uint8_t[]>> output_storages(num_outputs);
-    std::vector<Span<uint8_t>> output_storage_spans(num_outputs);
+
+    // Tensors provided by the caller to write the outputs into, if any. Left
+    // empty otherwise so that the common path does not allocate.
+    std::vector<std::optional<at::Tensor>> out_tensors;
+    if (!out.is_none()) {
+      const auto out_list = py::cast<py::sequence>(out);
+      if (py::len(out_list) != num_outputs) {
+        throw std::runtime_error(
+            "Expected " + std::to_string(num_outputs) +
+            " out tensors for method " + method_name + ", got " +
+            std::to_string(py::len(out_list)));
+      }
+      out_tensors.resize(num_outputs);
+      for (size_t i = 0; i < num_outputs; ++i) {
+        if (!py::isinstance<py::none>(out_list[i])) {
+          out_tensors[i] = out_list[i].cast<at::Tensor>();
+        }
+      }
+    }
+
+    auto& output_storage = get_output_storage(method_name);
     for (size_t i = 0; i < num_outputs; ++i) {
-      const auto& output_tensor_meta =
-          method.method_meta().output_tensor_meta(i);
-      if (!output_tensor_meta.ok()) {
-        // If the output isn't a tensor it won't have a tensor meta.
-        ET_LOG(
-            Info,
-            "Tensor meta doesn't exist for output %zu, error is 0x%" PRIx32
-            ", skipping allocating storage",
-            i,
-            static_cast<uint32_t>(output_tensor_meta.error()));
-        output_storage_spans[i] = Span<uint8_t>();
+      auto& owned = output_storage.buffers[i];
+      output_storage.spans[i] = Span<uint8_t>(owned.data(), owned.size());
+      if (out_tensors.empty() || !out_tensors[i]) {
         continue;
       }
-      const size_t output_size = output_tensor_meta.get().nbytes();
-      std::unique_ptr<uint8_t[]> output(new uint8_t[output_size]);
-      output_storage_spans[i] = Span<uint8_t>(output.get(), output_size);
-      output_storages[i] = std::move(output);
+      const auto& out_tensor = *out_tensors[i];
+      const std::string out_name =
+          "Out tensor " + std::to_string(i) + " for method " + method_name;
+      const auto tensor_meta = method.method_meta().output_tensor_meta(i);
+      if (!tensor_meta.ok()) {
+        throw std::runtime_error(out_name + " is given for a non-tensor output");
+      }
+#ifdef USE_ATEN_LIB
+      const c10::ScalarType expected_dtype = tensor_meta->scalar_type();
+#else
+      const c10::ScalarType expected_dtype =
+          torch::util::execuTorchtoTorchScalarType(tensor_meta->scalar_type());
+#endif
+      if (out_tensor.scalar_type() != expected_dtype) {
+        throw std::runtime_error(
+            out_name + " has dtype " + c10::toString(out_tensor.scalar_type()) +
+            ", expected " + c10::toString(expected_dtype));
+      }
+      // The sizes of the output, or their upper bounds with dynamic shapes.
+      const auto expected_sizes = tensor_meta->sizes();
+      if (!std::equal(
+              expected_sizes.begin(),
+              expected_sizes.end(),
+              out_tensor.sizes().begin(),
+              out_tensor.sizes().end())) {
+        throw std::runtime_error(
+            out_name + " has sizes " + c10::str(out_tensor.sizes()) +
+            ", expected " +
+            c10::str(at::IntArrayRef(std::vector<int64_t>(
+                expected_sizes.begin(), expected_sizes.end()))));
+      }
+      if (!out_tensor.is_contiguous()) {
+        throw std::runtime_error(out_name + " must be contiguous");
+      }
+      output_storage.spans[i] = Span<uint8_t>(
+          static_cast<uint8_t*>(out_tensor.data_ptr()), out_tensor.nbytes());
+    }
+    std::vector<EValue> outputs;
+    {
+      // Let other Python threads run, including ones executing other modules,
+      // while this one executes.
+      py::gil_scoped_release release;
+      outputs = module_->run_method(
+          method_name,
+          cpp_inputs,
+          Span<const Span<uint8_t>>(
+              output_storage.spans.data(), output_storage.spans.size()));
+    }
+
+    // If this run is sampled, take its ETDump to hand it to the callback once
+    // the outputs are converted. Otherwise drop it, so that the ETDump does
+    // not grow with unsampled runs.
+    py::object etdump_callback;
+    py::object etdump_buffer;
+    if (etdump_callback_) {
+      if (sample_etdump()) {
+        etdump_callback = etdump_callback_;
+        etdump_buffer = take_etdump_buffer();
+      } else {
+        module_->etdump().reset();
+      }
     }
-    auto outputs =
-        module_->run_method(method_name, cpp_inputs, output_storage_spans);
 
     // Retrieve outputs
     const auto outputs_size = outputs.size();
@@ -600,22 +965,53 @@ struct PyModule final {
         list[i] = py::cast(std::string(v.toString().data()));
       } else if (Tag::Tensor == v.tag) {
 #ifdef USE_ATEN_LIB
-        // Clone so the outputs in python do not share a lifetime with the
-        // module object
-        list[i] = py::cast(v.toTensor().clone());
+        at::Tensor output = v.toTensor();
 #else
-        list[i] = py::cast(
-            torch::util::alias_attensor_to_etensor(v.toTensor()).clone());
+        at::Tensor output =
+            torch::util::alias_attensor_to_etensor(v.toTensor());
 #endif
+        if (!out_tensors.empty() && out_tensors[i]) {
+          // The output was written to the caller's tensor, unless the program
+          // memory planned it, in which case it has to be copied over. With
+          // dynamic shapes, the output is a view of the start of that tensor,
+          // which keeps its upper bound sizes so that it can be reused.
+          auto out_tensor = *out_tensors[i];
+          if (out_tensor.sizes() != output.sizes()) {
+            out_tensor =
+                out_tensor.view(-1).narrow(0, 0, output.numel()).view(
+                    output.sizes());
+          }
+          if (out_tensor.data_ptr() != output.data_ptr()) {
+            out_tensor.copy_(output);
+          }
+          list[i] = py::cast(out_tensor);
+        } else if (clone_outputs) {
+          // Clone so the outputs in python do not share a lifetime with the
+          // module object
+          list[i] = py::cast(output.clone());
+        } else {
+          // Alias the module owned (or memory planned) output buffer. It is
+          // overwritten by the next call and freed with the module.
+          list[i] = py::cast(output);
+        }
       } else {
         ET_ASSERT_UNREACHABLE_MSG("Invalid model output type");
       }
     }
+
+    if (etdump_callback && !etdump_buffer.is_none()) {
+      // Release the lock first, so that the callback can use this module.
+      lock.unlock();
+      etdump_callback(method_name, etdump_buffer);
+    }
     return list;
   }
 
-  py::list forward(const py::sequence& inputs) {
-    return run_method("forward", inputs);
+  py::list forward(
+      const py::sequence& inputs,
+      const py::object& out = py::none(),
+      bool clone_outputs = true) {
+    return run_method("forward", inputs, out, clone_outputs);
   }
 
   py::list forward_single_input(const torch::Tensor& inputTensor) {
@@ -634,8 +1030,8 @@ struct PyModule final {
     if (!has_etdump()) {
       throw std::runtime_error("No etdump found");
     }
-    auto& etdump = module_->etdump();
-    etdump_result result = etdump.get_etdump_data();
+    auto lock = acquire_lock();
+    etdump_result result = take_etdump();
     if (result.buf != nullptr && result.size > 0) {
       write_data_to_file(path, result.buf, result.size);
       free(result.buf);
@@ -657,10 +1053,51 @@ struct PyModule final {
     }
   }
 
+  /// Returns the ETDump of the runs since the last call as a memoryview, or
+  /// None if nothing was recorded. The next run starts a new ETDump.
+  py::object get_etdump_buffer() {
+    if (!has_etdump()) {
+      throw std::runtime_error("No etdump found");
+    }
+    auto lock = acquire_lock();
+    return take_etdump_buffer();
+  }
+
+  /// Returns the debug buffer of the ETDump last returned by
+  /// get_etdump_buffer() or passed to the ETDump callback, holding the outputs
+  /// it refers to, or None if they did not log any.
+  py::object get_etdump_debug_buffer() {
+    if (!has_etdump()) {
+      throw std::runtime_error("No etdump found");
+    }
+    auto lock = acquire_lock();
+    return etdump_debug_buffer_;
+  }
+
+  /// Calls `callback(method_name, etdump)` after a `sample_rate` fraction of
+  /// the runs of run_method, with the ETDump of that run only. The ETDumps of
+  /// the other runs are discarded. A None callback restores the default of
+  /// accumulating the ETDumps of all runs.
+  void set_etdump_callback(const py::object& callback, double sample_rate) {
+    if (!has_etdump()) {
+      throw std::runtime_error("No etdump found");
+    }
+    if (!(sample_rate >= 0.0 && sample_rate <= 1.0)) {
+      throw std::invalid_argument(
+          "sample_rate must be in [0, 1], got " + std::to_string(sample_rate));
+    }
+    auto lock = acquire_lock();
+    // Start from an empty ETDump, so that the first sample only holds its run.
+    module_->etdump().reset();
+    etdump_callback_ = callback.is_none() ? py::object() : callback;
+    etdump_sample_rate_ = sample_rate;
+  }
+
   void load_bundled_input(
       PyBundledModule& m,
       const string method_name,
       size_t testset_idx) {
+    auto lock = acquire_lock();
     const void* bundled_program_ptr = m.get_bundled_program_ptr();
     Error status = bundled_program::LoadBundledInput(
         module_->get_method(method_name), bundled_program_ptr, testset_idx);
@@ -676,6 +1113,7 @@ struct PyModule final {
       size_t testset_idx,
       double rtol = 1e-5,
       double atol = 1e-8) {
+    auto lock = acquire_lock();
     const void* bundled_program_ptr = m.get_bundled_program_ptr();
     Error status = bundled_program::VerifyResultWithBundledExpectedOutput(
         module_->get_method(method_name),
@@ -690,15 +1128,262 @@ struct PyModule final {
   }
 
   void plan_execute(const string method_name) {
-    auto status = module_->get_method(method_name).execute();
+    auto lock = acquire_lock();
+    Error status;
+    {
+      py::gil_scoped_release release;
+      status = module_->get_method(method_name).execute();
+    }
     THROW_IF_ERROR(
         status,
         "executing execution plan for method 'forward' failed with error: 0x%" PRIx32,
         static_cast<uint32_t>(status));
   }
 
+  void unload_method(const std::string& method_name) {
+    auto lock = acquire_lock();
+    input_caches_.erase(method_name);
+    output_storages_.erase(method_name);
+    module_->unload_method(method_name);
+  }
+
+  bool is_method_loaded(const std::string& method_name) {
+    auto lock = acquire_lock();
+    return module_->is_method_loaded(method_name);
+  }
+
+  /// Returns a copy of the planned memory of a method, one bytes object per
+  /// arena. This is the state of its mutable buffers, e.g. KV caches, which
+  /// persist across runs.
+  py::list get_method_state(const std::string& method_name) {
+    auto lock = acquire_lock();
+    py::list state;
+    for (const auto& buffer : module_->planned_buffers(method_name)) {
+      state.append(py::bytes(
+          reinterpret_cast<const char*>(buffer.data()), buffer.size()));
+    }
+    return state;
+  }
+
+  /// Restores a state returned by get_method_state() for the same method of
+  /// this module, or of another instance of the same program.
+  void set_method_state(
+      const std::string& method_name,
+      const std::vector<py::buffer>& state) {
+    std::vector<std::shared_ptr<py::buffer_info>> infos;
+    for (const auto& buffer : state) {
+      infos.push_back(request_contiguous_buffer(buffer));
+    }
+    auto lock = acquire_lock();
+    auto& buffers = module_->planned_buffers(method_name);
+    if (infos.size() != buffers.size()) {
+      throw std::invalid_argument(
+          "method " + method_name + " has " + std::to_string(buffers.size()) +
+          " planned buffers, got a state of " + std::to_string(infos.size()));
+    }
+    for (size_t i = 0; i < infos.size(); ++i) {
+      size_t size = infos[i]->size * infos[i]->itemsize;
+      if (size != buffers[i].size()) {
+        throw std::invalid_argument(
+            "planned buffer " + std::to_string(i) + " of method " +
+            method_name + " has " + std::to_string(buffers[i].size()) +
+            " bytes, got " + std::to_string(size));
+      }
+    }
+    for (size_t i = 0; i < infos.size(); ++i) {
+      std::memcpy(buffers[i].data(), infos[i]->ptr, buffers[i].size());
+    }
+  }
+
+  /// Returns counters of how the program was loaded. The segment counters
+  /// include the segments loaded by methods, and are shared by all the
+  /// instances of the program since they share its data loader.
+  py::dict get_load_stats() {
+    const LoadedProgram& loaded_program = *module_->loaded_program();
+    const InstrumentedDataLoader& loader = *loaded_program.loader;
+    py::dict stats;
+    stats["data_loader"] = loader.name();
+    stats["program_load_ms"] = loaded_program.program_load_time_ms;
+    stats["num_segment_loads"] = loader.num_loads();
+    stats["segment_bytes_loaded"] = loader.bytes_loaded();
+    stats["segment_load_ms"] = loader.load_time_ms();
+    return stats;
+  }
+
+  /// Returns a new module that shares this module's program and constant
+  /// data, but has its own methods and planned memory. The two modules can
+  /// execute concurrently from different threads.
+  std::unique_ptr<PyModule> new_instance() {
+    return std::make_unique<PyModule>(std::make_unique<Module>(
+        module_->loaded_program(),
+        /*tracer=*/nullptr,
+        /*debug_buffer_size=*/0,
+        module_->allowed_methods()));
+  }
+
  private:
+  std::unique_lock<std::mutex> acquire_lock() {
+    std::unique_lock<std::mutex> lock(mutex_, std::defer_lock);
+    py::gil_scoped_release release;
+    lock.lock();
+    return lock;
+  }
+
+  /// Finalizes the ETDump of the runs so far and starts a new one. The
+  /// returned buffer is owned by the caller. Must be called with the lock.
+  etdump_result take_etdump() {
+    auto& etdump = module_->etdump();
+    etdump_result result = etdump.get_etdump_data();
+    etdump.reset();
+    return result;
+  }
+
+  py::object take_etdump_buffer() {
+    // The ETDump refers to the outputs in the debug buffer, which the next
+    // runs overwrite, so they are copied out along with it.
+    etdump_debug_buffer_ = py::none();
+    if (module_->has_etdump_debug_buffer()) {
+      const auto debug_data = module_->etdump().get_debug_buffer_data();
+      if (debug_data.size() > 0) {
+        etdump_result debug_result{
+            malloc(debug_data.size()), debug_data.size()};
+        if (debug_result.buf == nullptr) {
+          throw std::bad_alloc();
+        }
+        std::memcpy(debug_result.buf, debug_data.data(), debug_data.size());
+        etdump_debug_buffer_ = py::memoryview(
+            py::cast(std::make_unique<ETDumpBuffer>(debug_result)));
+      }
+    }
+    etdump_result result = take_etdump();
+    if (result.buf == nullptr || result.size == 0) {
+      return py::none();
+    }
+    return py::memoryview(py::cast(std::make_unique<ETDumpBuffer>(result)));
+  }
+
+  bool sample_etdump() {
+    return etdump_sample_rate_ >= 1.0 ||
+        std::uniform_real_distribution<double>(0.0, 1.0)(rng_) <
+        etdump_sample_rate_;
+  }
+
+  /// EValues of the inputs of a method, and in portable mode the metadata of
+  /// its tensor inputs, kept across calls so that calling a method again with
+  /// inputs of the same dtypes and shapes only has to update data pointers.
+  struct InputCache {
+    std::vector<EValue> values;
+
+#ifndef USE_ATEN_LIB
+    struct TensorInput {
+      torch::executor::ScalarType dtype;
+      std::vector<torch::executor::Tensor::SizesType> sizes;
+      std::vector<torch::executor::Tensor::StridesType> strides;
+      std::vector<torch::executor::Tensor::DimOrderType> dim_order;
+      std::unique_ptr<torch::executor::TensorImpl> impl;
+
+      bool matches(
+          torch::executor::ScalarType type,
+          const at::Tensor& at_tensor) const {
+        return type == dtype &&
+            std::equal(
+                   sizes.begin(),
+                   sizes.end(),
+                   at_tensor.sizes().begin(),
+                   at_tensor.sizes().end());
+      }
+    };
+
+    std::vector<std::unique_ptr<TensorInput>> tensors;
+
+    /// Returns an ETensor aliasing the contiguous `at_tensor`, the input at
+    /// `index`.
+    torch::executor::Tensor alias_tensor(
+        size_t index,
+        const at::Tensor& at_tensor) {
+      if (tensors.size() <= index) {
+        tensors.resize(index + 1);
+      }
+      auto type = torch::util::torchToExecuTorchScalarType(
+          at_tensor.options().dtype());
+      auto& input = tensors[index];
+      if (!input || !input->matches(type, at_tensor)) {
+        input = std::make_unique<TensorInput>();
+        input->dtype = type;
+        // cant directly alias at::Tensor sizes and strides due to int64 vs
+        // int32 typing conflict
+        input->sizes.assign(at_tensor.sizes().begin(), at_tensor.sizes().end());
+        input->strides.assign(
+            at_tensor.strides().begin(), at_tensor.strides().end());
+        // Only works for MemoryFormat::Contiguous inputs
+        for (size_t dim = 0; dim < input->sizes.size(); ++dim) {
+          input->dim_order.push_back(dim);
+        }
+        input->impl = std::make_unique<torch::executor::TensorImpl>(
+            type,
+            input->sizes.size(),
+            input->sizes.data(),
+            nullptr,
+            input->dim_order.data(),
+            input->strides.data());
+      }
+      input->impl->set_data(at_tensor.mutable_data_ptr());
+      return torch::executor::Tensor(input->impl.get());
+    }
+#endif
+  };
+
+  InputCache& get_input_cache(const std::string& method_name) {
+    return input_caches_[method_name];
+  }
+
+  /// Output buffers of a method, allocated on its first run and reused by
+  /// every later run so that no per-call allocation is needed.
+  struct OutputStorage {
+    std::vector<std::vector<uint8_t>> buffers;
+    std::vector<Span<uint8_t>> spans;
+  };
+
+  OutputStorage& get_output_storage(const std::string& method_name) {
+    auto it = output_storages_.find(method_name);
+    if (it != output_storages_.end()) {
+      return it->second;
+    }
+    const auto& method = module_->get_method(method_name);
+    const auto num_outputs = method.outputs_size();
+    OutputStorage storage;
+    // These output storages will not be used if the ExecuTorch program
+    // already pre-allocated output space. That is represented by an error
+    // from set_output_data_ptr.
+    storage.buffers.resize(num_outputs);
+    storage.spans.resize(num_outputs);
+    for (size_t i = 0; i < num_outputs; ++i) {
+      const auto& output_tensor_meta =
+          method.method_meta().output_tensor_meta(i);
+      if (!output_tensor_meta.ok()) {
+        // If the output isn't a tensor it won't have a tensor meta.
+        ET_LOG(
+            Info,
+            "Tensor meta doesn't exist for output %zu, error is 0x%" PRIx32
+            ", skipping allocating storage",
+            i,
+            static_cast<uint32_t>(output_tensor_meta.error()));
+        continue;
+      }
+      storage.buffers[i].resize(output_tensor_meta.get().nbytes());
+    }
+    return output_storages_.emplace(method_name, std::move(storage))
+        .first->second;
+  }
+
   std::unique_ptr<Module> module_;
+  std::unordered_map<std::string, InputCache> input_caches_;
+  std::unordered_map<std::string, OutputStorage> output_storages_;
+  py::object etdump_callback_;
+  py::object etdump_debug_buffer_ = py::none();
+  double etdump_sample_rate_ = 1.0;
+  std::minstd_rand rng_{std::random_device{}()};
+  std::mutex mutex_;
 };
 
 void create_profile_block(const std::string& name) {
@@ -716,18 +1401,66 @@ py::list get_operator_names() {
   return res;
 }
 
+/// Holds log_mutex for the duration of a binding, so that no other thread
+/// writes to std::cerr while it is redirected.
+struct LogMutexGuard {
+  std::lock_guard<std::recursive_mutex> guard{log_mutex};
+};
+
+/// Captures the logs of the current thread for the duration of a binding,
+/// and writes them to python's sys.stderr at the end of it. Used instead of
+/// redirecting std::cerr for bindings that release the GIL, since several
+/// threads run them at the same time.
+class ScopedLogCapture {
+ public:
+  ScopedLogCapture() : previous_(captured_logs) {
+    captured_logs = &logs_;
+  }
+
+  ScopedLogCapture(const ScopedLogCapture&) = delete;
+  ScopedLogCapture& operator=(const ScopedLogCapture&) = delete;
+
+  ~ScopedLogCapture() {
+    captured_logs = previous_;
+    if (logs_.empty()) {
+      return;
+    }
+    // Bindings hold the GIL when their call guard is destroyed, possibly
+    // while an exception propagates, so errors writing the logs are dropped.
+    try {
+      py::module_::import("sys").attr("stderr").attr("write")(logs_);
+    } catch (...) {
+    }
+  }
+
+ private:
+  std::string* previous_;
+  std::string logs_;
+};
+
 } // namespace
 
 PYBIND11_MODULE(EXECUTORCH_PYTHON_MODULE_NAME, m) {
   // Redirects cout and cerr for function calls this guards to the python env.
-  auto call_guard = py::
-      call_guard<py::scoped_ostream_redirect, py::scoped_estream_redirect>();
+  // Only for functions that hold the GIL throughout, so that the redirections
+  // of concurrent calls are nested.
+  auto call_guard = py::call_guard<
+      LogMutexGuard,
+      py::scoped_ostream_redirect,
+      py::scoped_estream_redirect>();
+  // Sends the logs of functions that release the GIL to the python env.
+  auto gil_releasing_call_guard = py::call_guard<ScopedLogCapture>();
   m.def(
       "_load_for_executorch",
       PyModule::load_from_file,
       py::arg("path"),
       py::arg("enable_etdump") = false,
       py::arg("debug_buffer_size") = 0,
+      py::arg("methods") = py::none(),
+      py::arg("data_loader") = "mmap",
+      py::arg("mlock_config") = "use_mlock_ignore_errors",
+      py::arg("prefault") = false,
+      py::arg("file_alignment") = alignof(std::max_align_t),
       call_guard);
   m.def(
       "_load_for_executorch_from_buffer",
@@ -735,6 +1468,7 @@ PYBIND11_MODULE(EXECUTORCH_PYTHON_MODULE_NAME, m) {
       py::arg("buffer"),
       py::arg("enable_etdump") = false,
       py::arg("debug_buffer_size") = 0,
+      py::arg("methods") = py::none(),
       call_guard);
   m.def(
       "_load_for_executorch_from_bundled_program",
@@ -742,6 +1476,7 @@ PYBIND11_MODULE(EXECUTORCH_PYTHON_MODULE_NAME, m) {
       py::arg("ptr"),
       py::arg("enable_etdump") = false,
       py::arg("debug_buffer_size") = 0,
+      py::arg("methods") = py::none(),
       call_guard);
   m.def(
       "_load_bundled_program_from_buffer",
@@ -767,7 +1502,10 @@ PYBIND11_MODULE(EXECUTORCH_PYTHON_MODULE_NAME, m) {
       call_guard);
 
   py::class_<PyModule>(m, "ExecuTorchModule")
-      .def("load_bundled_input", &PyModule::load_bundled_input, call_guard)
+      .def(
+          "load_bundled_input",
+          &PyModule::load_bundled_input,
+          gil_releasing_call_guard)
       .def(
           "verify_result_with_bundled_expected_output",
           &PyModule::verify_result_with_bundled_expected_output,
@@ -776,26 +1514,88 @@ PYBIND11_MODULE(EXECUTORCH_PYTHON_MODULE_NAME, m) {
           py::arg("testset_idx"),
           py::arg("rtol") = 1e-5,
           py::arg("atol") = 1e-8,
-          call_guard)
-      .def("plan_execute", &PyModule::plan_execute, call_guard)
+          gil_releasing_call_guard)
+      .def("plan_execute", &PyModule::plan_execute, gil_releasing_call_guard)
       .def(
           "run_method",
           &PyModule::run_method,
           py::arg("method_name"),
           py::arg("inputs") = py::list(),
-          call_guard)
-      .def("forward", &PyModule::forward, call_guard)
+          py::arg("out") = py::none(),
+          py::arg("clone_outputs") = true,
+          gil_releasing_call_guard)
+      .def(
+          "forward",
+          &PyModule::forward,
+          py::arg("inputs"),
+          py::arg("out") = py::none(),
+          py::arg("clone_outputs") = true,
+          gil_releasing_call_guard)
       .def("has_etdump", &PyModule::has_etdump, call_guard)
+      .def("new_instance", &PyModule::new_instance, call_guard)
+      .def("get_load_stats", &PyModule::get_load_stats, call_guard)
+      .def(
+          "get_method_state",
+          &PyModule::get_method_state,
+          py::arg("method_name"),
+          gil_releasing_call_guard)
+      .def(
+          "set_method_state",
+          &PyModule::set_method_state,
+          py::arg("method_name"),
+          py::arg("state"),
+          gil_releasing_call_guard)
+      .def(
+          "unload_method",
+          &PyModule::unload_method,
+          py::arg("method_name"),
+          gil_releasing_call_guard)
+      .def(
+          "is_method_loaded",
+          &PyModule::is_method_loaded,
+          py::arg("method_name"),
+          gil_releasing_call_guard)
       .def(
           "write_etdump_result_to_file",
           &PyModule::write_etdump_result_to_file,
           py::arg("path"),
           py::arg("debug_buffer_path") = py::none(),
-          call_guard)
-      .def("__call__", &PyModule::forward, call_guard)
-      .def("__call__", &PyModule::forward_single_input, call_guard);
+          gil_releasing_call_guard)
+      .def(
+          "get_etdump_buffer",
+          &PyModule::get_etdump_buffer,
+          gil_releasing_call_guard)
+      .def(
+          "get_etdump_debug_buffer",
+          &PyModule::get_etdump_debug_buffer,
+          gil_releasing_call_guard)
+      .def(
+          "set_etdump_callback",
+          &PyModule::set_etdump_callback,
+          py::arg("callback"),
+          py::arg("sample_rate") = 1.0,
+          gil_releasing_call_guard)
+      .def(
+          "__call__",
+          &PyModule::forward,
+          py::arg("inputs"),
+          py::arg("out") = py::none(),
+          py::arg("clone_outputs") = true,
+          gil_releasing_call_guard)
+      .def(
+          "__call__",
+          &PyModule::forward_single_input,
+          gil_releasing_call_guard);
 
   py::class_<PyBundledModule>(m, "BundledModule");
+
+  py::class_<ETDumpBuffer>(m, "ETDumpBuffer", py::buffer_protocol())
+      .def_buffer([](ETDumpBuffer& buffer) {
+        return py::buffer_info(
+            buffer.data,
+            static_cast<py::ssize_t>(buffer.size),
+            /*readonly=*/true);
+      });
 }
 
 } // namespace executor
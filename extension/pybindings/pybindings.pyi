@@ -5,15 +5,52 @@
 # LICENSE file in the root directory of this source tree.
 
 # pyre-strict
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import torch
 
 class ExecuTorchModule:
     # pyre-ignore[2, 3]: "Any" in parameter and return type annotations.
-    def __call__(self, inputs: Any) -> List[Any]: ...
+    def __call__(
+        self,
+        inputs: Any,
+        out: Optional[Sequence[Optional[torch.Tensor]]] = None,
+        clone_outputs: bool = True,
+    ) -> List[Any]: ...
     # pyre-ignore[2, 3]: "Any" in parameter and return type annotations.
-    def run_method(self, method_name: str, inputs: Sequence[Any]) -> List[Any]: ...
+    def run_method(
+        self,
+        method_name: str,
+        inputs: Sequence[Any],
+        out: Optional[Sequence[Optional[torch.Tensor]]] = None,
+        clone_outputs: bool = True,
+    ) -> List[Any]:
+        """Runs a method of the program.
+
+        Args:
+            method_name: The name of the method to run.
+            inputs: The flattened inputs of the method.
+            out: If provided, one tensor (or None) per output of the method.
+                Tensor outputs are written into these tensors, which are then
+                returned instead of new tensors. They must be contiguous, with
+                the dtype and sizes of the outputs (their upper bounds for
+                dynamic shapes, in which case a view of the start of the
+                tensor is returned).
+            clone_outputs: If false, tensor outputs that are not written to
+                `out` alias buffers owned by the module instead of being
+                copied. These buffers are reused, so the returned tensors are
+                only valid until the next call and while the module is alive.
+        """
+        ...
     # pyre-ignore[2, 3]: "Any" in parameter and return type annotations.
-    def forward(self, inputs: Sequence[Any]) -> List[Any]: ...
+    def forward(
+        self,
+        inputs: Sequence[Any],
+        out: Optional[Sequence[Optional[torch.Tensor]]] = None,
+        clone_outputs: bool = True,
+    ) -> List[Any]:
+        """Same as run_method("forward", ...)."""
+        ...
     # Bundled program methods.
     def load_bundled_input(
         self, bundle: BundledModule, method_name: str, testset_idx: int
@@ -27,16 +64,95 @@ class ExecuTorchModule:
         atol: float = 1e-8,
     ) -> None: ...
     def has_etdump(self) -> bool: ...
+    def unload_method(self, method_name: str) -> None:
+        """Frees the method and its planned memory and output buffers.
+
+        Outputs previously returned with `clone_outputs=False` must not be used
+        afterwards. The method is loaded again on its next use.
+        """
+        ...
+    def is_method_loaded(self, method_name: str) -> bool: ...
+    def new_instance(self) -> ExecuTorchModule:
+        """Returns a new module sharing this module's program and constant data.
+
+        The new module has its own methods and planned memory, so the two can
+        execute concurrently from different threads. Execution releases the GIL.
+        """
+        ...
+    def get_load_stats(self) -> Dict[str, Any]:
+        """Returns counters of how the program was loaded.
+
+        The keys are `data_loader`, the loader used, `program_load_ms`, the
+        time spent loading the program, and `num_segment_loads`,
+        `segment_bytes_loaded` and `segment_load_ms`, which count the segments
+        read by the loader so far. Segments are also read when methods are
+        loaded, and the segment counters are shared by all the instances of the
+        program.
+        """
+        ...
+    def get_method_state(self, method_name: str) -> List[bytes]:
+        """Returns a copy of the planned memory of a method, one bytes object per arena.
+
+        The planned memory holds the mutable buffers of the method, e.g. KV
+        caches, which persist across runs, along with its intermediate values.
+        """
+        ...
+    def set_method_state(self, method_name: str, state: Sequence[Any]) -> None:
+        """Restores a state returned by `get_method_state()`.
+
+        The state can come from this module or from another instance of the
+        same program. Raises ValueError if it does not match the planned
+        memory of the method.
+        """
+        ...
     def write_etdump_result_to_file(
         self, path: str, debug_buffer_path: Optional[str] = None
     ) -> None: ...
+    def get_etdump_buffer(self) -> Optional[memoryview]:
+        """Returns the ETDump of the runs since the last call, without copying it.
+
+        Returns None if nothing was recorded. The next run starts a new ETDump.
+        The buffer can be passed to `Inspector(etdump_data=...)`.
+        """
+        ...
+    def get_etdump_debug_buffer(self) -> Optional[memoryview]:
+        """Returns the debug buffer that the last ETDump refers to.
+
+        The last ETDump is the one returned by `get_etdump_buffer()` or passed
+        to the ETDump callback. Its debug buffer holds the outputs logged when
+        the module was loaded with a `debug_buffer_size`, and can be passed to
+        `Inspector(debug_buffer=...)`. Returns None if no output was logged.
+        """
+        ...
+    def set_etdump_callback(
+        self,
+        callback: Optional[Callable[[str, memoryview], None]],
+        sample_rate: float = 1.0,
+    ) -> None:
+        """Calls `callback(method_name, etdump)` after a `sample_rate` fraction of runs.
+
+        Each call receives the ETDump of that run only, the ETDumps of the other
+        runs are discarded. Passing None as the callback restores the default of
+        accumulating the ETDumps of all runs.
+        """
+        ...
 
 class BundledModule: ...
 
 def _load_for_executorch(
-    path: str, enable_etdump: bool = False, debug_buffer_size: int = 0
+    path: str,
+    enable_etdump: bool = False,
+    debug_buffer_size: int = 0,
+    methods: Optional[Sequence[str]] = None,
+    data_loader: str = "mmap",
+    mlock_config: str = "use_mlock_ignore_errors",
+    prefault: bool = False,
+    file_alignment: int = ...,
 ) -> ExecuTorchModule:
     """Load an ExecuTorch Program from a file.
+
+    Methods are loaded, and their planned memory allocated, on first use.
+
     Args:
         path: File path to the ExecuTorch program as a string.
         enable_etdump: If true, enables an ETDump which can store profiling information.
@@ -47,17 +163,38 @@ def _load_for_executorch(
             This is the fixed size of the buffer, if you have more intermediate
             result bytes than this allows, the execution will abort with a failed
             runtime check.
+        methods: If provided, only these methods can be used. They are loaded
+            right away, so that loading errors surface here.
+        data_loader: "mmap" to map the file into memory, or "file" to read
+            each segment of the file into a buffer when it is loaded.
+        mlock_config: Whether the "mmap" loader locks the pages it maps, one of
+            "no_mlock", "use_mlock" and "use_mlock_ignore_errors" (locking
+            fails without enough RLIMIT_MEMLOCK).
+        prefault: If true, the "mmap" loader asks the kernel to read each
+            segment ahead (MADV_WILLNEED) as soon as it is mapped, instead of
+            faulting its pages in on first access.
+        file_alignment: The alignment of the buffers of the "file" loader.
     """
     ...
 
 def _load_for_executorch_from_buffer(
-    buffer: bytes, enable_etdump: bool = False, debug_buffer_size: int = 0
+    buffer: Union[bytes, bytearray, memoryview],
+    enable_etdump: bool = False,
+    debug_buffer_size: int = 0,
+    methods: Optional[Sequence[str]] = None,
 ) -> ExecuTorchModule:
-    """Same as _load_for_executorch, but takes a byte buffer instead of a file path."""
+    """Same as _load_for_executorch, but takes a byte buffer instead of a file path.
+
+    The buffer can be any C contiguous object supporting the buffer protocol,
+    such as an `mmap.mmap`. It is not copied, and the module keeps it alive.
+    """
     ...
 
 def _load_for_executorch_from_bundled_program(
-    module: BundledModule, enable_etdump: bool = False, debug_buffer_size: int = 0
+    module: BundledModule,
+    enable_etdump: bool = False,
+    debug_buffer_size: int = 0,
+    methods: Optional[Sequence[str]] = None,
 ) -> ExecuTorchModule:
     """Same as _load_for_executorch, but takes a bundled program instead of a file path.
     See https://pytorch.org/executorch/stable/sdk-bundled-io.html for documentation."""
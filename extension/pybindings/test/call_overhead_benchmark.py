@@ -0,0 +1,68 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the per-call overhead of the Python bindings on a trivial model, where
+the time spent converting inputs and outputs dominates the time spent running
+kernels.
+
+    python -m executorch.extension.pybindings.test.call_overhead_benchmark
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import torch
+from executorch.exir import to_edge
+from executorch.extension.pybindings.portable_lib import (
+    _load_for_executorch_from_buffer,
+)
+from torch.export import export
+
+
+class ModuleAdd(torch.nn.Module):
+    def forward(self, x, y):
+        return x + y
+
+
+def _time_per_call_us(fn: Callable[[], List[torch.Tensor]], iterations: int) -> float:
+    # Warm up the method, its caches and the allocator.
+    for _ in range(10):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    inputs = (torch.ones(1, 2, 2, 2), torch.ones(1, 2, 2, 2))
+    program = to_edge(export(ModuleAdd(), inputs)).to_executorch()
+    # Keep the buffer alive as long as the module.
+    buffer = program.buffer
+    module = _load_for_executorch_from_buffer(buffer)
+
+    channels_last = tuple(x.to(memory_format=torch.channels_last) for x in inputs)
+    out = [torch.empty(1, 2, 2, 2)]
+    cases = {
+        "forward": lambda: module.forward(inputs),
+        "forward(clone_outputs=False)": lambda: module.forward(
+            inputs, clone_outputs=False
+        ),
+        "forward(out=...)": lambda: module.forward(inputs, out=out),
+        "forward(channels last inputs)": lambda: module.forward(channels_last),
+    }
+    for name, fn in cases.items():
+        print(f"{name}: {_time_per_call_us(fn, args.iterations):.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
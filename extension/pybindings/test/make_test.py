@@ -73,6 +73,23 @@ def make_test(  # noqa: C901
             def get_inputs(self):
                 return (torch.ones(2, 2),)
 
+        class ModuleAccumulate(torch.nn.Module):
+            """A module with a mutable buffer, whose value persists across runs."""
+
+            def __init__(self):
+                super(ModuleAccumulate, self).__init__()
+                self.register_buffer("total", torch.zeros(2, 2))
+
+            def forward(self, x):
+                self.total.add_(x)
+                return self.total * 1
+
+            def get_methods_to_export(self):
+                return ("forward",)
+
+            def get_inputs(self):
+                return (torch.ones(2, 2),)
+
         def create_program(
             eager_module: torch.nn.Module,
         ) -> Tuple[ExecutorchProgramManager, Tuple[Any, ...]]:
@@ -134,6 +151,28 @@ def make_test(  # noqa: C901
             executorch_output2 = executorch_module.run_method("forward2", inputs)[0]
             tester.assertTrue(torch.allclose(executorch_output2, torch.ones(2, 2) * 3))
 
+        def test_lazy_method_loading(tester):
+            program, inputs = create_program(ModuleMulti())
+
+            executorch_module = load_fn(program.buffer)
+            tester.assertFalse(executorch_module.is_method_loaded("forward"))
+            tester.assertFalse(executorch_module.is_method_loaded("forward2"))
+            executorch_output = executorch_module.run_method("forward2", inputs)[0]
+            tester.assertTrue(torch.allclose(executorch_output, torch.ones(2, 2) * 3))
+            tester.assertFalse(executorch_module.is_method_loaded("forward"))
+            tester.assertTrue(executorch_module.is_method_loaded("forward2"))
+
+            executorch_module.unload_method("forward2")
+            tester.assertFalse(executorch_module.is_method_loaded("forward2"))
+            executorch_output = executorch_module.run_method("forward2", inputs)[0]
+            tester.assertTrue(torch.allclose(executorch_output, torch.ones(2, 2) * 3))
+
+            # Only the requested methods are loaded, and the others can't be used.
+            executorch_module = load_fn(program.buffer, methods=["forward"])
+            tester.assertTrue(executorch_module.is_method_loaded("forward"))
+            with tester.assertRaises(RuntimeError):
+                executorch_module.run_method("forward2", inputs)
+
         def test_output_lifespan(tester):
             def lower_function_call():
                 program, inputs = create_program(ModuleMulti())
@@ -159,6 +198,28 @@ def make_test(  # noqa: C901
             expected = inputs[0] + inputs[1]
             tester.assertEqual(str(expected), str(executorch_output))
 
+        def test_input_layouts(tester):
+            exported_program, inputs = create_program(ModuleAdd())
+            executorch_module = load_fn(exported_program.buffer)
+            expected = inputs[0] + inputs[1]
+
+            # Non-contiguous inputs are copied instead of being rejected.
+            transposed = (inputs[0].t().contiguous().t(), inputs[1])
+            tester.assertFalse(transposed[0].is_contiguous())
+            tester.assertTrue(
+                torch.allclose(executorch_module.forward(transposed)[0], expected)
+            )
+
+            # Calls with inputs of the same shape reuse the cached input metadata,
+            # but must still read the new data.
+            for i in range(3):
+                x = torch.full((2, 2), float(i))
+                tester.assertTrue(
+                    torch.allclose(
+                        executorch_module.forward((x, inputs[1]))[0], x + inputs[1]
+                    )
+                )
+
         def test_module_single_input(tester):
             # Create an ExecuTorch program from ModuleAdd.
             exported_program, inputs = create_program(ModuleAddSingleInput())
@@ -174,6 +235,277 @@ def make_test(  # noqa: C901
             expected = inputs[0] + inputs[0]
             tester.assertEqual(str(expected), str(executorch_output))
 
+        def test_output_buffers(tester):
+            exported_program, inputs = create_program(ModuleAdd())
+            executorch_module = load_fn(exported_program.buffer)
+            expected = inputs[0] + inputs[1]
+
+            # Outputs are written into the caller's tensors.
+            out = torch.zeros(2, 2)
+            executorch_output = executorch_module.forward(inputs, out=[out])[0]
+            tester.assertEqual(executorch_output.data_ptr(), out.data_ptr())
+            tester.assertTrue(torch.allclose(out, expected))
+
+            # Without cloning, every call returns tensors aliasing the same
+            # module owned buffers.
+            first = executorch_module.forward(inputs, clone_outputs=False)[0]
+            second = executorch_module.forward(
+                (inputs[0], inputs[1] * 2), clone_outputs=False
+            )[0]
+            tester.assertEqual(first.data_ptr(), second.data_ptr())
+            tester.assertTrue(torch.allclose(first, inputs[0] + inputs[1] * 2))
+
+            # Out tensors with other sizes or dtypes than the output are
+            # rejected rather than reinterpreted.
+            with tester.assertRaises(RuntimeError):
+                executorch_module.forward(inputs, out=[torch.zeros(1)])
+            with tester.assertRaises(RuntimeError):
+                executorch_module.forward(inputs, out=[torch.zeros(4)])
+            with tester.assertRaises(RuntimeError):
+                executorch_module.forward(
+                    inputs, out=[torch.zeros(2, 2, dtype=torch.int32)]
+                )
+
+        def test_module_pool(tester):
+            import asyncio
+
+            from executorch.extension.pybindings.module_pool import (
+                ExecuTorchModulePool,
+            )
+
+            exported_program, inputs = create_program(ModuleAdd())
+            executorch_module = load_fn(exported_program.buffer)
+
+            # Instances share the program but not their planned memory.
+            instance = executorch_module.new_instance()
+            tester.assertTrue(
+                torch.allclose(instance.forward(inputs)[0], inputs[0] + inputs[1])
+            )
+
+            with ExecuTorchModulePool(executorch_module, 2) as pool:
+                tester.assertEqual(pool.num_instances, 2)
+                requests = [(torch.full((2, 2), float(i)), inputs[1]) for i in range(8)]
+                futures = [pool.submit("forward", request) for request in requests]
+                for request, future in zip(requests, futures):
+                    tester.assertTrue(
+                        torch.allclose(future.result()[0], request[0] + request[1])
+                    )
+
+                async def run_async():
+                    return await asyncio.gather(
+                        *(pool.run_method_async("forward", r) for r in requests)
+                    )
+
+                for request, outputs in zip(requests, asyncio.run(run_async())):
+                    tester.assertTrue(
+                        torch.allclose(outputs[0], request[0] + request[1])
+                    )
+
+        def test_benchmark(tester):
+            from executorch.extension.pybindings.benchmark import (
+                benchmark_method,
+                generate_method_inputs,
+            )
+
+            program, _ = create_program(ModuleMulti())
+            executorch_module = load_fn(program.buffer)
+
+            method_inputs = generate_method_inputs(program.buffer)
+            tester.assertEqual(set(method_inputs), {"forward", "forward2"})
+            tester.assertEqual(
+                [x.shape for x in method_inputs["forward"][0]],
+                [torch.Size([2, 2]), torch.Size([2, 2])],
+            )
+
+            result = benchmark_method(
+                executorch_module,
+                "forward",
+                method_inputs["forward"],
+                warmup=1,
+                iterations=10,
+                concurrency=[1, 2],
+            )
+            tester.assertEqual(result.iterations, 10)
+            tester.assertLessEqual(result.min_ms, result.p50_ms)
+            tester.assertLessEqual(result.p50_ms, result.p90_ms)
+            tester.assertLessEqual(result.p90_ms, result.p99_ms)
+            tester.assertLessEqual(result.p99_ms, result.max_ms)
+            tester.assertEqual([t.concurrency for t in result.throughput], [1, 2])
+            tester.assertTrue(all(t.calls_per_s > 0 for t in result.throughput))
+
+        def test_bundled_verification(tester):
+            from executorch.extension.pybindings.bundled_verification import (
+                BundledTestCase,
+                verify_bundled_test_cases,
+            )
+
+            exported_program, inputs = create_program(ModuleAdd())
+            executorch_module = load_fn(exported_program.buffer)
+            expected = inputs[0] + inputs[1]
+            test_cases = [
+                BundledTestCase("forward", i, list(inputs), [expected])
+                for i in range(4)
+            ]
+            # The third test case expects a wrong output.
+            test_cases[2].expected_outputs = [expected + 1]
+
+            results = verify_bundled_test_cases(
+                executorch_module, test_cases, num_instances=2
+            )
+            tester.assertEqual([r.index for r in results], [0, 1, 2, 3])
+            tester.assertEqual([r.passed for r in results], [True, True, False, True])
+            tester.assertEqual(results[0].max_abs_error, 0.0)
+            tester.assertAlmostEqual(results[2].max_abs_error, 1.0)
+            tester.assertIsNotNone(results[2].error)
+            tester.assertTrue(all(r.latency_ms > 0 for r in results))
+
+            # With a single instance, the test cases run in order and nothing
+            # runs after the failure.
+            results = verify_bundled_test_cases(
+                executorch_module, test_cases, fail_fast=True
+            )
+            tester.assertEqual([r.passed for r in results], [True, True, False])
+
+            # Errors other than execution failures only fail their test case.
+            test_cases[2].expected_outputs = [None]
+            results = verify_bundled_test_cases(
+                executorch_module, test_cases, num_instances=2
+            )
+            tester.assertEqual([r.passed for r in results], [True, True, False, True])
+            tester.assertIn("AttributeError", results[2].error)
+
+        def test_loader_options(tester):
+            import importlib
+            import tempfile
+
+            exported_program, inputs = create_program(ModuleAdd())
+            expected = inputs[0] + inputs[1]
+
+            # Any buffer is loaded without copying, and kept alive by the module.
+            executorch_module = load_fn(memoryview(bytearray(exported_program.buffer)))
+            torch.testing.assert_close(executorch_module.forward(inputs)[0], expected)
+            stats = executorch_module.get_load_stats()
+            tester.assertEqual(stats["data_loader"], "buffer")
+            tester.assertGreater(stats["num_segment_loads"], 0)
+            tester.assertGreater(stats["segment_bytes_loaded"], 0)
+
+            load_from_file = importlib.import_module(
+                load_fn.__module__
+            )._load_for_executorch
+            with tempfile.NamedTemporaryFile(suffix=".pte") as f:
+                f.write(exported_program.buffer)
+                f.flush()
+                for options in (
+                    {"data_loader": "mmap", "mlock_config": "no_mlock"},
+                    {"data_loader": "mmap", "prefault": True},
+                    {"data_loader": "file", "file_alignment": 64},
+                ):
+                    executorch_module = load_from_file(f.name, **options)
+                    torch.testing.assert_close(
+                        executorch_module.forward(inputs)[0], expected
+                    )
+                    stats = executorch_module.get_load_stats()
+                    tester.assertEqual(stats["data_loader"], options["data_loader"])
+                    tester.assertGreater(stats["num_segment_loads"], 0)
+                    tester.assertGreaterEqual(stats["program_load_ms"], 0)
+
+                with tester.assertRaises(ValueError):
+                    load_from_file(f.name, data_loader="file", prefault=True)
+                with tester.assertRaises(ValueError):
+                    load_from_file(f.name, mlock_config="always")
+
+        def test_method_state(tester):
+            exported_program, inputs = create_program(ModuleAccumulate())
+            executorch_module = load_fn(exported_program.buffer)
+            x = inputs[0]
+
+            torch.testing.assert_close(executorch_module.forward(inputs)[0], x)
+            state = executorch_module.get_method_state("forward")
+            tester.assertTrue(all(isinstance(buffer, bytes) for buffer in state))
+            torch.testing.assert_close(executorch_module.forward(inputs)[0], 2 * x)
+
+            # Restoring the state rewinds the buffer to its value after one run.
+            executorch_module.set_method_state("forward", state)
+            torch.testing.assert_close(executorch_module.forward(inputs)[0], 2 * x)
+
+            # The state can be restored in another instance of the program.
+            instance = executorch_module.new_instance()
+            instance.set_method_state("forward", state)
+            torch.testing.assert_close(instance.forward(inputs)[0], 2 * x)
+
+            with tester.assertRaises(ValueError):
+                executorch_module.set_method_state("forward", state + [b""])
+
+        def test_etdump_buffer(tester):
+            from executorch.sdk.etdump.serialize import (
+                deserialize_from_etdump_flatcc,
+            )
+
+            exported_program, inputs = create_program(ModuleAdd())
+            executorch_module = load_fn(exported_program.buffer, enable_etdump=True)
+            executorch_module.forward(inputs)
+
+            etdump = executorch_module.get_etdump_buffer()
+            if etdump is None:
+                # Built without the event tracer, so nothing is recorded.
+                return
+            tester.assertIsInstance(etdump, memoryview)
+            run_data = deserialize_from_etdump_flatcc(etdump).run_data
+            tester.assertTrue(
+                any(run.name == "Execute" and run.events for run in run_data)
+            )
+            # Each run starts a new ETDump.
+            tester.assertIsNone(executorch_module.get_etdump_buffer())
+
+            samples = []
+            executorch_module.set_etdump_callback(
+                lambda method_name, etdump: samples.append(
+                    (method_name, deserialize_from_etdump_flatcc(etdump))
+                )
+            )
+            executorch_module.forward(inputs)
+            executorch_module.forward(inputs)
+            tester.assertEqual(
+                [method_name for method_name, _ in samples], ["forward"] * 2
+            )
+            # Every sample only holds its own run.
+            tester.assertEqual(len(samples[1][1].run_data), 1)
+
+            executorch_module.set_etdump_callback(
+                lambda method_name, etdump: samples.append(method_name),
+                sample_rate=0.0,
+            )
+            executorch_module.forward(inputs)
+            tester.assertEqual(len(samples), 2)
+            tester.assertIsNone(executorch_module.get_etdump_buffer())
+
+        def test_etdump_debug_buffer(tester):
+            exported_program, inputs = create_program(ModuleAdd())
+            # Only fits the outputs of a few runs.
+            executorch_module = load_fn(
+                exported_program.buffer, enable_etdump=True, debug_buffer_size=1024
+            )
+            expected = (inputs[0] + inputs[1]).numpy().tobytes()
+            for _ in range(20):
+                executorch_module.forward(inputs)
+                if executorch_module.get_etdump_buffer() is None:
+                    # Built without the event tracer, so nothing is recorded.
+                    return
+                debug_buffer = executorch_module.get_etdump_debug_buffer()
+                tester.assertIsInstance(debug_buffer, memoryview)
+                tester.assertIn(expected, debug_buffer.tobytes())
+
+            debug_buffers = []
+            executorch_module.set_etdump_callback(
+                lambda method_name, etdump: debug_buffers.append(
+                    executorch_module.get_etdump_debug_buffer().tobytes()
+                )
+            )
+            for _ in range(20):
+                executorch_module.forward(inputs)
+            tester.assertEqual(len(debug_buffers), 20)
+            tester.assertEqual(debug_buffers[-1], debug_buffers[0])
+
         def test_stderr_redirect(tester):
             import sys
             from io import StringIO
@@ -211,11 +543,57 @@ def make_test(  # noqa: C901
                 except Exception:
                     tester.assertTrue(str(out).find("The length of given input array"))
 
+        def test_concurrent_logging(tester):
+            import sys
+            from concurrent.futures import ThreadPoolExecutor
+            from io import StringIO
+
+            exported_program, inputs = create_program(ModuleAdd())
+            executorch_module = load_fn(exported_program.buffer)
+            instances = [executorch_module] + [
+                executorch_module.new_instance() for _ in range(3)
+            ]
+
+            def run(instance):
+                for _ in range(20):
+                    instance.run_method("forward", inputs)
+                    # Logs an error, from several threads at once.
+                    with tester.assertRaises(RuntimeError):
+                        instance.run_method("forward", (*inputs, 1))
+
+            stderr = sys.stderr
+            sys.stderr = string_io = StringIO()
+            try:
+                with ThreadPoolExecutor(max_workers=len(instances)) as executor:
+                    list(executor.map(run, instances))
+                logs = string_io.getvalue()
+                # Logging still works once the concurrent calls are done.
+                sys.stderr = string_io = StringIO()
+                with tester.assertRaises(RuntimeError):
+                    executorch_module.run_method("forward", (*inputs, 1))
+            finally:
+                sys.stderr = stderr
+
+            message = "The length of given input array"
+            tester.assertEqual(logs.count(message), 20 * len(instances))
+            tester.assertIn(message, string_io.getvalue())
+
         test_e2e(tester)
         test_multiple_entry(tester)
+        test_lazy_method_loading(tester)
         test_output_lifespan(tester)
         test_module_callable(tester)
+        test_input_layouts(tester)
         test_module_single_input(tester)
+        test_output_buffers(tester)
+        test_module_pool(tester)
+        test_benchmark(tester)
+        test_bundled_verification(tester)
+        test_loader_options(tester)
+        test_method_state(tester)
+        test_etdump_buffer(tester)
+        test_etdump_debug_buffer(tester)
         test_stderr_redirect(tester)
+        test_concurrent_logging(tester)
 
     return wrapper
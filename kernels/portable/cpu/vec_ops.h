@@ -140,6 +140,44 @@ inline void vec_quantized_matmul_transb_int8(
   }
 }
 
+/// x: m * n, y: p * (n / 2), z: m * p, s: p * groups
+/// y holds two 4-bit values per byte, stored with an offset of 8: the value at
+/// an even k in the high nibble of y[j][k/2], and the next one in the low
+/// nibble, like the weights of quantized_decomposed::embedding_4bit.
+/// z[i][j] = sum(x[i][k] * y[j][k] * s[j][k/g])
+template <typename T, typename U = T, typename V = U>
+inline void vec_quantized_matmul_transb_int4(
+    T* __restrict__ z,
+    const U* __restrict__ x,
+    const uint8_t* __restrict__ y,
+    const V* __restrict__ s,
+    int64_t m,
+    int64_t n,
+    int64_t p,
+    int64_t g) {
+  int64_t n_over_g = (n + g - 1) / g;
+  int64_t n_over_2 = n / 2;
+
+  for (size_t i = 0; i < m; ++i) {
+    for (size_t j = 0; j < p; ++j) {
+      const uint8_t* y_row = y + j * n_over_2;
+      T sum = 0;
+      for (size_t k = 0; k < n; k += g) {
+        T psum = 0;
+        // the last group may have fewer than g elements
+        for (size_t k2 = k; k2 < bounds_min(k + g, n); k2++) {
+          const uint8_t byte = y_row[k2 / 2];
+          const int32_t value =
+              static_cast<int32_t>((k2 & 1) ? (byte & 0x0F) : (byte >> 4)) - 8;
+          psum += x[i * n + k2] * static_cast<U>(value);
+        }
+        sum += psum * s[j * n_over_g + k / g];
+      }
+      z[i * p + j] = sum;
+    }
+  }
+}
+
 // mat1 (m x n), mat2 (n x p), out (m, p), self (m x p)
 // z[i][j] = sum(x[i][k] * y[k][j]), for k in range(n)
 // T for tensor dtype, U for scalar type
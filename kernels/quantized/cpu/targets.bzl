@@ -38,6 +38,12 @@ _QUANT_OPS = (
             "//executorch/kernels/portable/cpu:vec_ops",
         ],
     ),
+    op_target(
+        name = "op_mixed_linear4b",
+        deps = [
+            "//executorch/kernels/portable/cpu:vec_ops",
+        ],
+    ),
     op_target(
         name = "op_quantize",
         deps = [
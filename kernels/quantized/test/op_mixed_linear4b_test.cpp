@@ -0,0 +1,132 @@
+/*
+ * Copyright (c) Meta Platforms, Inc. and affiliates.
+ * All rights reserved.
+ *
+ * This source code is licensed under the BSD-style license found in the
+ * LICENSE file in the root directory of this source tree.
+ */
+
+#include <executorch/kernels/portable/NativeFunctions.h> // Declares the aten operator
+#include <executorch/kernels/quantized/NativeFunctions.h> // Declares the quantized operator
+#include <executorch/runtime/core/exec_aten/exec_aten.h>
+#include <executorch/runtime/core/exec_aten/testing_util/tensor_factory.h>
+#include <executorch/runtime/core/exec_aten/testing_util/tensor_util.h>
+#include <executorch/runtime/core/exec_aten/util/scalar_type_util.h>
+#include <executorch/runtime/platform/runtime.h>
+
+#include <gtest/gtest.h>
+
+using namespace ::testing;
+using exec_aten::optional;
+using exec_aten::RuntimeContext;
+using exec_aten::ScalarType;
+using exec_aten::Tensor;
+using torch::executor::native::quantized_mixed_linear_4bit_out;
+using torch::executor::testing::TensorFactory;
+
+class OpQuantizedMixedDtypeLinear4bTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    // Since these tests cause ET_LOG to be called, the PAL must be initialized
+    // first.
+    torch::executor::runtime_init();
+  }
+};
+
+// Weight values {5, 3, 1, -2} and {4, 2, 1, 7}, offset by 8 and packed two per
+// byte, the first one in the high nibble.
+static const std::vector<uint8_t> kPackedWeight = {
+    (13 << 4) | 11,
+    (9 << 4) | 6,
+    (12 << 4) | 10,
+    (9 << 4) | 15};
+
+template <ScalarType DTYPE, ScalarType DTYPE_OUT>
+void test_dtype() {
+  TensorFactory<DTYPE> tf;
+  TensorFactory<ScalarType::Byte> tf_byte;
+  TensorFactory<DTYPE_OUT> tf_out;
+
+  Tensor input = tf.make(
+      /*sizes=*/{1, 4},
+      /*data=*/{1.0, 1.5, 2.0, -1.0});
+  Tensor weight = tf_byte.make(/*sizes=*/{2, 2}, /*data=*/kPackedWeight);
+  Tensor weight_scales = tf.make(
+      /*sizes=*/{2},
+      /*data=*/{0.2, 0.4});
+  const optional<Tensor> opt_weight_zp{};
+  const optional<ScalarType> opt_dtype_out{};
+
+  Tensor out = tf_out.zeros({1, 2});
+
+  Tensor expected = tf_out.make(
+      /*sizes=*/{1, 2},
+      /*data=*/
+      {(1.0 * 5 + 1.5 * 3 + 2.0 * 1 + -1.0 * -2) * 0.2,
+       (1.0 * 4 + 1.5 * 2 + 2.0 * 1 + -1.0 * 7) * 0.4});
+
+  RuntimeContext ctx{};
+
+  quantized_mixed_linear_4bit_out(
+      ctx, input, weight, weight_scales, opt_weight_zp, opt_dtype_out, out);
+
+  EXPECT_TENSOR_CLOSE(out, expected);
+}
+
+TEST_F(OpQuantizedMixedDtypeLinear4bTest, FloatInputFloatOutput) {
+  test_dtype<ScalarType::Float, ScalarType::Float>();
+}
+
+template <ScalarType DTYPE, ScalarType DTYPE_OUT>
+void test_dtype_partials() {
+  TensorFactory<DTYPE> tf;
+  TensorFactory<ScalarType::Byte> tf_byte;
+  TensorFactory<DTYPE_OUT> tf_out;
+
+  Tensor input = tf.make(
+      /*sizes=*/{1, 4},
+      /*data=*/{1.0, 1.5, 2.0, -1.0});
+  Tensor weight = tf_byte.make(/*sizes=*/{2, 2}, /*data=*/kPackedWeight);
+  Tensor weight_scales = tf.make(
+      /*sizes=*/{2, 2},
+      /*data=*/{0.2, 1, 0.4, 0.5});
+  const optional<Tensor> opt_weight_zp{};
+  const optional<ScalarType> opt_dtype_out{};
+
+  Tensor out = tf_out.zeros({1, 2});
+
+  Tensor expected = tf_out.make(
+      /*sizes=*/{1, 2},
+      /*data=*/
+      {(1.0 * 5 + 1.5 * 3) * 0.2 + (2.0 * 1 + -1.0 * -2) * 1,
+       (1.0 * 4 + 1.5 * 2) * 0.4 + (2.0 * 1 + -1.0 * 7) * 0.5});
+
+  RuntimeContext ctx{};
+
+  quantized_mixed_linear_4bit_out(
+      ctx, input, weight, weight_scales, opt_weight_zp, opt_dtype_out, out);
+
+  EXPECT_TENSOR_CLOSE(out, expected);
+}
+
+TEST_F(OpQuantizedMixedDtypeLinear4bTest, FloatInputFloatOutput_Partials) {
+  test_dtype_partials<ScalarType::Float, ScalarType::Float>();
+}
+
+TEST_F(OpQuantizedMixedDtypeLinear4bTest, MismatchedWeightSizeFails) {
+  TensorFactory<ScalarType::Float> tf;
+  TensorFactory<ScalarType::Byte> tf_byte;
+
+  Tensor input = tf.ones({1, 4});
+  // Holds 2 input features per row instead of 4.
+  Tensor weight = tf_byte.make(/*sizes=*/{2, 1}, /*data=*/{0x88, 0x88});
+  Tensor weight_scales = tf.ones({2});
+  Tensor out = tf.zeros({1, 2});
+
+  RuntimeContext ctx{};
+
+  quantized_mixed_linear_4bit_out(
+      ctx, input, weight, weight_scales, {}, {}, out);
+
+  EXPECT_EQ(ctx.failure_state(), torch::executor::Error::InvalidArgument);
+}
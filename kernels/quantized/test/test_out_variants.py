@@ -65,6 +65,14 @@ class TestOutVariants(unittest.TestCase):
         out_variant = fn.to_out_variant()
         self.assertEqual(out_variant.name(), "quantized_decomposed::mixed_linear.out")
 
+    def test_mixed_linear_4bit_to_out_variant(self) -> None:
+        self.assertIsNotNone(ops.edge.quantized_decomposed.mixed_linear_4bit.out)
+        fn = ops.edge.quantized_decomposed.mixed_linear_4bit.default
+        out_variant = fn.to_out_variant()
+        self.assertEqual(
+            out_variant.name(), "quantized_decomposed::mixed_linear_4bit.out"
+        )
+
     def test_mixed_mm_to_out_variant(self) -> None:
         self.assertIsNotNone(ops.edge.quantized_decomposed.mixed_mm.out)
         fn = ops.edge.quantized_decomposed.mixed_mm.default
@@ -11,6 +11,7 @@ from enum import Enum
 
 from typing import Dict, List, Tuple
 
+import numpy as np
 from prettytable import PrettyTable
 
 # This version number should match the one defined in profiler.h
@@ -31,6 +32,61 @@ ALLOCATION_STRUCT_FMT = "2I0Q"
 CHAIN_IDX_NO_CHAIN = -1
 
 
+def _struct_dtype(fmt: str, names: List[str], formats: List[str]) -> np.dtype:
+    """
+    Builds a numpy structured dtype matching the native layout of the given struct
+    format, so that arrays of structs can be viewed directly with np.frombuffer.
+    """
+    offsets = []
+    offset = 0
+    for field_format in formats:
+        field_dtype = np.dtype(field_format)
+        offset += -offset % field_dtype.alignment
+        offsets.append(offset)
+        offset += field_dtype.itemsize
+    dtype = np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": struct.calcsize(fmt),
+        }
+    )
+    assert offset <= dtype.itemsize, f"Layout mismatch for struct format {fmt}"
+    return dtype
+
+
+PROF_HEADER_DTYPE = _struct_dtype(
+    PROF_HEADER_STRUCT_FMT,
+    [
+        "name",
+        "prof_ver",
+        "max_prof_entries",
+        "prof_entries",
+        "max_allocator_entries",
+        "allocator_entries",
+        "max_mem_prof_entries",
+        "mem_prof_entries",
+    ],
+    ["S32"] + ["=u4"] * 7,
+)
+PROF_RESULT_DTYPE = _struct_dtype(
+    PROF_RESULT_STRUCT_FMT,
+    ["name", "chain_idx", "instruction_idx", "start_time", "end_time"],
+    ["S32", "=i4", "=u4", "=u8", "=u8"],
+)
+ALLOCATOR_DTYPE = _struct_dtype(
+    ALLOCATOR_STRUCT_FMT, ["name", "allocator_id"], ["S32", "=u8"]
+)
+ALLOCATION_DTYPE = _struct_dtype(
+    ALLOCATION_STRUCT_FMT, ["allocator_id", "allocation_size"], ["=u4", "=u4"]
+)
+
+# Profiling data of one iteration of a block: (perf events, memory allocations)
+# as structured arrays of PROF_RESULT_DTYPE and ALLOCATION_DTYPE.
+_RecordBlock = Tuple[np.ndarray, np.ndarray]
+
+
 class TimeScale(Enum):
     TIME_IN_NS = 0
     TIME_IN_US = 1
@@ -106,14 +162,16 @@ class MemEvent:
     total_allocations_done: int
 
 
+_TIME_DIV_FACTOR = {
+    TimeScale.CPU_CYCLES: 1,
+    TimeScale.TIME_IN_MS: 1,
+    TimeScale.TIME_IN_US: 1000,
+    TimeScale.TIME_IN_NS: 1000000,
+}
+
+
 def adjust_time_scale(event: ProfileData, time_scale: TimeScale):
-    time_div_factor = {
-        TimeScale.CPU_CYCLES: 1,
-        TimeScale.TIME_IN_MS: 1,
-        TimeScale.TIME_IN_US: 1000,
-        TimeScale.TIME_IN_NS: 1000000,
-    }
-    div_factor = time_div_factor[time_scale]
+    div_factor = _TIME_DIV_FACTOR[time_scale]
     if div_factor != 1:
         duration = round((event.end_time - event.start_time) / div_factor, 4)
         start_time = round((event.start_time) / div_factor, 4)
@@ -123,203 +181,252 @@ def adjust_time_scale(event: ProfileData, time_scale: TimeScale):
     return start_time, duration
 
 
-def parse_prof_blocks(
-    prof_blocks: Dict[str, List[Tuple[List[ProfileData], List[MemAllocation]]]],
-    allocator_dict: Dict[int, str],
-    time_scale: TimeScale,
-) -> Tuple[Dict[str, List[ProfileEvent]], Dict[str, List[MemEvent]]]:
-
-    prof_data = OrderedDict()
-    mem_prof_data = OrderedDict()
-
-    # Iterate through all the profiling blocks data that have been grouped by name.
-    for name, data_list in prof_blocks.items():
-        prof_data_list = []
-        mem_prof_data_list = []
-        # Each entry in data_list is a tuple in which the first entry is profiling data
-        # and the second entry is memory allocation data, also each entry in data_list
-        # represents one iteration of a code block.
-        for i in range(len(data_list)):
-            for idx, event in enumerate(data_list[i][0]):
-                # If the event represented by the index idx already exists in the list
-                # then just append the new time entry to the duration list present in
-                # the event object. If it doesn't exist then create a new entry and add
-                # it to the list.
-                if idx < len(prof_data_list):
-                    start_time, duration = adjust_time_scale(event, time_scale)
-                    prof_data_list[idx].ts.append(start_time)
-                    prof_data_list[idx].duration.append(duration)
-                else:
-                    start_time, duration = adjust_time_scale(event, time_scale)
-                    prof_data_list.append(
-                        ProfileEvent(
-                            event.name,
-                            [start_time],
-                            [duration],
-                            event.chain_idx,
-                            event.instruction_idx,
-                        )
-                    )
-
-            # Collect all the memory allocation events of this iteration of the code block
-            for idx, event in enumerate(data_list[i][1]):
-                if idx >= len(mem_prof_data_list):
-                    mem_prof_data_list.append(event)
-
-        # Group all the memory allocation events based on the allocator they were
-        # allocated from.
-        alloc_sum_dict = OrderedDict()
-        for alloc in mem_prof_data_list:
-            alloc_sum_dict[alloc.allocator_id] = (
-                alloc_sum_dict.get(alloc.allocator_id, 0) + alloc.allocation_size
-            )
+def _round(values: np.ndarray, ndigits: int = 4) -> np.ndarray:
+    """
+    Rounds like the builtin round(value, ndigits) applied to each value.
+
+    np.round scales the values by 10**ndigits and rounds ties to even, so it
+    differs from round() for values close to a tie. Those few values are rounded
+    with round() itself.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 10**ndigits
+    rounded = np.round(scaled) / 10**ndigits
+    near_ties = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-9 * np.maximum(
+        np.abs(scaled), 1.0
+    )
+    indices = np.flatnonzero(near_ties)
+    rounded.reshape(-1)[indices] = [
+        round(value, ndigits) for value in values.reshape(-1)[indices].tolist()
+    ]
+    return rounded
+
+
+def _adjust_time_scale_vectorized(
+    start_times: np.ndarray, end_times: np.ndarray, time_scale: TimeScale
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equivalent of adjust_time_scale applied to whole arrays of start and end times
+    """
+    start_times = start_times.astype(np.int64)
+    durations = end_times.astype(np.int64) - start_times
+    div_factor = _TIME_DIV_FACTOR[time_scale]
+    if div_factor != 1:
+        return (
+            _round(start_times / div_factor),
+            _round(durations / div_factor),
+        )
+    return start_times, durations
 
-        mem_prof_sum_list = []
-        for allocator_id, allocation_size in alloc_sum_dict.items():
-            mem_prof_sum_list.append(
-                MemEvent(allocator_dict[allocator_id], allocation_size)
-            )
-        prof_data[name] = prof_data_list
-        mem_prof_data[name] = mem_prof_sum_list
 
-    return prof_data, mem_prof_data
+def _decode_names(names: np.ndarray) -> List[str]:
+    # Names are 32 byte strings padded with 0 chars, which numpy already strips
+    return [name.decode("utf-8").replace("\u0000", "") for name in names.tolist()]
 
 
-def sanity_check_prof_outputs(
-    prof_blocks: Dict[str, List[Tuple[List[ProfileData], List[MemAllocation]]]]
-):
+def _sanity_check_record_blocks(prof_blocks: Dict[str, List[_RecordBlock]]) -> None:
     for _, prof_block_vals in prof_blocks.items():
         for i in range(len(prof_block_vals) - 1):
-            prof_data_list_base = prof_block_vals[i][0]
-            prof_data_list_cmp = prof_block_vals[i + 1][0]
+            prof_data_base, mem_prof_data_base = prof_block_vals[i]
+            prof_data_cmp, mem_prof_data_cmp = prof_block_vals[i + 1]
 
             # Profiling blocks corresponding to the same name should always be of the same
             # size as they essentially just represent one iteration of a code block that has been
             # run multiple times.
-            if len(prof_data_list_base) != len(prof_data_list_cmp):
+            if len(prof_data_base) != len(prof_data_cmp):
                 raise ValueError(
                     "Profiling blocks corresponding to the same name shouldn't be of different lengths."
                 )
 
-            for idx in range(len(prof_data_list_base)):
-                if prof_data_list_base[idx].name != prof_data_list_cmp[idx].name:
-                    raise ValueError(
-                        "Corresponding entries in different iterations of the "
-                        "profiling block do not match"
-                    )
-
-            mem_prof_data_list_base = prof_block_vals[i][1]
-            mem_prof_data_list_cmp = prof_block_vals[i + 1][1]
+            if not np.array_equal(prof_data_base["name"], prof_data_cmp["name"]):
+                raise ValueError(
+                    "Corresponding entries in different iterations of the "
+                    "profiling block do not match"
+                )
 
-            if len(mem_prof_data_list_base) != len(mem_prof_data_list_cmp):
+            if len(mem_prof_data_base) != len(mem_prof_data_cmp):
                 raise ValueError(
                     "Memory profiling blocks corresponding to the same name shouldn't be of different lengths."
                 )
 
-            for idx in range(len(mem_prof_data_list_base)):
-                if (
-                    mem_prof_data_list_base[idx].allocator_id
-                    != mem_prof_data_list_cmp[idx].allocator_id
-                ):
-                    raise ValueError(
-                        "Corresponding entries in different iterations of the memory "
-                        "profiling blocks do not have the same allocator id"
-                    )
-                if (
-                    mem_prof_data_list_base[idx].allocation_size
-                    != mem_prof_data_list_cmp[idx].allocation_size
-                ):
-                    raise ValueError(
-                        "Corresponding entries in different iterations of the memory "
-                        "profiling blocks do not have the same allocation size."
-                    )
+            if not np.array_equal(
+                mem_prof_data_base["allocator_id"], mem_prof_data_cmp["allocator_id"]
+            ):
+                raise ValueError(
+                    "Corresponding entries in different iterations of the memory "
+                    "profiling blocks do not have the same allocator id"
+                )
+            if not np.array_equal(
+                mem_prof_data_base["allocation_size"],
+                mem_prof_data_cmp["allocation_size"],
+            ):
+                raise ValueError(
+                    "Corresponding entries in different iterations of the memory "
+                    "profiling blocks do not have the same allocation size."
+                )
+
+
+def _parse_record_blocks(
+    prof_blocks: Dict[str, List[_RecordBlock]],
+    allocator_dict: Dict[int, str],
+    time_scale: TimeScale,
+) -> Tuple[Dict[str, List[ProfileEvent]], Dict[str, List[MemEvent]]]:
+    prof_data = OrderedDict()
+    mem_prof_data = OrderedDict()
+
+    # Iterate through all the profiling blocks data that have been grouped by name.
+    for name, data_list in prof_blocks.items():
+        # Each entry in data_list represents one iteration of a code block. Stacking them
+        # gives (iterations x entries) arrays, so that each column holds all the iterations
+        # of one event.
+        records = np.stack([prof_records for prof_records, _ in data_list])
+        start_times, durations = _adjust_time_scale_vectorized(
+            records["start_time"], records["end_time"], time_scale
+        )
+        first_iteration = records[0]
+        prof_data[name] = [
+            ProfileEvent(event_name, ts, duration, chain_idx, instruction_idx)
+            for event_name, ts, duration, chain_idx, instruction_idx in zip(
+                _decode_names(first_iteration["name"]),
+                start_times.T.tolist(),
+                durations.T.tolist(),
+                first_iteration["chain_idx"].tolist(),
+                first_iteration["instruction_idx"].tolist(),
+            )
+        ]
+
+        # The memory allocations are identical across iterations, so only the first
+        # one is aggregated. Group the allocations by allocator id, keeping the order
+        # in which the allocators first appear.
+        mem_records = data_list[0][1]
+        allocator_ids, first_index, inverse = np.unique(
+            mem_records["allocator_id"], return_index=True, return_inverse=True
+        )
+        allocation_sums = np.bincount(
+            inverse, weights=mem_records["allocation_size"], minlength=len(allocator_ids)
+        )
+        mem_prof_data[name] = [
+            MemEvent(allocator_dict[int(allocator_ids[i])], int(allocation_sums[i]))
+            for i in np.argsort(first_index, kind="stable").tolist()
+        ]
+
+    return prof_data, mem_prof_data
+
+
+def _to_record_block(
+    prof_data: List[ProfileData], mem_prof_data: List[MemAllocation]
+) -> _RecordBlock:
+    prof_records = np.array(
+        [
+            (
+                event.name.encode("utf-8"),
+                event.chain_idx,
+                event.instruction_idx,
+                event.start_time,
+                event.end_time,
+            )
+            for event in prof_data
+        ],
+        dtype=PROF_RESULT_DTYPE,
+    )
+    mem_records = np.array(
+        [(alloc.allocator_id, alloc.allocation_size) for alloc in mem_prof_data],
+        dtype=ALLOCATION_DTYPE,
+    )
+    return prof_records, mem_records
+
+
+def parse_prof_blocks(
+    prof_blocks: Dict[str, List[Tuple[List[ProfileData], List[MemAllocation]]]],
+    allocator_dict: Dict[int, str],
+    time_scale: TimeScale,
+) -> Tuple[Dict[str, List[ProfileEvent]], Dict[str, List[MemEvent]]]:
+    return _parse_record_blocks(
+        {
+            name: [_to_record_block(*data) for data in data_list]
+            for name, data_list in prof_blocks.items()
+        },
+        allocator_dict,
+        time_scale,
+    )
+
+
+def sanity_check_prof_outputs(
+    prof_blocks: Dict[str, List[Tuple[List[ProfileData], List[MemAllocation]]]]
+):
+    _sanity_check_record_blocks(
+        {
+            name: [_to_record_block(*data) for data in data_list]
+            for name, data_list in prof_blocks.items()
+        }
+    )
 
 
 def deserialize_profile_results(
     buff: bytes, time_scale: TimeScale = TimeScale.TIME_IN_NS
 ) -> Tuple[Dict[str, List[ProfileEvent]], Dict[str, List[MemEvent]]]:
 
-    prof_header_struct_size = struct.calcsize(PROF_HEADER_STRUCT_FMT)
-    prof_allocator_struct_size = struct.calcsize(ALLOCATOR_STRUCT_FMT)
-    prof_allocation_struct_size = struct.calcsize(ALLOCATION_STRUCT_FMT)
-    prof_result_struct_size = struct.calcsize(PROF_RESULT_STRUCT_FMT)
-    prof_blocks = OrderedDict()
+    prof_blocks: Dict[str, List[_RecordBlock]] = OrderedDict()
     allocator_dict = {}
     base_offset = 0
 
     while base_offset < len(buff):
         # Unpack the header for this profiling block from which we can figure
         # out how many profiling entries are present in this block.
-        prof_header_args = list(
-            struct.unpack_from(PROF_HEADER_STRUCT_FMT, buff, offset=base_offset)
-        )
-        # decode name in profiler header
-        prof_header_args[0] = prof_header_args[0].decode("utf-8").replace("\u0000", "")
-        prof_header = ProfilerHeader(*prof_header_args)
-        base_offset += prof_header_struct_size
+        prof_header = np.frombuffer(
+            buff, dtype=PROF_HEADER_DTYPE, count=1, offset=base_offset
+        )[0]
+        base_offset += PROF_HEADER_DTYPE.itemsize
 
-        assert prof_header.prof_ver == ET_PROF_VER, (
+        assert prof_header["prof_ver"] == ET_PROF_VER, (
             "Mismatch in version between profile dump" "and post-processing tool"
         )
-        # Get all the profiling (perf events) entries
-        prof_data = []
-        for i in range(prof_header.prof_entries):
-            name_bytes, type, id, start_time, end_time = struct.unpack_from(
-                PROF_RESULT_STRUCT_FMT,
-                buff,
-                offset=base_offset + i * prof_result_struct_size,
-            )
-            prof_data.append(
-                ProfileData(
-                    # name_bytes is 32 bytes string, where if the real log event is less
-                    # than 32 characters it'll be filled with 0 chars => trimming it
-                    name_bytes.decode("utf-8").replace("\u0000", ""),
-                    type,
-                    id,
-                    start_time,
-                    end_time,
-                )
-            )
+        # Get all the profiling (perf events) entries. These are views into buff.
+        prof_data = np.frombuffer(
+            buff,
+            dtype=PROF_RESULT_DTYPE,
+            count=int(prof_header["prof_entries"]),
+            offset=base_offset,
+        )
 
         # Move forward in the profiling block to start parsing memory allocation events.
-        base_offset += prof_result_struct_size * prof_header.max_prof_entries
+        base_offset += PROF_RESULT_DTYPE.itemsize * int(prof_header["max_prof_entries"])
 
         # Parse the allocator entries table, this table maps the allocator id to the
         # string containing the name designated to this allocator.
-        for i in range(0, prof_header.allocator_entries):
-            allocator_name, allocator_id = struct.unpack_from(
-                ALLOCATOR_STRUCT_FMT,
-                buff,
-                offset=base_offset + i * prof_allocator_struct_size,
-            )
-            allocator_dict[allocator_id] = allocator_name.decode("utf-8").replace(
-                "\u0000", ""
-            )
+        allocators = np.frombuffer(
+            buff,
+            dtype=ALLOCATOR_DTYPE,
+            count=int(prof_header["allocator_entries"]),
+            offset=base_offset,
+        )
+        allocator_dict.update(
+            zip(allocators["allocator_id"].tolist(), _decode_names(allocators["name"]))
+        )
 
-        base_offset += prof_allocator_struct_size * prof_header.max_allocator_entries
+        base_offset += ALLOCATOR_DTYPE.itemsize * int(
+            prof_header["max_allocator_entries"]
+        )
 
         # Get all the profiling (memory allocation events) entries
-        mem_prof_data = []
-        for i in range(0, prof_header.mem_prof_entries):
-            mem_prof_entry = list(
-                struct.unpack_from(
-                    ALLOCATION_STRUCT_FMT,
-                    buff,
-                    offset=base_offset + i * prof_allocation_struct_size,
-                )
-            )
-            mem_prof_data.append(MemAllocation(*mem_prof_entry))
+        mem_prof_data = np.frombuffer(
+            buff,
+            dtype=ALLOCATION_DTYPE,
+            count=int(prof_header["mem_prof_entries"]),
+            offset=base_offset,
+        )
 
-        base_offset += prof_allocation_struct_size * prof_header.max_mem_prof_entries
+        base_offset += ALLOCATION_DTYPE.itemsize * int(
+            prof_header["max_mem_prof_entries"]
+        )
 
         # Get the name of this profiling block and append the profiling data and memory
         # allocation data we just parsed to the list that maps to this block name.
-        prof_blocks[prof_header.name] = prof_blocks.get(prof_header.name, []) + [
-            (prof_data, mem_prof_data)
-        ]
+        block_name = prof_header["name"].decode("utf-8").replace("\u0000", "")
+        prof_blocks.setdefault(block_name, []).append((prof_data, mem_prof_data))
 
-    sanity_check_prof_outputs(prof_blocks)
-    return parse_prof_blocks(prof_blocks, allocator_dict, time_scale)
+    _sanity_check_record_blocks(prof_blocks)
+    return _parse_record_blocks(prof_blocks, allocator_dict, time_scale)
 
 
 def profile_table(
@@ -340,7 +447,7 @@ def profile_table(
                     entry.instruction_idx,
                     None,
                 )
-                + tuple(val for val in entry.duration)
+                + tuple(entry.duration)
                 for entry in prof_entries_list
             ]
         )
@@ -376,31 +483,43 @@ def profile_aggregate_framework_tax(
 
     for name, prof_data_list in prof_data.items():
         execute_max = []
-        kernel_and_delegate_sum = []
+        kernel_and_delegate_durations = []
 
         for d in prof_data_list:
             if "Method::execute" in d.name:
                 execute_max = max(execute_max, d.duration)
 
             if "native_call" in d.name or "delegate_execute" in d.name:
-                for idx in range(len(d.duration)):
-                    if idx < len(kernel_and_delegate_sum):
-                        kernel_and_delegate_sum[idx] += d.duration[idx]
-                    else:
-                        kernel_and_delegate_sum.append(d.duration[idx])
+                kernel_and_delegate_durations.append(d.duration)
 
-        if len(execute_max) == 0 or len(kernel_and_delegate_sum) == 0:
+        if len(execute_max) == 0 or len(kernel_and_delegate_durations) == 0:
             continue
 
-        framework_tax_list = [
-            round((execute_time - kernel_delegate_call) / execute_time, 4) * 100
-            for execute_time, kernel_delegate_call in zip(
-                execute_max, kernel_and_delegate_sum
+        # Sum the kernel and delegate durations of each iteration
+        num_iterations = max(len(d) for d in kernel_and_delegate_durations)
+        kernel_and_delegate = np.zeros(
+            (len(kernel_and_delegate_durations), num_iterations),
+            # Cycle counts are integers and should stay integers
+            dtype=np.result_type(*(np.asarray(d) for d in kernel_and_delegate_durations)),
+        )
+        for idx, durations in enumerate(kernel_and_delegate_durations):
+            kernel_and_delegate[idx, : len(durations)] = durations
+        kernel_and_delegate_sum = kernel_and_delegate.sum(axis=0)
+
+        num_compared = min(len(execute_max), num_iterations)
+        execute_times = np.asarray(execute_max[:num_compared], dtype=np.float64)
+        framework_tax = (
+            _round(
+                (execute_times - kernel_and_delegate_sum[:num_compared])
+                / execute_times
             )
-        ]
+            * 100
+        )
 
         prof_framework_tax[name] = ProfileEventFrameworkTax(
-            execute_max, kernel_and_delegate_sum, framework_tax_list
+            execute_max,
+            kernel_and_delegate_sum.tolist(),
+            framework_tax.tolist(),
         )
 
     return prof_framework_tax
@@ -0,0 +1,113 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+import struct
+import unittest
+
+from executorch.profiler.parse_profiler_results import (
+    _round,
+    ALLOCATION_STRUCT_FMT,
+    ALLOCATOR_STRUCT_FMT,
+    deserialize_profile_results,
+    ET_PROF_VER,
+    MemEvent,
+    profile_aggregate_framework_tax,
+    PROF_HEADER_STRUCT_FMT,
+    PROF_RESULT_STRUCT_FMT,
+    TimeScale,
+)
+
+MAX_PROF_ENTRIES = 4
+MAX_ALLOCATOR_ENTRIES = 2
+MAX_MEM_PROF_ENTRIES = 3
+
+
+def _gen_prof_block(name, events, allocators, allocations) -> bytes:
+    """
+    Serializes one profiling block the same way the runtime lays it out in memory
+    """
+    buff = struct.pack(
+        PROF_HEADER_STRUCT_FMT,
+        name.encode("utf-8"),
+        ET_PROF_VER,
+        MAX_PROF_ENTRIES,
+        len(events),
+        MAX_ALLOCATOR_ENTRIES,
+        len(allocators),
+        MAX_MEM_PROF_ENTRIES,
+        len(allocations),
+    )
+    for entries, fmt, max_entries in (
+        (events, PROF_RESULT_STRUCT_FMT, MAX_PROF_ENTRIES),
+        (allocators, ALLOCATOR_STRUCT_FMT, MAX_ALLOCATOR_ENTRIES),
+        (allocations, ALLOCATION_STRUCT_FMT, MAX_MEM_PROF_ENTRIES),
+    ):
+        for entry in entries:
+            buff += struct.pack(fmt, *entry)
+        buff += bytes(struct.calcsize(fmt) * (max_entries - len(entries)))
+    return buff
+
+
+class TestParseProfilerResults(unittest.TestCase):
+    def setUp(self) -> None:
+        allocators = [(b"allocator_0", 0), (b"allocator_1", 1)]
+        allocations = [(1, 16), (0, 8), (1, 32)]
+        self.buff = b"".join(
+            _gen_prof_block(
+                "block",
+                [
+                    (b"Method::execute", -1, 0, offset, offset + 10000000),
+                    (b"native_call_add.out", -1, 1, offset + 1000000, offset + 3000000),
+                    (b"native_call_mul.out", 0, 2, offset + 4000000, offset + 9000000),
+                ],
+                allocators,
+                allocations,
+            )
+            for offset in (0, 20000000)
+        )
+
+    def test_deserialize_profile_results(self) -> None:
+        prof_data, mem_allocations = deserialize_profile_results(
+            self.buff, TimeScale.TIME_IN_NS
+        )
+
+        events = prof_data["block"]
+        self.assertEqual(
+            [event.name for event in events],
+            ["Method::execute", "native_call_add.out", "native_call_mul.out"],
+        )
+        self.assertEqual(events[0].duration, [10.0, 10.0])
+        self.assertEqual(events[1].ts, [1.0, 21.0])
+        self.assertEqual(events[2].chain_idx, 0)
+        self.assertEqual(events[2].instruction_idx, 2)
+        self.assertEqual(
+            mem_allocations["block"],
+            [MemEvent("allocator_1", 48), MemEvent("allocator_0", 8)],
+        )
+
+    def test_deserialize_profile_results_cycles(self) -> None:
+        prof_data, _ = deserialize_profile_results(self.buff, TimeScale.CPU_CYCLES)
+
+        self.assertEqual(prof_data["block"][1].duration, [2000000, 2000000])
+        self.assertEqual(prof_data["block"][1].ts, [1000000, 21000000])
+
+    def test_profile_aggregate_framework_tax(self) -> None:
+        prof_data, _ = deserialize_profile_results(self.buff, TimeScale.TIME_IN_NS)
+
+        framework_tax = profile_aggregate_framework_tax(prof_data)["block"]
+        self.assertEqual(framework_tax.exec_time, [10.0, 10.0])
+        self.assertEqual(framework_tax.kernel_and_delegate_time, [7.0, 7.0])
+        self.assertEqual(framework_tax.framework_tax, [30.0, 30.0])
+
+    def test_round_matches_builtin_round(self) -> None:
+        random.seed(0)
+        # Nanoseconds converted to milliseconds, many of them ties at the 4th
+        # decimal, and arbitrary ratios.
+        values = [n / 1000000 for n in range(0, 2000000, 50)] + [
+            random.random() for _ in range(10000)
+        ]
+        self.assertEqual(_round(values).tolist(), [round(v, 4) for v in values])
@@ -1167,6 +1167,22 @@ Error Method::execute_instruction() {
           static_cast<uint8_t>(instruction->instr_args_type()));
       err = Error::InvalidProgram;
   }
+#ifdef ET_EVENT_TRACER_ENABLED
+  // The last argument of a kernel call is the value it returns, which is its
+  // output tensor, or the list of its output tensors. Log it outside of the
+  // OPERATOR_CALL scope, so that the operator's timing excludes the logging.
+  if (err == Error::Ok &&
+      instruction->instr_args_type() ==
+          executorch_flatbuffer::InstructionArguments::KernelCall) {
+    auto args = chain.argument_lists_[step_state_.instr_idx];
+    if (args.size() > 0) {
+      EValue* output = args[args.size() - 1];
+      if (output->isTensor() || output->isTensorList()) {
+        internal::event_tracer_log_evalue(event_tracer_, *output);
+      }
+    }
+  }
+#endif
   // Reset the temp allocator for every instruction.
   if (memory_manager_->temp_allocator() != nullptr) {
     memory_manager_->temp_allocator()->reset();
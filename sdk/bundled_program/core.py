@@ -17,6 +17,7 @@ import torch.fx
 
 from executorch.exir import ExecutorchProgram, ExecutorchProgramManager
 from executorch.exir._serialize import _serialize_pte_binary
+from executorch.exir._serialize._cord import Cord
 from executorch.exir.tensor import get_scalar_type, scalar_type_enum, TensorSpec
 from executorch.sdk.bundled_program.config import ConfigValue, MethodTestSuite
 
@@ -72,7 +73,6 @@ class BundledProgram:
         if self._bundled_program_in_schema is not None:
             return self._bundled_program_in_schema
 
-        program = self._extract_program(self.executorch_program)
         bundled_method_test_suites: List[bp_schema.BundledMethodTestSuite] = []
 
         # Emit data and metadata of bundled tensor
@@ -123,7 +123,8 @@ class BundledProgram:
             )
 
         # TODO(T181463742): avoid calling bytes(..) which may incur large copies.
-        program_bytes: bytes = bytes(_serialize_pte_binary(program))
+        # serialize.write_bundled_program_to_file() writes the program without it.
+        program_bytes: bytes = bytes(self.serialize_program())
         self._bundled_program_in_schema = bp_schema.BundledProgram(
             version=BUNDLED_PROGRAM_SCHEMA_VERSION,
             method_test_suites=bundled_method_test_suites,
@@ -131,6 +132,10 @@ class BundledProgram:
         )
         return self._bundled_program_in_schema
 
+    def serialize_program(self) -> Cord:
+        """Serialize the bundled ExecuTorch program, without copying its data into a single buffer."""
+        return _serialize_pte_binary(self._extract_program(self.executorch_program))
+
     def _emit_bundled_tensor(
         self, spec: TensorSpec, bundled_values: List[bp_schema.Value]
     ) -> None:
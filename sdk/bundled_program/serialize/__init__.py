@@ -8,9 +8,11 @@
 
 # TODO(T138924864): Refactor to unify the serialization for bundled program and executorch program.
 
+import io
 import json
 import os
 import tempfile
+from typing import Union
 
 import executorch.sdk.bundled_program.schema as bp_schema
 
@@ -20,6 +22,7 @@ import pkg_resources
 from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
 from executorch.exir._serialize._flatbuffer import _flatc_compile, _flatc_decompile
 from executorch.sdk.bundled_program.core import BundledProgram
+from executorch.sdk.bundled_program.serialize._writer import write_bundled_program
 
 # The prefix of schema files used for bundled program
 BUNDLED_PROGRAM_SCHEMA_NAME = "bundled_program_schema"
@@ -92,11 +95,32 @@ def serialize_from_bundled_program_to_flatbuffer(
         The serialized FlatBuffer binary data in bytes.
     """
 
-    bundled_program_in_schema = bundled_program.serialize_to_schema()
+    buffer = io.BytesIO()
+    write_bundled_program(bundled_program, buffer)
+    return buffer.getvalue()
 
-    return convert_to_flatbuffer(
-        serialize_from_bundled_program_to_json(bundled_program_in_schema)
-    )
+
+def write_bundled_program_to_file(
+    bundled_program: BundledProgram,
+    outfile: Union[str, io.BufferedIOBase],
+) -> None:
+    """
+    Serialize a BundledProgram into FlatBuffer binary format, straight to a file.
+
+    Unlike `serialize_from_bundled_program_to_flatbuffer`, the serialized data is
+    never held in memory as a whole: the program and test tensor data are written
+    directly from the program Cord and the tensor storages. Test tensors with
+    identical data are only written once.
+
+    Args:
+        bundled_program (BundledProgram): The `BundledProgram` variable to be serialized.
+        outfile: Path or binary file object to write to.
+    """
+    if isinstance(outfile, str):
+        with open(outfile, "wb") as f:
+            write_bundled_program(bundled_program, f)
+    else:
+        write_bundled_program(bundled_program, outfile)
 
 
 # From flatbuffer to bundled program in schema.
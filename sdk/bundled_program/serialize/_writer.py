@@ -0,0 +1,308 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Writes a BundledProgram as a flatbuffer straight to a file, without going
+through the schema dataclasses, JSON and flatc.
+
+The flatbuffer is laid out front to back: first the tables, vectors and
+strings describing the test suites, then the large byte vectors (test tensor
+data and the program). The large vectors are written from the program Cord and
+from the storages of the test tensors, so they are never copied, and test
+tensors with identical data share a single data vector.
+
+Field indices and alignments must match bundled_program_schema.fbs.
+"""
+
+import ctypes
+import hashlib
+import io
+import struct
+import typing
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import torch
+
+from executorch.exir._serialize._cord import Cord
+from executorch.exir.tensor import scalar_type_enum, TensorSpec
+from executorch.sdk.bundled_program.config import ConfigValue
+from executorch.sdk.bundled_program.core import BundledProgram
+from executorch.sdk.bundled_program.version import BUNDLED_PROGRAM_SCHEMA_VERSION
+
+_FILE_IDENTIFIER = b"BP08"
+
+# Alignments of the data of the `(force_align: N)` byte vectors of the schema.
+_TENSOR_DATA_ALIGNMENT = 16
+_PROGRAM_ALIGNMENT = 32
+
+# Members of the ValueUnion union, 0 being NONE.
+_VALUE_TYPE_TENSOR = 1
+_VALUE_TYPE_INT = 2
+_VALUE_TYPE_BOOL = 3
+_VALUE_TYPE_DOUBLE = 4
+
+# Formats of the scalar fields of tables, and of offset fields.
+_U8 = "<B"
+_I8 = "<b"
+_U32 = "<I"
+_I64 = "<q"
+_F64 = "<d"
+_OFFSET = "<I"
+
+_Blob = Union[memoryview, Cord]
+
+
+def _align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+@dataclass
+class _PendingBlob:
+    data: _Blob
+    alignment: int
+    # Positions of the offset fields referencing this blob.
+    references: List[int]
+    # The object owning the memory `data` views, kept alive until `data` is
+    # written out.
+    owner: Optional[object] = None
+
+
+class _FlatbufferWriter:
+    """
+    Lays out a flatbuffer front to back. Every table is written before the
+    tables, vectors and strings it references, which is what lets offsets be
+    patched in once the referenced object is placed, since flatbuffer offsets
+    must point forward.
+    """
+
+    def __init__(self, file_identifier: bytes) -> None:
+        self.buf = bytearray(struct.pack(_U32, 0) + file_identifier)
+        self._blobs: List[_PendingBlob] = []
+        self._blob_by_key: Dict[bytes, _PendingBlob] = {}
+
+    def _pad(self, alignment: int) -> None:
+        self.buf.extend(bytes(_align(len(self.buf), alignment) - len(self.buf)))
+
+    def patch(self, field: int, target: int) -> None:
+        """Points the offset field at `field` to the object at `target`."""
+        assert target > field, "flatbuffer offsets must point forward"
+        struct.pack_into(_OFFSET, self.buf, field, target - field)
+
+    def set_root(self, table: int) -> None:
+        self.patch(0, table)
+
+    def table(
+        self, fields: Dict[int, Tuple[str, object]]
+    ) -> Tuple[int, Dict[int, int]]:
+        """
+        Writes a table with the given {field index: (struct format, value)}
+        fields. Offset fields are given a None value and are patched later.
+
+        Returns the position of the table and of each of its fields.
+        """
+        # Place fields by decreasing size so that they are naturally aligned
+        # once the table itself is 8 byte aligned.
+        layout: Dict[int, int] = {}
+        size = 4
+        for index, (fmt, _) in sorted(
+            fields.items(), key=lambda item: -struct.calcsize(item[1][0])
+        ):
+            field_size = struct.calcsize(fmt)
+            size = _align(size, field_size)
+            layout[index] = size
+            size += field_size
+
+        num_entries = max(fields) + 1 if fields else 0
+        self._pad(4)
+        vtable = len(self.buf)
+        self.buf.extend(struct.pack("<HH", 4 + 2 * num_entries, size))
+        for index in range(num_entries):
+            self.buf.extend(struct.pack("<H", layout.get(index, 0)))
+
+        self._pad(8)
+        table = len(self.buf)
+        self.buf.extend(bytes(size))
+        struct.pack_into("<i", self.buf, table, table - vtable)
+        positions = {}
+        for index, (fmt, value) in fields.items():
+            positions[index] = table + layout[index]
+            if value is not None:
+                struct.pack_into(fmt, self.buf, positions[index], value)
+        return table, positions
+
+    def string(self, value: str) -> int:
+        encoded = value.encode("utf-8")
+        self._pad(4)
+        pos = len(self.buf)
+        self.buf.extend(struct.pack(_U32, len(encoded)) + encoded + b"\0")
+        return pos
+
+    def scalar_vector(self, fmt: str, values: Sequence[int]) -> int:
+        self._pad(4)
+        pos = len(self.buf)
+        self.buf.extend(struct.pack(f"<I{len(values)}{fmt}", len(values), *values))
+        return pos
+
+    def offset_vector(self, length: int) -> Tuple[int, List[int]]:
+        """Writes a vector of `length` offsets, to patch later."""
+        self._pad(4)
+        pos = len(self.buf)
+        self.buf.extend(struct.pack(_U32, length) + bytes(4 * length))
+        return pos, [pos + 4 + 4 * i for i in range(length)]
+
+    def blob(
+        self,
+        field: int,
+        data: _Blob,
+        alignment: int,
+        key: bytes = b"",
+        owner: Optional[object] = None,
+    ) -> None:
+        """
+        Makes the offset field at `field` reference a byte vector holding
+        `data`, written after all other objects. Blobs with the same non-empty
+        `key` are only written once. If `data` views memory it does not own,
+        `owner` must be the object owning that memory.
+        """
+        if key and key in self._blob_by_key:
+            self._blob_by_key[key].references.append(field)
+            return
+        pending = _PendingBlob(data, alignment, [field], owner)
+        self._blobs.append(pending)
+        if key:
+            self._blob_by_key[key] = pending
+
+    def write_to_file(self, outfile: io.BufferedIOBase) -> None:
+        # Place the blobs, so that the offsets to them can be patched in before
+        # writing out the rest of the buffer.
+        positions = []
+        pos = len(self.buf)
+        for pending in self._blobs:
+            # The data, which follows the length, must be aligned.
+            pos = _align(pos + 4, pending.alignment) - 4
+            positions.append(pos)
+            for field in pending.references:
+                self.patch(field, pos)
+            pos += 4 + len(pending.data)
+
+        outfile.write(self.buf)
+        written = len(self.buf)
+        for pending, pos in zip(self._blobs, positions):
+            outfile.write(bytes(pos - written))
+            outfile.write(struct.pack(_U32, len(pending.data)))
+            if isinstance(pending.data, Cord):
+                pending.data.write_to_file(outfile)
+            else:
+                outfile.write(pending.data)
+            written = pos + 4 + len(pending.data)
+
+
+def _tensor_data(spec: TensorSpec) -> memoryview:
+    """
+    Returns a view of the storage of a test tensor, without copying it. The
+    view does not keep the storage alive: for non-contiguous and view tensors,
+    the storage is that of a copy only referenced by `spec`.
+    """
+    if spec.allocated_memory == 0:
+        return memoryview(b"")
+    storage = typing.cast(torch.UntypedStorage, spec.storage)
+    return memoryview(
+        (ctypes.c_char * storage.nbytes()).from_address(storage.data_ptr())
+    ).cast("B")
+
+
+def _write_value(
+    writer: _FlatbufferWriter, field: int, value: Union[ConfigValue, torch.Tensor]
+) -> None:
+    """Writes a Value table referenced by the offset field at `field`."""
+    if type(value) is torch.Tensor:
+        value_type = _VALUE_TYPE_TENSOR
+    elif type(value) is int:
+        value_type = _VALUE_TYPE_INT
+    elif type(value) is bool:
+        value_type = _VALUE_TYPE_BOOL
+    elif type(value) is float:
+        value_type = _VALUE_TYPE_DOUBLE
+    else:
+        assert 0, "Unsupported primitive type received."
+
+    # The ValueUnion field is stored as a type field followed by an offset
+    # field to the member table.
+    table, fields = writer.table({0: (_U8, value_type), 1: (_OFFSET, None)})
+    writer.patch(field, table)
+
+    if value_type == _VALUE_TYPE_TENSOR:
+        spec = TensorSpec.from_tensor(typing.cast(torch.Tensor, value), const=True)
+        member, tensor_fields = writer.table(
+            {
+                0: (_I8, scalar_type_enum(spec.dtype)),
+                1: (_OFFSET, None),
+                2: (_OFFSET, None),
+                3: (_OFFSET, None),
+            }
+        )
+        writer.patch(tensor_fields[1], writer.scalar_vector("i", spec.shape))
+        writer.patch(tensor_fields[3], writer.scalar_vector("B", spec.dim_order))
+        data = _tensor_data(spec)
+        writer.blob(
+            tensor_fields[2],
+            data,
+            _TENSOR_DATA_ALIGNMENT,
+            key=hashlib.sha256(data).digest() + struct.pack("<Q", len(data)),
+            owner=spec.storage,
+        )
+    elif value_type == _VALUE_TYPE_INT:
+        member, _ = writer.table({0: (_I64, value)})
+    elif value_type == _VALUE_TYPE_BOOL:
+        member, _ = writer.table({0: (_U8, value)})
+    else:
+        member, _ = writer.table({0: (_F64, value)})
+    writer.patch(fields[1], member)
+
+
+def write_bundled_program(
+    bundled_program: BundledProgram, outfile: io.BufferedIOBase
+) -> None:
+    """Writes `bundled_program` to `outfile` as a bundled program flatbuffer."""
+    writer = _FlatbufferWriter(_FILE_IDENTIFIER)
+    root, root_fields = writer.table(
+        {
+            0: (_U32, BUNDLED_PROGRAM_SCHEMA_VERSION),
+            1: (_OFFSET, None),
+            2: (_OFFSET, None),
+        }
+    )
+    writer.set_root(root)
+
+    suites = bundled_program.method_test_suites
+    suites_vector, suite_offsets = writer.offset_vector(len(suites))
+    writer.patch(root_fields[1], suites_vector)
+    for suite, suite_offset in zip(suites, suite_offsets):
+        suite_table, suite_fields = writer.table(
+            {0: (_OFFSET, None), 1: (_OFFSET, None)}
+        )
+        writer.patch(suite_offset, suite_table)
+        writer.patch(suite_fields[0], writer.string(suite.method_name))
+        cases_vector, case_offsets = writer.offset_vector(len(suite.test_cases))
+        writer.patch(suite_fields[1], cases_vector)
+        for test_case, case_offset in zip(suite.test_cases, case_offsets):
+            case_table, case_fields = writer.table(
+                {0: (_OFFSET, None), 1: (_OFFSET, None)}
+            )
+            writer.patch(case_offset, case_table)
+            for index, values in enumerate(
+                (test_case.inputs, test_case.expected_outputs)
+            ):
+                values_vector, value_offsets = writer.offset_vector(len(values))
+                writer.patch(case_fields[index], values_vector)
+                for value, value_offset in zip(values, value_offsets):
+                    _write_value(writer, value_offset, value)
+
+    writer.blob(root_fields[2], bundled_program.serialize_program(), _PROGRAM_ALIGNMENT)
+    writer.write_to_file(outfile)
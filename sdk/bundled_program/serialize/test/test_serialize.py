@@ -6,13 +6,18 @@
 
 # pyre-strict
 
+import io
 import unittest
 
+import torch
+
+from executorch.sdk.bundled_program.config import ConfigValue
 from executorch.sdk.bundled_program.core import BundledProgram
 
 from executorch.sdk.bundled_program.serialize import (
     deserialize_from_flatbuffer_to_bundled_program,
     serialize_from_bundled_program_to_flatbuffer,
+    write_bundled_program_to_file,
 )
 from executorch.sdk.bundled_program.util.test_util import get_common_executorch_program
 
@@ -33,3 +38,55 @@ class TestSerialize(unittest.TestCase):
             regenerate_bundled_program_in_schema,
             "Regenerated bundled program mismatches original one",
         )
+
+    def test_write_bundled_program_to_file(self) -> None:
+        executorch_program, method_test_suites = get_common_executorch_program()
+        # Bundle every test case twice, so that their test tensors are shared.
+        for method_test_suite in method_test_suites:
+            method_test_suite.test_cases = method_test_suite.test_cases * 2
+
+        bundled_program = BundledProgram(executorch_program, method_test_suites)
+        outfile = io.BytesIO()
+        write_bundled_program_to_file(bundled_program, outfile)
+        flat_buffer_bundled_program = outfile.getvalue()
+
+        self.assertEqual(
+            bundled_program.serialize_to_schema(),
+            deserialize_from_flatbuffer_to_bundled_program(flat_buffer_bundled_program),
+            "Regenerated bundled program mismatches original one",
+        )
+
+    def test_write_bundled_program_with_view_tensors(self) -> None:
+        executorch_program, method_test_suites = get_common_executorch_program()
+
+        def transposed(value: ConfigValue) -> ConfigValue:
+            if not isinstance(value, torch.Tensor):
+                return value
+            # Same values, in a transposed layout.
+            return value.t().contiguous().t()
+
+        def sliced(value: ConfigValue) -> ConfigValue:
+            if not isinstance(value, torch.Tensor):
+                return value
+            # Same values, in the second half of a larger storage.
+            return torch.stack([torch.zeros_like(value), value])[1]
+
+        # The writer copies such tensors, and must keep the copies alive until
+        # their data is written out.
+        for method_test_suite in method_test_suites:
+            for i, test_case in enumerate(method_test_suite.test_cases):
+                make_view = transposed if i % 2 == 0 else sliced
+                test_case.inputs = [make_view(v) for v in test_case.inputs]
+                test_case.expected_outputs = [
+                    make_view(v) for v in test_case.expected_outputs
+                ]
+
+        bundled_program = BundledProgram(executorch_program, method_test_suites)
+        outfile = io.BytesIO()
+        write_bundled_program_to_file(bundled_program, outfile)
+
+        self.assertEqual(
+            bundled_program.serialize_to_schema(),
+            deserialize_from_flatbuffer_to_bundled_program(outfile.getvalue()),
+            "Regenerated bundled program mismatches original one",
+        )
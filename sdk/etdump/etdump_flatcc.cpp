@@ -125,6 +125,8 @@ ETDumpGen::~ETDumpGen() {
 void ETDumpGen::reset() {
   etdump_gen_state = ETDumpGen_Init;
   num_blocks = 0;
+  // The outputs logged in the debug buffer belong to the previous ETDump.
+  debug_buffer_offset = 0;
   flatcc_builder_reset(builder);
   flatbuffers_buffer_start(builder, etdump_ETDump_file_identifier);
   etdump_ETDump_start_as_root_with_size(builder);
@@ -485,6 +487,10 @@ void ETDumpGen::set_debug_buffer(Span<uint8_t> buffer) {
   debug_buffer = buffer;
 }
 
+Span<uint8_t> ETDumpGen::get_debug_buffer_data() {
+  return Span<uint8_t>(debug_buffer.data(), debug_buffer_offset);
+}
+
 size_t ETDumpGen::copy_tensor_to_debug_buffer(exec_aten::Tensor tensor) {
   if (tensor.nbytes() == 0) {
     return static_cast<size_t>(-1);
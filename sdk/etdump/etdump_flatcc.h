@@ -137,6 +137,11 @@ class ETDumpGen : public EventTracer {
       DebugHandle delegate_debug_index,
       const double& output) override;
   void set_debug_buffer(Span<uint8_t> buffer);
+  /**
+   * Returns the part of the debug buffer holding the outputs logged since the
+   * ETDump was last reset, which the ETDump refers to.
+   */
+  Span<uint8_t> get_debug_buffer_data();
   etdump_result get_etdump_data();
   size_t get_num_blocks();
   bool is_static_etdump();
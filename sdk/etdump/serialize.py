@@ -8,14 +8,33 @@
 
 import json
 import os
+import struct
 import tempfile
+from typing import Callable, List, Optional, TypeVar, Union
 
 import pkg_resources
 
-from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
+from executorch.exir._serialize._dataclass import _DataclassEncoder
 
-from executorch.exir._serialize._flatbuffer import _flatc_compile, _flatc_decompile
-from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC
+from executorch.exir._serialize._flatbuffer import _flatc_compile
+from executorch.exir.scalar_type import ScalarType
+from executorch.sdk.etdump.schema_flatcc import (
+    Allocator,
+    AllocationEvent,
+    Bool,
+    DebugEvent,
+    Double,
+    ETDumpFlatCC,
+    Event,
+    Float,
+    Int,
+    ProfileEvent,
+    RunData,
+    Tensor,
+    TensorList,
+    Value,
+    ValueType,
+)
 
 # The prefix of schema files used for etdump
 ETDUMP_FLATCC_SCHEMA_NAME = "etdump_schema_flatcc"
@@ -39,12 +58,6 @@ ETDump FlatCC Schema Implementations
 """
 
 
-# from json to etdump
-def _deserialize_from_json_to_etdump_flatcc(etdump_json: bytes) -> ETDumpFlatCC:
-    etdump_json = json.loads(etdump_json)
-    return _json_to_dataclass(etdump_json, ETDumpFlatCC)
-
-
 def _convert_to_flatcc(etdump_json: str) -> bytes:
     with tempfile.TemporaryDirectory() as d:
         # load given and common schema
@@ -62,22 +75,175 @@ def _convert_to_flatcc(etdump_json: str) -> bytes:
             return output_file.read()
 
 
-def _convert_from_flatcc(etdump_flatbuffer: bytes, size_prefixed: bool = True) -> bytes:
-    with tempfile.TemporaryDirectory() as d:
-        _write_schema(d, ETDUMP_FLATCC_SCHEMA_NAME)
-        _write_schema(d, SCALAR_TYPE_SCHEMA_NAME)
+"""
+ETDump FlatCC binary reader
 
-        schema_path = os.path.join(d, "{}.fbs".format(ETDUMP_FLATCC_SCHEMA_NAME))
-        bin_path = os.path.join(d, "schema.bin")
-        with open(bin_path, "wb") as bin_file:
-            bin_file.write(etdump_flatbuffer)
-        additional_args = []
-        if size_prefixed:
-            additional_args = ["--size-prefixed"]
-        _flatc_decompile(d, schema_path, bin_path, additional_args)
-        output_path = os.path.join(d, "schema.json")
-        with open(output_path, "rb") as output_file:
-            return output_file.read()
+Reads the flatbuffer directly rather than converting it to JSON with flatc, so
+that ETDumps can be parsed from memory, without touching disk or starting a
+subprocess. Field indices must match etdump_schema_flatcc.fbs.
+"""
+
+_T = TypeVar("_T")
+
+# Order of the ValueType enum in etdump_schema_flatcc.fbs.
+_VALUE_TYPES: List[str] = [
+    ValueType.NULL.value,
+    ValueType.INT.value,
+    ValueType.BOOL.value,
+    ValueType.FLOAT.value,
+    ValueType.DOUBLE.value,
+    ValueType.TENSOR.value,
+    ValueType.TENSOR_LIST.value,
+    ValueType.STRING.value,
+]
+
+
+class _ETDumpReader:
+    def __init__(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self.data = data
+
+    def _scalar(self, fmt: str, table: int, index: int, default: _T) -> _T:
+        field = self._field(table, index)
+        if field == 0:
+            return default
+        return struct.unpack_from(fmt, self.data, field)[0]
+
+    def _field(self, table: int, index: int) -> int:
+        """Returns the absolute position of a field of a table, or 0 if unset."""
+        vtable = table - struct.unpack_from("<i", self.data, table)[0]
+        vtable_size = struct.unpack_from("<H", self.data, vtable)[0]
+        entry = 4 + 2 * index
+        if entry >= vtable_size:
+            return 0
+        offset = struct.unpack_from("<H", self.data, vtable + entry)[0]
+        return table + offset if offset != 0 else 0
+
+    def _indirect(self, table: int, index: int) -> int:
+        """Follows the offset stored in a field, or returns 0 if unset."""
+        field = self._field(table, index)
+        if field == 0:
+            return 0
+        return field + struct.unpack_from("<I", self.data, field)[0]
+
+    def _string(self, table: int, index: int) -> Optional[str]:
+        pos = self._indirect(table, index)
+        if pos == 0:
+            return None
+        length = struct.unpack_from("<I", self.data, pos)[0]
+        return bytes(self.data[pos + 4 : pos + 4 + length]).decode("utf-8")
+
+    def _bytes(self, table: int, index: int) -> Optional[bytes]:
+        pos = self._indirect(table, index)
+        if pos == 0:
+            return None
+        length = struct.unpack_from("<I", self.data, pos)[0]
+        return bytes(self.data[pos + 4 : pos + 4 + length])
+
+    def _int64s(self, table: int, index: int) -> List[int]:
+        pos = self._indirect(table, index)
+        if pos == 0:
+            return []
+        length = struct.unpack_from("<I", self.data, pos)[0]
+        return list(struct.unpack_from(f"<{length}q", self.data, pos + 4))
+
+    def _table(self, table: int, index: int, read: Callable[[int], _T]) -> Optional[_T]:
+        pos = self._indirect(table, index)
+        return read(pos) if pos != 0 else None
+
+    def _tables(
+        self, table: int, index: int, read: Callable[[int], _T]
+    ) -> Optional[List[_T]]:
+        pos = self._indirect(table, index)
+        if pos == 0:
+            return None
+        length = struct.unpack_from("<I", self.data, pos)[0]
+        elements = []
+        for i in range(length):
+            element = pos + 4 + 4 * i
+            elements.append(
+                read(element + struct.unpack_from("<I", self.data, element)[0])
+            )
+        return elements
+
+    def _tensor(self, pos: int) -> Tensor:
+        return Tensor(
+            scalar_type=ScalarType(self._scalar("<b", pos, 0, 0)),
+            sizes=self._int64s(pos, 1),
+            strides=self._int64s(pos, 2),
+            offset=self._scalar("<q", pos, 3, 0),
+        )
+
+    def _value(self, pos: int) -> Value:
+        return Value(
+            val=_VALUE_TYPES[self._scalar("<b", pos, 0, 0)],
+            tensor=self._table(pos, 1, self._tensor),
+            tensor_list=self._table(
+                pos, 2, lambda p: TensorList(self._tables(p, 0, self._tensor) or [])
+            ),
+            int_value=self._table(pos, 3, lambda p: Int(self._scalar("<q", p, 0, 0))),
+            float_value=self._table(
+                pos, 4, lambda p: Float(self._scalar("<f", p, 0, 0.0))
+            ),
+            double_value=self._table(
+                pos, 5, lambda p: Double(self._scalar("<d", p, 0, 0.0))
+            ),
+            bool_value=self._table(
+                pos, 6, lambda p: Bool(self._scalar("<?", p, 0, False))
+            ),
+            output=self._table(pos, 7, lambda p: Bool(self._scalar("<?", p, 0, False))),
+        )
+
+    def _profile_event(self, pos: int) -> ProfileEvent:
+        return ProfileEvent(
+            name=self._string(pos, 0),
+            chain_index=self._scalar("<i", pos, 1, 0),
+            instruction_id=self._scalar("<i", pos, 2, -1),
+            delegate_debug_id_int=self._scalar("<i", pos, 3, -1),
+            delegate_debug_id_str=self._string(pos, 4),
+            delegate_debug_metadata=self._bytes(pos, 5),
+            start_time=self._scalar("<Q", pos, 6, 0),
+            end_time=self._scalar("<Q", pos, 7, 0),
+        )
+
+    def _allocation_event(self, pos: int) -> AllocationEvent:
+        return AllocationEvent(
+            allocator_id=self._scalar("<i", pos, 0, 0),
+            allocation_size=self._scalar("<Q", pos, 1, 0),
+        )
+
+    def _debug_event(self, pos: int) -> DebugEvent:
+        # pyre-ignore[6]: debug_entry is always set by the runtime.
+        return DebugEvent(
+            chain_index=self._scalar("<Q", pos, 0, 0),
+            instruction_id=self._scalar("<i", pos, 1, -1),
+            debug_entry=self._table(pos, 2, self._value),
+        )
+
+    def _event(self, pos: int) -> Event:
+        return Event(
+            profile_event=self._table(pos, 0, self._profile_event),
+            allocation_event=self._table(pos, 1, self._allocation_event),
+            debug_event=self._table(pos, 2, self._debug_event),
+        )
+
+    def _run_data(self, pos: int) -> RunData:
+        return RunData(
+            # pyre-ignore[6]: The runtime always names its event blocks.
+            name=self._string(pos, 0),
+            bundled_input_index=self._scalar("<i", pos, 1, -1),
+            allocators=self._tables(
+                pos, 2, lambda p: Allocator(self._string(p, 0) or "")
+            ),
+            events=self._tables(pos, 3, self._event),
+        )
+
+    def read(self, size_prefixed: bool) -> ETDumpFlatCC:
+        start = 4 if size_prefixed else 0
+        root = start + struct.unpack_from("<I", self.data, start)[0]
+        return ETDumpFlatCC(
+            version=self._scalar("<I", root, 0, 0),
+            run_data=self._tables(root, 1, self._run_data) or [],
+        )
 
 
 def serialize_to_etdump_flatcc(
@@ -95,16 +261,17 @@ def serialize_to_etdump_flatcc(
 
 
 def deserialize_from_etdump_flatcc(
-    data: bytes, size_prefixed: bool = True
+    data: Union[bytes, bytearray, memoryview], size_prefixed: bool = True
 ) -> ETDumpFlatCC:
     """
     Given an etdump binary blob (constructed using the FlatCC schema) this function will deserialize
     it and return the FlatCC python object representation of etdump.
     Args:
-        data: Serialized etdump binary blob.
+        data: Serialized etdump binary blob, e.g. the memoryview returned by
+            ExecuTorchModule.get_etdump_buffer().
+        size_prefixed: Whether the blob starts with its size, as the ETDumps
+            produced by the runtime do.
     Returns:
         Deserialized ETDump python object.
     """
-    return _deserialize_from_json_to_etdump_flatcc(
-        _convert_from_flatcc(data, size_prefixed)
-    )
+    return _ETDumpReader(data).read(size_prefixed)
@@ -187,6 +187,41 @@ TEST_F(ProfilerETDumpTest, DebugEvent) {
   }
 }
 
+TEST_F(ProfilerETDumpTest, ResetDebugBuffer) {
+  for (size_t i = 0; i < 2; i++) {
+    testing::TensorFactory<ScalarType::Float> tf;
+    EValue evalue(tf.ones({3, 2}));
+
+    // Only fits a few tensors, which are logged in a new ETDump each time.
+    void* ptr = malloc(256);
+    Span<uint8_t> buffer((uint8_t*)ptr, 256);
+    etdump_gen[i]->set_debug_buffer(buffer);
+
+    size_t debug_data_size = 0;
+    for (size_t run = 0; run < 10; run++) {
+      etdump_gen[i]->create_event_block("test_block");
+      etdump_gen[i]->log_evalue(evalue);
+      if (run == 0) {
+        debug_data_size = etdump_gen[i]->get_debug_buffer_data().size();
+        EXPECT_GE(debug_data_size, evalue.toTensor().nbytes());
+      } else {
+        EXPECT_EQ(
+            etdump_gen[i]->get_debug_buffer_data().size(), debug_data_size);
+      }
+
+      etdump_result result = etdump_gen[i]->get_etdump_data();
+      ASSERT_TRUE(result.buf != nullptr);
+      if (!etdump_gen[i]->is_static_etdump()) {
+        free(result.buf);
+      }
+      etdump_gen[i]->reset();
+      EXPECT_EQ(etdump_gen[i]->get_debug_buffer_data().size(), 0);
+    }
+
+    free(ptr);
+  }
+}
+
 TEST_F(ProfilerETDumpTest, DebugEventTensorList) {
   for (size_t i = 0; i < 2; i++) {
     testing::TensorFactory<ScalarType::Int> tf;
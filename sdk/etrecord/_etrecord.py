@@ -5,11 +5,15 @@
 # LICENSE file in the root directory of this source tree.
 
 import json
+import mmap
 import os
 import pickle
-from dataclasses import dataclass
-from typing import BinaryIO, Dict, IO, List, Optional, Union
-from zipfile import BadZipFile, ZipFile
+import struct
+from collections.abc import Mapping
+from typing import Any, BinaryIO, Callable, Dict, IO, Iterator, List, Optional, Union
+from zipfile import BadZipFile, ZIP_STORED, ZipFile, ZipInfo
+
+import torch
 
 from executorch import exir
 from executorch.exir import (
@@ -47,17 +51,218 @@ class ETRecordReservedFileNames(StrEnum):
     DEBUG_HANDLE_MAP_NAME = "debug_handle_map"
     DELEGATE_MAP_NAME = "delegate_map"
     REFERENCE_OUTPUTS = "reference_outputs"
+    REFERENCE_OUTPUTS_MANIFEST = "reference_outputs_manifest"
+    REFERENCE_OUTPUTS_DATA = "reference_outputs_data"
+
+
+# Size of the fixed part of a zip local file header, and the offset of the
+# file name / extra field lengths within it.
+_ZIP_LOCAL_HEADER_SIZE = 30
+_ZIP_LOCAL_HEADER_LENGTHS_OFFSET = 26
+
+# Alignment of each raw reference output tensor within its zip member.
+_REFERENCE_OUTPUT_ALIGNMENT = 16
+
+
+class _ETRecordArchive:
+    """
+    Index over the members of an ETRecord zip file.
+
+    The file is memory mapped, and since ETRecord members are written uncompressed,
+    reading a member returns a view into the mapping rather than a copy. The
+    mapping is copy-on-write: tensors aliasing it can be modified without
+    touching the file.
+    """
+
+    def __init__(self, etrecord_path: Union[str, os.PathLike]) -> None:
+        try:
+            self._zip = ZipFile(etrecord_path, "r")
+        except BadZipFile:
+            raise RuntimeError("Invalid etrecord file passed in.")
+        self._infos: Dict[str, ZipInfo] = {
+            info.filename: info for info in self._zip.infolist()
+        }
+        with open(etrecord_path, "rb") as f:
+            self._mmap: Optional[mmap.mmap] = mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_COPY
+            )
+
+    def __enter__(self) -> "_ETRecordArchive":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the file. The mapping itself is released once no tensor loaded
+        from it is alive anymore.
+        """
+        self._zip.close()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Reference output tensors still alias the mapping.
+                pass
+            self._mmap = None
+
+    def namelist(self) -> List[str]:
+        return list(self._infos.keys())
+
+    def read(self, name: str) -> Union[bytes, memoryview]:
+        if self._mmap is None:
+            raise RuntimeError(f"Cannot read {name} from a closed ETRecord.")
+        info = self._infos[name]
+        if info.compress_type != ZIP_STORED:
+            return self._zip.read(name)
+        lengths_offset = info.header_offset + _ZIP_LOCAL_HEADER_LENGTHS_OFFSET
+        name_length, extra_length = struct.unpack_from(
+            "<HH", self._mmap, lengths_offset
+        )
+        start = (
+            info.header_offset + _ZIP_LOCAL_HEADER_SIZE + name_length + extra_length
+        )
+        return memoryview(self._mmap)[start : start + info.file_size]
+
+    def read_exported_program(self, name: str) -> ExportedProgram:
+        serialized_state_dict_file = f"{name}_state_dict"
+        assert (
+            serialized_state_dict_file in self._infos
+        ), f"Could not find corresponding state dict file for {name}."
+        # torch.load reads the state dict into its own storages, so the weights
+        # of exported programs are copied out of the mapping.
+        serialized_artifact = SerializedArtifact(
+            bytes(self.read(name)),
+            bytes(self.read(serialized_state_dict_file)),
+            b"",
+        )
+        return deserialize(serialized_artifact)
+
+
+class _LazyExportedProgramMap(Mapping):
+    """
+    Mapping from graph names to ExportedPrograms that are deserialized from the
+    ETRecord on first access.
+    """
+
+    def __init__(self, archive: _ETRecordArchive, names: List[str]) -> None:
+        self._archive = archive
+        self._names = names
+        self._loaded: Dict[str, ExportedProgram] = {}
+
+    def __getitem__(self, name: str) -> ExportedProgram:
+        if name not in self._loaded:
+            if name not in self._names:
+                raise KeyError(name)
+            self._loaded[name] = self._archive.read_exported_program(name)
+        return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def _lazy_property(name: str) -> property:
+    """
+    Property backed by ETRecord._values, populated from ETRecord._loaders on first access
+    """
+
+    def getter(self: "ETRecord") -> Any:
+        if (loader := self._loaders.pop(name, None)) is not None:
+            self._values[name] = loader()
+        return self._values[name]
+
+    def setter(self: "ETRecord", value: Any) -> None:
+        self._loaders.pop(name, None)
+        self._values[name] = value
+
+    return property(getter, setter)
 
 
-@dataclass
 class ETRecord:
-    edge_dialect_program: Optional[ExportedProgram] = None
-    graph_map: Optional[Dict[str, ExportedProgram]] = None
-    _debug_handle_map: Optional[Dict[int, Union[int, List[int]]]] = None
+    """
+    Deserialized contents of an ETRecord file.
+
+    When parsed from a file, each artifact is only deserialized the first time it
+    is accessed, so consumers that only need e.g. the debug handle map do not pay
+    for deserializing the graphs. The file stays open until `close()` is called,
+    or the `ETRecord` is used as a context manager.
+    """
+
+    edge_dialect_program: Optional[ExportedProgram] = _lazy_property(
+        "edge_dialect_program"
+    )
+    graph_map: Optional[Mapping[str, ExportedProgram]] = _lazy_property("graph_map")
+    _debug_handle_map: Optional[Dict[int, Union[int, List[int]]]] = _lazy_property(
+        "_debug_handle_map"
+    )
     _delegate_map: Optional[
         Dict[str, Dict[int, Dict[str, Union[str, _DelegateDebugIdentifierMap]]]]
-    ] = None
-    _reference_outputs: Optional[Dict[str, List[ProgramOutput]]] = None
+    ] = _lazy_property("_delegate_map")
+    _reference_outputs: Optional[Dict[str, List[ProgramOutput]]] = _lazy_property(
+        "_reference_outputs"
+    )
+
+    def __init__(
+        self,
+        edge_dialect_program: Optional[ExportedProgram] = None,
+        graph_map: Optional[Mapping[str, ExportedProgram]] = None,
+        _debug_handle_map: Optional[Dict[int, Union[int, List[int]]]] = None,
+        _delegate_map: Optional[
+            Dict[str, Dict[int, Dict[str, Union[str, _DelegateDebugIdentifierMap]]]]
+        ] = None,
+        _reference_outputs: Optional[Dict[str, List[ProgramOutput]]] = None,
+    ) -> None:
+        self._values: Dict[str, Any] = {
+            "edge_dialect_program": edge_dialect_program,
+            "graph_map": graph_map,
+            "_debug_handle_map": _debug_handle_map,
+            "_delegate_map": _delegate_map,
+            "_reference_outputs": _reference_outputs,
+        }
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._archive: Optional[_ETRecordArchive] = None
+
+    def _is_set(self, name: str) -> bool:
+        """
+        Whether the artifact `name` is present, without loading it.
+        """
+        return name in self._loaders or self._values[name] is not None
+
+    def __eq__(self, other: object) -> bool:
+        # Like the dataclass ETRecord used to be: compares all the artifacts,
+        # loading them if needed.
+        if not isinstance(other, ETRecord):
+            return NotImplemented
+        return tuple(getattr(self, name) for name in self._values) == tuple(
+            getattr(other, name) for name in other._values
+        )
+
+    def __enter__(self) -> "ETRecord":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the ETRecord file this was parsed from. Artifacts that were not
+        accessed before can no longer be loaded.
+        """
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    def __repr__(self) -> str:
+        loaded = ", ".join(
+            f"{name}={value!r}"
+            for name, value in self._values.items()
+            if name not in self._loaders
+        )
+        return f"ETRecord({loaded})"
 
 
 def _handle_exported_program(
@@ -120,6 +325,72 @@ def _handle_edge_dialect_exported_program(
     )
 
 
+def _handle_reference_outputs(
+    etrecord_zip: ZipFile, reference_outputs: Dict[str, List[ProgramOutput]]
+) -> None:
+    """
+    Writes the reference outputs as raw tensor bytes plus a JSON manifest describing
+    them, so they can be loaded as views into the ETRecord without unpickling.
+    """
+    data = bytearray()
+    manifest: Dict[str, List[List[Dict[str, Any]]]] = {}
+    for method_name, program_outputs in reference_outputs.items():
+        manifest[method_name] = []
+        for program_output in program_outputs:
+            entries = []
+            for value in program_output:
+                if not isinstance(value, torch.Tensor):
+                    entries.append({"value": value})
+                    continue
+                tensor = value.detach().contiguous().cpu()
+                data.extend(b"\0" * (-len(data) % _REFERENCE_OUTPUT_ALIGNMENT))
+                entries.append(
+                    {
+                        "dtype": str(tensor.dtype).replace("torch.", ""),
+                        "sizes": list(tensor.shape),
+                        "offset": len(data),
+                    }
+                )
+                data.extend(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+            manifest[method_name].append(entries)
+
+    etrecord_zip.writestr(
+        ETRecordReservedFileNames.REFERENCE_OUTPUTS_MANIFEST, json.dumps(manifest)
+    )
+    etrecord_zip.writestr(ETRecordReservedFileNames.REFERENCE_OUTPUTS_DATA, bytes(data))
+
+
+def _load_reference_outputs(
+    archive: _ETRecordArchive,
+) -> Dict[str, List[ProgramOutput]]:
+    manifest = json.loads(
+        bytes(archive.read(ETRecordReservedFileNames.REFERENCE_OUTPUTS_MANIFEST))
+    )
+    data = archive.read(ETRecordReservedFileNames.REFERENCE_OUTPUTS_DATA)
+    reference_outputs: Dict[str, List[ProgramOutput]] = {}
+    for method_name, program_outputs in manifest.items():
+        reference_outputs[method_name] = []
+        for entries in program_outputs:
+            program_output = []
+            for entry in entries:
+                if "value" in entry:
+                    program_output.append(entry["value"])
+                    continue
+                dtype = getattr(torch, entry["dtype"])
+                numel = 1
+                for size in entry["sizes"]:
+                    numel *= size
+                if numel == 0:
+                    program_output.append(torch.empty(entry["sizes"], dtype=dtype))
+                    continue
+                tensor = torch.frombuffer(
+                    data, dtype=dtype, count=numel, offset=entry["offset"]
+                )
+                program_output.append(tensor.view(entry["sizes"]))
+            reference_outputs[method_name].append(program_output)
+    return reference_outputs
+
+
 def _get_reference_outputs(
     bundled_program: BundledProgram,
 ) -> Dict[str, List[ProgramOutput]]:
@@ -184,6 +455,8 @@ def generate_etrecord(
     if isinstance(et_record, (str, os.PathLike)):
         et_record = os.fspath(et_record)  # pyre-ignore
 
+    # Members are stored uncompressed (the ZipFile default), which lets them be
+    # read directly from the memory mapped file when parsed.
     etrecord_zip = ZipFile(et_record, "w")
     # Write the magic file identifier that will be used to verify that this file
     # is an etrecord when it's used later in the SDK tooling.
@@ -222,11 +495,7 @@ def generate_etrecord(
     # When a BundledProgram is passed in, extract the reference outputs and save in a file
     if isinstance(executorch_program, BundledProgram):
         reference_outputs = _get_reference_outputs(executorch_program)
-        etrecord_zip.writestr(
-            ETRecordReservedFileNames.REFERENCE_OUTPUTS,
-            # @lint-ignore PYTHONPICKLEISBAD
-            pickle.dumps(reference_outputs),
-        )
+        _handle_reference_outputs(etrecord_zip, reference_outputs)
         executorch_program = executorch_program.executorch_program
 
     etrecord_zip.writestr(
@@ -249,6 +518,9 @@ def parse_etrecord(etrecord_path: str) -> ETRecord:
     graph module in the `ETRecord` object with the name being `the original module name + "/" + the
     name of the entry point`.
 
+    Only the index of the file is read here. Each artifact is deserialized the first time the
+    corresponding attribute of the returned `ETRecord` is accessed.
+
     Args:
         etrecord_path: Path to the `ETRecord` file.
 
@@ -256,73 +528,49 @@ def parse_etrecord(etrecord_path: str) -> ETRecord:
         `ETRecord` object.
     """
 
-    try:
-        etrecord_zip = ZipFile(etrecord_path, "r")
-    except BadZipFile:
-        raise RuntimeError("Invalid etrecord file passed in.")
-
-    file_list = etrecord_zip.namelist()
+    archive = _ETRecordArchive(etrecord_path)
+    file_list = archive.namelist()
 
     if ETRecordReservedFileNames.ETRECORD_IDENTIFIER not in file_list:
         raise RuntimeError(
             "ETRecord identifier missing from etrecord file passed in. Either an invalid file was passed in or the file is corrupt."
         )
 
-    graph_map: Dict[str, ExportedProgram] = {}
-    debug_handle_map = None
-    delegate_map = None
-    edge_dialect_program = None
-    reference_outputs = None
-
-    serialized_exported_program_files = set()
-    serialized_state_dict_files = set()
+    etrecord = ETRecord()
+    exported_program_files = []
     for entry in file_list:
         if entry == ETRecordReservedFileNames.DEBUG_HANDLE_MAP_NAME:
-            debug_handle_map = json.loads(
-                etrecord_zip.read(ETRecordReservedFileNames.DEBUG_HANDLE_MAP_NAME)
+            etrecord._loaders["_debug_handle_map"] = lambda: json.loads(
+                bytes(archive.read(ETRecordReservedFileNames.DEBUG_HANDLE_MAP_NAME))
             )
         elif entry == ETRecordReservedFileNames.DELEGATE_MAP_NAME:
-            delegate_map = json.loads(
-                etrecord_zip.read(ETRecordReservedFileNames.DELEGATE_MAP_NAME)
+            etrecord._loaders["_delegate_map"] = lambda: json.loads(
+                bytes(archive.read(ETRecordReservedFileNames.DELEGATE_MAP_NAME))
             )
-        elif entry == ETRecordReservedFileNames.ETRECORD_IDENTIFIER:
-            continue
         elif entry == ETRecordReservedFileNames.EDGE_DIALECT_EXPORTED_PROGRAM:
-            serialized_artifact = SerializedArtifact(
-                etrecord_zip.read(
+            etrecord._loaders["edge_dialect_program"] = (
+                lambda: archive.read_exported_program(
                     ETRecordReservedFileNames.EDGE_DIALECT_EXPORTED_PROGRAM
-                ),
-                etrecord_zip.read(f"{entry}_state_dict"),
-                b"",
+                )
+            )
+        elif entry == ETRecordReservedFileNames.REFERENCE_OUTPUTS_MANIFEST:
+            etrecord._loaders["_reference_outputs"] = lambda: _load_reference_outputs(
+                archive
             )
-            edge_dialect_program = deserialize(serialized_artifact)
         elif entry == ETRecordReservedFileNames.REFERENCE_OUTPUTS:
+            # ETRecords generated before reference outputs were stored as raw tensors
             # @lint-ignore PYTHONPICKLEISBAD
-            reference_outputs = pickle.loads(
-                etrecord_zip.read(ETRecordReservedFileNames.REFERENCE_OUTPUTS)
+            etrecord._loaders["_reference_outputs"] = lambda: pickle.loads(
+                archive.read(ETRecordReservedFileNames.REFERENCE_OUTPUTS)
             )
+        elif entry in (
+            ETRecordReservedFileNames.ETRECORD_IDENTIFIER,
+            ETRecordReservedFileNames.REFERENCE_OUTPUTS_DATA,
+        ) or entry.endswith("state_dict"):
+            continue
         else:
-            if entry.endswith("state_dict"):
-                serialized_state_dict_files.add(entry)
-            else:
-                serialized_exported_program_files.add(entry)
+            exported_program_files.append(entry)
 
-    for serialized_file in serialized_exported_program_files:
-        serialized_state_dict_file = f"{serialized_file}_state_dict"
-        assert (
-            serialized_state_dict_file in serialized_state_dict_files
-        ), f"Could not find corresponding state dict file for {serialized_file}."
-        serialized_artifact = SerializedArtifact(
-            etrecord_zip.read(serialized_file),
-            etrecord_zip.read(serialized_state_dict_file),
-            b"",
-        )
-        graph_map[serialized_file] = deserialize(serialized_artifact)
-
-    return ETRecord(
-        edge_dialect_program=edge_dialect_program,
-        graph_map=graph_map,
-        _debug_handle_map=debug_handle_map,
-        _delegate_map=delegate_map,
-        _reference_outputs=reference_outputs,
-    )
+    etrecord.graph_map = _LazyExportedProgramMap(archive, exported_program_files)
+    etrecord._archive = archive
+    return etrecord
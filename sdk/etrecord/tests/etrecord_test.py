@@ -8,6 +8,8 @@ import copy
 import json
 import tempfile
 import unittest
+import zipfile
+from unittest.mock import patch
 
 import executorch.exir.tests.models as models
 import torch
@@ -15,7 +17,8 @@ from executorch import exir
 from executorch.exir import EdgeCompileConfig, EdgeProgramManager, to_edge
 from executorch.sdk.bundled_program.config import MethodTestCase, MethodTestSuite
 from executorch.sdk.bundled_program.core import BundledProgram
-from executorch.sdk.etrecord import generate_etrecord, parse_etrecord
+from executorch.sdk.etrecord import ETRecord, generate_etrecord, parse_etrecord
+from executorch.sdk.etrecord import _etrecord
 from executorch.sdk.etrecord._etrecord import (
     _get_reference_outputs,
     ETRecordReservedFileNames,
@@ -144,6 +147,93 @@ class TestETRecord(unittest.TestCase):
                 torch.equal(expected["forward"][1][0], actual["forward"][1][0])
             )
 
+    def test_etrecord_lazy_loading(self):
+        (
+            captured_output,
+            edge_output,
+            bundled_program,
+        ) = self.get_test_model_with_bundled_program()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(
+                tmpdirname + "/etrecord.bin",
+                edge_output,
+                bundled_program,
+                {
+                    "aten_dialect_output": captured_output,
+                },
+            )
+
+            with patch.object(
+                _etrecord, "deserialize", wraps=_etrecord.deserialize
+            ) as mock_deserialize:
+                etrecord = parse_etrecord(tmpdirname + "/etrecord.bin")
+                self.assertIsNotNone(etrecord._debug_handle_map)
+                self.assertEqual(
+                    list(etrecord.graph_map.keys()), ["aten_dialect_output/forward"]
+                )
+                # Nothing has been deserialized until the programs are accessed
+                mock_deserialize.assert_not_called()
+
+                self.assertIsNotNone(etrecord.edge_dialect_program)
+                self.assertIsNotNone(etrecord.edge_dialect_program)
+                self.assertEqual(mock_deserialize.call_count, 1)
+
+                self.assertIsNotNone(etrecord.graph_map["aten_dialect_output/forward"])
+                self.assertEqual(mock_deserialize.call_count, 2)
+
+            # Reference outputs are stored as raw tensors rather than pickled
+            self.assertNotIn(
+                ETRecordReservedFileNames.REFERENCE_OUTPUTS.value,
+                zipfile.ZipFile(tmpdirname + "/etrecord.bin").namelist(),
+            )
+
+    def test_etrecord_close(self):
+        (
+            captured_output,
+            edge_output,
+            bundled_program,
+        ) = self.get_test_model_with_bundled_program()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(
+                tmpdirname + "/etrecord.bin",
+                edge_output,
+                bundled_program,
+                {
+                    "aten_dialect_output": captured_output,
+                },
+            )
+
+            with parse_etrecord(tmpdirname + "/etrecord.bin") as etrecord:
+                reference_output = etrecord._reference_outputs["forward"][0][0]
+                expected = reference_output.clone()
+                # Reference outputs can be modified without changing the file
+                reference_output.add_(1)
+
+            # Reference outputs loaded before closing stay valid
+            self.assertTrue(torch.equal(reference_output, expected + 1))
+            with self.assertRaises(RuntimeError):
+                etrecord.edge_dialect_program
+
+            with parse_etrecord(tmpdirname + "/etrecord.bin") as etrecord:
+                self.assertTrue(
+                    torch.equal(etrecord._reference_outputs["forward"][0][0], expected)
+                )
+
+    def test_etrecord_equality(self):
+        captured_output, edge_output, et_output = self.get_test_model()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(tmpdirname + "/etrecord.bin", edge_output, et_output)
+
+            with parse_etrecord(tmpdirname + "/etrecord.bin") as etrecord:
+                debug_handle_map = etrecord._debug_handle_map
+                self.assertEqual(
+                    ETRecord(_debug_handle_map=debug_handle_map),
+                    ETRecord(_debug_handle_map=debug_handle_map),
+                )
+                self.assertNotEqual(
+                    etrecord, ETRecord(_debug_handle_map=debug_handle_map)
+                )
+
     def test_etrecord_generation_with_manager(self):
         captured_output, edge_output, et_output = self.get_test_model_with_manager()
         with tempfile.TemporaryDirectory() as tmpdirname:
@@ -6,5 +6,23 @@
 
 from executorch.sdk.inspector._inspector import Event, EventBlock, Inspector, PerfData
 from executorch.sdk.inspector._inspector_utils import TimeScale
+from executorch.sdk.inspector._perf_analysis import (
+    analyze_bottlenecks,
+    analyze_event_block,
+    BottleneckAnalysis,
+    OpTiming,
+    summarize_op_timings,
+)
 
-__all__ = ["Event", "EventBlock", "Inspector", "PerfData", "TimeScale"]
+__all__ = [
+    "analyze_bottlenecks",
+    "analyze_event_block",
+    "BottleneckAnalysis",
+    "Event",
+    "EventBlock",
+    "Inspector",
+    "OpTiming",
+    "PerfData",
+    "summarize_op_timings",
+    "TimeScale",
+]
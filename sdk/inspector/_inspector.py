@@ -36,6 +36,8 @@ from executorch.sdk.debug_format.et_schema import OperatorGraph, OperatorNode
 from executorch.sdk.etdump.schema_flatcc import DebugEvent, ETDumpFlatCC, ProfileEvent
 from executorch.sdk.etrecord import ETRecord, parse_etrecord
 from executorch.sdk.inspector._inspector_utils import (
+    calculate_batched_metrics,
+    capture_intermediate_outputs,
     create_debug_handle_to_op_node_mapping,
     EDGE_DIALECT_GRAPH_KEY,
     EXCLUDED_COLUMNS_WHEN_PRINTING,
@@ -44,11 +46,14 @@ from executorch.sdk.inspector._inspector_utils import (
     FORWARD,
     gen_etdump_object,
     gen_graphs_from_etrecord,
+    inference_output_to_tensors,
+    InferenceOutput,
     inflate_runtime_output,
     is_debug_output,
     is_inference_output_equal,
     ProgramOutput,
     RESERVED_FRAMEWORK_EVENT_NAMES,
+    SUPPORTED_METRICS,
     TIME_SCALE_DICT,
     TimeScale,
     verify_debug_data_equivalence,
@@ -912,6 +917,14 @@ class EventBlock:
                         event.debug_handles = value
 
 
+def _innermost_module(module_hierarchy: Dict[str, Any]) -> str:
+    """
+    Returns the qualified name of the innermost module of an nn_module_stack entry
+    """
+    innermost = list(module_hierarchy.values())[-1]
+    return innermost[0] if isinstance(innermost, (list, tuple)) else str(innermost)
+
+
 class Inspector:
     """
     APIs for examining model architecture and performance stats.
@@ -937,19 +950,23 @@ class Inspector:
             Callable[[Union[int, str], Union[int, float]], Union[int, float]]
         ] = None,
         enable_module_hierarchy: bool = False,
+        etdump_data: Optional[Union[bytes, memoryview]] = None,
+        debug_buffer: Optional[Union[bytes, memoryview]] = None,
     ) -> None:
         r"""
         Initialize an `Inspector` instance with the underlying `EventBlock`\ s populated with data from the provided ETDump path
         and optional ETRecord path.
 
         Args:
-            etdump_path: Path to the ETDump file.
+            etdump_path: Path to the ETDump file. Not needed if etdump_data is provided.
             etrecord: Optional ETRecord object or path to the ETRecord file.
             source_time_scale: The time scale of the performance data retrieved from the runtime. The default time hook implentation in the runtime returns NS.
             target_time_scale: The target time scale to which the users want their performance data converted to. Defaults to MS.
             debug_buffer_path: Debug buffer file path that contains the debug data referenced by ETDump for intermediate and program outputs.
             delegate_metadata_parser: Optional function to parse delegate metadata from an Profiling Event. Expected signature of the function is:
                     (delegate_metadata_list: List[bytes]) -> Union[List[str], Dict[str, Any]]
+            etdump_data: In-memory ETDump, e.g. from ExecuTorchModule.get_etdump_buffer(), to use instead of etdump_path.
+            debug_buffer: In-memory debug buffer, to use instead of debug_buffer_path.
 
         Returns:
             None
@@ -964,18 +981,26 @@ class Inspector:
         self._source_time_scale = source_time_scale
         self._target_time_scale = target_time_scale
 
+        # Whether the ETRecord was opened here, and must be closed by close().
+        self._owns_etrecord = False
         if etrecord is None:
             self._etrecord = None
         elif isinstance(etrecord, ETRecord):
             self._etrecord = etrecord
         elif isinstance(etrecord, str):
             self._etrecord = parse_etrecord(etrecord_path=etrecord)
+            self._owns_etrecord = True
         else:
             raise TypeError("Unsupported ETRecord type")
 
         # Create EventBlocks from ETDump
-        etdump = gen_etdump_object(etdump_path=etdump_path)
-        if debug_buffer_path is not None:
+        if etdump_data is not None:
+            etdump = gen_etdump_object(etdump_data=etdump_data)
+        else:
+            etdump = gen_etdump_object(etdump_path=etdump_path)
+        if debug_buffer is not None:
+            output_buffer = debug_buffer
+        elif debug_buffer_path is not None:
             with open(debug_buffer_path, "rb") as f:
                 output_buffer = f.read()
         else:
@@ -1003,6 +1028,23 @@ class Inspector:
         self._enable_module_hierarchy = enable_module_hierarchy
         self._consume_etrecord()
 
+    def __enter__(self) -> "Inspector":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the ETRecord file, if the Inspector opened it from a path. Graphs
+        that were not accessed before, through `op_graph_dict` or
+        `get_exported_program`, can no longer be loaded. An `ETRecord` passed in
+        as an object is left open.
+        """
+        if self._owns_etrecord and self._etrecord is not None:
+            self._etrecord.close()
+        self._owns_etrecord = False
+
     def _consume_etrecord(self) -> None:
         """
         If an ETRecord is provided, connect it to the EventBlocks and populate the Event metadata.
@@ -1038,6 +1080,8 @@ class Inspector:
             )
 
         # (2) Event Metadata Association
+        # Graphs are generated on first access, so only the edge dialect graph is
+        # deserialized here.
         self.op_graph_dict = gen_graphs_from_etrecord(
             etrecord=self._etrecord,
             enable_module_hierarchy=self._enable_module_hierarchy,
@@ -1159,6 +1203,177 @@ class Inspector:
                         break
         return total
 
+    def calculate_numerical_divergence(
+        self,
+        reference_inputs: Optional[Sequence[Any]] = None,
+        reference_intermediate_outputs: Optional[
+            Mapping[int, Mapping[int, InferenceOutput]]
+        ] = None,
+        metric: str = "snr",
+        threshold: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """
+        Compares the intermediate outputs logged in each EventBlock against reference values and
+        returns a table of Events ranked by how much numerical error each of them introduces.
+
+        References are keyed by bundled input index, then by debug handle. They are either provided
+        directly or captured by running the ETRecord Edge Dialect program eagerly on reference_inputs
+        (indexed by bundled input index). EventBlocks are processed one at a time and all metrics of a
+        block are computed with a single batched call, so memory is bounded by one set of intermediates.
+
+        Args:
+            reference_inputs: Inputs used to generate each bundled run, indexed by bundled input index.
+            reference_intermediate_outputs: Precomputed reference intermediate outputs.
+            metric: One of "snr", "mse" or "cosine_similarity". Defaults to "snr".
+            threshold: Value past which an Event is considered divergent. Defaults to 20dB for snr,
+                0.99 for cosine_similarity and no threshold for mse.
+
+        Returns:
+            A pandas DataFrame with one row per Event with debug data, ordered by the degradation of the
+            metric relative to the preceding Event. The "first_divergence" column marks the earliest Event
+            (in execution order) past the threshold.
+        """
+        if metric not in SUPPORTED_METRICS:
+            raise ValueError(
+                f"Unsupported metric {metric}, expected one of {SUPPORTED_METRICS}"
+            )
+        if (reference_inputs is None) == (reference_intermediate_outputs is None):
+            raise ValueError(
+                "Exactly one of reference_inputs and reference_intermediate_outputs must be provided"
+            )
+        if reference_inputs is not None:
+            if self._etrecord is None or self._etrecord.edge_dialect_program is None:
+                raise ValueError(
+                    "Capturing reference intermediate outputs requires an ETRecord with the Edge Dialect program"
+                )
+            graph_module = self._etrecord.edge_dialect_program.module()
+        if threshold is None:
+            threshold = {"snr": 20.0, "cosine_similarity": 0.99}.get(metric)
+        # For snr and cosine similarity, lower values mean larger error
+        error_sign = 1.0 if metric == "mse" else -1.0
+
+        # Events are matched across the EventBlocks of different bundled inputs
+        # by (name, instruction id, delegate debug identifier)
+        event_order: Dict[Tuple[Any, ...], Event] = OrderedDict()
+        event_values: Dict[Tuple[Any, ...], List[float]] = defaultdict(list)
+
+        for event_block in self.event_blocks:
+            if (index := event_block.bundled_input_index) is None:
+                continue
+            if reference_inputs is not None:
+                references = capture_intermediate_outputs(
+                    graph_module, reference_inputs[index]
+                )
+            else:
+                references = reference_intermediate_outputs.get(index)
+            if not references:
+                continue
+
+            # Gather every comparable (reference, runtime) tensor pair in the block
+            ref_tensors, tensors, segment_ids, keys = [], [], [], []
+            for event in event_block.events:
+                if not event.debug_data or event.debug_handles is None:
+                    continue
+                debug_handles = (
+                    [event.debug_handles]
+                    if isinstance(event.debug_handles, int)
+                    else event.debug_handles
+                )
+                # The last op of a fused or delegated region produces the logged output
+                handle = max(
+                    (h for h in debug_handles if h in references), default=None
+                )
+                if handle is None:
+                    continue
+                runtime_values = [
+                    t
+                    for output in event.debug_data
+                    for t in inference_output_to_tensors(output)
+                ]
+                reference_values = inference_output_to_tensors(references[handle])
+                if len(runtime_values) != len(reference_values):
+                    log.warning(
+                        f"Mismatched number of outputs for event {event.name} with debug handle {handle}"
+                    )
+                    continue
+                for reference_value, runtime_value in zip(
+                    reference_values, runtime_values
+                ):
+                    ref_tensors.append(reference_value)
+                    tensors.append(runtime_value)
+                    segment_ids.append(len(keys))
+                key = (
+                    event.name,
+                    event._instruction_id,
+                    event.delegate_debug_identifier,
+                )
+                event_order.setdefault(key, event)
+                keys.append(key)
+
+            if not keys:
+                continue
+            block_values = calculate_batched_metrics(
+                ref_tensors, tensors, segment_ids, metrics=[metric]
+            )[metric].tolist()
+            for key, value in zip(keys, block_values):
+                event_values[key].append(value)
+
+        rows = []
+        previous_error = None
+        first_divergence_found = False
+        for key, event in event_order.items():
+            values = event_values[key]
+            mean_value = float(np.mean(values))
+            worst_value = error_sign * max(error_sign * v for v in values)
+            error = error_sign * mean_value
+            degradation = (
+                error - previous_error
+                if previous_error is not None and error != previous_error
+                else 0.0
+            )
+            previous_error = error
+            is_divergent = threshold is not None and error > error_sign * threshold
+            rows.append(
+                {
+                    "event_name": event.name,
+                    "op_types": event.op_types,
+                    "debug_handles": event.debug_handles,
+                    "source_modules": [
+                        _innermost_module(hierarchy)
+                        for hierarchy in event.module_hierarchy.values()
+                        if hierarchy
+                    ],
+                    "stack_traces": event.stack_traces,
+                    metric: mean_value,
+                    f"worst_{metric}": worst_value,
+                    "degradation": degradation,
+                    "num_inputs": len(values),
+                    "first_divergence": is_divergent and not first_divergence_found,
+                }
+            )
+            first_divergence_found |= is_divergent
+
+        df = pd.DataFrame(
+            rows,
+            columns=[
+                "event_name",
+                "op_types",
+                "debug_handles",
+                "source_modules",
+                "stack_traces",
+                metric,
+                f"worst_{metric}",
+                "degradation",
+                "num_inputs",
+                "first_divergence",
+            ],
+        )
+        df = df.sort_values(
+            by=["first_divergence", "degradation"], ascending=False, kind="stable"
+        ).reset_index(drop=True)
+        df.insert(0, "rank", range(1, len(df) + 1))
+        return df
+
     def get_op_list(
         self, event_block: str, show_delegated_ops: Optional[bool] = True
     ) -> Dict[str, List[Event]]:
@@ -6,7 +6,18 @@
 
 import math
 from enum import Enum
-from typing import Dict, List, Mapping, Optional, Tuple, TypeAlias, Union
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeAlias,
+    Union,
+)
 
 import executorch.sdk.etdump.schema_flatcc as flatcc
 
@@ -27,6 +38,7 @@ from executorch.sdk.etdump.schema_flatcc import (
 
 from executorch.sdk.etdump.serialize import deserialize_from_etdump_flatcc
 from executorch.sdk.etrecord import ETRecord
+from torch.utils._pytree import tree_flatten
 
 FORWARD = "forward"
 EDGE_DIALECT_GRAPH_KEY = "edge_dialect_graph_module"
@@ -70,6 +82,17 @@ InferenceOutput: TypeAlias = Union[
 ProgramOutput: TypeAlias = List[InferenceOutput]
 
 
+def inference_output_to_tensors(output: InferenceOutput) -> List[torch.Tensor]:
+    """
+    Returns the tensors contained in the given InferenceOutput, in order
+    """
+    if isinstance(output, torch.Tensor):
+        return [output]
+    if isinstance(output, (list, tuple)):
+        return [t for t in output if isinstance(t, torch.Tensor)]
+    return []
+
+
 # Compare whether two InferenceOutputs are equal
 def is_inference_output_equal(
     output1: InferenceOutput, output2: InferenceOutput
@@ -127,8 +150,9 @@ def _parse_tensor_value(
     if tensor.offset is None:
         raise ValueError("Tensor offset cannot be None")
 
+    # Slice through a memoryview so the tensor aliases the buffer instead of copying it
     return torch.frombuffer(
-        output_buffer[tensor.offset : tensor.offset + tensor_bytes_size],
+        memoryview(output_buffer)[tensor.offset : tensor.offset + tensor_bytes_size],
         dtype=torch_dtype,
     ).view(tensor.sizes)
 
@@ -216,25 +240,58 @@ def is_debug_output(value: Value) -> bool:
     return value.output is not None and value.output.bool_val
 
 
-def gen_graphs_from_etrecord(
-    etrecord: ETRecord, enable_module_hierarchy: bool = False
-) -> Mapping[str, OperatorGraph]:
-    op_graph_map = {}
-    if etrecord.graph_map is not None:
-        op_graph_map = {
-            name: FXOperatorGraph.gen_operator_graph(
+class _LazyOperatorGraphMap(Mapping[str, OperatorGraph]):
+    """
+    Mapping from graph names to the OperatorGraphs of an ETRecord, each generated
+    from its ExportedProgram on first access.
+    """
+
+    def __init__(self, etrecord: ETRecord, enable_module_hierarchy: bool) -> None:
+        self._etrecord = etrecord
+        self._enable_module_hierarchy = enable_module_hierarchy
+        self._names: List[str] = (
+            list(etrecord.graph_map.keys()) if etrecord.graph_map is not None else []
+        )
+        self._has_edge_dialect_program: bool = etrecord._is_set(
+            "edge_dialect_program"
+        )
+        if (
+            self._has_edge_dialect_program
+            and EDGE_DIALECT_GRAPH_KEY not in self._names
+        ):
+            self._names.append(EDGE_DIALECT_GRAPH_KEY)
+        self._graphs: Dict[str, OperatorGraph] = {}
+
+    def __getitem__(self, name: str) -> OperatorGraph:
+        if name not in self._graphs:
+            if name == EDGE_DIALECT_GRAPH_KEY and self._has_edge_dialect_program:
+                exported_program = self._etrecord.edge_dialect_program
+            elif name in self._names:
+                exported_program = self._etrecord.graph_map[name]
+            else:
+                raise KeyError(name)
+            self._graphs[name] = FXOperatorGraph.gen_operator_graph(
                 exported_program.graph_module,
-                enable_module_hierarchy=enable_module_hierarchy,
+                enable_module_hierarchy=self._enable_module_hierarchy,
             )
-            for name, exported_program in etrecord.graph_map.items()
-        }
-    if etrecord.edge_dialect_program is not None:
-        op_graph_map[EDGE_DIALECT_GRAPH_KEY] = FXOperatorGraph.gen_operator_graph(
-            etrecord.edge_dialect_program.graph_module,
-            enable_module_hierarchy=enable_module_hierarchy,
-        )
+        return self._graphs[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
 
-    return op_graph_map
+def gen_graphs_from_etrecord(
+    etrecord: ETRecord, enable_module_hierarchy: bool = False
+) -> Mapping[str, OperatorGraph]:
+    """
+    Returns the OperatorGraphs of the graphs of an ETRecord and of its edge dialect
+    program, by name. Each graph is only generated, and its program deserialized,
+    the first time it is accessed.
+    """
+    return _LazyOperatorGraphMap(etrecord, enable_module_hierarchy)
 
 
 def create_debug_handle_to_op_node_mapping(
@@ -268,10 +325,15 @@ def create_debug_handle_to_op_node_mapping(
     return debug_handle_to_op_node_map
 
 
-def gen_etdump_object(etdump_path: Optional[str] = None) -> ETDumpFlatCC:
+def gen_etdump_object(
+    etdump_path: Optional[str] = None,
+    etdump_data: Optional[Union[bytes, memoryview]] = None,
+) -> ETDumpFlatCC:
     # Gen event blocks from etdump
+    if etdump_data is not None:
+        return deserialize_from_etdump_flatcc(etdump_data)
     if etdump_path is None:
-        raise ValueError("Etdump_path must be specified.")
+        raise ValueError("Either etdump_path or etdump_data must be specified.")
     with open(etdump_path, "rb") as buff:
         etdump = deserialize_from_etdump_flatcc(buff.read())
         return etdump
@@ -322,70 +384,164 @@ def plot_metric(result: List[float], metric_name: str):
     plt.show()
 
 
-def calculate_mse(ref_values: ProgramOutput, values: ProgramOutput):
-    def mean_squared_error(a: torch.Tensor, b: torch.Tensor):
-        return round((torch.pow((a - b).to(torch.float32), 2)).mean().item(), 2)
+SUPPORTED_METRICS = ["snr", "mse", "cosine_similarity"]
 
-    results = []
-    for ref_value, value in zip(ref_values, values):
-        # TODO T171811011: extend the implementation of each metrics function to support value types other than tensor type
-        if isinstance(ref_value, torch.Tensor) and isinstance(value, torch.Tensor):
-            results.append(mean_squared_error(ref_value, value))
-        else:
-            results.append(None)
 
-    return results
+def _flatten_to_float_tensors(
+    ref_value: torch.Tensor, value: torch.Tensor
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    if ref_value.shape != value.shape:
+        ref_value, value = torch.broadcast_tensors(ref_value, value)
+    return (
+        ref_value.detach().reshape(-1).to(torch.float64),
+        value.detach().reshape(-1).to(torch.float64),
+    )
 
 
-def calculate_snr(ref_values: ProgramOutput, values: ProgramOutput):
-    def signal_to_noise(signal: torch.Tensor, noise: torch.Tensor):
-        signal = signal.type(torch.float32)
-        noise = noise.type(torch.float32)
-        signal_power = torch.mean(torch.pow(signal, 2))
-        noise_power = torch.mean(torch.pow(noise, 2))
-        snr = 10 * torch.log10(signal_power / noise_power)
-        return round(snr.item(), 2)
-
-    results = []
-    for ref_value, value in zip(ref_values, values):
-        # TODO T171811011: extend the implementation of each metrics function to support value types other than tensor type
-        if isinstance(ref_value, torch.Tensor) and isinstance(value, torch.Tensor):
-            diff = ref_value - value
-            snr = signal_to_noise(ref_value, diff)
-            results.append(snr)
-        else:
-            results.append(None)
+def calculate_batched_metrics(
+    ref_tensors: Sequence[torch.Tensor],
+    tensors: Sequence[torch.Tensor],
+    segment_ids: Optional[Sequence[int]] = None,
+    metrics: Optional[Sequence[str]] = None,
+) -> Dict[str, torch.Tensor]:
+    """
+    Computes the requested metrics for many (reference, value) tensor pairs with a
+    handful of batched torch ops instead of one Python iteration per pair.
+
+    All pairs are flattened into a single buffer and reduced per segment. By default
+    each pair is its own segment; pass segment_ids to reduce several pairs together
+    (e.g. all the outputs of one debug event).
 
+    Args:
+        ref_tensors: Reference tensors.
+        tensors: Tensors to compare against the references, pairwise.
+        segment_ids: Optional segment index of each pair. Segments must be numbered 0..N-1.
+        metrics: List of requested metric names. Defaults to all available metrics.
+
+    Returns:
+        Dictionary of metric names to float64 tensors with one entry per segment.
+    """
+    if len(ref_tensors) != len(tensors):
+        raise ValueError(
+            f"Expected the same number of reference and run tensors, got {len(ref_tensors)} and {len(tensors)}"
+        )
+    for metric in metrics or []:
+        if metric not in SUPPORTED_METRICS:
+            raise ValueError(f"Unsupported metric {metric}")
+
+    if segment_ids is None:
+        segment_ids = range(len(tensors))
+    num_segments = max(segment_ids, default=-1) + 1
+
+    flat_refs, flat_values = [], []
+    for ref_tensor, tensor in zip(ref_tensors, tensors):
+        flat_ref, flat_value = _flatten_to_float_tensors(ref_tensor, tensor)
+        flat_refs.append(flat_ref)
+        flat_values.append(flat_value)
+
+    lengths = torch.tensor([t.numel() for t in flat_refs], dtype=torch.long)
+    index = torch.repeat_interleave(
+        torch.as_tensor(list(segment_ids), dtype=torch.long), lengths
+    )
+    ref = torch.cat(flat_refs) if flat_refs else torch.zeros(0, dtype=torch.float64)
+    value = (
+        torch.cat(flat_values) if flat_values else torch.zeros(0, dtype=torch.float64)
+    )
+
+    def segment_sum(x: torch.Tensor) -> torch.Tensor:
+        return torch.zeros(num_segments, dtype=torch.float64).index_add_(0, index, x)
+
+    counts = segment_sum(torch.ones_like(ref))
+    ref_power = segment_sum(ref * ref)
+    noise_power = segment_sum(torch.pow(ref - value, 2))
+
+    results = {}
+    if metrics is None or "snr" in metrics:
+        # Exact matches, including all-zero references, have an snr of inf, and
+        # any error on an all-zero reference has an snr of -inf, instead of nan.
+        results["snr"] = torch.where(
+            noise_power == 0, math.inf, 10 * torch.log10(ref_power / noise_power)
+        )
+    if metrics is None or "mse" in metrics:
+        results["mse"] = noise_power / counts
+    if metrics is None or "cosine_similarity" in metrics:
+        norms = torch.sqrt(ref_power * segment_sum(value * value))
+        # Two all-zero segments are identical, an all-zero segment is
+        # orthogonal to any other.
+        results["cosine_similarity"] = torch.where(
+            norms == 0,
+            (noise_power == 0).to(torch.float64),
+            segment_sum(ref * value) / norms,
+        )
     return results
 
 
-def calculate_cosine_similarity(ref_values: ProgramOutput, values: ProgramOutput):
-    def cosine_similarity(tensor1: torch.Tensor, tensor2: torch.Tensor):
-        # Ensure that the tensors have the same shape
-        if tensor1.shape != tensor2.shape:
-            raise ValueError("Input tensors must have the same shape")
+def _calculate_metric(
+    metric: str, ref_values: ProgramOutput, values: ProgramOutput
+) -> List[Optional[float]]:
+    # TODO T171811011: extend the implementation of each metrics function to support value types other than tensor type
+    tensor_indices = [
+        index
+        for index, (ref_value, value) in enumerate(zip(ref_values, values))
+        if isinstance(ref_value, torch.Tensor) and isinstance(value, torch.Tensor)
+    ]
+    metric_values = calculate_batched_metrics(
+        [ref_values[index] for index in tensor_indices],
+        [values[index] for index in tensor_indices],
+        metrics=[metric],
+    )[metric].tolist()
+
+    results: List[Optional[float]] = [None] * min(len(ref_values), len(values))
+    for index, metric_value in zip(tensor_indices, metric_values):
+        results[index] = round(metric_value, 2)
+    return results
 
-        # Calculate the dot product
-        dot_product = torch.sum(tensor1 * tensor2)
 
-        # Calculate the magnitudes
-        magnitude1 = torch.sqrt(torch.sum(torch.pow(tensor1, 2)))
-        magnitude2 = torch.sqrt(torch.sum(torch.pow(tensor2, 2)))
+def calculate_mse(ref_values: ProgramOutput, values: ProgramOutput):
+    return _calculate_metric("mse", ref_values, values)
 
-        # Calculate the cosine similarity
-        similarity = dot_product / (magnitude1 * magnitude2)
 
-        return round(similarity.item(), 2)  # Convert the result to a Python float
+def calculate_snr(ref_values: ProgramOutput, values: ProgramOutput):
+    return _calculate_metric("snr", ref_values, values)
+
 
-    results = []
+def calculate_cosine_similarity(ref_values: ProgramOutput, values: ProgramOutput):
     for ref_value, value in zip(ref_values, values):
-        # TODO T171811011: extend the implementation of each metrics function to support value types other than tensor type
-        if isinstance(ref_value, torch.Tensor) and isinstance(value, torch.Tensor):
-            results.append(cosine_similarity(ref_value, value))
-        else:
-            results.append(None)
+        # Ensure that the tensors have the same shape
+        if (
+            isinstance(ref_value, torch.Tensor)
+            and isinstance(value, torch.Tensor)
+            and ref_value.shape != value.shape
+        ):
+            raise ValueError("Input tensors must have the same shape")
+    return _calculate_metric("cosine_similarity", ref_values, values)
 
-    return results
+
+def capture_intermediate_outputs(
+    graph_module: torch.fx.GraphModule, inputs: Sequence[Any]
+) -> Dict[int, InferenceOutput]:
+    """
+    Runs the graph module eagerly on the given inputs and returns the output of every
+    node carrying a debug handle, keyed by that debug handle. The result can be used
+    as the reference for the intermediate outputs logged in ETDump.
+    """
+    intermediate_outputs: Dict[int, InferenceOutput] = {}
+
+    class _IntermediateOutputCapturer(torch.fx.Interpreter):
+        def run_node(self, node: torch.fx.Node) -> Any:
+            result = super().run_node(node)
+            if (debug_handle := node.meta.get("debug_handle")) is not None:
+                if isinstance(result, torch.Tensor):
+                    intermediate_outputs[debug_handle] = result.detach()
+                elif isinstance(result, (list, tuple)) and all(
+                    isinstance(r, torch.Tensor) for r in result
+                ):
+                    intermediate_outputs[debug_handle] = [r.detach() for r in result]
+            return result
+
+    with torch.no_grad():
+        _IntermediateOutputCapturer(graph_module).run(*tree_flatten(inputs)[0])
+    return intermediate_outputs
 
 
 def compare_results(
@@ -0,0 +1,523 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Structural performance analysis of ETDump runs: attribution of wall time to
+framework / kernel / delegate categories, critical path through the operator
+dependency graph and roofline estimates for individual operators. Also
+lightweight aggregation of in-memory ETDumps, for sampled profiling in
+production.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from executorch.sdk.debug_format.base_schema import Node, OperatorGraph, OperatorNode
+from executorch.sdk.etdump.serialize import deserialize_from_etdump_flatcc
+from executorch.sdk.inspector._inspector import Event, EventBlock, Inspector
+from executorch.sdk.inspector._inspector_utils import (
+    create_debug_handle_to_op_node_mapping,
+    EDGE_DIALECT_GRAPH_KEY,
+    TIME_SCALE_DICT,
+    TimeScale,
+)
+
+METHOD_EXECUTE = "Method::execute"
+OPERATOR_CALL = "OPERATOR_CALL"
+DELEGATE_CALL = "DELEGATE_CALL"
+INSTRUCTION_EVENT_NAMES = {OPERATOR_CALL, DELEGATE_CALL}
+
+# Machine balance (FLOPs per byte) used to classify ops as memory or compute bound
+# when the peak throughput of the target is not provided.
+DEFAULT_MACHINE_BALANCE = 10.0
+
+# Bytes per element for dtypes recorded in the operator graph. Unknown dtypes
+# are assumed to be 4 bytes wide.
+_DTYPE_SIZES = {
+    "bool": 1,
+    "uint8": 1,
+    "int8": 1,
+    "float16": 2,
+    "bfloat16": 2,
+    "int16": 2,
+    "float32": 4,
+    "int32": 4,
+    "float64": 8,
+    "int64": 8,
+}
+_DEFAULT_DTYPE_SIZE = 4
+
+# Ops whose FLOPs are computed as 2 * output elements * reduction size, mapped to
+# the index of the input whose last dimension is the reduction dimension.
+_MATMUL_OPS = {"addmm": 1, "bmm": 0, "linear": 0, "matmul": 0, "mm": 0}
+_CONVOLUTION_OPS = {"convolution", "conv1d", "conv2d"}
+
+
+@dataclass
+class RunTimeBreakdown:
+    """
+    Wall time of one run of an EventBlock attributed to categories, in the
+    target time scale of the EventBlock.
+
+    Args:
+        wall_time: Duration of Method::execute.
+        kernel: Time spent inside kernels, as reported by the kernel profiling events.
+        framework_tax: Time spent in OPERATOR_CALL outside of the kernels (argument
+            marshaling, dispatch, ...). Zero if kernels are not individually profiled.
+        delegate: Time spent in DELEGATE_CALL, including the delegate's own overhead.
+        unattributed: Remaining wall time spent between instructions (instruction
+            dispatch loop, moves, jumps, idle gaps).
+    """
+
+    wall_time: float
+    kernel: float
+    framework_tax: float
+    delegate: float
+    unattributed: float
+
+
+@dataclass
+class OpCost:
+    """
+    Cost estimate of a single instruction (operator or delegate call).
+
+    Args:
+        name: Name of the instruction's event.
+        instruction_id: Instruction id of the event.
+        op_types: Op types of the operator graph nodes associated with the instruction.
+        latency: Median latency of the instruction across runs, in the target time scale.
+        bytes_accessed: Estimated bytes read and written, if tensor sizes are known.
+        flops: Estimated floating point operations, if tensor sizes are known.
+        achieved_bytes_per_s: bytes_accessed divided by the latency.
+        achieved_flops_per_s: flops divided by the latency.
+        arithmetic_intensity: flops per byte accessed.
+        bound: "memory" or "compute" based on the arithmetic intensity vs machine balance.
+        on_critical_path: Whether the instruction lies on the critical path.
+    """
+
+    name: str
+    instruction_id: Optional[int]
+    op_types: List[str] = field(default_factory=list)
+    latency: float = 0.0
+    bytes_accessed: Optional[int] = None
+    flops: Optional[int] = None
+    achieved_bytes_per_s: Optional[float] = None
+    achieved_flops_per_s: Optional[float] = None
+    arithmetic_intensity: Optional[float] = None
+    bound: Optional[str] = None
+    on_critical_path: bool = False
+
+
+@dataclass
+class BottleneckAnalysis:
+    """
+    Result of analyzing one EventBlock.
+
+    Args:
+        event_block_name: Name of the analyzed EventBlock.
+        runs: Time breakdown of each run in the EventBlock.
+        ops: Cost of each instruction, in execution order.
+        critical_path: Instructions on the longest dependency chain, in execution order.
+        critical_path_length: Sum of the latencies on the critical path.
+    """
+
+    event_block_name: str
+    runs: List[RunTimeBreakdown]
+    ops: List[OpCost]
+    critical_path: List[OpCost]
+    critical_path_length: float
+
+    @property
+    def parallelism(self) -> float:
+        """
+        Total instruction time divided by the critical path length, i.e. the speedup
+        achievable if independent instructions could run concurrently.
+        """
+        total = sum(op.latency for op in self.ops)
+        return total / self.critical_path_length if self.critical_path_length else 1.0
+
+    def breakdown_to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns a pandas DataFrame with one row per run and one column per time category.
+        """
+        return pd.DataFrame([vars(run) for run in self.runs])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns a pandas DataFrame with one row per instruction, sorted by latency.
+        """
+        df = pd.DataFrame([vars(op) for op in self.ops])
+        if df.empty:
+            return df
+        return df.sort_values(by="latency", ascending=False).reset_index(drop=True)
+
+
+@dataclass
+class OpTiming:
+    """
+    Aggregated durations of the profiling events sharing a key, in the target time scale.
+
+    Args:
+        count: Number of events.
+        total: Sum of their durations.
+        min: Shortest duration.
+        max: Longest duration.
+    """
+
+    count: int
+    total: float
+    min: float
+    max: float
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+
+def _median(event: Optional[Event]) -> float:
+    if event is None or event.perf_data is None:
+        return 0.0
+    return float(event.perf_data.p50)
+
+
+def _run_values(event: Optional[Event], num_runs: int) -> np.ndarray:
+    if event is None or event.perf_data is None:
+        return np.zeros(num_runs)
+    raw = np.asarray(event.perf_data.raw, dtype=np.float64)
+    # Events present in only some runs of the block are spread evenly
+    if len(raw) != num_runs:
+        return np.full(num_runs, raw.mean() if len(raw) else 0.0)
+    return raw
+
+
+def _compute_run_breakdown(event_block: EventBlock) -> List[RunTimeBreakdown]:
+    events = event_block.events
+    num_runs = max(
+        (len(e.perf_data.raw) for e in events if e.perf_data is not None), default=0
+    )
+    if num_runs == 0:
+        return []
+
+    operator_calls = np.zeros(num_runs)
+    delegate_calls = np.zeros(num_runs)
+    kernels = np.zeros(num_runs)
+    profiled_kernel_instructions = set()
+    wall_time = None
+    for event in events:
+        if event.name == METHOD_EXECUTE:
+            wall_time = _run_values(event, num_runs)
+        elif event.name == OPERATOR_CALL:
+            operator_calls += _run_values(event, num_runs)
+        elif event.name == DELEGATE_CALL:
+            delegate_calls += _run_values(event, num_runs)
+        elif (
+            not event.is_delegated_op
+            and event._instruction_id is not None
+            and event._instruction_id >= 0
+            and event.perf_data is not None
+        ):
+            # Kernel events are nested inside the OPERATOR_CALL of their instruction
+            kernels += _run_values(event, num_runs)
+            profiled_kernel_instructions.add(event._instruction_id)
+
+    if not profiled_kernel_instructions:
+        # Without kernel level events the whole OPERATOR_CALL is attributed to the kernel
+        kernels = operator_calls
+    framework_tax = np.maximum(operator_calls - kernels, 0.0)
+    if wall_time is None:
+        wall_time = operator_calls + delegate_calls
+    unattributed = np.maximum(wall_time - operator_calls - delegate_calls, 0.0)
+
+    return [
+        RunTimeBreakdown(
+            wall_time=float(wall_time[i]),
+            kernel=float(kernels[i]),
+            framework_tax=float(framework_tax[i]),
+            delegate=float(delegate_calls[i]),
+            unattributed=float(unattributed[i]),
+        )
+        for i in range(num_runs)
+    ]
+
+
+def _dtype_size(node: Node) -> int:
+    dtype = str(getattr(node, "dtype", ""))
+    # Check longer names first so that e.g. "bfloat16" does not match "float16"
+    for name in sorted(_DTYPE_SIZES, key=len, reverse=True):
+        if name in dtype:
+            return _DTYPE_SIZES[name]
+    return _DEFAULT_DTYPE_SIZE
+
+
+def _tensor_bytes(node: Node) -> int:
+    if not node.output_shapes:
+        return 0
+    return sum(math.prod(shape) for shape in node.output_shapes) * _dtype_size(node)
+
+
+def _estimate_flops(op_node: OperatorNode) -> Optional[int]:
+    if not op_node.output_shapes:
+        return None
+    output_numel = math.prod(op_node.output_shapes[0])
+    op_name = (op_node.op or "").split(".")
+    base_name = op_name[-2] if len(op_name) > 1 else op_name[0]
+    input_shapes = [
+        node.output_shapes[0] if node.output_shapes else None
+        for node in (op_node.inputs or [])
+    ]
+
+    if base_name in _MATMUL_OPS:
+        index = _MATMUL_OPS[base_name]
+        if len(input_shapes) > index and input_shapes[index]:
+            return 2 * output_numel * input_shapes[index][-1]
+    elif base_name in _CONVOLUTION_OPS:
+        if len(input_shapes) > 1 and input_shapes[1]:
+            # Weight is [C_out, C_in / groups, *kernel_size]
+            return 2 * output_numel * math.prod(input_shapes[1][1:])
+    # Treat everything else as elementwise
+    return output_numel
+
+
+def _estimate_op_cost(
+    op_cost: OpCost,
+    op_nodes: Sequence[OperatorNode],
+    time_scale: TimeScale,
+    machine_balance: float,
+) -> None:
+    """
+    Populates the roofline related fields of op_cost from the tensor sizes of op_nodes
+    """
+    if not op_nodes:
+        return
+    op_node_names = {node.name for node in op_nodes}
+    bytes_accessed = 0
+    flops = 0
+    for node in op_nodes:
+        # Tensors flowing between nodes of the same instruction stay internal to it
+        bytes_accessed += sum(
+            _tensor_bytes(input_node)
+            for input_node in (node.inputs or [])
+            if input_node.name not in op_node_names
+        )
+        bytes_accessed += _tensor_bytes(node)
+        if (node_flops := _estimate_flops(node)) is not None:
+            flops += node_flops
+    op_cost.bytes_accessed = bytes_accessed
+    op_cost.flops = flops
+    if bytes_accessed > 0:
+        op_cost.arithmetic_intensity = flops / bytes_accessed
+        op_cost.bound = (
+            "compute" if op_cost.arithmetic_intensity >= machine_balance else "memory"
+        )
+
+    if time_scale == TimeScale.CYCLES or op_cost.latency <= 0:
+        return
+    seconds = op_cost.latency / TIME_SCALE_DICT[time_scale]
+    op_cost.achieved_bytes_per_s = bytes_accessed / seconds
+    op_cost.achieved_flops_per_s = flops / seconds
+
+
+def _compute_critical_path(
+    ops: List[OpCost], op_nodes: List[List[OperatorNode]]
+) -> Tuple[List[OpCost], float]:
+    """
+    Longest path through the instruction dependency graph, with instructions in
+    execution (and therefore topological) order. Without operator graph information
+    each instruction is assumed to depend on the previous one.
+    """
+    if not ops:
+        return [], 0.0
+
+    producers: Dict[str, int] = {}
+    finish: List[float] = []
+    predecessor: List[Optional[int]] = []
+    for index, (op, nodes) in enumerate(zip(ops, op_nodes)):
+        if nodes:
+            dependencies = {
+                producers[input_node.name]
+                for node in nodes
+                for input_node in (node.inputs or [])
+                if input_node.name in producers
+            }
+        else:
+            dependencies = {index - 1} if index > 0 else set()
+        best = max(dependencies, key=lambda d: finish[d], default=None)
+        finish.append(op.latency + (finish[best] if best is not None else 0.0))
+        predecessor.append(best)
+        for node in nodes:
+            producers[node.name] = index
+
+    current: Optional[int] = int(np.argmax(finish))
+    length = finish[current]
+    path = []
+    while current is not None:
+        ops[current].on_critical_path = True
+        path.append(ops[current])
+        current = predecessor[current]
+    return list(reversed(path)), length
+
+
+def analyze_event_block(
+    event_block: EventBlock,
+    op_graph: Optional[OperatorGraph] = None,
+    machine_balance: float = DEFAULT_MACHINE_BALANCE,
+) -> BottleneckAnalysis:
+    """
+    Attributes the wall time of each run of the EventBlock to time categories, estimates
+    the cost of each instruction and computes the critical path through the instructions.
+
+    Args:
+        event_block: EventBlock to analyze. Its events should have debug handles resolved
+            (i.e. come from an Inspector constructed with an ETRecord) for the roofline
+            estimates and the dependency based critical path.
+        op_graph: Operator graph of the Edge Dialect program, used to look up tensor sizes
+            and data dependencies.
+        machine_balance: Peak FLOPs per byte of the target, used to classify instructions
+            as memory or compute bound.
+
+    Returns:
+        A BottleneckAnalysis for the EventBlock.
+    """
+    debug_handle_to_op_node = (
+        create_debug_handle_to_op_node_mapping(op_graph) if op_graph is not None else {}
+    )
+
+    ops: List[OpCost] = []
+    op_nodes: List[List[OperatorNode]] = []
+    for event in event_block.events:
+        if event.name not in INSTRUCTION_EVENT_NAMES:
+            continue
+        handles = event.debug_handles
+        if handles is None:
+            handles = []
+        elif isinstance(handles, int):
+            handles = [handles]
+        nodes = [
+            debug_handle_to_op_node[handle]
+            for handle in handles
+            if handle in debug_handle_to_op_node
+        ]
+        op_cost = OpCost(
+            name=event.name,
+            instruction_id=event._instruction_id,
+            op_types=[node.op for node in nodes if node.op] or list(event.op_types),
+            latency=_median(event),
+        )
+        if event.name == OPERATOR_CALL:
+            _estimate_op_cost(
+                op_cost, nodes, event_block.target_time_scale, machine_balance
+            )
+        ops.append(op_cost)
+        op_nodes.append(nodes)
+
+    critical_path, critical_path_length = _compute_critical_path(ops, op_nodes)
+    return BottleneckAnalysis(
+        event_block_name=event_block.name,
+        runs=_compute_run_breakdown(event_block),
+        ops=ops,
+        critical_path=critical_path,
+        critical_path_length=critical_path_length,
+    )
+
+
+def analyze_bottlenecks(
+    inspector: Inspector,
+    peak_flops_per_s: Optional[float] = None,
+    peak_bytes_per_s: Optional[float] = None,
+) -> List[BottleneckAnalysis]:
+    """
+    Runs analyze_event_block over every EventBlock of the Inspector that contains instructions,
+    using the Edge Dialect operator graph from the Inspector's ETRecord if available.
+
+    Args:
+        inspector: Inspector to analyze.
+        peak_flops_per_s: Optional peak compute throughput of the target.
+        peak_bytes_per_s: Optional peak memory bandwidth of the target.
+            The peaks must be provided together, and their ratio is used as the
+            machine balance. Without them, DEFAULT_MACHINE_BALANCE is used.
+
+    Returns:
+        A list of BottleneckAnalysis, one per analyzed EventBlock.
+    """
+    if (peak_flops_per_s is None) != (peak_bytes_per_s is None):
+        raise ValueError(
+            "peak_flops_per_s and peak_bytes_per_s must be provided together, got "
+            f"{peak_flops_per_s} and {peak_bytes_per_s}"
+        )
+    if peak_flops_per_s is not None and peak_bytes_per_s is not None:
+        if peak_flops_per_s <= 0 or peak_bytes_per_s <= 0:
+            raise ValueError(
+                "peak_flops_per_s and peak_bytes_per_s must be positive, got "
+                f"{peak_flops_per_s} and {peak_bytes_per_s}"
+            )
+        machine_balance = peak_flops_per_s / peak_bytes_per_s
+    else:
+        machine_balance = DEFAULT_MACHINE_BALANCE
+    op_graph = (
+        inspector.op_graph_dict.get(EDGE_DIALECT_GRAPH_KEY)
+        if inspector.op_graph_dict is not None
+        else None
+    )
+    return [
+        analyze_event_block(event_block, op_graph, machine_balance)
+        for event_block in inspector.event_blocks
+        if any(event.name in INSTRUCTION_EVENT_NAMES for event in event_block.events)
+    ]
+
+
+def summarize_op_timings(
+    etdump_data: Union[bytes, memoryview],
+    source_time_scale: TimeScale = TimeScale.NS,
+    target_time_scale: TimeScale = TimeScale.MS,
+) -> Dict[str, OpTiming]:
+    """
+    Aggregates the profiling events of an in-memory ETDump, e.g. the one passed
+    to the callback of ExecuTorchModule.set_etdump_callback(), without building
+    an Inspector.
+
+    Events are keyed by name, so kernel events (e.g. "native_call_add.out") and
+    delegate events are aggregated per op. OPERATOR_CALL and DELEGATE_CALL
+    events are generic, and are keyed by their instruction id instead, e.g.
+    "OPERATOR_CALL[3]".
+
+    Args:
+        etdump_data: Serialized, size prefixed ETDump.
+        source_time_scale: Time scale of the timestamps recorded by the runtime.
+        target_time_scale: Time scale of the returned durations.
+
+    Returns:
+        A mapping from event key to the aggregated durations of its events.
+    """
+    scale_factor = (
+        TIME_SCALE_DICT[source_time_scale] / TIME_SCALE_DICT[target_time_scale]
+    )
+    timings: Dict[str, OpTiming] = {}
+    for run_data in deserialize_from_etdump_flatcc(etdump_data).run_data:
+        for event in run_data.events or []:
+            profile_event = event.profile_event
+            if profile_event is None:
+                continue
+            name = profile_event.name
+            if name is None:
+                name = f"delegate_{profile_event.delegate_debug_id_int}"
+            elif name in INSTRUCTION_EVENT_NAMES:
+                name = f"{name}[{profile_event.instruction_id}]"
+            duration = (
+                profile_event.end_time - profile_event.start_time
+            ) / scale_factor
+            timing = timings.get(name)
+            if timing is None:
+                timings[name] = OpTiming(1, duration, duration, duration)
+            else:
+                timing.count += 1
+                timing.total += duration
+                timing.min = min(timing.min, duration)
+                timing.max = max(timing.max, duration)
+    return timings
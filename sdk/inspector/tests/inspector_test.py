@@ -14,6 +14,8 @@ from typing import List
 
 from unittest.mock import patch
 
+import torch
+
 from executorch.exir import ExportedProgram
 from executorch.sdk import generate_etrecord, parse_etrecord
 from executorch.sdk.debug_format.et_schema import OperatorNode
@@ -275,6 +277,34 @@ class TestInspector(unittest.TestCase):
                     )
                 )
 
+    def test_inspector_close(self):
+        with patch.object(
+            _inspector, "gen_etdump_object", return_value=None
+        ), patch.object(EventBlock, "_gen_from_etdump", return_value=[]), patch.object(
+            Inspector, "_consume_etrecord"
+        ):
+            captured_output, edge_output, et_output = TestETRecord().get_test_model()
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                etrecord_path = tmpdirname + "/etrecord.bin"
+                generate_etrecord(etrecord_path, edge_output, et_output)
+
+                # An ETRecord opened by the Inspector is closed with it.
+                with Inspector(
+                    etdump_path=ETDUMP_PATH, etrecord=etrecord_path
+                ) as inspector_instance:
+                    etrecord = inspector_instance._etrecord
+                    self.assertIsNotNone(etrecord._archive)
+                self.assertIsNone(etrecord._archive)
+
+                # An ETRecord passed in by the caller is left open.
+                etrecord = parse_etrecord(etrecord_path)
+                Inspector(etdump_path=ETDUMP_PATH, etrecord=etrecord).close()
+                self.assertIsNotNone(etrecord._archive)
+                self.assertTrue(
+                    isinstance(etrecord.edge_dialect_program, ExportedProgram)
+                )
+                etrecord.close()
+
     def test_populate_debugging_related_fields_raises_for_inconsistent_events(self):
         ret_event: Event = Event(
             name="event",
@@ -401,6 +431,62 @@ class TestInspector(unittest.TestCase):
                 events=events,
             )
 
+    def test_calculate_numerical_divergence(self):
+        with patch.object(
+            _inspector, "parse_etrecord", return_value=None
+        ), patch.object(
+            _inspector, "gen_etdump_object", return_value=None
+        ), patch.object(
+            EventBlock, "_gen_from_etdump"
+        ), patch.object(
+            _inspector, "gen_graphs_from_etrecord"
+        ):
+            inspector_instance = Inspector(
+                etdump_path=ETDUMP_PATH,
+                etrecord=ETRECORD_PATH,
+            )
+
+            reference = {
+                0: torch.ones(4),
+                1: torch.full((4,), 2.0),
+                2: torch.full((4,), 3.0),
+            }
+            # op_1 introduces the error, op_2 only propagates it
+            runtime = {
+                0: torch.ones(4),
+                1: torch.tensor([2.0, 2.0, 2.0, 3.0]),
+                2: torch.tensor([3.0, 3.0, 3.0, 4.0]),
+            }
+            inspector_instance.event_blocks = [
+                EventBlock(
+                    name=EVENT_BLOCK_NAME,
+                    bundled_input_index=index,
+                    events=[
+                        Event(
+                            name=f"op_{handle}",
+                            debug_handles=handle,
+                            debug_data=[runtime[handle]],
+                            _instruction_id=handle,
+                        )
+                        for handle in range(3)
+                    ],
+                )
+                for index in range(2)
+            ]
+
+            df = inspector_instance.calculate_numerical_divergence(
+                reference_intermediate_outputs={0: reference, 1: reference},
+                metric="mse",
+                threshold=0.1,
+            )
+
+            self.assertEqual(len(df), 3)
+            self.assertEqual(df["event_name"][0], "op_1")
+            self.assertTrue(df["first_divergence"][0])
+            self.assertEqual(df["first_divergence"].sum(), 1)
+            self.assertEqual(df["num_inputs"].tolist(), [2, 2, 2])
+            self.assertEqual(df["rank"].tolist(), [1, 2, 3])
+
     def _gen_random_float_list(self) -> List[float]:
         return [random.uniform(0, 10) for _ in range(RAW_DATA_SIZE)]
 
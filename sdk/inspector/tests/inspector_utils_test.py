@@ -4,6 +4,7 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import math
 import tempfile
 import unittest
 from typing import Dict, Tuple
@@ -23,6 +24,10 @@ from executorch.sdk.etdump import schema_flatcc as flatcc
 
 from executorch.sdk.etrecord.tests.etrecord_test import TestETRecord
 from executorch.sdk.inspector._inspector_utils import (
+    calculate_batched_metrics,
+    calculate_cosine_similarity,
+    calculate_mse,
+    calculate_snr,
     create_debug_handle_to_op_node_mapping,
     EDGE_DIALECT_GRAPH_KEY,
     find_populated_event,
@@ -56,6 +61,31 @@ class TestInspectorUtils(unittest.TestCase):
             )
             self.assertTrue(isinstance(graphs[EDGE_DIALECT_GRAPH_KEY], FXOperatorGraph))
 
+    def test_gen_graphs_from_etrecord_is_lazy(self):
+        captured_output, edge_output, et_output = TestETRecord().get_test_model()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            generate_etrecord(
+                tmpdirname + "/etrecord.bin",
+                edge_output,
+                et_output,
+                {
+                    "aten_dialect_output": captured_output,
+                },
+            )
+
+            with parse_etrecord(tmpdirname + "/etrecord.bin") as etrecord:
+                graphs = gen_graphs_from_etrecord(etrecord)
+                self.assertEqual(
+                    set(graphs), {"aten_dialect_output/forward", EDGE_DIALECT_GRAPH_KEY}
+                )
+                # Listing the graphs does not deserialize their programs.
+                self.assertIn("edge_dialect_program", etrecord._loaders)
+                self.assertEqual(etrecord.graph_map._loaded, {})
+
+                graphs[EDGE_DIALECT_GRAPH_KEY]
+                self.assertNotIn("edge_dialect_program", etrecord._loaders)
+                self.assertEqual(etrecord.graph_map._loaded, {})
+
     def test_create_debug_handle_to_op_node_mapping(self):
         graph, expected_mapping = gen_mock_operator_graph_with_expected_map()
         debug_handle_to_op_node_map = create_debug_handle_to_op_node_mapping(graph)
@@ -168,6 +198,55 @@ class TestInspectorUtils(unittest.TestCase):
             )
         )
 
+    def test_calculate_batched_metrics_matches_per_tensor_metrics(self):
+        ref_tensors = [torch.randn(4, 3), torch.randn(7), torch.randn(2, 2, 2)]
+        tensors = [t + 0.1 * torch.randn(t.shape) for t in ref_tensors]
+
+        results = calculate_batched_metrics(ref_tensors, tensors)
+
+        for index, (ref, value) in enumerate(zip(ref_tensors, tensors)):
+            ref, value = ref.double(), value.double()
+            mse = torch.mean((ref - value) ** 2)
+            snr = 10 * torch.log10(torch.mean(ref**2) / mse)
+            cosine = torch.sum(ref * value) / (ref.norm() * value.norm())
+            self.assertAlmostEqual(results["mse"][index].item(), mse.item())
+            self.assertAlmostEqual(results["snr"][index].item(), snr.item())
+            self.assertAlmostEqual(
+                results["cosine_similarity"][index].item(), cosine.item()
+            )
+
+    def test_calculate_batched_metrics_reduces_over_segments(self):
+        ref_tensors = [torch.tensor([1.0, 2.0]), torch.tensor([3.0])]
+        tensors = [torch.tensor([1.0, 2.0]), torch.tensor([2.0])]
+
+        results = calculate_batched_metrics(
+            ref_tensors, tensors, segment_ids=[0, 0], metrics=["mse"]
+        )
+
+        self.assertEqual(list(results.keys()), ["mse"])
+        self.assertEqual(results["mse"].tolist(), [1.0 / 3.0])
+
+    def test_calculate_batched_metrics_zero_noise_and_zero_reference(self):
+        ref_tensors = [torch.zeros(3), torch.ones(3), torch.zeros(3)]
+        tensors = [torch.zeros(3), torch.ones(3), torch.ones(3)]
+
+        results = calculate_batched_metrics(ref_tensors, tensors)
+
+        self.assertEqual(results["snr"].tolist(), [math.inf, math.inf, -math.inf])
+        self.assertEqual(results["mse"].tolist(), [0.0, 0.0, 1.0])
+        self.assertEqual(results["cosine_similarity"].tolist(), [1.0, 1.0, 0.0])
+
+    def test_calculate_metrics_skip_non_tensor_values(self):
+        ref_values = [torch.tensor([1.0, 2.0]), 1, torch.tensor([3.0, 4.0])]
+        values = [torch.tensor([1.0, 3.0]), 1, torch.tensor([3.0, 4.0])]
+
+        self.assertEqual(calculate_mse(ref_values, values), [0.5, None, 0.0])
+        self.assertEqual(calculate_snr(ref_values, values)[1], None)
+        self.assertEqual(calculate_snr(ref_values, values)[2], float("inf"))
+        self.assertEqual(
+            calculate_cosine_similarity(ref_values, values), [0.99, None, 1.0]
+        )
+
 
 def gen_mock_operator_graph_with_expected_map() -> (
     Tuple[OperatorGraph, Dict[int, OperatorNode]]
@@ -0,0 +1,212 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import struct
+import unittest
+from typing import List, Optional
+from unittest.mock import MagicMock
+
+import executorch.sdk.etdump.schema_flatcc as flatcc
+
+from executorch.sdk.debug_format.base_schema import (
+    OperatorGraph,
+    OperatorNode,
+    ValueNode,
+)
+from executorch.sdk.etdump.serialize import serialize_to_etdump_flatcc
+from executorch.sdk.inspector import (
+    analyze_bottlenecks,
+    analyze_event_block,
+    Event,
+    EventBlock,
+    PerfData,
+    summarize_op_timings,
+)
+from executorch.sdk.inspector._inspector_utils import TimeScale
+
+
+def _gen_event(
+    name: str,
+    raw: List[float],
+    instruction_id: int,
+    debug_handles: Optional[int] = None,
+) -> Event:
+    return Event(
+        name=name,
+        perf_data=PerfData(raw),
+        debug_handles=debug_handles,
+        _instruction_id=instruction_id,
+    )
+
+
+def _gen_profile_event(
+    name: str, instruction_id: int, start_time: int, end_time: int
+) -> flatcc.Event:
+    return flatcc.Event(
+        profile_event=flatcc.ProfileEvent(
+            name=name,
+            chain_index=0,
+            instruction_id=instruction_id,
+            delegate_debug_id_int=-1,
+            delegate_debug_id_str=None,
+            delegate_debug_metadata=None,
+            start_time=start_time,
+            end_time=end_time,
+        ),
+        allocation_event=None,
+        debug_event=None,
+    )
+
+
+def _gen_op_graph() -> OperatorGraph:
+    """
+    x -> mm (handle 1) -> relu (handle 2) -> add (handle 4)
+    x -> sin (handle 3) --------------------^
+    """
+    x = ValueNode("x", output_shapes=[[4, 8]], dtype="torch.float32")
+    w = ValueNode("w", output_shapes=[[8, 16]], dtype="torch.float32")
+    mm = OperatorNode(
+        "mm",
+        inputs=[x, w],
+        output_shapes=[[4, 16]],
+        metadata={"debug_handle": 1},
+        op="aten.mm.default",
+    )
+    relu = OperatorNode(
+        "relu",
+        inputs=[mm],
+        output_shapes=[[4, 16]],
+        metadata={"debug_handle": 2},
+        op="aten.relu.default",
+    )
+    sin = OperatorNode(
+        "sin",
+        inputs=[x],
+        output_shapes=[[4, 8]],
+        metadata={"debug_handle": 3},
+        op="aten.sin.default",
+    )
+    add = OperatorNode(
+        "add",
+        inputs=[relu, sin],
+        output_shapes=[[4, 16]],
+        metadata={"debug_handle": 4},
+        op="aten.add.Tensor",
+    )
+    return OperatorGraph(graph_name="graph", elements=[x, w, mm, relu, sin, add])
+
+
+class TestPerfAnalysis(unittest.TestCase):
+    def _gen_event_block(self) -> EventBlock:
+        return EventBlock(
+            name="Execute",
+            source_time_scale=TimeScale.NS,
+            target_time_scale=TimeScale.MS,
+            events=[
+                _gen_event("Method::execute", [20.0, 30.0], -1),
+                _gen_event("OPERATOR_CALL", [5.0, 6.0], 0, debug_handles=1),
+                _gen_event("native_call_mm.out", [4.0, 4.0], 0),
+                _gen_event("OPERATOR_CALL", [2.0, 2.0], 1, debug_handles=2),
+                _gen_event("native_call_relu.out", [1.0, 1.0], 1),
+                _gen_event("OPERATOR_CALL", [9.0, 9.0], 2, debug_handles=3),
+                _gen_event("native_call_sin.out", [8.0, 8.0], 2),
+                _gen_event("DELEGATE_CALL", [3.0, 3.0], 3, debug_handles=4),
+            ],
+        )
+
+    def test_run_breakdown(self) -> None:
+        analysis = analyze_event_block(self._gen_event_block())
+
+        self.assertEqual(len(analysis.runs), 2)
+        first_run = analysis.runs[0]
+        self.assertEqual(first_run.wall_time, 20.0)
+        self.assertEqual(first_run.kernel, 13.0)
+        self.assertEqual(first_run.framework_tax, 3.0)
+        self.assertEqual(first_run.delegate, 3.0)
+        self.assertEqual(first_run.unattributed, 1.0)
+        self.assertEqual(analysis.runs[1].framework_tax, 4.0)
+        self.assertEqual(analysis.runs[1].unattributed, 10.0)
+
+    def test_critical_path_without_op_graph_is_sequential(self) -> None:
+        analysis = analyze_event_block(self._gen_event_block())
+
+        self.assertEqual(len(analysis.critical_path), 4)
+        self.assertEqual(analysis.parallelism, 1.0)
+
+    def test_critical_path_with_op_graph(self) -> None:
+        analysis = analyze_event_block(self._gen_event_block(), _gen_op_graph())
+
+        # sin (9) + add (3) is longer than mm (5.5) + relu (2) + add (3)
+        self.assertEqual(
+            [op.instruction_id for op in analysis.critical_path], [2, 3]
+        )
+        self.assertEqual(analysis.critical_path_length, 12.0)
+        self.assertGreater(analysis.parallelism, 1.0)
+
+    def test_roofline_estimates(self) -> None:
+        analysis = analyze_event_block(self._gen_event_block(), _gen_op_graph())
+        mm = analysis.ops[0]
+
+        self.assertEqual(mm.op_types, ["aten.mm.default"])
+        self.assertEqual(mm.flops, 2 * 4 * 16 * 8)
+        self.assertEqual(mm.bytes_accessed, (4 * 8 + 8 * 16 + 4 * 16) * 4)
+        # Latency is 5.5ms
+        self.assertAlmostEqual(mm.achieved_bytes_per_s, mm.bytes_accessed / 5.5e-3)
+        self.assertEqual(mm.bound, "memory")
+        # Delegate calls have no roofline estimate
+        self.assertIsNone(analysis.ops[3].flops)
+
+    def test_analyze_bottlenecks_requires_both_peaks(self) -> None:
+        inspector = MagicMock(
+            event_blocks=[self._gen_event_block()], op_graph_dict=None
+        )
+        with self.assertRaises(ValueError):
+            analyze_bottlenecks(inspector, peak_flops_per_s=1e9)
+        with self.assertRaises(ValueError):
+            analyze_bottlenecks(inspector, peak_bytes_per_s=1e9)
+        with self.assertRaises(ValueError):
+            analyze_bottlenecks(inspector, peak_flops_per_s=1e9, peak_bytes_per_s=0)
+
+        analyses = analyze_bottlenecks(
+            inspector, peak_flops_per_s=1e9, peak_bytes_per_s=2e9
+        )
+        self.assertEqual(len(analyses), 1)
+
+    def test_summarize_op_timings(self) -> None:
+        events = []
+        for run in range(2):
+            start = run * 100_000_000
+            events += [
+                _gen_profile_event("Method::execute", -1, start, start + 30_000_000),
+                _gen_profile_event("OPERATOR_CALL", 0, start, start + 10_000_000),
+                _gen_profile_event(
+                    "native_call_add.out", 0, start, start + (run + 1) * 4_000_000
+                ),
+            ]
+        etdump = flatcc.ETDumpFlatCC(
+            version=0,
+            run_data=[
+                flatcc.RunData(
+                    name="Execute",
+                    bundled_input_index=-1,
+                    allocators=[],
+                    events=events,
+                )
+            ],
+        )
+        data = serialize_to_etdump_flatcc(etdump)
+        # The runtime produces size prefixed ETDumps.
+        timings = summarize_op_timings(memoryview(struct.pack("<I", len(data)) + data))
+
+        self.assertEqual(
+            set(timings), {"Method::execute", "OPERATOR_CALL[0]", "native_call_add.out"}
+        )
+        add = timings["native_call_add.out"]
+        self.assertEqual(add.count, 2)
+        self.assertEqual(add.min, 4.0)
+        self.assertEqual(add.max, 8.0)
+        self.assertEqual(add.mean, 6.0)
+        self.assertEqual(timings["Method::execute"].total, 60.0)
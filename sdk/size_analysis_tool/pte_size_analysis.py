@@ -0,0 +1,678 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Size analysis that only needs the serialized .pte file.
+
+The program flatbuffer is walked table by table (without flatc or the Python
+schema classes), so that every byte of the file can be attributed to one of
+a handful of categories: the file header, the execution plans (values,
+instructions, operators, delegates, stack traces), program level metadata,
+constant data, delegate blobs, and alignment padding. The categories always
+add up to the size of the file.
+"""
+
+import hashlib
+import struct
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from executorch.exir._serialize._program import _get_extended_header
+from executorch.sdk.etrecord import ETRecord
+
+# Field indices of the tables in schema/program.fbs. A union field takes two
+# slots: the type tag and the value.
+_PROGRAM_EXECUTION_PLAN = 1
+_PROGRAM_CONSTANT_BUFFER = 2
+_PROGRAM_BACKEND_DELEGATE_DATA = 3
+_PROGRAM_SEGMENTS = 4
+_PROGRAM_CONSTANT_SEGMENT = 5
+
+_PLAN_NAME = 0
+_PLAN_CONTAINER_META_TYPE = 1
+_PLAN_VALUES = 2
+_PLAN_INPUTS = 3
+_PLAN_OUTPUTS = 4
+_PLAN_CHAINS = 5
+_PLAN_OPERATORS = 6
+_PLAN_DELEGATES = 7
+_PLAN_NON_CONST_BUFFER_SIZES = 8
+
+_CHAIN_INPUTS = 0
+_CHAIN_OUTPUTS = 1
+_CHAIN_INSTRUCTIONS = 2
+_CHAIN_STACKTRACE = 3
+
+# ContainerMetadata: encoded_inp_str, encoded_out_str
+_CONTAINER_METADATA_STRINGS = (0, 1)
+# Frame: filename, lineno, name, context
+_FRAME_STRINGS = (0, 2, 3)
+
+_UNION_TYPE = 0
+_UNION_VALUE = 1
+
+_KERNEL_CALL = 1
+_DELEGATE_CALL = 2
+
+_TENSOR_TYPE = 5
+_TENSOR_SCALAR_TYPE = 0
+_TENSOR_SIZES = 2
+_TENSOR_DIM_ORDER = 3
+_TENSOR_CONSTANT_BUFFER_IDX = 5
+_TENSOR_ALLOCATION_INFO = 6
+
+_BACKEND_DELEGATE_ID = 0
+_BACKEND_DELEGATE_PROCESSED = 1
+_BACKEND_DELEGATE_COMPILE_SPECS = 2
+
+_DATA_LOCATION_INLINE = 0
+_DATA_LOCATION_SEGMENT = 1
+
+# Element sizes of the vectors found in the program, keyed by the EValue
+# union tag for the list types.
+_EVALUE_LIST_ELEMENT_SIZES = {
+    7: 8,  # IntList: [long]
+    8: 8,  # DoubleList: [double]
+    9: 1,  # BoolList: [bool]
+    10: 4,  # TensorList: [int]
+    11: 4,  # OptionalTensorList: [int]
+}
+_EVALUE_STRING_TYPE = 6
+
+# Bytes per element of each ScalarType in schema/scalar_type.fbs.
+_SCALAR_TYPE_SIZES = {
+    0: 1,  # BYTE
+    1: 1,  # CHAR
+    2: 2,  # SHORT
+    3: 4,  # INT
+    4: 8,  # LONG
+    5: 2,  # HALF
+    6: 4,  # FLOAT
+    7: 8,  # DOUBLE
+    11: 1,  # BOOL
+    12: 1,  # QINT8
+    13: 1,  # QUINT8
+    14: 4,  # QINT32
+    15: 2,  # BFLOAT16
+    16: 1,  # QUINT4X2
+    17: 1,  # QUINT2X4
+}
+
+# Categories that the bytes of a .pte file are attributed to.
+HEADER = "header"
+EXECUTION_PLANS = "execution_plans"
+PROGRAM_METADATA = "program_metadata"
+CONSTANTS = "constants"
+DELEGATE_BLOBS = "delegate_blobs"
+PADDING = "padding"
+
+
+class _FlatbufferReader:
+    """
+    Minimal reader of the flatbuffer binary format, which records the byte
+    ranges of every table, vtable, vector and string it visits so that
+    unvisited bytes can later be reported as padding.
+    """
+
+    def __init__(self, data: Union[bytes, memoryview], size: int) -> None:
+        self.data = memoryview(data)[:size]
+        self.size = size
+        # Start -> end of every visited object. Objects may be shared (e.g.
+        # identical vtables), in which case they are only counted once.
+        self.spans: Dict[int, int] = {}
+
+    def u32(self, pos: int) -> int:
+        return struct.unpack_from("<I", self.data, pos)[0]
+
+    def i32(self, pos: int) -> int:
+        return struct.unpack_from("<i", self.data, pos)[0]
+
+    def u64(self, pos: int) -> int:
+        return struct.unpack_from("<Q", self.data, pos)[0]
+
+    def record(self, start: int, end: int) -> int:
+        if start in self.spans:
+            return 0
+        self.spans[start] = end
+        return end - start
+
+    def root(self) -> int:
+        return self.u32(0)
+
+    def _vtable(self, table: int) -> int:
+        return table - self.i32(table)
+
+    def field(self, table: int, field_id: int) -> Optional[int]:
+        """Returns the absolute position of a field, or None if it is absent."""
+        vtable = self._vtable(table)
+        entry = 4 + 2 * field_id
+        if entry >= struct.unpack_from("<H", self.data, vtable)[0]:
+            return None
+        offset = struct.unpack_from("<H", self.data, vtable + entry)[0]
+        return table + offset if offset else None
+
+    def indirect(self, table: int, field_id: int) -> Optional[int]:
+        """Follows the offset stored in a table, vector or string field."""
+        pos = self.field(table, field_id)
+        return pos + self.u32(pos) if pos is not None else None
+
+    def scalar(self, table: int, field_id: int, fmt: str, default: int = 0) -> int:
+        pos = self.field(table, field_id)
+        return (
+            struct.unpack_from(fmt, self.data, pos)[0] if pos is not None else default
+        )
+
+    def vector(self, pos: Optional[int]) -> Tuple[int, int]:
+        """Returns the position of the first element and the length."""
+        if pos is None:
+            return 0, 0
+        return pos + 4, self.u32(pos)
+
+    def table_positions(self, pos: Optional[int]) -> List[int]:
+        start, length = self.vector(pos)
+        return [start + 4 * i + self.u32(start + 4 * i) for i in range(length)]
+
+    def string(self, pos: Optional[int]) -> str:
+        start, length = self.vector(pos)
+        return bytes(self.data[start : start + length]).decode("utf-8")
+
+    def table_bytes(self, table: int) -> int:
+        """Size of the inline part of a table and of its vtable."""
+        vtable = self._vtable(table)
+        vtable_size, table_size = struct.unpack_from("<HH", self.data, vtable)
+        return self.record(table, table + table_size) + self.record(
+            vtable, vtable + vtable_size
+        )
+
+    def vector_bytes(self, pos: Optional[int], element_size: int) -> int:
+        if pos is None:
+            return 0
+        return self.record(pos, pos + 4 + self.u32(pos) * element_size)
+
+    def string_bytes(self, pos: Optional[int]) -> int:
+        if pos is None:
+            return 0
+        # Strings are null terminated.
+        return self.record(pos, pos + 4 + self.u32(pos) + 1)
+
+    def table_vector_bytes(self, pos: Optional[int]) -> int:
+        """Size of a vector of tables, excluding the tables themselves."""
+        return self.vector_bytes(pos, 4)
+
+    def covered_bytes(self) -> int:
+        covered = 0
+        end = 0
+        for span_start, span_end in sorted(self.spans.items()):
+            span_start = max(span_start, end)
+            if span_end > span_start:
+                covered += span_end - span_start
+                end = span_end
+        return covered
+
+
+def _table_with_strings_bytes(
+    reader: _FlatbufferReader, table: int, string_fields: Tuple[int, ...]
+) -> int:
+    return reader.table_bytes(table) + sum(
+        reader.string_bytes(reader.indirect(table, field_id))
+        for field_id in string_fields
+    )
+
+
+def _evalue_bytes(reader: _FlatbufferReader, evalue: int) -> int:
+    num_bytes = reader.table_bytes(evalue)
+    val_type = reader.scalar(evalue, _UNION_TYPE, "<B")
+    val = reader.indirect(evalue, _UNION_VALUE)
+    if val is None:
+        return num_bytes
+    num_bytes += reader.table_bytes(val)
+    if val_type == _TENSOR_TYPE:
+        num_bytes += reader.vector_bytes(reader.indirect(val, _TENSOR_SIZES), 4)
+        num_bytes += reader.vector_bytes(reader.indirect(val, _TENSOR_DIM_ORDER), 1)
+        allocation_info = reader.indirect(val, _TENSOR_ALLOCATION_INFO)
+        if allocation_info is not None:
+            num_bytes += reader.table_bytes(allocation_info)
+    elif val_type == _EVALUE_STRING_TYPE:
+        num_bytes += reader.string_bytes(reader.indirect(val, 0))
+    elif val_type in _EVALUE_LIST_ELEMENT_SIZES:
+        num_bytes += reader.vector_bytes(
+            reader.indirect(val, 0), _EVALUE_LIST_ELEMENT_SIZES[val_type]
+        )
+    return num_bytes
+
+
+def _tensor_constant(
+    reader: _FlatbufferReader, evalue: int
+) -> Optional[Tuple[int, int]]:
+    """Returns (constant_buffer_idx, nbytes) if the value is a constant tensor."""
+    if reader.scalar(evalue, _UNION_TYPE, "<B") != _TENSOR_TYPE:
+        return None
+    tensor = reader.indirect(evalue, _UNION_VALUE)
+    if tensor is None:
+        return None
+    buffer_idx = reader.scalar(tensor, _TENSOR_CONSTANT_BUFFER_IDX, "<I")
+    # Index 0 is reserved for non-constant tensors.
+    if buffer_idx == 0:
+        return None
+    numel = 1
+    start, length = reader.vector(reader.indirect(tensor, _TENSOR_SIZES))
+    for i in range(length):
+        numel *= reader.i32(start + 4 * i)
+    scalar_type = reader.scalar(tensor, _TENSOR_SCALAR_TYPE, "<b")
+    return buffer_idx, numel * _SCALAR_TYPE_SIZES.get(scalar_type, 1)
+
+
+def _debug_handles_to_modules(etrecord: ETRecord) -> Dict[int, str]:
+    """Maps debug handles in the edge dialect program to their source module."""
+    modules: Dict[int, str] = {}
+    if etrecord.edge_dialect_program is None:
+        return modules
+    for node in etrecord.edge_dialect_program.graph_module.graph.nodes:
+        debug_handle = node.meta.get("debug_handle")
+        nn_module_stack = node.meta.get("nn_module_stack")
+        if debug_handle is None or not nn_module_stack:
+            continue
+        # The innermost module is the last entry of the stack.
+        modules[debug_handle] = list(nn_module_stack.values())[-1][0]
+    return modules
+
+
+def _instruction_modules(
+    etrecord: Optional[ETRecord],
+    modules: Dict[int, str],
+    plan_name: str,
+    instruction_id: int,
+) -> List[str]:
+    if etrecord is None or etrecord._debug_handle_map is None:
+        return []
+    plan_map = etrecord._debug_handle_map.get(plan_name, {})
+    debug_handles = plan_map.get(str(instruction_id), plan_map.get(instruction_id))
+    if debug_handles is None:
+        return []
+    if isinstance(debug_handles, int):
+        debug_handles = [debug_handles]
+    return sorted({modules[h] for h in debug_handles if h in modules})
+
+
+def generate_pte_size_information(  # noqa: C901
+    pte_data: Union[bytes, memoryview],
+    etrecord: Optional[ETRecord] = None,
+) -> Dict[str, Any]:
+    """
+    Attributes every byte of a serialized program (.pte) to the execution
+    plans, operators, constants, delegate blobs and padding it is made of.
+
+    Args:
+        pte_data: The contents of the .pte file.
+        etrecord: Optional ETRecord generated alongside the .pte. When given,
+            operator and constant bytes are also attributed to the source
+            modules (innermost nn_module_stack entry) they came from.
+
+    Returns:
+        A JSON serializable dictionary with the keys "overview",
+        "execution_plans", "operators", "constants", "delegate_blobs",
+        "segments" and, if an ETRecord was given, "source_modules".
+    """
+    file_size = len(pte_data)
+    eh = _get_extended_header(pte_data)
+    program_size = eh.program_size if eh is not None else file_size
+    reader = _FlatbufferReader(pte_data, program_size)
+
+    categories: Dict[str, int] = defaultdict(int)
+    # Root offset and file identifier, followed by the extended header.
+    categories[HEADER] += reader.record(0, 8)
+    if eh is not None:
+        categories[HEADER] += reader.record(8, 8 + eh.length)
+
+    program = reader.root()
+    categories[PROGRAM_METADATA] += reader.table_bytes(program)
+
+    modules = _debug_handles_to_modules(etrecord) if etrecord is not None else {}
+    module_bytes: Dict[str, Dict[str, int]] = defaultdict(
+        lambda: {"instruction_bytes": 0, "constant_bytes": 0}
+    )
+
+    # constant_buffer_idx -> (nbytes of the tensor, operators using it, modules)
+    constant_users: Dict[int, Dict[str, Any]] = defaultdict(
+        lambda: {"tensor_bytes": 0, "operators": set(), "source_modules": set()}
+    )
+    # (plan index, delegate index) -> backend id and data reference
+    delegate_references: List[Dict[str, Any]] = []
+    execution_plans: List[Dict[str, Any]] = []
+    operators: List[Dict[str, Any]] = []
+
+    plans_vector = reader.indirect(program, _PROGRAM_EXECUTION_PLAN)
+    categories[PROGRAM_METADATA] += reader.table_vector_bytes(plans_vector)
+    for plan in reader.table_positions(plans_vector):
+        plan_name = reader.string(reader.indirect(plan, _PLAN_NAME))
+        breakdown: Dict[str, int] = defaultdict(int)
+
+        breakdown["metadata"] += reader.table_bytes(plan)
+        breakdown["metadata"] += reader.string_bytes(reader.indirect(plan, _PLAN_NAME))
+        container_meta_type = reader.indirect(plan, _PLAN_CONTAINER_META_TYPE)
+        if container_meta_type is not None:
+            breakdown["metadata"] += _table_with_strings_bytes(
+                reader, container_meta_type, _CONTAINER_METADATA_STRINGS
+            )
+        for field_id, element_size in (
+            (_PLAN_INPUTS, 4),
+            (_PLAN_OUTPUTS, 4),
+            (_PLAN_NON_CONST_BUFFER_SIZES, 8),
+        ):
+            breakdown["metadata"] += reader.vector_bytes(
+                reader.indirect(plan, field_id), element_size
+            )
+
+        values_vector = reader.indirect(plan, _PLAN_VALUES)
+        values = reader.table_positions(values_vector)
+        breakdown["values"] += reader.table_vector_bytes(values_vector)
+        for value in values:
+            breakdown["values"] += _evalue_bytes(reader, value)
+
+        operators_vector = reader.indirect(plan, _PLAN_OPERATORS)
+        operator_names: List[str] = []
+        breakdown["operators"] += reader.table_vector_bytes(operators_vector)
+        for operator in reader.table_positions(operators_vector):
+            breakdown["operators"] += reader.table_bytes(operator)
+            name_pos = reader.indirect(operator, 0)
+            overload_pos = reader.indirect(operator, 1)
+            breakdown["operators"] += reader.string_bytes(name_pos)
+            breakdown["operators"] += reader.string_bytes(overload_pos)
+            name = reader.string(name_pos)
+            overload = reader.string(overload_pos)
+            operator_names.append(f"{name}.{overload}" if overload else name)
+
+        delegates_vector = reader.indirect(plan, _PLAN_DELEGATES)
+        delegate_ids: List[str] = []
+        breakdown["delegates"] += reader.table_vector_bytes(delegates_vector)
+        for delegate_index, delegate in enumerate(
+            reader.table_positions(delegates_vector)
+        ):
+            breakdown["delegates"] += reader.table_bytes(delegate)
+            id_pos = reader.indirect(delegate, _BACKEND_DELEGATE_ID)
+            breakdown["delegates"] += reader.string_bytes(id_pos)
+            delegate_ids.append(reader.string(id_pos))
+            processed = reader.indirect(delegate, _BACKEND_DELEGATE_PROCESSED)
+            if processed is not None:
+                breakdown["delegates"] += reader.table_bytes(processed)
+                delegate_references.append(
+                    {
+                        "execution_plan": plan_name,
+                        "delegate_index": delegate_index,
+                        "backend_id": delegate_ids[-1],
+                        "location": reader.scalar(processed, 0, "<b"),
+                        "index": reader.scalar(processed, 1, "<I"),
+                    }
+                )
+            compile_specs_vector = reader.indirect(
+                delegate, _BACKEND_DELEGATE_COMPILE_SPECS
+            )
+            breakdown["delegates"] += reader.table_vector_bytes(compile_specs_vector)
+            for compile_spec in reader.table_positions(compile_specs_vector):
+                breakdown["delegates"] += reader.table_bytes(compile_spec)
+                breakdown["delegates"] += reader.string_bytes(
+                    reader.indirect(compile_spec, 0)
+                )
+                breakdown["delegates"] += reader.vector_bytes(
+                    reader.indirect(compile_spec, 1), 1
+                )
+
+        # (operator name) -> number of calls and bytes of their instructions
+        operator_stats: Dict[str, Dict[str, Any]] = {}
+        chains_vector = reader.indirect(plan, _PLAN_CHAINS)
+        breakdown["instructions"] += reader.table_vector_bytes(chains_vector)
+        for chain in reader.table_positions(chains_vector):
+            breakdown["instructions"] += reader.table_bytes(chain)
+            for field_id in (_CHAIN_INPUTS, _CHAIN_OUTPUTS):
+                breakdown["instructions"] += reader.vector_bytes(
+                    reader.indirect(chain, field_id), 4
+                )
+
+            stacktrace_vector = reader.indirect(chain, _CHAIN_STACKTRACE)
+            breakdown["stacktrace"] += reader.table_vector_bytes(stacktrace_vector)
+            for frame_list in reader.table_positions(stacktrace_vector):
+                breakdown["stacktrace"] += reader.table_bytes(frame_list)
+                frames_vector = reader.indirect(frame_list, 0)
+                breakdown["stacktrace"] += reader.table_vector_bytes(frames_vector)
+                for frame in reader.table_positions(frames_vector):
+                    breakdown["stacktrace"] += _table_with_strings_bytes(
+                        reader, frame, _FRAME_STRINGS
+                    )
+
+            instructions_vector = reader.indirect(chain, _CHAIN_INSTRUCTIONS)
+            breakdown["instructions"] += reader.table_vector_bytes(instructions_vector)
+            for instruction_id, instruction in enumerate(
+                reader.table_positions(instructions_vector)
+            ):
+                num_bytes = reader.table_bytes(instruction)
+                instr_type = reader.scalar(instruction, _UNION_TYPE, "<B")
+                instr_args = reader.indirect(instruction, _UNION_VALUE)
+                args: List[int] = []
+                if instr_args is not None:
+                    num_bytes += reader.table_bytes(instr_args)
+                    if instr_type in (_KERNEL_CALL, _DELEGATE_CALL):
+                        args_pos = reader.indirect(instr_args, 1)
+                        num_bytes += reader.vector_bytes(args_pos, 4)
+                        start, length = reader.vector(args_pos)
+                        args = [reader.i32(start + 4 * i) for i in range(length)]
+                breakdown["instructions"] += num_bytes
+
+                if instr_type == _KERNEL_CALL:
+                    index = reader.scalar(instr_args, 0, "<i")
+                    name = operator_names[index]
+                elif instr_type == _DELEGATE_CALL:
+                    index = reader.scalar(instr_args, 0, "<i")
+                    name = f"delegate:{delegate_ids[index]}"
+                else:
+                    continue
+
+                instruction_modules = _instruction_modules(
+                    etrecord, modules, plan_name, instruction_id
+                )
+                stats = operator_stats.setdefault(
+                    name,
+                    {
+                        "execution_plan": plan_name,
+                        "name": name,
+                        "num_calls": 0,
+                        "instruction_bytes": 0,
+                        "constant_bytes": 0,
+                    },
+                )
+                stats["num_calls"] += 1
+                stats["instruction_bytes"] += num_bytes
+                for module in instruction_modules:
+                    module_bytes[module]["instruction_bytes"] += num_bytes // len(
+                        instruction_modules
+                    )
+
+                for arg in args:
+                    constant = _tensor_constant(reader, values[arg])
+                    if constant is None:
+                        continue
+                    buffer_idx, tensor_bytes = constant
+                    users = constant_users[buffer_idx]
+                    users["tensor_bytes"] = max(users["tensor_bytes"], tensor_bytes)
+                    users["operators"].add(name)
+                    users["source_modules"].update(instruction_modules)
+
+        plan_bytes = sum(breakdown.values())
+        categories[EXECUTION_PLANS] += plan_bytes
+        execution_plans.append(
+            {"name": plan_name, "num_bytes": plan_bytes, **breakdown}
+        )
+        operators.extend(operator_stats.values())
+
+    # Constant data, stored either inline in the flatbuffer or in a segment.
+    # Each entry is (index, location, data, size of the slot including padding).
+    constant_slots: List[Tuple[int, str, memoryview, int]] = []
+
+    segments_vector = reader.indirect(program, _PROGRAM_SEGMENTS)
+    categories[PROGRAM_METADATA] += reader.table_vector_bytes(segments_vector)
+    segments: List[Dict[str, Any]] = []
+    segment_base_offset = eh.segment_base_offset if eh is not None else program_size
+    for index, segment in enumerate(reader.table_positions(segments_vector)):
+        categories[PROGRAM_METADATA] += reader.table_bytes(segment)
+        segments.append(
+            {
+                "index": index,
+                "offset": segment_base_offset + reader.scalar(segment, 0, "<Q"),
+                "size": reader.scalar(segment, 1, "<Q"),
+                "kind": "unknown",
+            }
+        )
+
+    constant_buffer_vector = reader.indirect(program, _PROGRAM_CONSTANT_BUFFER)
+    categories[PROGRAM_METADATA] += reader.table_vector_bytes(constant_buffer_vector)
+    for index, buffer in enumerate(reader.table_positions(constant_buffer_vector)):
+        categories[PROGRAM_METADATA] += reader.table_bytes(buffer)
+        storage = reader.indirect(buffer, 0)
+        if storage is None:
+            continue
+        start, length = reader.vector(storage)
+        categories[PROGRAM_METADATA] += reader.record(storage, start)
+        categories[CONSTANTS] += reader.record(start, start + length)
+        if index > 0:
+            constant_slots.append(
+                (index, "inline", reader.data[start : start + length], length)
+            )
+
+    constant_segment = reader.indirect(program, _PROGRAM_CONSTANT_SEGMENT)
+    if constant_segment is not None:
+        categories[PROGRAM_METADATA] += reader.table_bytes(constant_segment)
+        offsets_pos = reader.indirect(constant_segment, 1)
+        categories[PROGRAM_METADATA] += reader.vector_bytes(offsets_pos, 8)
+        start, length = reader.vector(offsets_pos)
+        offsets = [reader.u64(start + 8 * i) for i in range(length)]
+        if offsets and segments:
+            segment = segments[reader.scalar(constant_segment, 0, "<I")]
+            segment["kind"] = "constants"
+            data = memoryview(pte_data)[
+                segment["offset"] : segment["offset"] + segment["size"]
+            ]
+            ends = offsets[1:] + [segment["size"]]
+            for index, (begin, end) in enumerate(zip(offsets, ends)):
+                if index > 0:
+                    constant_slots.append(
+                        (index, "segment", data[begin:end], end - begin)
+                    )
+
+    constants: List[Dict[str, Any]] = []
+    # Content hash -> index of the first constant with that content.
+    first_by_hash: Dict[Tuple[int, str], int] = {}
+    total_constant_bytes = 0
+    duplicate_constant_bytes = 0
+    for index, location, slot, slot_size in constant_slots:
+        users = constant_users.get(index)
+        num_bytes = users["tensor_bytes"] if users is not None else slot_size
+        num_bytes = min(num_bytes, slot_size)
+        key = (num_bytes, hashlib.sha1(slot[:num_bytes]).hexdigest())
+        duplicate_of = first_by_hash.setdefault(key, index)
+        total_constant_bytes += num_bytes
+        if duplicate_of != index:
+            duplicate_constant_bytes += num_bytes
+        source_modules = sorted(users["source_modules"]) if users is not None else []
+        for module in source_modules:
+            module_bytes[module]["constant_bytes"] += num_bytes // len(source_modules)
+        for op in operators:
+            if users is not None and op["name"] in users["operators"]:
+                op["constant_bytes"] += num_bytes
+        constants.append(
+            {
+                "index": index,
+                "location": location,
+                "num_bytes": num_bytes,
+                "padding_bytes": slot_size - num_bytes,
+                "duplicate_of": duplicate_of if duplicate_of != index else None,
+                "operators": sorted(users["operators"]) if users is not None else [],
+                "source_modules": source_modules,
+            }
+        )
+
+    delegate_blobs: List[Dict[str, Any]] = []
+    inline_data_vector = reader.indirect(program, _PROGRAM_BACKEND_DELEGATE_DATA)
+    categories[PROGRAM_METADATA] += reader.table_vector_bytes(inline_data_vector)
+    inline_data = reader.table_positions(inline_data_vector)
+    for inline in inline_data:
+        categories[PROGRAM_METADATA] += reader.table_bytes(inline)
+        data_pos = reader.indirect(inline, 0)
+        if data_pos is not None:
+            start, length = reader.vector(data_pos)
+            categories[PROGRAM_METADATA] += reader.record(data_pos, start)
+            categories[DELEGATE_BLOBS] += reader.record(start, start + length)
+    for reference in delegate_references:
+        location = reference.pop("location")
+        index = reference.pop("index")
+        if location == _DATA_LOCATION_INLINE:
+            _, num_bytes = reader.vector(reader.indirect(inline_data[index], 0))
+            reference["location"] = "inline"
+        elif location == _DATA_LOCATION_SEGMENT:
+            segments[index]["kind"] = "delegate"
+            num_bytes = segments[index]["size"]
+            reference["location"] = "segment"
+        else:
+            continue
+        delegate_blobs.append({**reference, "num_bytes": num_bytes})
+
+    # Everything in the flatbuffer that was not visited is alignment padding.
+    categories[PADDING] += program_size - reader.covered_bytes()
+
+    segment_bytes = 0
+    for segment in segments:
+        segment_bytes += segment["size"]
+        if segment["kind"] == "delegate":
+            categories[DELEGATE_BLOBS] += segment["size"]
+        elif segment["kind"] == "constants":
+            data_bytes = sum(
+                c["num_bytes"] for c in constants if c["location"] == "segment"
+            )
+            categories[CONSTANTS] += data_bytes
+            categories[PADDING] += segment["size"] - data_bytes
+        else:
+            categories[PROGRAM_METADATA] += segment["size"]
+    # Alignment between the flatbuffer and the segments, and between segments.
+    categories[PADDING] += file_size - program_size - segment_bytes
+
+    overview: Dict[str, Any] = {
+        "file_size": file_size,
+        "program_size": program_size,
+        **{
+            category: categories[category]
+            for category in (
+                HEADER,
+                EXECUTION_PLANS,
+                PROGRAM_METADATA,
+                CONSTANTS,
+                DELEGATE_BLOBS,
+                PADDING,
+            )
+        },
+        "unique_constant_bytes": total_constant_bytes - duplicate_constant_bytes,
+        "duplicate_constant_bytes": duplicate_constant_bytes,
+    }
+
+    size_information: Dict[str, Any] = {
+        "overview": overview,
+        "execution_plans": execution_plans,
+        "operators": sorted(
+            operators,
+            key=lambda op: op["instruction_bytes"] + op["constant_bytes"],
+            reverse=True,
+        ),
+        "constants": sorted(constants, key=lambda c: c["num_bytes"], reverse=True),
+        "delegate_blobs": delegate_blobs,
+        "segments": segments,
+    }
+    if etrecord is not None:
+        size_information["source_modules"] = sorted(
+            (
+                {"module": module, **num_bytes}
+                for module, num_bytes in module_bytes.items()
+            ),
+            key=lambda m: m["instruction_bytes"] + m["constant_bytes"],
+            reverse=True,
+        )
+    return size_information
@@ -13,6 +13,9 @@ import torch
 from executorch.exir import ExportedProgram
 from executorch.exir.backend.backend_api import LoweredBackendModule
 from executorch.sdk import parse_etrecord
+from executorch.sdk.size_analysis_tool.pte_size_analysis import (
+    generate_pte_size_information,
+)
 
 
 def _get_tensor_data(node: torch.fx.Node, tensor: torch.Tensor) -> Dict[str, Any]:
@@ -144,10 +147,20 @@ def parse_args():
 
     parser.add_argument(
         "--etrecord_path",
-        required=True,
+        default=None,
         help="The path to the ETRecord for the model to generate size information for",
     )
 
+    parser.add_argument(
+        "--pte_path",
+        default=None,
+        help=(
+            "The path to the serialized program (.pte) to generate size information "
+            "for. If --etrecord_path is also given, bytes are attributed to the "
+            "source modules recorded in the ETRecord"
+        ),
+    )
+
     parser.add_argument(
         "--output_path",
         default="model_size_information.json",
@@ -155,13 +168,24 @@ def parse_args():
     )
 
     args = parser.parse_args()
+    if args.etrecord_path is None and args.pte_path is None:
+        parser.error("At least one of --etrecord_path and --pte_path is required")
     return args
 
 
 def main():
     args = parse_args()
 
-    etrecord = parse_etrecord(args.etrecord_path)
+    etrecord = (
+        parse_etrecord(args.etrecord_path) if args.etrecord_path is not None else None
+    )
+
+    if args.pte_path is not None:
+        with open(args.pte_path, "rb") as f:
+            size_information = generate_pte_size_information(f.read(), etrecord)
+        with open(args.output_path, "w") as f:
+            f.write(json.dumps(size_information))
+        return
 
     all_model_size_information = [
         generate_model_size_information(
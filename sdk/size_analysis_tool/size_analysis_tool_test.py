@@ -14,12 +14,32 @@ from executorch.backends.xnnpack.utils.configs import (
     get_xnnpack_executorch_backend_config,
 )
 from executorch.backends.xnnpack.utils.utils import capture_graph_for_xnnpack
+from executorch.exir import to_edge
 from executorch.exir.backend.backend_api import to_backend, validation_disabled
 from executorch.exir.passes.spec_prop_pass import SpecPropPass
+from executorch.sdk.size_analysis_tool.pte_size_analysis import (
+    CONSTANTS,
+    DELEGATE_BLOBS,
+    EXECUTION_PLANS,
+    generate_pte_size_information,
+    HEADER,
+    PADDING,
+    PROGRAM_METADATA,
+)
 
 from executorch.sdk.size_analysis_tool.size_analysis_tool import (
     generate_model_size_information,
 )
+from torch.export import export
+
+_CATEGORIES = (
+    HEADER,
+    EXECUTION_PLANS,
+    PROGRAM_METADATA,
+    CONSTANTS,
+    DELEGATE_BLOBS,
+    PADDING,
+)
 
 
 class SizeAnalysisToolTest(unittest.TestCase):
@@ -113,3 +133,47 @@ class SizeAnalysisToolTest(unittest.TestCase):
 
         # Two delegate blobs: sigmoid and conv2d
         self.assertEqual(len(size_information["delegate_blob_data"]), 2)
+
+        pte_size_information = generate_pte_size_information(program.buffer)
+        overview = pte_size_information["overview"]
+        self.assertEqual(
+            sum(overview[category] for category in _CATEGORIES), len(program.buffer)
+        )
+        self.assertEqual(len(pte_size_information["delegate_blobs"]), 2)
+        self.assertEqual(
+            overview[DELEGATE_BLOBS],
+            sum(blob["num_bytes"] for blob in pte_size_information["delegate_blobs"]),
+        )
+
+    def test_generate_pte_size_information_attributes_constants(self):
+        class MyModel(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.a = torch.nn.Parameter(torch.arange(16, dtype=torch.float))
+                # Same contents as self.a.
+                self.b = torch.nn.Parameter(torch.arange(16, dtype=torch.float))
+
+            def forward(self, x):
+                return torch.mul(x, self.a) + torch.sub(x, self.b)
+
+        program = to_edge(export(MyModel(), (torch.ones(16),))).to_executorch()
+
+        size_information = generate_pte_size_information(program.buffer)
+        overview = size_information["overview"]
+
+        self.assertEqual(
+            sum(overview[category] for category in _CATEGORIES), len(program.buffer)
+        )
+        self.assertEqual(len(size_information["execution_plans"]), 1)
+        self.assertEqual(size_information["execution_plans"][0]["name"], "forward")
+        # The emitter already stores identical constants once, so both
+        # operators share a single constant.
+        self.assertEqual(overview["duplicate_constant_bytes"], 0)
+        self.assertEqual(overview["unique_constant_bytes"], 16 * 4)
+        self.assertEqual(len(size_information["constants"]), 1)
+        self.assertEqual(
+            size_information["constants"][0]["operators"],
+            ["aten::mul.out", "aten::sub.out"],
+        )
+        operator_names = {op["name"] for op in size_information["operators"]}
+        self.assertIn("aten::add.out", operator_names)
@@ -14,6 +14,7 @@ PORTABLE_MODULE_DEPS = [
     "//executorch/extension/aten_util:aten_bridge",
     "//executorch/sdk/bundled_program:runtime",
     "//executorch/extension/data_loader:buffer_data_loader",
+    "//executorch/extension/data_loader:file_data_loader",
     "//executorch/extension/data_loader:mmap_data_loader",
     "//executorch/extension/memory_allocator:malloc_memory_allocator",
     "//executorch/util:util",
@@ -27,6 +28,7 @@ ATEN_MODULE_DEPS = [
     "//executorch/runtime/core/exec_aten:lib",
     "//executorch/sdk/bundled_program/schema:bundled_program_schema_fbs",
     "//executorch/extension/data_loader:buffer_data_loader",
+    "//executorch/extension/data_loader:file_data_loader",
     "//executorch/extension/data_loader:mmap_data_loader",
     "//executorch/extension/memory_allocator:malloc_memory_allocator",
     "//executorch/util:read_file",